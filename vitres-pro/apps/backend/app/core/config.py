@@ -9,6 +9,15 @@ class Settings(BaseSettings):
     RESEND_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
 
+    # Pool de connexions (voir app/core/db_pool.py)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800  # secondes, sous le delai d'inactivite du pooler
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 = pas de limite
+    DB_NULL_POOL: bool = False  # PgBouncer en mode transaction : pas de pool local
+
     class Config:
         # On dit à Pydantic de chercher dans le dossier courant OU dans apps/backend
         env_file = [".env", "apps/backend/.env"]
@@ -0,0 +1,158 @@
+"""
+Pool de connexions Postgres : reglages (Settings) et telemetrie.
+
+Le pooler Supabase coupe les connexions inactives et, au pic de pointage du
+matin, les workers attendaient une connexion libre jusqu'au TimeoutError de
+QueuePool. Les reglages DB_* (config.py) s'appliquent aux deux moteurs
+(psycopg2 et asyncpg) :
+- DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT : taille et attente ;
+- DB_POOL_RECYCLE / DB_POOL_PRE_PING : connexions perimees ecartees ;
+- DB_STATEMENT_TIMEOUT_MS : statement_timeout pose a l'ouverture (0 = aucun) ;
+- DB_NULL_POOL : aucune connexion gardee cote application, pour un PgBouncer
+  en mode transaction qui fait deja le pooling.
+
+Chaque pool compte ses attentes (duree d'obtention d'une connexion, pre-ping
+et ouverture compris) ; pool_status() les expose pour /health/ready.
+
+/health/ready sonde la base par des moteurs sans pool (PROBE_OPTIONS) : une
+connexion neuve par sonde, qu'un pool sature ne fait pas attendre. Un pool
+plein n'est pas une panne ; son etat figure dans la reponse.
+"""
+import asyncio
+import threading
+import time
+
+from sqlalchemy import exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.core.config import settings
+
+
+class PoolTelemetry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.total_wait / attempts * 1000, 2) if attempts else 0.0,
+                "wait_max_ms": round(self.max_wait * 1000, 2),
+            }
+
+
+class _TimedPool:
+    """Mesure le temps passe dans connect() (attente d'une connexion libre)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.telemetry.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.telemetry.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async: bool = False) -> dict:
+    """Arguments de create_engine / create_async_engine tires de Settings."""
+    if settings.DB_NULL_POOL:
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# Moteurs de sonde : hors pool, ouverture bornee (secondes).
+PROBE_TIMEOUT = 2
+PROBE_OPTIONS = {"poolclass": NullPool}
+
+
+def probe_connect_args(is_async: bool = False) -> dict:
+    """connect_args bornant l'ouverture d'une connexion de sonde."""
+    return {"timeout": PROBE_TIMEOUT} if is_async else {"connect_timeout": PROBE_TIMEOUT}
+
+
+def statement_timeout_args(is_async: bool = False) -> dict:
+    """connect_args posant statement_timeout a l'ouverture de chaque connexion."""
+    if not settings.DB_STATEMENT_TIMEOUT_MS:
+        return {}
+    if is_async:
+        return {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+
+
+def pool_status(engine) -> dict:
+    """Etat instantane du pool d'un moteur (sync ou async) et ses attentes."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"mode": "null"}
+    status = {
+        "mode": "queue",
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+    telemetry = getattr(pool, "telemetry", None)
+    if telemetry is not None:
+        status.update(telemetry.snapshot())
+    return status
+
+
+async def probe(sync_engine, async_engine, timeout: float = PROBE_TIMEOUT) -> dict:
+    """SELECT 1 sur chaque moteur, en parallele : {"sync": bool, "async": bool}.
+
+    Le moteur synchrone tourne dans un thread ; connect_timeout (probe_connect_args)
+    borne son ouverture pour que le thread ne survive pas a la sonde."""
+    def ping_sync():
+        with sync_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def ping_async():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def ok(ping) -> bool:
+        try:
+            await asyncio.wait_for(ping, timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    sync_ok, async_ok = await asyncio.gather(ok(asyncio.to_thread(ping_sync)), ok(ping_async()))
+    return {"sync": sync_ok, "async": async_ok}
@@ -1,50 +1,86 @@
+from uuid import UUID
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.models.models import get_db, Employee
+from app.core import principal_cache
+from app.models.models import get_async_db, get_db, Employee
 
 security = HTTPBearer()
 
+def _decode_token(token: str) -> dict:
+    """Vérifie la signature et l'audience du JWT Supabase, renvoie le payload."""
+    try:
+        payload = jwt.decode(
+            token,
+            settings.JWT_SECRET,
+            algorithms=["HS256"],
+            audience="authenticated",
+            options={"verify_aud": True}
+        )
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token invalide ou expiré",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token invalide: ID manquant")
+    return payload
+
+def _unknown_employee() -> HTTPException:
+    # Si l'user est connecté sur Supabase mais n'est pas dans ta table employees
+    return HTTPException(
+        status_code=401,
+        detail="Utilisateur inconnu dans la table employés"
+    )
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db) #  On injecte la DB ici
 ) -> Employee:
     """
     Valide le token, récupère l'ID, et charge l'Employé depuis la DB.
+    Token déjà vu et encore valide : employé repris du cache (ni décodage, ni SELECT).
     """
     token = credentials.credentials
-    
+    key = principal_cache.token_key(token)
+    cached = principal_cache.get_principal(db, key)
+    if cached is not None:
+        return cached
+
+    payload = _decode_token(token)
+
+    # VÉRIFICATION EN BASE DE DONNÉES
+    # On cherche l'employé qui a cet ID Supabase exact
+    employee = db.query(Employee).filter(Employee.id == payload["sub"]).first()
+    if not employee:
+        raise _unknown_employee()
+
+    principal_cache.store_principal(key, employee, payload.get("exp"))
+    return employee #  On renvoie l'objet complet
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> Employee:
+    """Équivalent de get_current_user pour les routes async (session asyncpg)."""
+    token = credentials.credentials
+    key = principal_cache.token_key(token)
+    cached = principal_cache.cached_employee(key)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+
+    payload = _decode_token(token)
     try:
-        payload = jwt.decode(
-            token, 
-            settings.JWT_SECRET, 
-            algorithms=["HS256"], 
-            audience="authenticated",
-            options={"verify_aud": True} 
-        )
-        user_id = payload.get("sub")
-        
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Token invalide: ID manquant")
-
-        # VÉRIFICATION EN BASE DE DONNÉES
-        # On cherche l'employé qui a cet ID Supabase exact
-        employee = db.query(Employee).filter(Employee.id == user_id).first()
-        
-        if not employee:
-            # Si l'user est connecté sur Supabase mais n'est pas dans ta table employees
-            raise HTTPException(
-                status_code=401, 
-                detail="Utilisateur inconnu dans la table employés"
-            )
-            
-        return employee #  On renvoie l'objet complet
+        employee = await db.get(Employee, UUID(payload["sub"]))
+    except ValueError:
+        employee = None
+    if not employee:
+        raise _unknown_employee()
 
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token invalide ou expiré",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+    principal_cache.store_principal(key, employee, payload.get("exp"))
+    return employee
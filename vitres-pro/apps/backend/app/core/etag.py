@@ -0,0 +1,66 @@
+"""
+Reponses conditionnelles (ETag / If-None-Match) pour les listes que le mobile
+relit en boucle : calendrier, employes, clients, sous-zones, taux horaires.
+
+Principe : l'endpoint calcule d'abord un jeton de version bon marche (une
+seule requete SQL, sans charger d'objet ORM), puis appelle not_modified().
+Si le client possede deja cette version, on renvoie 304 immediatement :
+ni chargement de la liste, ni serialisation. Sinon l'ETag est pose sur la
+reponse normale.
+
+Jetons de version :
+- tables de reference : compteur resource_versions, incremente par trigger
+  a chaque ecriture (migration 027) -> resource_version("clients") ;
+- interventions : count + max(updated_at) sur la plage filtree, plus la
+  derniere suppression (tombstones) et les versions des tables embarquees.
+
+Usage dans un endpoint (parametres request: Request, response: Response) :
+    version = db.execute(select(resource_version("clients"))).scalar()
+    cached = not_modified(request, response, etag_for("clients", version))
+    if cached:
+        return cached
+    ...  # chargement et reponse normale, ETag deja pose
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+
+from app.models.models import ResourceVersion
+
+# no-cache : le client peut garder la reponse mais doit la revalider a chaque fois.
+CACHE_CONTROL = "private, no-cache"
+
+
+def resource_version(name: str):
+    """Sous-requete scalaire : version courante de la ressource (0 si inconnue)."""
+    return func.coalesce(
+        select(ResourceVersion.version).where(ResourceVersion.name == name).scalar_subquery(),
+        0,
+    )
+
+
+def etag_for(*parts) -> str:
+    """ETag faible derive des composants du jeton de version (ordre significatif)."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Comparaison faible (RFC 9110) : le prefixe W/ est ignore.
+    bare = etag.removeprefix("W/")
+    return "*" in candidates or any(c.removeprefix("W/") == bare for c in candidates)
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Pose l'ETag sur la reponse ; renvoie une 304 prete a retourner si le
+    client a deja cette version, sinon None (l'endpoint continue normalement)."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,114 @@
+"""
+Cache en memoire de l'utilisateur authentifie (get_current_user).
+
+Chaque appel de l'app mobile decode le JWT puis relit l'employe en base. Le
+token est le meme pendant toute sa duree de vie : on garde donc, par empreinte
+du token, une copie des colonnes de l'employe et on la rattache a la session de
+la requete sans SELECT.
+
+Bornes :
+- une entree expire a PRINCIPAL_TTL ou a l'expiration du token (exp), au plus tot ;
+- au plus PRINCIPAL_CACHE_SIZE entrees (LRU) ;
+- invalidate_principal(id) est appele par les routes qui modifient un employe
+  (update, delete, sync-profile, avatar). Le cache est propre au processus :
+  sur les autres workers, PRINCIPAL_TTL borne le retard (ex: changement de role).
+
+Seules les colonnes sont mises en cache ; les relations (absences, heures
+progressives...) restent chargees a la demande depuis la session.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.models.models import Employee
+
+PRINCIPAL_TTL = 60  # secondes
+PRINCIPAL_CACHE_SIZE = 1024
+
+_COLUMNS = tuple(attr.key for attr in sa_inspect(Employee).column_attrs)
+
+# empreinte du token -> (echeance monotonic, id employe, colonnes)
+_entries: "OrderedDict[str, Tuple[float, UUID, dict]]" = OrderedDict()
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_principal(db: Session, key: str) -> Optional[Employee]:
+    """Employe en cache pour ce token, rattache a la session ; None si absent ou expire."""
+    employee = cached_employee(key)
+    if employee is None:
+        return None
+    # load=False : l'objet devient persistant dans la session sans requete ;
+    # les modifications faites par la route sont commitees normalement.
+    return db.merge(employee, load=False)
+
+
+def cached_employee(key: str) -> Optional[Employee]:
+    """Employe en cache, detache : a rattacher avec merge(load=False) (les
+    routes async passent par AsyncSession.merge)."""
+    global _hits, _misses
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                del _entries[key]
+            _misses += 1
+            return None
+        _entries.move_to_end(key)
+        _hits += 1
+        values = copy.deepcopy(entry[2])
+
+    employee = sa_inspect(Employee).class_manager.new_instance()
+    for column, value in values.items():
+        set_committed_value(employee, column, value)
+    make_transient_to_detached(employee)
+    return employee
+
+
+def store_principal(key: str, employee: Employee, token_exp: Optional[float]) -> None:
+    ttl = PRINCIPAL_TTL
+    if token_exp is not None:
+        ttl = min(ttl, token_exp - time.time())
+    if ttl <= 0:
+        return
+    values = copy.deepcopy({column: getattr(employee, column) for column in _COLUMNS})
+    with _lock:
+        _entries[key] = (time.monotonic() + ttl, employee.id, values)
+        _entries.move_to_end(key)
+        while len(_entries) > PRINCIPAL_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def invalidate_principal(employee_id) -> None:
+    """Oublie tous les tokens en cache de cet employe (apres toute ecriture sur lui)."""
+    employee_id = UUID(str(employee_id))
+    with _lock:
+        for key in [k for k, entry in _entries.items() if entry[1] == employee_id]:
+            del _entries[key]
+
+
+def clear() -> None:
+    global _hits, _misses
+    with _lock:
+        _entries.clear()
+        _hits = _misses = 0
+
+
+def stats() -> dict:
+    with _lock:
+        return {"hits": _hits, "misses": _misses, "size": len(_entries)}
@@ -1,11 +1,14 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text, Numeric, create_engine, Table, Float, Date, Time, Integer, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Text, Numeric, create_engine, Table, Float, Date, Time, Integer, UniqueConstraint, Index, text, BigInteger, FetchedValue
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, deferred
 from sqlalchemy.sql import func
 import uuid
 from app.core.config import settings
+from app.core.db_pool import PROBE_OPTIONS, engine_options, probe_connect_args, statement_timeout_args
 
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, connect_args=statement_timeout_args(), **engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -16,11 +19,47 @@ def get_db():
     finally:
         db.close()
 
+
+# --- MOTEUR ASYNCHRONE (asyncpg) ---
+# Pour les routes "async def" les plus appelees : elles attendent la base sans
+# occuper un thread du threadpool (partage avec les appels Storage/Google).
+SUPABASE_TRANSACTION_POOLER_PORT = 6543
+
+def _async_url(url: str):
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    if "sslmode" in query:
+        # asyncpg ne connait pas sslmode, mais accepte les memes valeurs via ssl.
+        query["ssl"] = query.pop("sslmode")
+    if url.port == SUPABASE_TRANSACTION_POOLER_PORT:
+        # PgBouncer en mode transaction : pas de requetes preparees persistantes.
+        query["prepared_statement_cache_size"] = "0"
+    return url.set(query=query)
+
+_async_db_url = _async_url(settings.DATABASE_URL)
+_async_connect_args = statement_timeout_args(is_async=True)
+if _async_db_url.port == SUPABASE_TRANSACTION_POOLER_PORT:
+    _async_connect_args["statement_cache_size"] = 0
+async_engine = create_async_engine(_async_db_url, connect_args=_async_connect_args, **engine_options(is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Sondes de /health/ready (app/core/db_pool.py) : memes bases, hors pool.
+probe_engine = create_engine(settings.DATABASE_URL, connect_args=probe_connect_args(), **PROBE_OPTIONS)
+async_probe_engine = create_async_engine(
+    _async_db_url, connect_args={**_async_connect_args, **probe_connect_args(is_async=True)}, **PROBE_OPTIONS
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # --- TABLES D'ASSOCIATION (Many-to-Many) ---
 intervention_employees = Table(
     'intervention_employees', Base.metadata,
     Column('intervention_id', UUID(as_uuid=True), ForeignKey('interventions.id'), primary_key=True),
-    Column('employee_id', UUID(as_uuid=True), ForeignKey('employees.id'), primary_key=True)
+    Column('employee_id', UUID(as_uuid=True), ForeignKey('employees.id'), primary_key=True),
+    # La PK commence par intervention_id : "mes interventions" (employees.any) a besoin de l'inverse.
+    Index('idx_intervention_employees_employee', 'employee_id', 'intervention_id'),
 )
 
 raw_event_employees = Table(
@@ -154,6 +193,10 @@ class Client(Base):
     notes = Column(Text, nullable=True)
     sub_zone = Column(String(60), nullable=True)  # code sous-zone ex: "HAINAUT_BRAINE_TUBIZE"
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Recherche : calcules par trigger (migration 026), jamais ecrits par l'ORM
+    search_document = deferred(Column(Text, nullable=True))
+    search_digits = deferred(Column(Text, nullable=True))
     
     interventions = relationship("Intervention", back_populates="client")
     services = relationship("ClientService", back_populates="client", cascade="all, delete-orphan", order_by="ClientService.position")
@@ -210,7 +253,7 @@ class Intervention(Base):
     __tablename__ = "interventions"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=True)
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id"), nullable=True, index=True)
 
     type = Column(String(20), default="intervention", nullable=False)
     title = Column(String, nullable=False)
@@ -232,6 +275,11 @@ class Intervention(Base):
     hourly_rate_id = Column(UUID(as_uuid=True), ForeignKey("hourly_rates.id", ondelete="SET NULL"), nullable=True)
     hourly_rate = relationship("HourlyRate")
 
+    # Copie de tour_run.publication_status : "none" (pas de tournee) | "draft" | "published".
+    # Evite les EXISTS correles sur tour_runs a chaque lecture du calendrier ;
+    # posee par le routeur tours (brouillon, publication).
+    tour_visibility = Column(String(10), default="none", nullable=False, server_default="none")
+
     # Reprise RDV
     reprise_taken = Column(Boolean, nullable=True)
     reprise_note = Column(Text, nullable=True)
@@ -252,6 +300,13 @@ class Intervention(Base):
     # CETTE intervention, celle qui encaisse) : exclu du calcul des heures
     # planifiees (taux horaire), inclus dans price_estimated.
     carried_over_deferred_amount = Column(Numeric(10, 2), nullable=True)
+    # Heures comptees dans la charge planifiee (planning.intervention_hours),
+    # tenues a jour par trigger (migration 031) : jamais ecrites par l'ORM.
+    # Relues apres INSERT / UPDATE de la ligne ; un recalcul declenche par
+    # les prestations ou le taux n'est visible qu'apres le commit.
+    planned_hours = Column(
+        Float, nullable=False, server_default=text("0"), server_onupdate=FetchedValue(),
+    )
 
     # Renfort : intervention légère créée pour qu'un employé vienne épauler une
     # intervention préexistante assignée à un(des) autre(s) employé(s), sans
@@ -327,12 +382,20 @@ class Intervention(Base):
     recurrence_rule = Column(JSONB, nullable=True)   # {"freq":"weekly","interval":1,"count":12}
     recurrence_group_id = Column(UUID(as_uuid=True), nullable=True, index=True)
 
-    # Horodatage de modification : delta-sync et diagnostic de conflit (mode hors-connexion)
+    # Recherche : texte normalise et chiffres seuls, calcules par trigger
+    # (migration 026) a chaque ecriture, jamais ecrits par l'ORM. Differes :
+    # inutiles partout ailleurs que dans la clause WHERE de /search.
+    search_document = deferred(Column(Text, nullable=True))
+    search_digits = deferred(Column(Text, nullable=True))
+
+    # Horodatage de modification : delta-sync et diagnostic de conflit (mode hors-connexion).
+    # Aussi avance par trigger quand items, employes assignes ou tournee changent (migration 023).
     updated_at = Column(
         DateTime(timezone=True),
         server_default=func.now(),
         onupdate=func.now(),
         nullable=True,
+        index=True,
     )
 
     # Relations
@@ -343,6 +406,15 @@ class Intervention(Base):
     notes = relationship("InterventionNote", back_populates="intervention", cascade="all, delete-orphan", order_by="InterventionNote.created_at")
     tour_run = relationship("TourRun", back_populates="intervention", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
 
+    __table_args__ = (
+        # Lectures calendrier : brouillons de tournee exclus de l'index (migration 024)
+        Index("idx_interventions_visible_start", "start_time", postgresql_where=text("tour_visibility <> 'draft'")),
+        # Plages par zone / sous-zone : listes non-admin, stats, assignation en masse (migration 025)
+        Index("idx_interventions_start_time", "start_time"),
+        Index("idx_interventions_zone_start", "zone", "start_time", postgresql_where=text("tour_visibility <> 'draft'")),
+        Index("idx_interventions_sub_zone_start", "sub_zone", "start_time", postgresql_where=text("tour_visibility <> 'draft'")),
+    )
+
 
 class InterventionNote(Base):
     """Fil de notes horodatées sur une intervention, canal admin <-> employé(s) assigné(s)."""
@@ -451,6 +523,32 @@ class CashSettlement(Base):
     )
 
 
+class WeeklyHoursVersion(Base):
+    """Version d'une semaine ISO d'un employé, incrémentée par trigger
+    (migration 033) à chaque écriture qui change ses heures réelles :
+    pointages, absences, montées en charge."""
+    __tablename__ = "weekly_hours_versions"
+
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # lundi
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class WeeklyHoursLedger(Base):
+    """Heures réelles et écart au plancher d'une semaine terminée, base du
+    solde heures sup : recalculé à la lecture quand il est périmé, voir
+    _weekly_hours dans app/routers/timetracking.py et la migration 033."""
+    __tablename__ = "weekly_hours_ledger"
+
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # lundi
+    actual_hours = Column(Float, nullable=False)
+    delta_hours = Column(Float, nullable=False)
+    version = Column(BigInteger, nullable=False)
+    profile = Column(Text, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class RawCalendarEvent(Base):
     """Événement brut importé depuis Google Calendar, non encore structuré."""
     __tablename__ = "raw_calendar_events"
@@ -502,6 +600,141 @@ class ClientOperation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
+class ResourceVersion(Base):
+    """
+    Compteur de version d'une table de reference (employees, clients, zones,
+    hourly_rates), incremente par trigger a chaque ecriture (migration 027).
+    Sert de base aux ETag : voir app/core/etag.py.
+    """
+    __tablename__ = "resource_versions"
+
+    name = Column(Text, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class InterventionTombstone(Base):
+    """
+    Trace d'une intervention supprimee, pour le delta-sync du mobile.
+
+    Alimentee par trigger (migration 023) sur tout DELETE d'interventions :
+    suppression simple, d'une serie ou d'un brouillon de tournee. Le mobile
+    retire de son cache les ids recus dans /api/interventions/changes.
+    """
+    __tablename__ = "intervention_tombstones"
+
+    intervention_id = Column(UUID(as_uuid=True), primary_key=True)
+    zone = Column(String(20), nullable=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class InterventionUnassignment(Base):
+    """
+    Desassignation d'un employe, pour le delta-sync du mobile.
+
+    Alimentee par trigger (migration 035) sur tout DELETE / UPDATE
+    d'intervention_employees : /api/interventions/changes retire ces
+    interventions du cache de l'employe si elles ne lui sont plus visibles.
+    """
+    __tablename__ = "intervention_unassignments"
+
+    intervention_id = Column(UUID(as_uuid=True), primary_key=True)
+    employee_id = Column(UUID(as_uuid=True), primary_key=True)
+    unassigned_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class RecurringSeries(Base):
+    """
+    Serie recurrente "a l'infini" (migration 029) : regle + modele des
+    occurrences. Seules les occurrences avant materialized_until (et celles
+    ouvertes a la demande) existent dans interventions ; les suivantes sont
+    calculees a la lecture, voir app/services/recurrence.py.
+    """
+    __tablename__ = "recurring_series"
+
+    id = Column(UUID(as_uuid=True), primary_key=True)  # = Intervention.recurrence_group_id
+    rule = Column(JSONB, nullable=False)
+    dtstart = Column(DateTime(timezone=True), nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    # Champs copies sur chaque occurrence, plus "employee_ids" et "items".
+    template = Column(JSONB, nullable=False)
+    until = Column(DateTime(timezone=True), nullable=True)
+    materialized_until = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class RecurringSeriesChange(Base):
+    """
+    Dernier changement d'une serie sans fin, pour le delta-sync du mobile.
+
+    Alimentee par trigger (migration 036) a la creation, la suppression et
+    a toute modification des colonnes qui definissent les occurrences :
+    /api/interventions/changes renvoie l'id de la serie pour que le client
+    recharge ses occurrences calculees. employee_ids cumule les employes
+    assignes avant et apres chaque changement.
+    """
+    __tablename__ = "recurring_series_changes"
+
+    series_id = Column(UUID(as_uuid=True), primary_key=True)
+    employee_ids = Column(ARRAY(UUID(as_uuid=True)), nullable=False, server_default="{}")
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+
+class PlanningDayVersion(Base):
+    """
+    Version d'un jour calendaire belge, incrementee par trigger (migration 030)
+    a chaque ecriture qui change sa charge ou sa capacite : interventions,
+    prestations, absences, fermetures, montees en charge.
+    """
+    __tablename__ = "planning_day_versions"
+
+    day = Column(Date, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class PlanningDayStats(Base):
+    """
+    Cumul journalier du planning pour une zone / sous-zone ('' = toutes),
+    recalcule en memoire a la lecture quand il est perime et reenregistre par
+    le planificateur : voir planning_stats() et refresh_stats_job() dans
+    app/routers/planning.py, et les migrations 030 et 037.
+    """
+    __tablename__ = "planning_day_stats"
+
+    zone = Column(Text, primary_key=True, default="")
+    sub_zone = Column(Text, primary_key=True, default="")
+    day = Column(Date, primary_key=True)
+    capacity_hours = Column(Float, nullable=False)
+    planned_hours = Column(Float, nullable=False)
+    present_employees = Column(Integer, nullable=False)
+    closed = Column(Boolean, nullable=False, default=False)
+    day_version = Column(BigInteger, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class MonthlyRevenue(Base):
+    """
+    Chiffre d'affaires des interventions "done" par mois belge, zone, mode de
+    paiement et employe qui a cloture. Tenu a jour par trigger sur
+    interventions (migration 032) : jamais ecrit par l'application.
+    """
+    __tablename__ = "monthly_revenue"
+    __table_args__ = (
+        UniqueConstraint("month", "zone", "payment_mode", "closed_by_employee_id", name="uq_monthly_revenue_key"),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    month = Column(Date, nullable=False)  # 1er du mois
+    zone = Column(String(20), nullable=True)
+    payment_mode = Column(String(20), nullable=False)
+    closed_by_employee_id = Column(UUID(as_uuid=True), nullable=True)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    cash_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    invoice_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    interventions = Column(Integer, nullable=False, default=0)
+
+
 # --- TOURNEES RECURRENTES ---
 
 class TourTemplate(Base):
@@ -522,6 +755,8 @@ class TourTemplate(Base):
     active = Column(Boolean, default=False, nullable=False, server_default="false")
     archived = Column(Boolean, default=False, nullable=False, server_default="false")
     source_document = Column(Text, nullable=True)
+    # Brouillons generes avant cette date (exclue), NULL = aucun (migration 034).
+    drafts_until = Column(Date, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
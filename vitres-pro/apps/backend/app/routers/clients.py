@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
 from app.models.models import get_db, Client, Intervention, ClientService
 from app.schemas.schemas import ClientCreate, ClientOut, ClientOutLite, ClientServiceCreate, ClientServiceOut, ClientServiceUpdate
 from app.core.deps import get_current_user
+from app.core.etag import etag_for, not_modified, resource_version
 from app.core.idempotency import already_processed, record_operation
 from pydantic import BaseModel
 
@@ -36,9 +38,15 @@ def create_client(
 
 @router.get("", response_model=List[ClientOutLite])
 def read_clients(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    etag = etag_for("clients", db.execute(select(resource_version("clients"))).scalar())
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
     return db.query(Client).all()
 
 @router.get("/count")
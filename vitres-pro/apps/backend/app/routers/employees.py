@@ -1,11 +1,12 @@
 import secrets
 from io import BytesIO
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from uuid import UUID
-from datetime import date
+from datetime import date, datetime
 from pydantic import BaseModel
 from PIL import Image, ImageOps
 
@@ -14,7 +15,11 @@ from pydantic import field_validator
 from app.models.models import get_db, Employee
 from app.schemas.schemas import EmployeeBase, EmployeeOut, EmployeeUpdate, validate_hours_per_weekday
 from app.core.deps import get_current_user
+from app.core.etag import etag_for, not_modified, resource_version
+from app.routers.planning import BRUSSELS_TZ
 from app.core.supabase import supabase_admin
+from app.core.principal_cache import invalidate_principal
+from app.services.notifications import invalidate_admin_ids
 
 router = APIRouter()
 
@@ -77,9 +82,17 @@ class PasswordResetRequest(BaseModel):
 
 @router.get("", response_model=List[EmployeeOut])
 def read_employees(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
+    # Le jour fait partie du jeton : les URLs d'avatar signées expirent (7 jours),
+    # une liste gardée en cache plus d'un jour doit être rechargée.
+    version = db.execute(select(resource_version("employees"))).scalar()
+    cached = not_modified(request, response, etag_for("employees", version, datetime.now(BRUSSELS_TZ).date()))
+    if cached:
+        return cached
     return [_employee_out(emp) for emp in db.query(Employee).all()]
 
 @router.get("/me", response_model=EmployeeOut)
@@ -123,6 +136,7 @@ def upload_my_avatar(
 
     current_user.avatar_path = path
     db.commit()
+    invalidate_principal(current_user.id)
     db.refresh(current_user)
     return _employee_out(current_user)
 
@@ -139,6 +153,7 @@ def delete_my_avatar(
             pass
         current_user.avatar_path = None
         db.commit()
+        invalidate_principal(current_user.id)
         db.refresh(current_user)
     return _employee_out(current_user)
 
@@ -196,6 +211,7 @@ def create_employee(
         db.add(new_employee)
         db.commit()
         db.refresh(new_employee)
+        invalidate_admin_ids()
     except Exception as e:
         # Nettoyage si échec DB
         try:
@@ -222,6 +238,8 @@ def sync_profile(
         setattr(current_user, k, v)
     
     db.commit()
+    invalidate_admin_ids()
+    invalidate_principal(current_user.id)
     db.refresh(current_user)
     return current_user
 
@@ -257,6 +275,9 @@ def update_employee(
         setattr(db_obj, field, update_data[field])
 
     db.commit()
+    invalidate_principal(db_obj.id)
+    if "role" in update_data:
+        invalidate_admin_ids()
     db.refresh(db_obj)
     return db_obj
 
@@ -311,6 +332,8 @@ def delete_employee(
         # 3. Supprimer l'employé de la base de données
         db.delete(employee_to_delete)
         db.commit()
+        invalidate_admin_ids()
+        invalidate_principal(employee_id)
     except Exception as e:
         db.rollback()
         print(f"Erreur DB: {e}")
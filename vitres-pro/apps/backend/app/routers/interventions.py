@@ -1,26 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy.sql import func, or_
+from sqlalchemy import case, delete, insert, select, true, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.sql import func
 from typing import Dict, List, Literal, Optional
 from uuid import UUID
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 import math
 import re
 import uuid
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 from app.models.models import (
-    get_db, Intervention, Client, Employee, InterventionItem,
-    intervention_employees, RawCalendarEvent, AuditLog, InAppNotification,
-    InterventionService, InterventionNote, TourRun
+    get_db, get_async_db, Intervention, Client, Employee, InterventionItem, HourlyRate, TourRunStop,
+    intervention_employees, RawCalendarEvent, AuditLog,
+    InterventionService, InterventionNote, TourRun, InterventionTombstone, InterventionUnassignment, RecurringSeries,
+    RecurringSeriesChange,
 )
 from app.schemas.schemas import (
-    InterventionCreate, InterventionOut, InterventionRecurringCreate,
+    InterventionCreate, InterventionOut, InterventionRecurringCreate, InterventionChangesOut,
+    InterventionCalendarOut,
     InterventionServiceCreate, InterventionServiceOut, InterventionServiceUpdate,
     InterventionNoteCreate, InterventionNoteOut,
+    ClientOutLite, EmployeeOut, HourlyRateOut, InterventionItemOut,
 )
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_current_user_async
+from app.core.etag import etag_for, not_modified, resource_version
 from app.core.idempotency import already_processed, record_operation
+from app.routers.planning import _utc_bounds
+from app.services.notifications import notify, notify_admins
+from app.services.recurrence import (
+    TEMPLATE_FIELDS, expandable_rule, find_occurrence, horizon_end, insert_occurrences, materialize,
+    materialize_occurrence, occurrence_id, series_template, template_items, virtual_occurrences,
+)
 
 router = APIRouter()
 
@@ -63,10 +77,6 @@ class ReinforcementCreate(BaseModel):
     time_tbd: bool = True
     start_time: Optional[datetime] = None
 
-def is_admin(user_id: str, db: Session) -> bool:
-    emp = db.query(Employee).filter(Employee.id == user_id).first()
-    return emp.role == 'admin' if emp else False
-
 def _strip_prices(interventions: List[Intervention]) -> None:
     """Neutralise les prix en mémoire (non commité) pour les sous-traitants,
     qui ne doivent jamais voir de montants."""
@@ -76,8 +86,9 @@ def _strip_prices(interventions: List[Intervention]) -> None:
         for item in iv.items:
             item.price = 0
 
-def _load_intervention(intervention_id: UUID, db: Session) -> Intervention:
-    return db.query(Intervention).options(
+def _with_out_relations(query):
+    """Charge d'avance tout ce que sérialise InterventionOut (évite le N+1)."""
+    return query.options(
         selectinload(Intervention.client),
         selectinload(Intervention.employees),
         selectinload(Intervention.items),
@@ -85,7 +96,252 @@ def _load_intervention(intervention_id: UUID, db: Session) -> Intervention:
         selectinload(Intervention.tour_run).selectinload(TourRun.stops),
         selectinload(Intervention.reinforcement_for).selectinload(Intervention.employees),
         selectinload(Intervention.reinforcements).selectinload(Intervention.employees),
-    ).filter(Intervention.id == intervention_id).first()
+    )
+
+def _visible_to(query, current_user: Employee):
+    """Filtres de visibilité communs aux listes : brouillons de tournée masqués,
+    aucune tournée pour les sous-traitants, et hors admin seulement les
+    interventions de sa zone auxquelles on est assigné."""
+    query = query.filter(Intervention.tour_visibility != "draft")
+    if current_user.role == "subcontractor":
+        query = query.filter(Intervention.tour_visibility == "none")
+    if current_user.role != 'admin':
+        query = query.filter(
+            Intervention.zone == current_user.zone,
+            Intervention.employees.any(id=current_user.id),
+        )
+    return query
+
+def _parse_bound(value: Optional[str]) -> Optional[datetime]:
+    """Borne ISO du calendrier ; une valeur illisible est ignorée (pas de filtre)."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def _calendar_filters(query, current_user: Employee, start: Optional[datetime], end: Optional[datetime]):
+    """Visibilité + plage [start, end] : commun à la liste complète (Query ORM),
+    à la projection calendrier et au jeton ETag (select Core)."""
+    query = _visible_to(query, current_user)
+    if start:
+        query = query.filter(Intervention.start_time >= start)
+    if end:
+        query = query.filter(Intervention.start_time <= end)
+    return query
+
+def _in_calendar_range(query, current_user: Employee, start: Optional[datetime], end: Optional[datetime]):
+    return _calendar_filters(query, current_user, start, end).order_by(Intervention.start_time.asc())
+
+def _calendar_version(current_user: Employee, start: Optional[datetime], end: Optional[datetime]):
+    """Jeton de version de la plage visible, en une requête sans objet ORM :
+    nombre et dernier updated_at (avancé aussi par items, assignations et
+    tournée, migration 023), dernière suppression, et versions des tables
+    embarquées dans la réponse (employés, clients, taux horaires), plus
+    celle des séries dont on calcule les occurrences."""
+    return _calendar_filters(
+        select(
+            func.count(Intervention.id),
+            func.max(Intervention.updated_at),
+            select(func.max(InterventionTombstone.deleted_at)).scalar_subquery(),
+            resource_version("employees"),
+            resource_version("clients"),
+            resource_version("hourly_rates"),
+            resource_version("recurring_series"),
+        ),
+        current_user, start, end,
+    )
+
+def _calendar_etag(db: Session, view: str, current_user: Employee, start: Optional[datetime], end: Optional[datetime]) -> str:
+    version = db.execute(_calendar_version(current_user, start, end)).one()
+    return etag_for(view, current_user.id, current_user.role, start, end, *version)
+
+def _out_columns(model, schema) -> list:
+    """Colonnes de la table de `model` que sérialise `schema` (select Core)."""
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields if name in table.c]
+
+def _calendar_query(current_user: Employee, start: Optional[datetime], end: Optional[datetime]):
+    """Liste calendrier (GET /api/interventions), bornes incluses, en select
+    Core. Forme couverte par tests/test_query_plans.py (index, jamais de Seq Scan)."""
+    columns = select(*_out_columns(Intervention, InterventionOut), Intervention.client_id)
+    return _in_calendar_range(columns, current_user, start, end)
+
+def _reinforcement_arrivals(reinforcements, employees_by_intervention) -> list:
+    """Intervention.reinforcement_employees sur des lignes Core : employés des
+    renforts, dédupliqués, avec l'heure précise la plus proche s'il y en a."""
+    entries: dict = {}
+    for r in reinforcements:
+        candidate_time = None if r["time_tbd"] else r["start_time"]
+        for emp in employees_by_intervention.get(r["id"], []):
+            existing = entries.get(emp["id"])
+            if existing is None:
+                entries[emp["id"]] = {**emp, "reinforcement_start_time": candidate_time}
+            elif candidate_time is not None and (
+                existing["reinforcement_start_time"] is None or candidate_time < existing["reinforcement_start_time"]
+            ):
+                existing["reinforcement_start_time"] = candidate_time
+    return list(entries.values())
+
+async def _full_list(
+    db: AsyncSession, current_user: Employee, start: Optional[datetime], end: Optional[datetime],
+) -> List[dict]:
+    """Lignes de GET /api/interventions en dicts prêts pour InterventionOut :
+    selects Core sur asyncpg, une requête par relation (ce que charge
+    _with_out_relations), sans objet ORM hydraté sur la boucle."""
+    rows = [dict(row) for row in (await db.execute(_calendar_query(current_user, start, end))).mappings()]
+    if not rows:
+        return rows
+    ids = [row["id"] for row in rows]
+
+    reinforcements: Dict[UUID, list] = {}
+    reinforcement_rows = (await db.execute(
+        select(Intervention.id, Intervention.reinforcement_for_id, Intervention.time_tbd, Intervention.start_time)
+        .where(Intervention.reinforcement_for_id.in_(ids))
+    )).mappings().all()
+    for r in reinforcement_rows:
+        reinforcements.setdefault(r["reinforcement_for_id"], []).append(r)
+
+    # Employés des interventions, de leurs sources et de leurs renforts.
+    employees: Dict[UUID, list] = {}
+    wanted = set(ids) | {row["reinforcement_for_id"] for row in rows if row["reinforcement_for_id"]}
+    wanted |= {r["id"] for r in reinforcement_rows}
+    assigned = await db.execute(
+        select(intervention_employees.c.intervention_id, *_out_columns(Employee, EmployeeOut))
+        .join(Employee, Employee.id == intervention_employees.c.employee_id)
+        .where(intervention_employees.c.intervention_id.in_(wanted))
+    )
+    for row in assigned.mappings():
+        employee = dict(row)
+        employees.setdefault(employee.pop("intervention_id"), []).append(employee)
+
+    items: Dict[UUID, list] = {}
+    item_rows = await db.execute(
+        select(InterventionItem.intervention_id, *_out_columns(InterventionItem, InterventionItemOut))
+        .where(InterventionItem.intervention_id.in_(ids))
+    )
+    for row in item_rows.mappings():
+        item = dict(row)
+        items.setdefault(item.pop("intervention_id"), []).append(item)
+
+    client_ids = {row["client_id"] for row in rows if row["client_id"]}
+    clients = {
+        row["id"]: dict(row) for row in (await db.execute(
+            select(*_out_columns(Client, ClientOutLite)).where(Client.id.in_(client_ids))
+        )).mappings()
+    } if client_ids else {}
+    rate_ids = {row["hourly_rate_id"] for row in rows if row["hourly_rate_id"]}
+    rates = {
+        row["id"]: dict(row) for row in (await db.execute(
+            select(*_out_columns(HourlyRate, HourlyRateOut)).where(HourlyRate.id.in_(rate_ids))
+        )).mappings()
+    } if rate_ids else {}
+
+    # TourRun.progress : arrêts cochés, et parmi eux ceux déjà traités.
+    selected = TourRunStop.selected.is_(True)
+    runs = {
+        row["intervention_id"]: row for row in (await db.execute(
+            select(
+                TourRun.id, TourRun.intervention_id, TourRun.publication_status,
+                func.count(TourRunStop.id).filter(selected).label("total"),
+                func.count(TourRunStop.id).filter(selected, TourRunStop.status != "pending").label("resolved"),
+            )
+            .outerjoin(TourRunStop, TourRunStop.run_id == TourRun.id)
+            .where(TourRun.intervention_id.in_(ids))
+            .group_by(TourRun.id)
+        )).mappings()
+    }
+
+    for row in rows:
+        run = runs.get(row["id"])
+        if run is not None:
+            if run["publication_status"] == "draft":
+                lifecycle = "draft"
+            else:
+                lifecycle = "published" if row["status"] == "planned" else row["status"]
+            run = {
+                "id": run["id"], "publication_status": run["publication_status"], "lifecycle_status": lifecycle,
+                "progress": {
+                    "resolved": run["resolved"], "total": run["total"],
+                    "percent": round((run["resolved"] / run["total"]) * 100) if run["total"] else 0,
+                },
+            }
+        row.update(
+            client=clients.get(row["client_id"]),
+            hourly_rate=rates.get(row["hourly_rate_id"]),
+            employees=employees.get(row["id"], []),
+            items=items.get(row["id"], []),
+            tour_run=run,
+            reinforcement_for_employees=employees.get(row["reinforcement_for_id"], []),
+            reinforcement_employees=_reinforcement_arrivals(reinforcements.get(row["id"], []), employees),
+        )
+    return rows
+
+_FULL_LIST = TypeAdapter(List[InterventionOut])
+
+def _dump_full_list(payload: List[dict]) -> bytes:
+    return _FULL_LIST.dump_json(_FULL_LIST.validate_python(payload))
+
+def _bulk_assign_query(db: Session, body: BulkAssignBody):
+    """Interventions hors tournée d'une sous-zone, sur le jour calendaire belge."""
+    day_start, day_end = _utc_bounds(body.date)
+    return db.query(Intervention).options(selectinload(Intervention.employees)).filter(
+        Intervention.start_time >= day_start,
+        Intervention.start_time < day_end,
+        Intervention.sub_zone == body.sub_zone,
+        Intervention.tour_visibility == "none",
+    )
+
+def _virtual_in_range(db: Session, current_user: Employee, start: Optional[datetime], end: Optional[datetime]):
+    """Occurrences calculées des séries sans fin sur [start, end] (bornes
+    incluses comme la liste) ; seulement si la plage est bornée des deux côtés.
+    Jamais de brouillon de tournée : mêmes règles de visibilité que _visible_to."""
+    if not start or not end:
+        return []
+    if current_user.role == 'admin':
+        return virtual_occurrences(db, start, end + timedelta(microseconds=1))
+    return virtual_occurrences(
+        db, start, end + timedelta(microseconds=1), zone=current_user.zone, employee_id=current_user.id,
+    )
+
+def _open_occurrence(
+    intervention_id: UUID, db: Session, current_user: Employee, series_id: Optional[UUID],
+) -> bool:
+    """Id inconnu en base : si c'est celui d'une occurrence calculée (listée
+    virtual=True au-delà de l'horizon) de la série `series_id` — le client
+    renvoie son recurrence_group_id en paramètre de requête —, l'enregistre
+    dans la transaction en cours pour qu'elle soit lue ou modifiée comme les
+    autres, sans attendre qu'il appelle POST /recurring/{id}/materialize.
+    Sans série, rien n'est cherché. Un non-admin n'ouvre que celles qu'il
+    voit dans la liste (_virtual_in_range)."""
+    found = find_occurrence(db, series_id, intervention_id) if series_id else None
+    if not found:
+        return False
+    series, start = found
+    template = series.template
+    if current_user.role != 'admin' and (
+        template.get("zone") != current_user.zone
+        or str(current_user.id) not in (template.get("employee_ids") or [])
+    ):
+        return False
+    # Verrou sur la série : deux ouvertures simultanées n'insèrent pas deux fois.
+    db.refresh(series, with_for_update=True)
+    return materialize_occurrence(db, series, start) is not None
+
+def _load_intervention(intervention_id: UUID, db: Session) -> Intervention:
+    return _with_out_relations(db.query(Intervention)).filter(Intervention.id == intervention_id).first()
+
+def _get_intervention(
+    intervention_id: UUID, db: Session, current_user: Employee, series_id: Optional[UUID],
+) -> Optional[Intervention]:
+    """Intervention à modifier ou supprimer ; ouvre au besoin l'occurrence
+    calculée portant cet id (_open_occurrence)."""
+    query = db.query(Intervention).filter(Intervention.id == intervention_id)
+    intervention = query.first()
+    if intervention is None and _open_occurrence(intervention_id, db, current_user, series_id):
+        intervention = query.first()
+    return intervention
 
 
 def _pending_deferred_amount(db: Session, intervention: Intervention):
@@ -168,46 +424,257 @@ def _add_audit(db: Session, action_type: str, employee_id, intervention_id=None,
 
 
 @router.get("", response_model=List[InterventionOut])
-def read_interventions(
+async def read_interventions(
+    request: Request,
+    response: Response,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Employee = Depends(get_current_user_async),
+):
+    # Route async : la base est attendue sur asyncpg (selects Core, aucune
+    # hydratation ORM), et la validation + sérialisation InterventionOut d'un
+    # mois entier, du calcul, part dans le threadpool. La boucle reste libre
+    # pour /today, /unread-count et /health/ready.
+    start_dt, end_dt = _parse_bound(start), _parse_bound(end)
+    version = (await db.execute(_calendar_version(current_user, start_dt, end_dt))).one()
+    etag = etag_for("full", current_user.id, current_user.role, start_dt, end_dt, *version)
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+    results = await _full_list(db, current_user, start_dt, end_dt)
+    # Occurrences calculées : seulement au-delà de l'horizon enregistré,
+    # rares sur une semaine ou un mois ; dumpées tant que la session sync existe.
+    virtual = await db.run_sync(lambda session: [
+        InterventionOut.model_validate(iv).model_dump()
+        for iv in _virtual_in_range(session, current_user, start_dt, end_dt)
+    ])
+    if virtual:
+        results = sorted(results + virtual, key=lambda iv: iv["start_time"])
+    # Connexion rendue au pool avant la sérialisation, qui n'en a plus besoin.
+    await db.close()
+    if current_user.role == 'subcontractor':
+        for iv in results:
+            iv["price_estimated"] = None
+            iv["hourly_rate"] = None
+            for item in iv["items"]:
+                item["price"] = 0
+    content = await run_in_threadpool(_dump_full_list, results)
+    # Response renvoyée telle quelle : FastAPI ne revalide pas sur la boucle,
+    # et n'y recopie pas l'ETag posé sur `response`.
+    return Response(content, media_type="application/json", headers=dict(response.headers))
+
+
+@router.get("/calendar", response_model=List[InterventionCalendarOut])
+def read_interventions_calendar(
+    request: Request,
+    response: Response,
     start: Optional[str] = None,
     end: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
-    query = db.query(Intervention).options(
-        selectinload(Intervention.client),
-        selectinload(Intervention.employees),
-        selectinload(Intervention.items),
-        selectinload(Intervention.hourly_rate),
-        selectinload(Intervention.tour_run).selectinload(TourRun.stops),
-        selectinload(Intervention.reinforcement_for).selectinload(Intervention.employees),
-        selectinload(Intervention.reinforcements).selectinload(Intervention.employees),
+    """Projection légère pour les vues mois/semaine : mêmes filtres que
+    GET /api/interventions, mais seulement les colonnes affichées sur une
+    tuile et la couleur des employés assignés. Deux requêtes Core, aucun
+    objet ORM ni relation chargée."""
+    start_dt, end_dt = _parse_bound(start), _parse_bound(end)
+    cached = not_modified(request, response, _calendar_etag(db, "calendar", current_user, start_dt, end_dt))
+    if cached:
+        return cached
+    columns = select(
+        Intervention.id, Intervention.type, Intervention.title,
+        Intervention.start_time, Intervention.end_time, Intervention.time_tbd,
+        Intervention.status, Intervention.zone, Intervention.sub_zone,
+        Intervention.price_estimated, Intervention.reinforcement_for_id,
     )
-    query = query.filter(
-        ~Intervention.tour_run.has()
-        | Intervention.tour_run.has(TourRun.publication_status == "published")
+    rows = db.execute(_in_calendar_range(columns, current_user, start_dt, end_dt)).mappings().all()
+
+    employees_by_intervention: Dict[UUID, list] = {row["id"]: [] for row in rows}
+    if rows:
+        assigned = db.execute(
+            select(intervention_employees.c.intervention_id, Employee.id, Employee.full_name, Employee.color)
+            .join(Employee, Employee.id == intervention_employees.c.employee_id)
+            .where(intervention_employees.c.intervention_id.in_(list(employees_by_intervention)))
+        ).all()
+        for intervention_id, employee_id, full_name, color in assigned:
+            employees_by_intervention[intervention_id].append(
+                {"id": employee_id, "full_name": full_name, "color": color}
+            )
+
+    hide_price = current_user.role == 'subcontractor'
+    tiles = [
+        {
+            **row,
+            "price_estimated": None if hide_price else row["price_estimated"],
+            "employees": employees_by_intervention[row["id"]],
+        }
+        for row in rows
+    ]
+    virtual = _virtual_in_range(db, current_user, start_dt, end_dt)
+    if virtual:
+        tiles += [
+            {
+                "id": iv.id, "type": iv.type, "title": iv.title,
+                "start_time": iv.start_time, "end_time": iv.end_time, "time_tbd": iv.time_tbd,
+                "status": iv.status, "zone": iv.zone, "sub_zone": iv.sub_zone,
+                "price_estimated": None if hide_price else iv.price_estimated,
+                "reinforcement_for_id": None, "virtual": True,
+                "employees": [{"id": e.id, "full_name": e.full_name, "color": e.color} for e in iv.employees],
+            }
+            for iv in virtual
+        ]
+        tiles.sort(key=lambda tile: tile["start_time"])
+    return tiles
+
+
+# Le curseur rendu recule d'une minute : une écriture commencée avant notre
+# lecture mais commitée après porte un updated_at (début de sa transaction)
+# antérieur à notre now(). Quelques doublons au prochain appel, jamais de trou.
+SYNC_CURSOR_OVERLAP = timedelta(minutes=1)
+
+@router.get("/changes", response_model=InterventionChangesOut)
+def read_intervention_changes(
+    since: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Delta-sync du calendrier mobile : interventions créées ou modifiées
+    depuis `since` (y compris items, employés assignés et statut de tournée,
+    avancés par trigger), et ids à retirer du cache (supprimées, ou plus
+    visibles pour l'utilisateur). Les occurrences calculées des séries sans
+    fin n'ont pas d'updated_at : `series` liste les séries créées, modifiées
+    ou supprimées depuis `since` (migration 036), dont le client recharge les
+    occurrences calculées.
+
+    Sans `since`, ne renvoie qu'un curseur : le client l'obtient avant son
+    chargement complet de la plage, puis n'appelle plus que le delta."""
+    now = db.query(func.now()).scalar()
+    cursor = (now - SYNC_CURSOR_OVERLAP).isoformat()
+    if not since:
+        return {"cursor": cursor, "changed": [], "deleted": [], "series": []}
+    try:
+        since_dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Curseur de synchronisation invalide.")
+    if since_dt.tzinfo is None:
+        since_dt = since_dt.replace(tzinfo=timezone.utc)
+
+    changed = (
+        _visible_to(_with_out_relations(db.query(Intervention)), current_user)
+        .filter(Intervention.updated_at > since_dt)
+        .order_by(Intervention.start_time.asc())
+        .all()
     )
-    if current_user.role == "subcontractor":
-        query = query.filter(~Intervention.tour_run.has())
-    if current_user.role != 'admin':
-        query = query.filter(
-            Intervention.zone == current_user.zone,
+
+    # Admin : toutes les suppressions (pierres tombales, migration 023). Il ne
+    # voit que les brouillons de tournée en moins, et ne les a jamais vus :
+    # rien d'autre à retirer.
+    if current_user.role == 'admin':
+        deleted = db.execute(
+            select(InterventionTombstone.intervention_id).where(InterventionTombstone.deleted_at > since_dt)
+        ).scalars().all()
+    else:
+        # Hors admin, seulement ce que l'utilisateur a pu voir (migration
+        # 035) : encore assigné mais zone changée ou tournée repassée en
+        # brouillon, ou désassigné depuis le curseur — une suppression
+        # retire d'abord les employés assignés, elle passe donc par là.
+        # Jamais l'id d'une intervention du planning d'un autre.
+        visible_ids = {iv.id for iv in changed}
+        still_assigned = select(Intervention.id).where(
+            Intervention.updated_at > since_dt,
             Intervention.employees.any(id=current_user.id),
         )
-    if start:
-        try:
-            query = query.filter(Intervention.start_time >= datetime.fromisoformat(start.replace("Z", "+00:00")))
-        except ValueError:
-            pass
-    if end:
-        try:
-            query = query.filter(Intervention.start_time <= datetime.fromisoformat(end.replace("Z", "+00:00")))
-        except ValueError:
-            pass
-    results = query.order_by(Intervention.start_time.asc()).all()
+        unassigned = select(InterventionUnassignment.intervention_id).where(
+            InterventionUnassignment.employee_id == current_user.id,
+            InterventionUnassignment.unassigned_at > since_dt,
+        )
+        revoked = db.execute(still_assigned.union(unassigned)).scalars().all()
+        deleted = [iv_id for iv_id in dict.fromkeys(revoked) if iv_id not in visible_ids]
+
+    # Séries : hors admin, seulement celles où l'utilisateur est ou a été
+    # assigné (les seules dont il voit des occurrences calculées).
+    series = select(RecurringSeriesChange.series_id).where(RecurringSeriesChange.changed_at > since_dt)
+    if current_user.role != 'admin':
+        series = series.where(RecurringSeriesChange.employee_ids.any(current_user.id))
+
     if current_user.role == 'subcontractor':
-        _strip_prices(results)
-    return results
+        _strip_prices(changed)
+    return {"cursor": cursor, "changed": changed, "deleted": deleted, "series": db.execute(series).scalars().all()}
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _phone_core(digits: str) -> str:
+    """Numéro belge sans préfixe : "0475...", "32475..." et "0032475..."
+    se retrouvent tous par "475...", quelle que soit la forme enregistrée."""
+    for prefix in ("00", "32", "0"):
+        if digits.startswith(prefix) and len(digits) - len(prefix) >= 6:
+            digits = digits[len(prefix):]
+    return digits
+
+# Jumeau Python de search_normalize() (migration 026) : mêmes remplacements,
+# dans le même ordre. La saisie est normalisée ici, les documents par trigger ;
+# tests/test_search.py vérifie que les deux donnent le même texte.
+_SEARCH_TRANSLATION = str.maketrans(
+    "ÀÁÂÃÄÅàáâãäåÇçÈÉÊËèéêëÌÍÎÏìíîïÑñÒÓÔÕÖòóôõöÙÚÛÜùúûüÝýÿ’‘`´",
+    "AAAAAAaaaaaaCcEEEEeeeeIIIIiiiiNnOOOOOoooooUUUUuuuuYyy" + "'" * 4,
+)
+
+def _search_normalize(value: Optional[str]) -> str:
+    text = (value or "").translate(_SEARCH_TRANSLATION).lower()
+    for ligature, replacement in (("œ", "oe"), ("æ", "ae"), ("Œ", "oe"), ("Æ", "ae")):
+        text = text.replace(ligature, replacement)
+    return re.sub(r"\s+", " ", text).strip(" ")
+
+def _search_query(db: Session, current_user: Employee, q: str):
+    """Interventions correspondant à `q`, les plus pertinentes d'abord.
+
+    Cherche dans les documents normalisés (minuscules, sans accents) et les
+    chiffres seuls que la migration 026 maintient par trigger sur
+    interventions et clients, via index trigrammes. La saisie est normalisée
+    comme les documents (_search_normalize) : les motifs LIKE sont des
+    constantes, que le planificateur voit pour choisir l'index."""
+    needle = _like_escape(_search_normalize(q))
+    anywhere = f"%{needle}%"
+    digits = re.sub(r"\D", "", q)
+    # Seuil historique : en dessous de 6 chiffres, un numéro de rue ou un
+    # code postal ramènerait n'importe quel téléphone.
+    digit_pattern = f"%{_phone_core(digits)}%" if len(digits) >= 6 else None
+
+    def _hits(model):
+        condition = model.search_document.like(anywhere, escape="\\")
+        if digit_pattern:
+            condition = condition | model.search_digits.like(digit_pattern)
+        return condition
+
+    # UNION plutôt qu'un OR à travers la jointure : chaque branche reste un
+    # parcours d'index trigrammes.
+    hit_ids = select(Intervention.id).where(_hits(Intervention)).union(
+        select(Intervention.id)
+        .join(Client, Client.id == Intervention.client_id)
+        .where(_hits(Client))
+    )
+
+    # Pertinence : document (nom du client ou titre en tête) qui commence par
+    # la saisie, ou téléphone > début d'un mot > n'importe où ; puis le plus récent.
+    def _like(pattern):
+        return (
+            Intervention.search_document.like(pattern, escape="\\")
+            | Client.search_document.like(pattern, escape="\\")
+        )
+    ranks = [(_like(f"{needle}%"), 3)]
+    if digit_pattern:
+        ranks.append((Intervention.search_digits.like(digit_pattern) | Client.search_digits.like(digit_pattern), 3))
+    ranks.append((_like(f"% {needle}%"), 2))
+    rank = case(*ranks, else_=1)
+
+    query = _with_out_relations(
+        db.query(Intervention).outerjoin(Client, Intervention.client_id == Client.id)
+    ).filter(Intervention.id.in_(hit_ids))
+    query = _visible_to(query, current_user)
+    return query.order_by(rank.desc(), Intervention.start_time.desc())
 
 
 @router.get("/search", response_model=List[InterventionOut])
@@ -217,51 +684,10 @@ def search_interventions(
     current_user: Employee = Depends(get_current_user),
 ):
     """Mini moteur de recherche : nom, adresse ou téléphone (avec ou sans
-    séparateurs) -> tout l'historique d'interventions qui s'y rapporte, que
-    l'intervention soit rattachée à une fiche client ou non."""
-    q = q.strip()
-    digits = re.sub(r"\D", "", q)
-
-    conditions = [
-        Intervention.title.ilike(f"%{q}%"),
-        Intervention.description.ilike(f"%{q}%"),
-        Client.name.ilike(f"%{q}%"),
-        Client.address.ilike(f"%{q}%"),
-    ]
-    if len(digits) >= 6:
-        digits_only = lambda col: func.regexp_replace(func.coalesce(col, ""), r"\D", "", "g")
-        conditions += [
-            digits_only(Intervention.title).ilike(f"%{digits}%"),
-            digits_only(Intervention.description).ilike(f"%{digits}%"),
-            digits_only(Client.phone).ilike(f"%{digits}%"),
-        ]
-
-    query = (
-        db.query(Intervention)
-        .outerjoin(Client, Intervention.client_id == Client.id)
-        .options(
-            selectinload(Intervention.client),
-            selectinload(Intervention.employees),
-            selectinload(Intervention.items),
-            selectinload(Intervention.hourly_rate),
-            selectinload(Intervention.tour_run).selectinload(TourRun.stops),
-            selectinload(Intervention.reinforcement_for).selectinload(Intervention.employees),
-            selectinload(Intervention.reinforcements).selectinload(Intervention.employees),
-        )
-        .filter(or_(*conditions))
-        .filter(
-            ~Intervention.tour_run.has()
-            | Intervention.tour_run.has(TourRun.publication_status == "published")
-        )
-    )
-    if current_user.role == "subcontractor":
-        query = query.filter(~Intervention.tour_run.has())
-    if current_user.role != 'admin':
-        query = query.filter(
-            Intervention.zone == current_user.zone,
-            Intervention.employees.any(id=current_user.id),
-        )
-    results = query.order_by(Intervention.start_time.desc()).limit(200).all()
+    séparateurs, avec ou sans accents) -> tout l'historique d'interventions
+    qui s'y rapporte, que l'intervention soit rattachée à une fiche client ou
+    non, classé par pertinence."""
+    results = _search_query(db, current_user, q.strip()).limit(200).all()
     if current_user.role == 'subcontractor':
         _strip_prices(results)
     return results
@@ -353,10 +779,15 @@ def delete_intervention_service(
 @router.get("/{intervention_id}", response_model=InterventionOut)
 def read_intervention(
     intervention_id: UUID,
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
     intervention = _load_intervention(intervention_id, db)
+    if not intervention and _open_occurrence(intervention_id, db, current_user, recurrence_group_id):
+        # Occurrence calculée : enregistrée une fois pour toutes, sous le même id.
+        db.commit()
+        intervention = _load_intervention(intervention_id, db)
     if not intervention:
         raise HTTPException(status_code=404, detail="Non trouvé")
     if intervention.tour_run and current_user.role != "admin":
@@ -383,11 +814,13 @@ def create_recurring_bulk(
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
-    """Crée toutes les occurrences d'une série récurrente "à l'infini" en une
-    seule transaction — les dates sont déjà calculées côté client (horizon
-    glissant de plusieurs années), ici on ne fait que les persister en masse,
-    pour ne jamais bloquer l'appli sur des centaines/milliers de requêtes
-    individuelles."""
+    """Crée une série récurrente en une seule transaction, pour ne jamais
+    bloquer l'appli sur des centaines/milliers de requêtes individuelles.
+    Série "à l'infini" (endType "never") : seule la première date envoyée
+    compte, le serveur enregistre l'horizon glissant et calcule la suite à la
+    lecture (app/services/recurrence.py). Sinon les dates calculées côté
+    client sont persistées en masse. Un groupe qui a déjà sa série sans fin
+    est refusé (409) plutôt que dupliqué."""
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Réservé aux admins.")
     if not payload.occurrences:
@@ -407,57 +840,53 @@ def create_recurring_bulk(
         if not client:
             raise HTTPException(status_code=404, detail="Client introuvable")
 
-    employees = (
-        db.query(Employee).filter(Employee.id.in_(payload.employee_ids)).all()
+    employee_ids = (
+        db.execute(select(Employee.id).where(Employee.id.in_(payload.employee_ids))).scalars().all()
         if payload.employee_ids else []
     )
 
     total_price = sum(_item_effective_price(i) for i in payload.items) if payload.items else 0
     price_estimated = payload.price_estimated or total_price
     recurrence_group_id = payload.recurrence_group_id or uuid.uuid4()
-
-    created_ids = []
-    for occ in payload.occurrences:
-        new_intervention = Intervention(
-            id=uuid.uuid4(),
-            type=payload.type,
-            title=payload.title,
-            description=payload.description,
-            start_time=occ.start_time,
-            end_time=occ.end_time,
-            status=payload.status,
-            price_estimated=price_estimated,
-            is_invoice=payload.is_invoice,
-            payment_mode=payload.payment_mode,
-            amount_cash=payload.amount_cash,
-            amount_invoice=payload.amount_invoice,
-            zone=payload.zone,
-            sub_zone=payload.sub_zone,
-            client_id=payload.client_id,
-            address=payload.address,
-            phone=payload.phone,
-            email=payload.email,
-            time_tbd=payload.time_tbd,
-            hourly_rate_id=payload.hourly_rate_id,
-            recurrence_rule=payload.recurrence_rule,
-            recurrence_group_id=recurrence_group_id,
+    if payload.recurrence_group_id and db.get(RecurringSeries, recurrence_group_id):
+        # Série sans fin déjà créée : ses occurrences sont enregistrées ou
+        # calculées, réinsérer les dates les doublerait. Elle se modifie par
+        # /{id}/recurrence-scope.
+        raise HTTPException(status_code=409, detail="Série déjà créée pour ce groupe.")
+
+    values = {
+        **payload.model_dump(include=set(TEMPLATE_FIELDS)),
+        "price_estimated": price_estimated,
+        "recurrence_rule": payload.recurrence_rule,
+        "recurrence_group_id": recurrence_group_id,
+    }
+    items = [item.model_dump() for item in payload.items]
+
+    if expandable_rule(payload.recurrence_rule):
+        # Série sans fin : la règle et le modèle sont gardés, seul l'horizon
+        # glissant est enregistré ; la suite est calculée à la lecture. Les
+        # dates envoyées au-delà de la première ne servent plus.
+        first = payload.occurrences[0]
+        series = RecurringSeries(
+            id=recurrence_group_id,
+            rule=payload.recurrence_rule,
+            dtstart=first.start_time,
+            duration_minutes=round((first.end_time - first.start_time).total_seconds() / 60),
+            template=series_template(values, employee_ids, items),
+            materialized_until=first.start_time,
         )
-        new_intervention.employees = employees
-        for item_data in payload.items:
-            new_intervention.items.append(InterventionItem(
-                label=item_data.label,
-                price=item_data.price,
-                client_service_id=item_data.client_service_id,
-                intervention_service_id=item_data.intervention_service_id,
-                on_demand=item_data.on_demand,
-            ))
-        db.add(new_intervention)
-        created_ids.append(new_intervention.id)
+        db.add(series)
+        created = materialize(db, series, max(horizon_end(), first.start_time + timedelta(seconds=1)))
+        first_id = occurrence_id(recurrence_group_id, first.start_time)
+    else:
+        occurrences = [(uuid.uuid4(), occ.start_time, occ.end_time) for occ in payload.occurrences]
+        insert_occurrences(db, values, employee_ids, items, occurrences)
+        created, first_id = len(occurrences), occurrences[0][0]
 
     _add_audit(
-        db, "created", current_user.id, created_ids[0],
-        f"Série récurrente créée : {payload.title} ({len(created_ids)} occurrences)",
-        {"recurrence_group_id": str(recurrence_group_id), "count": len(created_ids)},
+        db, "created", current_user.id, first_id,
+        f"Série récurrente créée : {payload.title} ({created} occurrences)",
+        {"recurrence_group_id": str(recurrence_group_id), "count": created},
     )
     record_operation(
         db, payload.client_operation_id, current_user.id,
@@ -465,7 +894,7 @@ def create_recurring_bulk(
     )
 
     db.commit()
-    return {"created": len(created_ids), "recurrence_group_id": str(recurrence_group_id)}
+    return {"created": created, "recurrence_group_id": str(recurrence_group_id)}
 
 
 @router.post("", response_model=InterventionOut)
@@ -528,8 +957,8 @@ def create_intervention(
             new_intervention.reprise_chain_id = new_intervention.id
 
     if current_user.role != 'admin':
-        employee = db.query(Employee).filter(Employee.id == current_user.id).first()
-        new_intervention.employees = [employee] if employee else []
+        # current_user est déjà attaché à la session de la requête.
+        new_intervention.employees = [current_user]
     elif intervention.employee_ids:
         employees = db.query(Employee).filter(Employee.id.in_(intervention.employee_ids)).all()
         new_intervention.employees = employees
@@ -617,11 +1046,7 @@ def bulk_assign_employees(
     skip_assigned=True (défaut) : saute les interventions qui ont déjà des employés assignés."""
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Réservé aux admins.")
-    interventions = db.query(Intervention).options(selectinload(Intervention.employees)).filter(
-        func.date(Intervention.start_time) == body.date,
-        Intervention.sub_zone == body.sub_zone,
-        ~Intervention.tour_run.has(),
-    ).all()
+    interventions = _bulk_assign_query(db, body).all()
 
     employees = db.query(Employee).filter(Employee.id.in_(body.employee_ids)).all()
 
@@ -708,14 +1133,11 @@ def create_reinforcement(
         {"reinforcement_for_id": str(source.id)},
     )
 
-    for emp in source.employees:
-        db.add(InAppNotification(
-            recipient_id=emp.id,
-            type="reinforcement_added",
-            title="Renfort planifié",
-            message=f"{employee.full_name or employee.email} viendra en renfort sur « {source.title} ».",
-            metadata_={"intervention_id": str(source.id), "reinforcement_id": str(reinforcement.id)},
-        ))
+    notify(
+        db, [emp.id for emp in source.employees], "reinforcement_added", "Renfort planifié",
+        f"{employee.full_name or employee.email} viendra en renfort sur « {source.title} ».",
+        {"intervention_id": str(source.id), "reinforcement_id": str(reinforcement.id)},
+    )
 
     db.commit()
     db.refresh(reinforcement)
@@ -726,10 +1148,11 @@ def create_reinforcement(
 def update_intervention(
     intervention_id: UUID,
     intervention_update: dict,
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
-    db_intervention = db.query(Intervention).filter(Intervention.id == intervention_id).first()
+    db_intervention = _get_intervention(intervention_id, db, current_user, recurrence_group_id)
     if not db_intervention:
         raise HTTPException(status_code=404, detail="Introuvable")
     if db_intervention.tour_run:
@@ -844,11 +1267,18 @@ RECURRENCE_SCOPE_FORBIDDEN_KEYS = {
     "reprise_taken", "reprise_note", "recurrence_rule", "recurrence_group_id",
 }
 
+# Colonnes modifiables d'un seul UPDATE sur toute la série ; employee_ids et
+# items sont traités à part (table d'association, lignes enfants).
+RECURRENCE_SCOPE_COLUMNS = {
+    attr.key for attr in sa_inspect(Intervention).column_attrs
+} - RECURRENCE_SCOPE_FORBIDDEN_KEYS - {"id"}
+
 
 @router.patch("/{intervention_id}/recurrence-scope")
 def update_intervention_recurrence_scope(
     intervention_id: UUID,
     body: RecurrenceScopeBody,
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
@@ -857,36 +1287,72 @@ def update_intervention_recurrence_scope(
     l'édition d'une seule occurrence."""
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Réservé aux admins.")
-    anchor = db.query(Intervention).filter(Intervention.id == intervention_id).first()
+    anchor = _get_intervention(intervention_id, db, current_user, recurrence_group_id)
     if not anchor or not anchor.recurrence_group_id:
         raise HTTPException(status_code=404, detail="Intervention introuvable ou hors série")
 
     fields = {k: v for k, v in body.fields.items() if k not in RECURRENCE_SCOPE_FORBIDDEN_KEYS}
 
-    query = db.query(Intervention).filter(Intervention.recurrence_group_id == anchor.recurrence_group_id)
-    if body.scope == "following":
-        query = query.filter(Intervention.start_time >= anchor.start_time)
-    targets = query.all()
+    series = db.get(RecurringSeries, anchor.recurrence_group_id)
+    if series and body.scope == "following":
+        # Les occurrences encore calculées avant l'ancre gardent l'ancien
+        # modèle : on les enregistre avant de le changer.
+        materialize(db, series, anchor.start_time)
 
-    updated = 0
-    for target in targets:
-        for key, value in fields.items():
-            if key == "employee_ids":
-                target.employees = db.query(Employee).filter(Employee.id.in_(value)).all()
-            elif key == "items":
-                db.query(InterventionItem).filter(InterventionItem.intervention_id == target.id).delete()
-                for item_data in value:
-                    db.add(InterventionItem(
-                        intervention_id=target.id,
-                        label=item_data["label"],
-                        price=item_data["price"],
-                        client_service_id=item_data.get("client_service_id"),
-                        intervention_service_id=item_data.get("intervention_service_id"),
-                        on_demand=item_data.get("on_demand", False),
-                    ))
-            elif hasattr(target, key):
-                setattr(target, key, value)
-        updated += 1
+    targets = select(Intervention.id).where(Intervention.recurrence_group_id == anchor.recurrence_group_id)
+    if body.scope == "following":
+        targets = targets.where(Intervention.start_time >= anchor.start_time)
+    target_ids = db.execute(targets).scalars().all()
+    updated = len(target_ids)
+
+    # Instructions ensemblistes : leur nombre ne dépend pas de la longueur de
+    # la série (une série hebdo sur plusieurs années = des centaines d'occurrences).
+    columns = {k: v for k, v in fields.items() if k in RECURRENCE_SCOPE_COLUMNS}
+    if columns:
+        db.execute(
+            update(Intervention).where(Intervention.id.in_(targets)).values(**columns),
+            execution_options={"synchronize_session": False},
+        )
+    if "employee_ids" in fields:
+        db.execute(delete(intervention_employees).where(intervention_employees.c.intervention_id.in_(targets)))
+        db.execute(
+            insert(intervention_employees).from_select(
+                ["intervention_id", "employee_id"],
+                select(Intervention.id, Employee.id)
+                .join_from(Intervention, Employee, true())
+                .where(Intervention.id.in_(targets), Employee.id.in_(fields["employee_ids"])),
+            )
+        )
+    if "items" in fields:
+        db.execute(
+            delete(InterventionItem).where(InterventionItem.intervention_id.in_(targets)),
+            execution_options={"synchronize_session": False},
+        )
+        rows = [
+            {
+                "intervention_id": target_id,
+                "label": item_data["label"],
+                "price": item_data["price"],
+                "client_service_id": item_data.get("client_service_id"),
+                "intervention_service_id": item_data.get("intervention_service_id"),
+                "on_demand": item_data.get("on_demand", False),
+            }
+            for target_id in target_ids
+            for item_data in fields["items"]
+        ]
+        if rows:
+            db.execute(insert(InterventionItem), rows)
+
+    if series:
+        # Occurrences pas encore enregistrées : elles suivront le nouveau modèle.
+        template = {**series.template, **{k: v for k, v in columns.items() if k in TEMPLATE_FIELDS}}
+        if "employee_ids" in fields:
+            template["employee_ids"] = [str(e) for e in db.execute(
+                select(Employee.id).where(Employee.id.in_(fields["employee_ids"]))
+            ).scalars()]
+        if "items" in fields:
+            template["items"] = template_items(fields["items"])
+        series.template = template
 
     _add_audit(
         db, "modified", current_user.id, intervention_id,
@@ -913,6 +1379,7 @@ class ItemsDoneBody(BaseModel):
 def update_items_done(
     intervention_id: UUID,
     body: ItemsDoneBody,
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
@@ -920,6 +1387,8 @@ def update_items_done(
     intervention, ajoute d'éventuels ajustements ad-hoc (déduction partielle
     ou supplément imprévu) et recalcule price_estimated en conséquence."""
     db_intervention = _load_intervention(intervention_id, db)
+    if not db_intervention and _open_occurrence(intervention_id, db, current_user, recurrence_group_id):
+        db_intervention = _load_intervention(intervention_id, db)
     if not db_intervention:
         raise HTTPException(status_code=404, detail="Introuvable")
     if db_intervention.tour_run:
@@ -985,20 +1454,15 @@ def update_items_done(
         client_label = db_intervention.client.name if db_intervention.client else db_intervention.title
         labels_str = ", ".join(f"« {label} »" for label in newly_unchecked_labels)
         message = f"{emp_name} a décoché {labels_str} sur « {db_intervention.title} » ({client_label})"
-        admins = db.query(Employee).filter(Employee.role == "admin").all()
-        for admin in admins:
-            db.add(InAppNotification(
-                recipient_id=admin.id,
-                type="service_unchecked",
-                title="Prestation décochée",
-                message=message,
-                metadata_={
-                    "intervention_id": str(intervention_id),
-                    "employee_id": str(current_user.id),
-                    "intervention_title": db_intervention.title,
-                    "item_labels": newly_unchecked_labels,
-                },
-            ))
+        notify_admins(
+            db, "service_unchecked", "Prestation décochée", message,
+            {
+                "intervention_id": str(intervention_id),
+                "employee_id": str(current_user.id),
+                "intervention_title": db_intervention.title,
+                "item_labels": newly_unchecked_labels,
+            },
+        )
 
     db.commit()
     db.refresh(db_intervention)
@@ -1010,13 +1474,14 @@ def update_items_done(
 @router.delete("/{intervention_id}")
 def delete_intervention(
     intervention_id: UUID,
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Seul un admin peut supprimer.")
 
-    db_intervention = db.query(Intervention).filter(Intervention.id == intervention_id).first()
+    db_intervention = _get_intervention(intervention_id, db, current_user, recurrence_group_id)
     if not db_intervention:
         raise HTTPException(status_code=404, detail="Introuvable")
     if db_intervention.tour_run:
@@ -1042,6 +1507,7 @@ def delete_intervention(
 def delete_intervention_recurrence_scope(
     intervention_id: UUID,
     scope: Literal["following", "all"],
+    recurrence_group_id: Optional[UUID] = None,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
@@ -1050,7 +1516,7 @@ def delete_intervention_recurrence_scope(
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="Seul un admin peut supprimer.")
 
-    anchor = db.query(Intervention).filter(Intervention.id == intervention_id).first()
+    anchor = _get_intervention(intervention_id, db, current_user, recurrence_group_id)
     if not anchor or not anchor.recurrence_group_id:
         raise HTTPException(status_code=404, detail="Intervention introuvable ou hors série")
 
@@ -1072,10 +1538,49 @@ def delete_intervention_recurrence_scope(
 
     for target in targets:
         db.delete(target)
+    # Série sans fin : plus aucune occurrence calculée après l'ancre (ou du tout).
+    series = db.get(RecurringSeries, anchor.recurrence_group_id)
+    if series and scope == "all":
+        db.delete(series)
+    elif series:
+        series.until = min(series.until, anchor.start_time) if series.until else anchor.start_time
     db.commit()
     return {"ok": True, "deleted": len(ids)}
 
 
+class MaterializeOccurrenceBody(BaseModel):
+    start_time: datetime
+
+
+@router.post("/recurring/{recurrence_group_id}/materialize", response_model=InterventionOut)
+def materialize_recurring_occurrence(
+    recurrence_group_id: UUID,
+    body: MaterializeOccurrenceBody,
+    db: Session = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Enregistre une occurrence calculée (virtual=True) d'une série sans fin,
+    au-delà de l'horizon glissant, pour la modifier, la clôturer ou la
+    supprimer comme les autres. Elle garde l'id sous lequel elle était listée ;
+    rappeler l'endpoint renvoie simplement l'occurrence déjà enregistrée."""
+    if current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Réservé aux admins.")
+    series = db.get(RecurringSeries, recurrence_group_id)
+    if not series:
+        raise HTTPException(status_code=404, detail="Série introuvable")
+
+    occ_id = occurrence_id(recurrence_group_id, body.start_time)
+    if db.get(Intervention, occ_id) is None:
+        if materialize_occurrence(db, series, body.start_time) is None:
+            raise HTTPException(status_code=404, detail="Aucune occurrence de la série à cette date")
+        db.commit()
+    intervention = _load_intervention(occ_id, db)
+    if not intervention:
+        # Occurrence supprimée (pierre tombale) : on ne la recrée pas.
+        raise HTTPException(status_code=404, detail="Occurrence supprimée")
+    return intervention
+
+
 @router.post("/{intervention_id}/no-reprise")
 def no_reprise(
     intervention_id: UUID,
@@ -1127,21 +1632,16 @@ def no_reprise(
         {"note": note, "intervention_title": intervention.title},
     )
 
-    # Notifier tous les admins
-    admins = db.query(Employee).filter(Employee.role == "admin").all()
-    for admin in admins:
-        notif = InAppNotification(
-            recipient_id=admin.id,
-            type="no_reprise",
-            title=title,
-            message=description,
-            metadata_={
-                "intervention_id": str(intervention_id),
-                "employee_id": str(current_user.id),
-                "intervention_title": intervention.title,
-            },
-        )
-        db.add(notif)
+    # Notifier tous les admins (même transaction que record_operation : un
+    # rejeu hors-connexion ne renotifie pas)
+    notify_admins(
+        db, "no_reprise", title, description,
+        {
+            "intervention_id": str(intervention_id),
+            "employee_id": str(current_user.id),
+            "intervention_title": intervention.title,
+        },
+    )
 
     record_operation(
         db, op_uuid, current_user.id,
@@ -1201,20 +1701,15 @@ def defer_cash(
         {"amount": amount, "note": note, "intervention_title": intervention.title},
     )
 
-    admins = db.query(Employee).filter(Employee.role == "admin").all()
-    for admin in admins:
-        db.add(InAppNotification(
-            recipient_id=admin.id,
-            type="deferred_cash",
-            title="Paiement reporté",
-            message=description,
-            metadata_={
-                "intervention_id": str(intervention_id),
-                "employee_id": str(current_user.id),
-                "intervention_title": intervention.title,
-                "amount": amount,
-            },
-        ))
+    notify_admins(
+        db, "deferred_cash", "Paiement reporté", description,
+        {
+            "intervention_id": str(intervention_id),
+            "employee_id": str(current_user.id),
+            "intervention_title": intervention.title,
+            "amount": amount,
+        },
+    )
 
     record_operation(
         db, op_uuid, current_user.id,
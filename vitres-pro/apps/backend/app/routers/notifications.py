@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
 
-from app.models.models import get_db, InAppNotification, Employee
+from app.models.models import get_async_db, get_db, InAppNotification, Employee
 from app.schemas.schemas import NotificationOut
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, get_current_user_async
 
 router = APIRouter()
 
@@ -39,14 +41,15 @@ def get_notifications(
 
 
 @router.get("/unread-count")
-def get_unread_count(
-    db: Session = Depends(get_db),
-    current_user: Employee = Depends(get_current_user),
+async def get_unread_count(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Employee = Depends(get_current_user_async),
 ):
-    count = (
-        db.query(InAppNotification)
-        .filter(InAppNotification.recipient_id == current_user.id, InAppNotification.is_read == False)
-        .count()
+    # Interrogé en boucle par chaque téléphone : route async, sans thread.
+    count = await db.scalar(
+        select(func.count())
+        .select_from(InAppNotification)
+        .where(InAppNotification.recipient_id == current_user.id, InAppNotification.is_read == False)
     )
     return {"count": count}
 
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session, selectinload
+import threading
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from typing import List, Dict, Optional
+from sqlalchemy import tuple_
 from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 BRUSSELS_TZ = ZoneInfo("Europe/Brussels")
 
@@ -15,14 +18,31 @@ def _utc_bounds(d: date):
     end   = (datetime(d.year, d.month, d.day, tzinfo=BRUSSELS_TZ) + timedelta(days=1)).astimezone(timezone.utc)
     return start, end
 
-from app.models.models import get_db, Intervention, Employee, Absence, CompanySettings, ProgressiveHours, CompanyClosure, TourRun
+from app.models.models import (
+    get_db, Intervention, Employee, Absence, CompanySettings, ProgressiveHours, CompanyClosure,
+    PlanningDayStats, PlanningDayVersion, SubZone, MonthlyRevenue,
+)
 from app.core.deps import get_current_user
+from app.services.capacity import CapacityMatrix
+from app.services.recurrence import virtual_occurrences
 
 router = APIRouter()
 
+# Plage réenregistrée par refresh_stats_job autour d'aujourd'hui : le mois
+# écoulé et l'horizon de huit semaines des brouillons et des séries.
+STATS_REFRESH_PAST = timedelta(days=31)
+STATS_REFRESH_AHEAD = timedelta(weeks=8)
+
+def _require_admin(current_user: Employee):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux admins")
+
+
 # --- SERVICE (Logique pure) ---
 def _get_employee_hours_for_day(emp: Employee, target_date: date, progressive: list) -> float:
-    """Retourne les heures disponibles d'un employé pour un jour donné."""
+    """Retourne les heures disponibles d'un employé pour un jour donné.
+    Règle de référence : les calculs sur une plage passent par CapacityMatrix
+    (app/services/capacity.py), qui applique les mêmes règles en une passe."""
     weekday_key = str(target_date.isoweekday())  # "1"=lun ... "5"=ven, "6"=sam, "7"=dim
 
     # 1. Montée en charge progressive
@@ -58,6 +78,11 @@ def intervention_hours(interv) -> float:
     Doit rester alignée sur le calcul de l'écran « Session taux » côté mobile
     (apps/mobile/app/(app)/calendar/rate-session.tsx) : les deux affichent le
     même total à l'utilisateur.
+
+    Interventions enregistrées : la même règle est persistée en base dans
+    interventions.planned_hours (fonction SQL intervention_planned_hours,
+    migration 031), que les stats somment directement. Reste évaluée ici
+    pour les occurrences calculées des séries, qui n'existent pas en base.
     """
     if not (interv.hourly_rate_id and interv.hourly_rate):
         return 0.0
@@ -96,91 +121,466 @@ def intervention_hours(interv) -> float:
     return 0.0
 
 
-def calculate_day_stats(target_date: date, db: Session, zone: Optional[str] = None, sub_zone: Optional[str] = None):
-    settings = db.query(CompanySettings).first()
-    tolerance = settings.overtime_tolerance_hours if settings else 3.0
-
-    # Vérifier fermeture entreprise
-    closure = db.query(CompanyClosure).filter(
-        CompanyClosure.start_date <= target_date,
-        CompanyClosure.end_date >= target_date
-    ).first()
-    if closure:
-        return {
-            "date": target_date.strftime("%Y-%m-%d"),
-            "capacity_hours": 0,
-            "planned_hours": 0,
-            "tolerance": tolerance,
-            "present_employees": 0,
-            "status": "closed"
-        }
+def _planned_interventions_query(
+    db: Session, start_utc: datetime, end_utc: datetime,
+    zone: Optional[str] = None, sub_zone: Optional[str] = None,
+):
+    """Interventions comptées dans la charge planifiée sur [start_utc, end_utc) :
+    hors annulées et brouillons de tournée, filtrées par sous-zone ou zone.
+    Forme couverte par tests/test_query_plans.py (index, jamais de Seq Scan)."""
+    query = db.query(Intervention).filter(
+        Intervention.start_time >= start_utc,
+        Intervention.start_time < end_utc,
+        Intervention.status != "cancelled",
+        Intervention.tour_visibility != "draft",
+    )
+    if sub_zone:
+        query = query.filter(Intervention.sub_zone == sub_zone)
+    elif zone:
+        query = query.filter(Intervention.zone == zone)
+    return query
 
-    emp_query = db.query(Employee)
-    if zone:
-        emp_query = emp_query.filter(Employee.zone == zone)
-    all_employees = emp_query.all()
 
-    day_start, day_end = _utc_bounds(target_date)
+def _planned_hours_by_day_query(
+    db: Session, start_utc: datetime, end_utc: datetime,
+    zone: Optional[str] = None, sub_zone: Optional[str] = None,
+):
+    """(jour belge, somme de planned_hours) des interventions enregistrées :
+    une ligne par jour, sans charger d'intervention ni de taux horaire."""
+    day = func.date(func.timezone("Europe/Brussels", Intervention.start_time))
+    return _planned_interventions_query(db, start_utc, end_utc, zone, sub_zone).filter(
+        Intervention.planned_hours > 0,
+    ).with_entities(
+        day.label("day"), func.sum(Intervention.planned_hours).label("hours"),
+    ).group_by(day)
+
+
+def _date_range(start: date, end: date):
+    current = start
+    while current <= end:
+        yield current
+        current += timedelta(days=1)
+
+
+def _capacity_matrix(db: Session, start: date, end: date, employees: list) -> CapacityMatrix:
+    """Capacité employé × jour de [start, end] en une passe, avec les absences,
+    montées en charge et fermetures de la plage."""
+    closures = db.query(CompanyClosure).filter(
+        CompanyClosure.start_date <= end,
+        CompanyClosure.end_date >= start
+    ).all()
+
+    range_start_utc, _ = _utc_bounds(start)
+    _, range_end_utc    = _utc_bounds(end)
+
     absences = db.query(Absence).filter(
-        Absence.start_date < day_end,
-        Absence.end_date >= day_start,
+        Absence.start_date < range_end_utc,
+        Absence.end_date >= range_start_utc,
     ).all()
-    absent_ids = {a.employee_id for a in absences}
 
     progressive = db.query(ProgressiveHours).filter(
-        ProgressiveHours.start_date <= target_date,
-        ProgressiveHours.end_date >= target_date
+        ProgressiveHours.start_date <= end,
+        ProgressiveHours.end_date >= start,
     ).all()
 
-    total_capacity = 0
-    present_count = 0
-    for emp in all_employees:
-        if emp.id not in absent_ids:
-            hours = _get_employee_hours_for_day(emp, target_date, progressive)
-            total_capacity += hours
-            if hours > 0:
-                present_count += 1
-
-    int_query = db.query(Intervention).options(
-        selectinload(Intervention.employees),
-        selectinload(Intervention.hourly_rate),
-    ).filter(
-        Intervention.start_time >= day_start,
-        Intervention.start_time < day_end,
-        Intervention.status != "cancelled",
-        ~Intervention.tour_run.has() | Intervention.tour_run.has(TourRun.publication_status == "published"),
+    return CapacityMatrix(employees, start, end, progressive, absences, closures)
+
+
+def _cell_stats(capacity: CapacityMatrix, d: date, planned: float, employee_ids=None) -> dict:
+    if capacity.is_closed(d):
+        return {"capacity_hours": 0.0, "planned_hours": 0.0, "present_employees": 0, "closed": True}
+    total_capacity, present_count = capacity.day_capacity(d, employee_ids)
+    return {
+        "capacity_hours": total_capacity,
+        "planned_hours": planned,
+        "present_employees": present_count,
+        "closed": False,
+    }
+
+
+def compute_range_stats(
+    db: Session, start: date, end: date,
+    zone: Optional[str] = None, sub_zone: Optional[str] = None,
+) -> Dict[date, dict]:
+    """
+    Calcul direct des cumuls de chaque jour de [start, end] (6 requêtes pour
+    toute la plage) : {jour: {capacity_hours, planned_hours, present_employees,
+    closed}}, non arrondis. La capacité suit la zone des employés, la charge
+    planifiée la sous-zone si elle est donnée, sinon la zone.
+
+    Les lectures passent par planning_day_stats(), qui ne rappelle ce calcul
+    que pour les jours dont le cumul enregistré est périmé.
+    """
+    emp_query = db.query(Employee)
+    if zone:
+        emp_query = emp_query.filter(Employee.zone == zone)
+    capacity = _capacity_matrix(db, start, end, emp_query.all())
+
+    range_start_utc, _ = _utc_bounds(start)
+    _, range_end_utc    = _utc_bounds(end)
+
+    # Heures planifiées par jour calendaire belge (comme les triggers de la
+    # migration 030), sans multiplier par le nombre d'employés assignés :
+    # 2 ouvriers sur un chantier de 4h ne comptent pas 8h dans le total du jour.
+    planned_by_day: Dict[date, float] = {
+        row.day: float(row.hours)
+        for row in _planned_hours_by_day_query(db, range_start_utc, range_end_utc, zone, sub_zone)
+    }
+    # Occurrences encore calculées des séries sans fin (app/services/recurrence.py).
+    for iv in virtual_occurrences(
+        db, range_start_utc, range_end_utc, zone=zone, sub_zone=sub_zone, exclude_cancelled=True,
+    ):
+        h = intervention_hours(iv)
+        if h > 0:
+            day = iv.start_time.astimezone(BRUSSELS_TZ).date()
+            planned_by_day[day] = planned_by_day.get(day, 0.0) + h
+
+    return {d: _cell_stats(capacity, d, planned_by_day.get(d, 0.0)) for d in capacity.days()}
+
+
+def _planned_hours_matrix_query(db: Session, start_utc: datetime, end_utc: datetime):
+    """Heures planifiées par jour, en une lecture des interventions de la
+    plage : GROUPING SETS (jour), (jour, zone), (jour, sous-zone)."""
+    day = func.date(func.timezone("Europe/Brussels", Intervention.start_time))
+    return _planned_interventions_query(db, start_utc, end_utc).filter(
+        Intervention.planned_hours > 0,
+    ).with_entities(
+        day.label("day"),
+        Intervention.zone,
+        Intervention.sub_zone,
+        func.grouping(Intervention.zone).label("by_zone"),
+        func.grouping(Intervention.sub_zone).label("by_sub_zone"),
+        func.sum(Intervention.planned_hours).label("hours"),
+    ).group_by(
+        func.grouping_sets(tuple_(day), tuple_(day, Intervention.zone), tuple_(day, Intervention.sub_zone)),
     )
-    if sub_zone:
-        int_query = int_query.filter(Intervention.sub_zone == sub_zone)
-    elif zone:
-        int_query = int_query.filter(Intervention.zone == zone)
-    interventions = int_query.all()
-
-    total_planned = 0
-    for inter in interventions:
-        hours = intervention_hours(inter)
-        if hours <= 0:
-            continue
-        # Heures de l'intervention elle-meme, sans multiplier par le nombre
-        # d'employes assignes : 2 ouvriers sur un chantier de 4h ne doivent
-        # pas compter comme 8h dans le total planifie du jour.
-        total_planned += hours
-
-    status = "ok"
+
+
+def compute_matrix_stats(db: Session, start: date, end: date, keys) -> Dict[tuple, Dict[date, dict]]:
+    """
+    compute_range_stats pour plusieurs cellules (zone, sous-zone) d'un coup —
+    clés normalisées ("" = toutes), sous-zone toujours accompagnée de sa zone
+    parente. Une seule lecture de chaque table : capacité de tous les employés
+    (sommée par zone ensuite), charge planifiée groupée en SQL par jour, zone
+    et sous-zone, occurrences calculées réparties en mémoire.
+    """
+    employees = db.query(Employee).all()
+    capacity = _capacity_matrix(db, start, end, employees)
+    range_start_utc, _ = _utc_bounds(start)
+    _, range_end_utc    = _utc_bounds(end)
+
+    return _matrix_cells(
+        capacity,
+        _planned_hours_matrix_query(db, range_start_utc, range_end_utc),
+        virtual_occurrences(db, range_start_utc, range_end_utc, exclude_cancelled=True),
+        employees,
+        keys,
+    )
+
+
+def _matrix_cells(capacity: CapacityMatrix, planned_rows, occurrences, employees, keys) -> Dict[tuple, Dict[date, dict]]:
+    """Assemblage des cellules de compute_matrix_stats, sans accès à la base :
+    lignes GROUPING SETS de _planned_hours_matrix_query, occurrences calculées
+    et employés (pour la capacité par zone)."""
+    # Clés de charge : ("", "") toutes zones, (zone, "") ou ("", sous-zone).
+    planned: Dict[tuple, Dict[date, float]] = {}
+
+    def add(key, d, hours):
+        by_day = planned.setdefault(key, {})
+        by_day[d] = by_day.get(d, 0.0) + hours
+
+    for row in planned_rows:
+        if row.by_zone and row.by_sub_zone:
+            add(("", ""), row.day, float(row.hours))
+        elif not row.by_zone and row.zone:
+            add((row.zone, ""), row.day, float(row.hours))
+        elif not row.by_sub_zone and row.sub_zone:
+            add(("", row.sub_zone), row.day, float(row.hours))
+    for iv in occurrences:
+        h = intervention_hours(iv)
+        if h > 0:
+            d = iv.start_time.astimezone(BRUSSELS_TZ).date()
+            add(("", ""), d, h)
+            if iv.zone:
+                add((iv.zone, ""), d, h)
+            if iv.sub_zone:
+                add(("", iv.sub_zone), d, h)
+
+    employees_by_zone: Dict[str, list] = {}
+    for emp in employees:
+        employees_by_zone.setdefault(emp.zone, []).append(emp.id)
+
+    results = {}
+    for zone_key, sub_zone_key in keys:
+        employee_ids = employees_by_zone.get(zone_key, []) if zone_key else None
+        by_day = planned.get(("", sub_zone_key) if sub_zone_key else (zone_key, ""), {})
+        results[(zone_key, sub_zone_key)] = {
+            d: _cell_stats(capacity, d, by_day.get(d, 0.0), employee_ids) for d in capacity.days()
+        }
+    return results
+
+
+# Jours recalculés par une lecture faute de cumul à jour, par clé (zone,
+# sous-zone) : refresh_stats_job les réenregistre, même hors de sa plage
+# autour d'aujourd'hui. Propre au processus, comme le job qui les vide.
+_stale_reads: Dict[tuple, set] = {}
+_stale_reads_lock = threading.Lock()
+
+
+def _queue_stale_reads(missing: Dict[tuple, List[date]]) -> None:
+    with _stale_reads_lock:
+        for key, stale_days in missing.items():
+            _stale_reads.setdefault(key, set()).update(stale_days)
+
+
+def _take_stale_reads() -> Dict[tuple, set]:
+    global _stale_reads
+    with _stale_reads_lock:
+        queued, _stale_reads = _stale_reads, {}
+    return queued
+
+
+def _stats_versions(db: Session, start: date, end: date) -> Dict[date, int]:
+    """{jour: version} de [start, end] : voir les migrations 030 et 037."""
+    return dict(db.query(PlanningDayVersion.day, PlanningDayVersion.version).filter(
+        PlanningDayVersion.day >= start,
+        PlanningDayVersion.day <= end,
+    ).all())
+
+
+def _store_stats(db: Session, computed: Dict[tuple, Dict[date, dict]], days: dict):
+    """Upsert des cumuls calculés, dans la transaction courante (commit à la
+    charge de l'appelant, qui tient le verrou 837264023 : migration 037)."""
+    values = [
+        {
+            "zone": zone_key, "sub_zone": sub_zone_key, "day": d,
+            "day_version": days.get(d, 0),
+            **stats,
+        }
+        for (zone_key, sub_zone_key), by_day in computed.items()
+        for d, stats in by_day.items()
+    ]
+    if not values:
+        return
+    stmt = pg_insert(PlanningDayStats).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PlanningDayStats.zone, PlanningDayStats.sub_zone, PlanningDayStats.day],
+        set_={
+            col: stmt.excluded[col]
+            for col in ("capacity_hours", "planned_hours", "present_employees", "closed", "day_version")
+        } | {"computed_at": func.now()},
+    )
+    db.execute(stmt)
+
+
+def _current_stats(rows, keys, days: dict) -> Dict[tuple, Dict[date, dict]]:
+    """Lignes de planning_day_stats encore à jour, par clé : version du jour
+    (0 si le jour n'a jamais été touché) égale à celle lue par
+    _stats_versions."""
+    results: Dict[tuple, Dict[date, dict]] = {key: {} for key in keys}
+    for row in rows:
+        key = (row.zone, row.sub_zone)
+        if key in results and row.day_version == days.get(row.day, 0):
+            results[key][row.day] = {
+                "capacity_hours": row.capacity_hours,
+                "planned_hours": row.planned_hours,
+                "present_employees": row.present_employees,
+                "closed": row.closed,
+            }
+    return results
+
+
+def _missing_days(results: Dict[tuple, Dict[date, dict]], start: date, end: date) -> Dict[tuple, List[date]]:
+    """Jours de [start, end] sans cumul à jour, par clé ; clés complètes omises."""
+    missing = {key: [d for d in _date_range(start, end) if d not in by_day] for key, by_day in results.items()}
+    return {key: stale_days for key, stale_days in missing.items() if stale_days}
+
+
+def planning_stats(
+    db: Session, start: date, end: date, keys,
+    store: bool = False, rebuild: bool = False,
+) -> Dict[tuple, Dict[date, dict]]:
+    """
+    Cumuls de [start, end] pour chaque clé (zone, sous-zone) normalisée, lus
+    dans planning_day_stats (un parcours de la clé primaire par cellule) ;
+    les jours absents ou périmés — version du jour changée depuis le calcul —
+    sont recalculés en une passe sur [premier, dernier] jour manquant.
+
+    Par défaut la lecture n'écrit rien : les GET de stats ne prennent ni
+    verrou ni transaction d'écriture, et le recalcul ne sert qu'à la réponse.
+    Les jours recalculés sont mis en file pour refresh_stats_job, qui les
+    réenregistre : la lecture suivante les retrouve dans la table.
+    store=True réenregistre les jours recalculés (refresh_stats_job) ;
+    rebuild=True recalcule et réenregistre toute la plage
+    (scripts/planning_rollup.py). Dans les deux cas, commit à la charge de
+    l'appelant.
+
+    Les versions sont lues avant le calcul : une écriture concurrente peut
+    rendre la ligne enregistrée périmée, jamais la faire passer pour à jour.
+    """
+    keys = list(dict.fromkeys(keys))
+    days = _stats_versions(db, start, end)
+
+    if rebuild:
+        results: Dict[tuple, Dict[date, dict]] = {key: {} for key in keys}
+    else:
+        rows = db.query(PlanningDayStats).filter(
+            tuple_(PlanningDayStats.zone, PlanningDayStats.sub_zone).in_(keys),
+            PlanningDayStats.day >= start,
+            PlanningDayStats.day <= end,
+        ).all()
+        results = _current_stats(rows, keys, days)
+
+    missing = _missing_days(results, start, end)
+    if missing:
+        first = min(stale_days[0] for stale_days in missing.values())
+        last = max(stale_days[-1] for stale_days in missing.values())
+        if len(missing) == 1:
+            # Une seule cellule (daily-stats, range-stats) : requêtes filtrées.
+            (zone_key, sub_zone_key), = missing
+            computed = {
+                (zone_key, sub_zone_key): compute_range_stats(db, first, last, zone_key or None, sub_zone_key or None),
+            }
+        else:
+            computed = compute_matrix_stats(db, first, last, missing)
+        stale = {key: {d: computed[key][d] for d in stale_days} for key, stale_days in missing.items()}
+        if store or rebuild:
+            _store_stats(db, stale, days)
+        else:
+            _queue_stale_reads(missing)
+        for key, by_day in stale.items():
+            results[key].update(by_day)
+    return results
+
+
+def planning_day_stats(
+    db: Session, start: date, end: date,
+    zone: Optional[str] = None, sub_zone: Optional[str] = None,
+    rebuild: bool = False,
+) -> Dict[date, dict]:
+    """Cumuls d'une seule cellule : voir planning_stats()."""
+    key = (zone or "", sub_zone or "")
+    return planning_stats(db, start, end, [key], rebuild=rebuild)[key]
+
+
+def _matrix_keys(db: Session) -> list:
+    """Cellules du tableau de bord : toutes zones, puis chaque zone suivie de
+    ses sous-zones (ordre de l'écran Paramètres)."""
+    keys = [("", "")]
+    sub_zones = db.query(SubZone.parent_zone, SubZone.code).order_by(
+        SubZone.parent_zone, SubZone.position, SubZone.code,
+    ).all()
+    for parent_zone, code in sub_zones:
+        if (parent_zone, "") not in keys:
+            keys.append((parent_zone, ""))
+        keys.append((parent_zone, code))
+    return keys
+
+
+def _stats_keys(db: Session, start: date, end: date) -> list:
+    """Cellules du tableau de bord, zones des employés (sans sous-zone, donc
+    absentes du tableau de bord) et cellules déjà enregistrées sur la plage."""
+    zones = db.query(Employee.zone).distinct().all()
+    rows = db.query(PlanningDayStats.zone, PlanningDayStats.sub_zone).filter(
+        PlanningDayStats.day >= start,
+        PlanningDayStats.day <= end,
+    ).distinct().all()
+    return sorted({
+        *_matrix_keys(db),
+        *((zone, "") for zone, in zones),
+        *((zone_key, sub_zone_key) for zone_key, sub_zone_key in rows),
+    })
+
+
+def refresh_planning_stats(db: Session, start: date, end: date):
+    """Réenregistre les cumuls absents ou périmés de [start, end] ; les
+    lignes déjà à jour ne sont pas recalculées. Commit à la charge de
+    l'appelant."""
+    planning_stats(db, start, end, _stats_keys(db, start, end), store=True)
+
+
+def store_stale_reads(db: Session, queued: Dict[tuple, set]):
+    """Réenregistre les jours mis en file par les lectures (_take_stale_reads),
+    par plage de jours consécutifs : une passe par plage pour toutes les clés
+    qui la partagent."""
+    runs: Dict[tuple, list] = {}
+    for key, stale_days in queued.items():
+        ordered = sorted(stale_days)
+        first = ordered[0]
+        for previous, d in zip(ordered, ordered[1:] + [None]):
+            if d != previous + timedelta(days=1):
+                runs.setdefault((first, previous), []).append(key)
+                first = d
+    for (first, last), keys in sorted(runs.items()):
+        planning_stats(db, first, last, keys, store=True)
+
+
+def refresh_stats_job() -> None:
+    """Job planifié : remet à jour les cumuls autour d'aujourd'hui et les
+    jours recalculés depuis par les lectures, pour que les GET de stats (qui
+    n'écrivent pas) les trouvent valides. Même schéma que
+    tours.generate_drafts_job ; sans le verrou (autre worker, écriture
+    d'employé en cours : migration 037), les jours restent en file."""
+    from sqlalchemy import text
+    from app.models.models import SessionLocal
+
+    queued = _take_stale_reads()
+    db = SessionLocal()
+    try:
+        locked = db.execute(text("SELECT pg_try_advisory_xact_lock(837264023)")).scalar()
+        if not locked:
+            db.rollback()
+            _queue_stale_reads(queued)
+            return
+        today = datetime.now(BRUSSELS_TZ).date()
+        refresh_planning_stats(db, today - STATS_REFRESH_PAST, today + STATS_REFRESH_AHEAD)
+        store_stale_reads(db, queued)
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        _queue_stale_reads(queued)
+        print(f"[planning-stats] rafraichissement differe: {error}")
+    finally:
+        db.close()
+
+
+def _day_payload(d: date, stats: dict, tolerance: float) -> dict:
+    """Réponse de daily-stats / range-stats pour un jour ; le statut dépend
+    de la tolérance courante et n'est donc jamais enregistré."""
+    if stats["closed"]:
+        return {
+            "date": d.strftime("%Y-%m-%d"),
+            "capacity_hours": 0, "planned_hours": 0,
+            "tolerance": tolerance, "present_employees": 0, "status": "closed"
+        }
+
+    total_capacity, total_planned = stats["capacity_hours"], stats["planned_hours"]
     if total_planned > (total_capacity + tolerance):
         status = "overload"
     elif total_planned > total_capacity:
         status = "warning"
+    else:
+        status = "ok"
 
     return {
-        "date": target_date.strftime("%Y-%m-%d"),
+        "date": d.strftime("%Y-%m-%d"),
         "capacity_hours": round(total_capacity, 1),
         "planned_hours": round(total_planned, 1),
         "tolerance": tolerance,
-        "present_employees": present_count,
-        "status": status
+        "present_employees": stats["present_employees"],
+        "status": status,
     }
 
+
+def _tolerance(db: Session) -> float:
+    settings = db.query(CompanySettings).first()
+    return settings.overtime_tolerance_hours if settings else 3.0
+
+
+def calculate_day_stats(target_date: date, db: Session, zone: Optional[str] = None, sub_zone: Optional[str] = None):
+    stats = planning_day_stats(db, target_date, target_date, zone, sub_zone)
+    return _day_payload(target_date, stats[target_date], _tolerance(db))
+
 # --- ROUTES ---
 
 @router.get("/daily-stats")
@@ -206,115 +606,87 @@ def get_range_stats_endpoint(
     start = datetime.strptime(start_str, "%Y-%m-%d").date()
     end = datetime.strptime(end_str, "%Y-%m-%d").date()
 
-    # --- Batch : 6 requêtes pour tout le range ---
-    settings = db.query(CompanySettings).first()
-    tolerance = settings.overtime_tolerance_hours if settings else 3.0
+    tolerance = _tolerance(db)
+    stats = planning_day_stats(db, start, end, zone, sub_zone)
+    return {d.strftime("%Y-%m-%d"): _day_payload(d, stats[d], tolerance) for d in _date_range(start, end)}
 
-    closures = db.query(CompanyClosure).filter(
-        CompanyClosure.start_date <= end,
-        CompanyClosure.end_date >= start
-    ).all()
-    closed_dates = set()
-    for c in closures:
-        d = c.start_date
-        while d <= c.end_date:
-            if start <= d <= end:
-                closed_dates.add(d)
-            d += timedelta(days=1)
 
-    emp_query = db.query(Employee)
-    if zone:
-        emp_query = emp_query.filter(Employee.zone == zone)
-    employees = emp_query.all()
+@router.get("/matrix")
+def get_planning_matrix(
+    start: str,
+    end: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    """
+    Stats de toutes les cellules (zone, sous-zone, jour) de la plage en une
+    réponse, pour la carte de chaleur du tableau de bord — qui appelait
+    range-stats une fois par zone et par sous-zone. Chaque cellule vaut
+    exactement range-stats?zone=...&sub_zone=... (None = toutes).
+    """
+    start_day = datetime.strptime(start, "%Y-%m-%d").date()
+    end_day = datetime.strptime(end, "%Y-%m-%d").date()
 
-    range_start_utc, _ = _utc_bounds(start)
-    _, range_end_utc    = _utc_bounds(end)
+    tolerance = _tolerance(db)
+    keys = _matrix_keys(db)
+    stats = planning_stats(db, start_day, end_day, keys)
+    return {
+        "tolerance": tolerance,
+        "cells": [
+            {
+                "zone": zone_key or None,
+                "sub_zone": sub_zone_key or None,
+                "days": {
+                    d.strftime("%Y-%m-%d"): _day_payload(d, stats[(zone_key, sub_zone_key)][d], tolerance)
+                    for d in _date_range(start_day, end_day)
+                },
+            }
+            for zone_key, sub_zone_key in keys
+        ],
+    }
 
-    absences = db.query(Absence).filter(
-        Absence.start_date < range_end_utc,
-        Absence.end_date >= range_start_utc,
-    ).all()
 
-    progressive = db.query(ProgressiveHours).filter(
-        ProgressiveHours.start_date <= end,
-        ProgressiveHours.end_date >= start,
-    ).all()
+# Colonnes de détail acceptées par /revenue (paramètre by) et nom du champ
+# correspondant dans la réponse.
+REVENUE_BREAKDOWNS = {
+    "zone": MonthlyRevenue.zone.label("zone"),
+    "payment_mode": MonthlyRevenue.payment_mode.label("payment_mode"),
+    "employee": MonthlyRevenue.closed_by_employee_id.label("employee_id"),
+}
+MAX_REVENUE_MONTHS = 24
 
-    int_query = db.query(Intervention).options(
-        selectinload(Intervention.employees),
-        selectinload(Intervention.hourly_rate),
-    ).filter(
-        Intervention.start_time >= range_start_utc,
-        Intervention.start_time < range_end_utc,
-        Intervention.status != "cancelled",
-        ~Intervention.tour_run.has() | Intervention.tour_run.has(TourRun.publication_status == "published"),
-    )
-    if sub_zone:
-        int_query = int_query.filter(Intervention.sub_zone == sub_zone)
-    elif zone:
-        int_query = int_query.filter(Intervention.zone == zone)
-    interventions = int_query.all()
-
-    # Index interventions par jour
-    from collections import defaultdict
-    interventions_by_day: Dict[date, list] = defaultdict(list)
-    for iv in interventions:
-        day = iv.start_time.date() if iv.start_time else None
-        if day:
-            interventions_by_day[day].append(iv)
-
-    # Index absences par employé
-    def is_absent(emp_id, d: date) -> bool:
-        for ab in absences:
-            if ab.employee_id == emp_id and ab.start_date.date() <= d <= ab.end_date.date():
-                return True
-        return False
 
-    results = {}
-    current = start
-    while current <= end:
-        if current in closed_dates:
-            results[current.strftime("%Y-%m-%d")] = {
-                "date": current.strftime("%Y-%m-%d"),
-                "capacity_hours": 0, "planned_hours": 0,
-                "tolerance": tolerance, "present_employees": 0, "status": "closed"
-            }
-            current += timedelta(days=1)
-            continue
-
-        total_capacity = 0.0
-        present_count = 0
-        for emp in employees:
-            if not is_absent(emp.id, current):
-                h = _get_employee_hours_for_day(emp, current, progressive)
-                total_capacity += h
-                if h > 0:
-                    present_count += 1
-
-        total_planned = 0.0
-        for iv in interventions_by_day.get(current, []):
-            h = intervention_hours(iv)
-            if h > 0:
-                total_planned += h
-
-        if total_planned > (total_capacity + tolerance):
-            status = "overload"
-        elif total_planned > total_capacity:
-            status = "warning"
-        else:
-            status = "ok"
-
-        results[current.strftime("%Y-%m-%d")] = {
-            "date": current.strftime("%Y-%m-%d"),
-            "capacity_hours": round(total_capacity, 1),
-            "planned_hours": round(total_planned, 1),
-            "tolerance": tolerance,
-            "present_employees": present_count,
-            "status": status,
-        }
-        current += timedelta(days=1)
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
 
-    return results
+
+def _current_month() -> date:
+    return datetime.now(BRUSSELS_TZ).date().replace(day=1)
+
+
+def _revenue_query(db: Session, first_month: date, last_month: date, breakdown: List[str] = ()):
+    """Sommes de monthly_revenue (migration 032) par mois et par colonnes de
+    détail, sur [first_month, last_month] : un parcours de l'index unique, dont
+    le mois est la première colonne."""
+    columns = [REVENUE_BREAKDOWNS[name] for name in breakdown]
+    return db.query(
+        MonthlyRevenue.month,
+        *columns,
+        func.sum(MonthlyRevenue.total_amount).label("total"),
+        func.sum(MonthlyRevenue.cash_amount).label("cash"),
+        func.sum(MonthlyRevenue.invoice_amount).label("invoice"),
+        func.sum(MonthlyRevenue.interventions).label("interventions"),
+    ).filter(
+        MonthlyRevenue.month >= first_month,
+        MonthlyRevenue.month <= last_month,
+    ).group_by(
+        MonthlyRevenue.month, *columns,
+    ).having(
+        func.sum(MonthlyRevenue.interventions) > 0,
+    ).order_by(
+        MonthlyRevenue.month, *columns,
+    )
 
 
 @router.get("/monthly-revenue")
@@ -327,48 +699,73 @@ def get_monthly_revenue(
     CA réalisé par mois, sur les `months` derniers mois (mois courant inclus).
 
     Le dashboard calculait ces totaux côté mobile, ce qui l'obligeait à
-    télécharger tout l'historique des interventions au démarrage. L'agrégation
-    est faite ici en SQL : la réponse tient en quelques lignes {month, revenue},
-    assez légère pour être conservée hors ligne et affichée immédiatement.
-
-    Les mois sans chiffre d'affaires sont renvoyés à 0 plutôt qu'omis, pour que
-    le graphique garde toujours le même nombre de points.
+    télécharger tout l'historique des interventions au démarrage. Les totaux
+    sont lus dans monthly_revenue, tenue à jour par la base (migration 032) :
+    la réponse tient en quelques lignes {month, revenue}, assez légère pour
+    être conservée hors ligne et affichée immédiatement.
+
+    Les mois sont découpés en heure de Bruxelles, pas en UTC : une
+    intervention du 1er du mois à 00h30 locale reste dans son mois. Les mois
+    sans chiffre d'affaires sont renvoyés à 0 plutôt qu'omis, pour que le
+    graphique garde toujours le même nombre de points.
     """
-    months = max(1, min(months, 24))
+    months = max(1, min(months, MAX_REVENUE_MONTHS))
 
-    today = datetime.now(BRUSSELS_TZ).date()
-    year, month = today.year, today.month - (months - 1)
-    while month <= 0:
-        month += 12
-        year -= 1
+    last_month = _current_month()
+    first_month = _add_months(last_month, -(months - 1))
+    totals = {r.month: float(r.total or 0) for r in _revenue_query(db, first_month, last_month)}
 
-    start_utc = datetime(year, month, 1, tzinfo=BRUSSELS_TZ).astimezone(timezone.utc)
+    return [
+        {"month": m.strftime("%Y-%m"), "revenue": round(totals.get(m, 0.0), 2)}
+        for m in (_add_months(first_month, i) for i in range(months))
+    ]
 
-    # Les mois sont découpés en heure de Bruxelles, pas en UTC : sinon une
-    # intervention du 1er du mois à 00h30 locale bascule dans le mois précédent.
-    month_expr = func.date_trunc(
-        "month", func.timezone("Europe/Brussels", Intervention.start_time)
-    )
-    rows = (
-        db.query(
-            month_expr.label("month"),
-            func.sum(Intervention.price_estimated).label("revenue"),
-        )
-        .filter(
-            Intervention.status == "done",
-            Intervention.start_time >= start_utc,
-        )
-        .group_by(month_expr)
-        .all()
-    )
-    totals = {r.month.strftime("%Y-%m"): float(r.revenue or 0) for r in rows}
-
-    result = []
-    for _ in range(months):
-        key = f"{year:04d}-{month:02d}"
-        result.append({"month": key, "revenue": round(totals.get(key, 0.0), 2)})
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-    return result
+
+@router.get("/revenue")
+def get_revenue(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    by: str = "",
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    CA réalisé de start à end (mois "YYYY-MM" inclus, 24 au plus ; par défaut
+    les 12 derniers mois), détaillé par les colonnes listées dans by, séparées
+    par des virgules : zone, payment_mode, employee (employé qui a clôturé).
+
+    Une ligne par mois et combinaison présente : {month, [zone],
+    [payment_mode], [employee_id], total, cash, invoice, interventions}. La
+    part cash suit la règle du cash hebdomadaire (amount_cash pour
+    invoice_cash), la part facture est le reste. Réservé aux admins : le
+    détail par employé expose le CA de chacun.
+    """
+    _require_admin(current_user)
+    breakdown = [name.strip() for name in by.split(",") if name.strip()]
+    unknown = [name for name in breakdown if name not in REVENUE_BREAKDOWNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Détail inconnu : {', '.join(unknown)}")
+    breakdown = list(dict.fromkeys(breakdown))
+
+    try:
+        last_month = datetime.strptime(end, "%Y-%m").date() if end else _current_month()
+        first_month = datetime.strptime(start, "%Y-%m").date() if start else _add_months(last_month, -11)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Mois attendu au format AAAA-MM")
+    if first_month > last_month:
+        raise HTTPException(status_code=400, detail="start doit précéder end")
+    if first_month < _add_months(last_month, -(MAX_REVENUE_MONTHS - 1)):
+        raise HTTPException(status_code=400, detail=f"{MAX_REVENUE_MONTHS} mois au plus")
+
+    rows = _revenue_query(db, first_month, last_month, breakdown)
+    return [
+        {
+            "month": r.month.strftime("%Y-%m"),
+            **{REVENUE_BREAKDOWNS[name].name: getattr(r, REVENUE_BREAKDOWNS[name].name) for name in breakdown},
+            "total": round(float(r.total), 2),
+            "cash": round(float(r.cash), 2),
+            "invoice": round(float(r.invoice), 2),
+            "interventions": int(r.interventions),
+        }
+        for r in rows
+    ]
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 from uuid import UUID
@@ -7,6 +8,7 @@ import re
 from app.models.models import get_db, SubZone, CitySubZone, Client, Intervention, HourlyRate, CompanySettings
 from app.schemas.schemas import SubZoneOut, HourlyRateOut, HourlyRateCreate, normalize_city
 from app.core.deps import get_current_user
+from app.core.etag import etag_for, not_modified, resource_version
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -30,7 +32,15 @@ class CompanySettingsPatch(BaseModel):
 
 
 @router.get("/zones", response_model=List[SubZoneOut])
-def list_zones(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def list_zones(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    cached = not_modified(request, response, etag_for("zones", db.execute(select(resource_version("zones"))).scalar()))
+    if cached:
+        return cached
     zones = db.query(SubZone).options(joinedload(SubZone.cities)).order_by(
         SubZone.parent_zone, SubZone.position
     ).all()
@@ -164,11 +174,16 @@ def reassign_city(city: str, body: CityReassign, db: Session = Depends(get_db),
 
 @router.get("/hourly-rates", response_model=List[HourlyRateOut])
 def list_hourly_rates(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Réservé aux admins.")
+    cached = not_modified(request, response, etag_for("hourly_rates", db.execute(select(resource_version("hourly_rates"))).scalar()))
+    if cached:
+        return cached
     return db.query(HourlyRate).order_by(HourlyRate.rate).all()
 
 
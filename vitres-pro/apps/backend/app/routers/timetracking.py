@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, selectinload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from datetime import date, datetime, timedelta, timezone
 from typing import List, Optional
 from uuid import UUID
+import csv
+import io
+import json
+import tempfile
 
 from app.models.models import (
+    SessionLocal,
+    get_async_db,
     get_db,
     Employee,
     EmployeeTimeEntry,
@@ -13,10 +23,14 @@ from app.models.models import (
     Absence,
     ProgressiveHours,
     Intervention,
-    InAppNotification,
+    WeeklyHoursLedger,
+    WeeklyHoursVersion,
+    intervention_employees,
 )
-from app.core.deps import get_current_user
-from app.routers.planning import BRUSSELS_TZ, _utc_bounds, _get_employee_hours_for_day
+from app.core.deps import get_current_user, get_current_user_async
+from app.routers.planning import BRUSSELS_TZ, _utc_bounds
+from app.services.capacity import CapacityMatrix
+from app.services.notifications import notify_admins_later
 from app.schemas.schemas import (
     TimeEntryOut,
     DailyEntryOut,
@@ -71,68 +85,175 @@ def _worked_hours(entry: EmployeeTimeEntry) -> Optional[float]:
     return None
 
 
-def _notify_admins(db: Session, notif_type: str, title: str, message: str, metadata: dict):
-    admins = db.query(Employee).filter(Employee.role == "admin").all()
-    for admin in admins:
-        db.add(InAppNotification(
-            recipient_id=admin.id,
-            type=notif_type,
-            title=title,
-            message=message,
-            metadata_=metadata,
-        ))
-
-
 def _employee_actual_hours_for_day(
-    emp: Employee, d: date, entries_by_day: dict, absences: list, progressive: list
+    emp: Employee, d: date, entries_by_day: dict, capacity: CapacityMatrix
 ) -> float:
     entry = entries_by_day.get(d)
     if entry and entry.clock_in_at and entry.clock_out_at:
         return (entry.clock_out_at - entry.clock_in_at).total_seconds() / 3600
-    day_start, day_end = _utc_bounds(d)
-    for ab in absences:
-        if ab.employee_id == emp.id and ab.start_date < day_end and ab.end_date >= day_start:
-            return _get_employee_hours_for_day(emp, d, progressive)
+    if capacity.is_absent(emp.id, d):
+        return capacity.hours(emp.id, d)
     return 0.0
 
 
-def _weekly_actual_hours(db: Session, emp: Employee, week_start: date, week_end: date) -> float:
+def _load_timesheets(
+    db: Session, employees: List[Employee], start: date, end: date
+) -> tuple[dict, CapacityMatrix]:
+    """Pointages, absences et montées en charge des employés sur [start, end],
+    en trois requêtes quel que soit le nombre d'employés et de semaines.
+
+    Renvoie ({employee_id: {jour: pointage}}, matrice de capacité de la
+    période) : _weekly_actual_hours et _daily_entries ne font plus que lire."""
+    ids = [emp.id for emp in employees]
+    entries_by_employee = {emp_id: {} for emp_id in ids}
     entries = (
         db.query(EmployeeTimeEntry)
         .filter(
-            EmployeeTimeEntry.employee_id == emp.id,
-            EmployeeTimeEntry.work_date >= week_start,
-            EmployeeTimeEntry.work_date <= week_end,
+            EmployeeTimeEntry.employee_id.in_(ids),
+            EmployeeTimeEntry.work_date >= start,
+            EmployeeTimeEntry.work_date <= end,
         )
         .all()
     )
-    entries_by_day = {e.work_date: e for e in entries}
+    for e in entries:
+        entries_by_employee[e.employee_id][e.work_date] = e
 
-    day_start_utc, _ = _utc_bounds(week_start)
-    _, day_end_utc = _utc_bounds(week_end)
+    day_start_utc, _ = _utc_bounds(start)
+    _, day_end_utc = _utc_bounds(end)
     absences = db.query(Absence).filter(
         Absence.start_date < day_end_utc,
         Absence.end_date >= day_start_utc,
-        Absence.employee_id == emp.id,
+        Absence.employee_id.in_(ids),
     ).all()
     progressive = db.query(ProgressiveHours).filter(
-        ProgressiveHours.start_date <= week_end,
-        ProgressiveHours.end_date >= week_start,
+        ProgressiveHours.start_date <= end,
+        ProgressiveHours.end_date >= start,
+        ProgressiveHours.employee_id.in_(ids),
     ).all()
+    return entries_by_employee, CapacityMatrix(employees, start, end, progressive, absences)
+
 
+def _weekly_actual_hours(
+    emp: Employee, week_start: date, week_end: date, entries_by_day: dict, capacity: CapacityMatrix
+) -> float:
     total = 0.0
     d = week_start
     while d <= week_end:
-        total += _employee_actual_hours_for_day(emp, d, entries_by_day, absences, progressive)
+        total += _employee_actual_hours_for_day(emp, d, entries_by_day, capacity)
         d += timedelta(days=1)
     return total
 
 
-def _overtime_balance(
-    db: Session, emp: Employee, include_current_week: bool = False
-) -> tuple[float, date, date]:
-    """Solde d'heures sup/en moins depuis le dernier règlement (ou depuis le
-    premier pointage si jamais réglé), calculé à la volée.
+def _hours_profile(emp: Employee) -> str:
+    """Horaire contractuel de l'employé, tel qu'il entre dans les heures
+    réelles (jours d'absence) : une ligne de weekly_hours_ledger calculée avec
+    un autre profil est périmée."""
+    return json.dumps([
+        emp.hours_per_weekday,
+        emp.daily_capacity,
+        emp.hours_valid_from.isoformat() if emp.hours_valid_from else None,
+        emp.hours_valid_until.isoformat() if emp.hours_valid_until else None,
+    ], sort_keys=True)
+
+
+def _weekly_hours(
+    db: Session, employees: List[Employee], first_weeks: dict, last_day: date,
+    store: bool = False, rebuild: bool = False,
+) -> dict:
+    """
+    Heures réelles de chaque semaine ISO, du lundi first_weeks[employee_id]
+    jusqu'au dimanche last_day : {employee_id: {lundi: heures}}.
+
+    Les semaines terminées sont lues dans weekly_hours_ledger (un parcours de
+    la clé primaire) ; les absentes ou périmées — version de la semaine ou
+    profil horaire changés depuis le calcul — sont recalculées en une passe
+    sur [première, dernière] semaine manquante. store=True les réenregistre
+    (refresh_ledger_job, règlement d'heures sup) ; les GET ne font que lire.
+    La semaine en cours est toujours calculée, jamais enregistrée.
+    rebuild=True recalcule toute la plage (scripts/overtime_ledger.py).
+
+    Les versions sont lues avant le calcul : une écriture concurrente peut
+    rendre la ligne enregistrée périmée, jamais la faire passer pour à jour.
+    Les lignes sont écrites sans commit : à l'appelant de valider.
+    """
+    results = {emp.id: {} for emp in employees}
+    if not employees:
+        return results
+    current_week_start, _ = _week_bounds(_today_brussels())
+    ids = [emp.id for emp in employees]
+    first = min(first_weeks[emp_id] for emp_id in ids)
+
+    versions = {
+        (employee_id, week_start): version
+        for employee_id, week_start, version in db.query(
+            WeeklyHoursVersion.employee_id, WeeklyHoursVersion.week_start, WeeklyHoursVersion.version
+        ).filter(
+            WeeklyHoursVersion.employee_id.in_(ids),
+            WeeklyHoursVersion.week_start >= first,
+            WeeklyHoursVersion.week_start <= last_day,
+        ).all()
+    }
+    profiles = {emp.id: _hours_profile(emp) for emp in employees}
+    if not rebuild:
+        rows = db.query(WeeklyHoursLedger).filter(
+            WeeklyHoursLedger.employee_id.in_(ids),
+            WeeklyHoursLedger.week_start >= first,
+            WeeklyHoursLedger.week_start < min(current_week_start, last_day),
+        ).all()
+        for row in rows:
+            if (
+                row.week_start >= first_weeks[row.employee_id]
+                and row.version == versions.get((row.employee_id, row.week_start), 0)
+                and row.profile == profiles[row.employee_id]
+            ):
+                results[row.employee_id][row.week_start] = row.actual_hours
+
+    missing = {}
+    for emp in employees:
+        weeks, week = [], first_weeks[emp.id]
+        while week <= last_day:
+            if week not in results[emp.id]:
+                weeks.append(week)
+            week += timedelta(days=7)
+        if weeks:
+            missing[emp.id] = weeks
+    if not missing:
+        return results
+
+    stale = [emp for emp in employees if emp.id in missing]
+    load_start = min(weeks[0] for weeks in missing.values())
+    load_end = max(weeks[-1] for weeks in missing.values()) + timedelta(days=6)
+    entries_by_employee, capacity = _load_timesheets(db, stale, load_start, load_end)
+    values = []
+    for emp in stale:
+        for week in missing[emp.id]:
+            actual = _weekly_actual_hours(emp, week, week + timedelta(days=6), entries_by_employee[emp.id], capacity)
+            results[emp.id][week] = actual
+            if store and week < current_week_start:
+                values.append({
+                    "employee_id": emp.id, "week_start": week,
+                    "actual_hours": actual, "delta_hours": weekly_delta_hours(actual),
+                    "version": versions.get((emp.id, week), 0), "profile": profiles[emp.id],
+                })
+    if values:
+        stmt = pg_insert(WeeklyHoursLedger).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WeeklyHoursLedger.employee_id, WeeklyHoursLedger.week_start],
+            set_={
+                col: stmt.excluded[col]
+                for col in ("actual_hours", "delta_hours", "version", "profile")
+            } | {"computed_at": func.now()},
+        )
+        db.execute(stmt)
+    return results
+
+
+def _overtime_balances(
+    db: Session, employees: List[Employee], include_current_week: bool = False, store: bool = False
+) -> dict:
+    """Solde d'heures sup/en moins de chaque employé depuis son dernier
+    règlement (ou depuis son premier pointage si jamais réglé) :
+    {employee_id: (solde, début de période, fin de période)}.
 
     Par défaut, on ne juge que les semaines complètes : la semaine en cours
     n'est comptée qu'une fois terminée (dimanche passé), sinon un employé qui
@@ -143,131 +264,176 @@ def _overtime_balance(
     `include_current_week=True` force l'inclusion de la semaine en cours
     (jusqu'à aujourd'hui) — calcul manuel/anticipé demandé par l'admin, par
     ex. le vendredi après-midi quand la semaine de travail est déjà terminée
-    sans attendre le dimanche calendaire."""
+    sans attendre le dimanche calendaire.
+
+    Le solde est le reliquat du dernier règlement plus la somme des écarts
+    hebdomadaires, lus dans le registre des semaines (_weekly_hours) : seules
+    les semaines jamais calculées ou modifiées depuis sont relues en détail,
+    et réenregistrées si store=True."""
     today = _today_brussels()
     current_week_start, current_week_end = _week_bounds(today)
-
-    last_settlement = (
-        db.query(OvertimeSettlement)
-        .filter(OvertimeSettlement.employee_id == emp.id)
-        .order_by(OvertimeSettlement.period_end.desc())
-        .first()
-    )
-    # Un règlement partiel (ex. 1 jour de congé pris sur un solde plus large)
-    # laisse un reliquat non consommé : on repart de là plutôt que de zéro,
-    # sinon le reste du solde disparaîtrait silencieusement.
-    carried_forward = last_settlement.carried_forward_hours if last_settlement else 0.0
-    if last_settlement:
-        period_start = last_settlement.period_end + timedelta(days=1)
-    else:
-        first_entry = (
-            db.query(EmployeeTimeEntry)
-            .filter(EmployeeTimeEntry.employee_id == emp.id)
-            .order_by(EmployeeTimeEntry.work_date.asc())
-            .first()
-        )
-        period_start = first_entry.work_date if first_entry else current_week_start
-        period_start, _ = _week_bounds(period_start)
-
     last_counted_week_end = (
         current_week_end if include_current_week else current_week_start - timedelta(days=1)
     )
+    ids = [emp.id for emp in employees]
+
+    # Dernier règlement de chaque employé (DISTINCT ON employee_id).
+    last_settlements = {
+        s.employee_id: s
+        for s in db.query(OvertimeSettlement)
+        .filter(OvertimeSettlement.employee_id.in_(ids))
+        .distinct(OvertimeSettlement.employee_id)
+        .order_by(OvertimeSettlement.employee_id, OvertimeSettlement.period_end.desc())
+        .all()
+    }
+    first_work_dates = dict(
+        db.query(EmployeeTimeEntry.employee_id, func.min(EmployeeTimeEntry.work_date))
+        .filter(EmployeeTimeEntry.employee_id.in_(ids))
+        .group_by(EmployeeTimeEntry.employee_id)
+        .all()
+    )
+
+    periods = {}
+    for emp in employees:
+        last_settlement = last_settlements.get(emp.id)
+        # Un règlement partiel (ex. 1 jour de congé pris sur un solde plus large)
+        # laisse un reliquat non consommé : on repart de là plutôt que de zéro,
+        # sinon le reste du solde disparaîtrait silencieusement.
+        carried_forward = last_settlement.carried_forward_hours if last_settlement else 0.0
+        if last_settlement:
+            period_start = last_settlement.period_end + timedelta(days=1)
+        else:
+            period_start, _ = _week_bounds(first_work_dates.get(emp.id, current_week_start))
+        periods[emp.id] = (period_start, carried_forward)
+
+    counted = [emp for emp in employees if periods[emp.id][0] <= last_counted_week_end]
+    hours = _weekly_hours(
+        db, counted, {emp.id: _week_bounds(periods[emp.id][0])[0] for emp in counted}, last_counted_week_end,
+        store=store,
+    )
 
-    if period_start > last_counted_week_end:
-        return round(carried_forward, 2), period_start, last_counted_week_end
+    result = {}
+    for emp in employees:
+        period_start, total_delta = periods[emp.id]
+        for week in sorted(hours.get(emp.id, ())):
+            total_delta += weekly_delta_hours(hours[emp.id][week])
+        result[emp.id] = (round(total_delta, 2), period_start, last_counted_week_end)
+    return result
 
-    total_delta = carried_forward
-    week_cursor = period_start
-    while week_cursor <= last_counted_week_end:
-        w_start, w_end = _week_bounds(week_cursor)
-        w_end = min(w_end, last_counted_week_end)
-        actual = _weekly_actual_hours(db, emp, w_start, w_end)
-        total_delta += weekly_delta_hours(actual)
-        week_cursor = w_end + timedelta(days=1)
 
-    return round(total_delta, 2), period_start, last_counted_week_end
+def _overtime_balance(
+    db: Session, emp: Employee, include_current_week: bool = False, store: bool = False
+) -> tuple[float, date, date]:
+    """_overtime_balances pour un seul employé."""
+    return _overtime_balances(db, [emp], include_current_week, store)[emp.id]
 
 
-def _weekly_cash_amount(db: Session, emp: Employee, week_start: date, week_end: date) -> float:
+def refresh_weekly_ledger(db: Session) -> None:
+    """Enregistre les semaines terminées absentes ou périmées du registre,
+    pour chaque employé et sous-traitant, depuis son dernier règlement."""
+    employees = db.query(Employee).filter(Employee.role.in_(["employee", "subcontractor"])).all()
+    _overtime_balances(db, employees, store=True)
+
+
+def refresh_ledger_job() -> None:
+    """Job planifié : tient weekly_hours_ledger à jour (semaine qui vient de
+    se terminer, pointages corrigés, absences...) pour que GET
+    /weekly-summary, qui n'écrit pas, n'ait presque rien à recalculer. Même
+    schéma que planning.refresh_stats_job."""
+    from sqlalchemy import text
+
+    db = SessionLocal()
+    try:
+        locked = db.execute(text("SELECT pg_try_advisory_xact_lock(837264024)")).scalar()
+        if not locked:
+            db.rollback()
+            return
+        refresh_weekly_ledger(db)
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        print(f"[weekly-ledger] rafraichissement differe: {error}")
+    finally:
+        db.close()
+
+
+def _weekly_cash_query(db: Session, week_start: date, week_end: date, employee_ids: list, by_week: bool = False):
+    """Cash encaissé de week_start à week_end, agrégé en SQL : une ligne
+    (employee_id, amount) par employé de employee_ids qui a encaissé ;
+    by_week=True ajoute le lundi de chaque semaine (week_start) à la clé,
+    pour l'export sur plusieurs semaines."""
     day_start_utc, _ = _utc_bounds(week_start)
     _, day_end_utc = _utc_bounds(week_end)
-    interventions = (
-        db.query(Intervention)
-        .options(selectinload(Intervention.employees))
+    # Un seul employe encaisse reellement, meme si plusieurs sont assignes au
+    # RDV : sans ca, un RDV a 2 employes doublait le montant compte (une fois
+    # par employe assigne). Ancienne intervention cloturee avant l'ajout de
+    # closed_by_employee_id : on retombe sur l'ancien comportement (compte
+    # pour chaque assigne) plutot que de perdre silencieusement ce cash
+    # historique — d'ou la jointure limitee a ces interventions.
+    holder = func.coalesce(Intervention.closed_by_employee_id, intervention_employees.c.employee_id)
+    # Part cash uniquement pour invoice_cash. NULL (ancienne ligne, ou split
+    # reinitialise par une cloture qui a change le total) : on retombe sur le
+    # prix total pour ne pas sous-declarer silencieusement le cash du.
+    amount = case(
+        (Intervention.payment_mode == "invoice_cash",
+         func.coalesce(Intervention.amount_cash, Intervention.price_estimated, 0)),
+        else_=func.coalesce(Intervention.price_estimated, 0),
+    )
+    keys = [holder.label("employee_id")]
+    if by_week:
+        keys.append(func.date_trunc("week", func.timezone("Europe/Brussels", Intervention.start_time)).label("week_start"))
+    return (
+        db.query(*keys, func.sum(amount).label("amount"))
+        .select_from(Intervention)
+        .outerjoin(
+            intervention_employees,
+            and_(
+                Intervention.closed_by_employee_id.is_(None),
+                intervention_employees.c.intervention_id == Intervention.id,
+            ),
+        )
         .filter(
             Intervention.start_time >= day_start_utc,
             Intervention.start_time < day_end_utc,
             Intervention.status == "done",
             Intervention.payment_mode.in_(["cash", "invoice_cash"]),
-            ~Intervention.tour_run.has(),
-        )
-        .all()
-    )
-    total = 0.0
-    for iv in interventions:
-        if iv.closed_by_employee_id is not None:
-            # Un seul employe encaisse reellement, meme si plusieurs sont
-            # assignes au RDV : sans ca, un RDV a 2 employes doublait le
-            # montant compte (une fois par employe assigne).
-            if iv.closed_by_employee_id != emp.id:
-                continue
-        elif not any(e.id == emp.id for e in iv.employees):
-            # Ancienne intervention cloturee avant l'ajout de ce champ : on
-            # retombe sur l'ancien comportement (compte pour chaque assigne)
-            # plutot que de perdre silencieusement ce cash historique.
-            continue
-        if iv.deferred_cash_amount is not None:
+            Intervention.tour_visibility == "none",
             # Paiement reporte (client absent) : cette intervention ne compte
             # jamais dans le total cash de SA semaine, meme une fois reglee —
             # l'argent est compte plus tard, sur l'intervention qui l'encaisse
             # reellement (son propre amount_cash/price_estimated normal).
-            continue
-        if iv.payment_mode == "invoice_cash":
-            # Part cash uniquement. NULL (ancienne ligne, ou split reinitialise
-            # par une cloture qui a change le total) : on retombe sur le prix
-            # total pour ne pas sous-declarer silencieusement le cash du.
-            total += float(iv.amount_cash) if iv.amount_cash is not None else float(iv.price_estimated or 0)
-        else:  # "cash"
-            total += float(iv.price_estimated or 0)
-    return round(total, 2)
-
-
-def _daily_entries(
-    db: Session, emp: Employee, week_start: date, week_end: date
-) -> List[DailyEntryOut]:
-    entries = (
-        db.query(EmployeeTimeEntry)
-        .filter(
-            EmployeeTimeEntry.employee_id == emp.id,
-            EmployeeTimeEntry.work_date >= week_start,
-            EmployeeTimeEntry.work_date <= week_end,
+            Intervention.deferred_cash_amount.is_(None),
+            holder.in_(employee_ids),
         )
-        .all()
+        .group_by(*keys)
     )
-    entries_by_day = {e.work_date: e for e in entries}
 
-    day_start_utc, _ = _utc_bounds(week_start)
-    _, day_end_utc = _utc_bounds(week_end)
-    absences = db.query(Absence).filter(
-        Absence.start_date < day_end_utc,
-        Absence.end_date >= day_start_utc,
-        Absence.employee_id == emp.id,
-    ).all()
-    progressive = db.query(ProgressiveHours).filter(
-        ProgressiveHours.start_date <= week_end,
-        ProgressiveHours.end_date >= week_start,
-    ).all()
 
+def _weekly_cash_amounts(
+    db: Session, employees: List[Employee], week_start: date, week_end: date
+) -> dict:
+    """Cash encaissé dans la semaine par chaque employé : {employee_id: montant},
+    en une requête pour tous les employés."""
+    totals = {emp.id: 0.0 for emp in employees}
+    if totals:
+        for employee_id, amount in _weekly_cash_query(db, week_start, week_end, list(totals)).all():
+            totals[employee_id] = round(float(amount), 2)
+    return totals
+
+
+def _weekly_cash_amount(db: Session, emp: Employee, week_start: date, week_end: date) -> float:
+    return _weekly_cash_amounts(db, [emp], week_start, week_end)[emp.id]
+
+
+def _daily_entries(
+    emp: Employee, week_start: date, week_end: date, entries_by_day: dict, capacity: CapacityMatrix
+) -> List[DailyEntryOut]:
     result = []
     d = week_start
     while d <= week_end:
         entry = entries_by_day.get(d)
-        day_start, day_end = _utc_bounds(d)
-        is_absence = any(
-            ab.employee_id == emp.id and ab.start_date < day_end and ab.end_date >= day_start
-            for ab in absences
-        )
-        actual = _employee_actual_hours_for_day(emp, d, entries_by_day, absences, progressive)
+        is_absence = capacity.is_absent(emp.id, d)
+        actual = _employee_actual_hours_for_day(emp, d, entries_by_day, capacity)
         result.append(DailyEntryOut(
             date=d,
             clock_in_at=entry.clock_in_at if entry else None,
@@ -280,18 +446,209 @@ def _daily_entries(
     return result
 
 
+# --- EXPORT PAIE ---
+
+EXPORT_COLUMNS = [
+    "Employé", "Date", "Début", "Fin", "Heures pointées", "Absence", "Heures comptées",
+    "Heures semaine", "Écart semaine", "Cash calculé", "Cash réglé", "Heures sup soldées", "Reliquat",
+]
+# Lignes par lot : le flux rend la main (et le thread) entre deux lots.
+EXPORT_BATCH_ROWS = 500
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+def _export_rows(db: Session, first_day: date, last_day: date):
+    """
+    Lignes de l'export paie sur [first_day, last_day] (semaines ISO
+    complètes) : pour chaque employé, une ligne par jour puis une ligne
+    "Semaine du ..." avec heures, écart au plancher, cash et règlements.
+
+    Sept requêtes quelle que soit la période : employés, absences, montées en
+    charge, règlements heures sup, règlements cash, cash agrégé par semaine,
+    puis les pointages lus au fil de l'eau (curseur serveur, triés comme les
+    employés). Seuls les pointages de la semaine en cours d'écriture sont en
+    mémoire.
+    """
+    yield EXPORT_COLUMNS
+
+    employees = (
+        db.query(Employee)
+        .filter(Employee.role.in_(["employee", "subcontractor"]))
+        .order_by(Employee.full_name, Employee.id)
+        .all()
+    )
+    ids = [emp.id for emp in employees]
+
+    day_start_utc, _ = _utc_bounds(first_day)
+    _, day_end_utc = _utc_bounds(last_day)
+    absences, progressive = {}, {}
+    for ab in db.query(Absence).filter(
+        Absence.start_date < day_end_utc,
+        Absence.end_date >= day_start_utc,
+        Absence.employee_id.in_(ids),
+    ):
+        absences.setdefault(ab.employee_id, []).append(ab)
+    for ph in db.query(ProgressiveHours).filter(
+        ProgressiveHours.start_date <= last_day,
+        ProgressiveHours.end_date >= first_day,
+        ProgressiveHours.employee_id.in_(ids),
+    ):
+        progressive.setdefault(ph.employee_id, []).append(ph)
+
+    # Règlements heures sup rattachés à la semaine de leur fin de période.
+    overtime = {}
+    for settlement in db.query(OvertimeSettlement).filter(
+        OvertimeSettlement.employee_id.in_(ids),
+        OvertimeSettlement.period_end >= first_day,
+        OvertimeSettlement.period_end <= last_day,
+    ):
+        key = (settlement.employee_id, _week_bounds(settlement.period_end)[0])
+        delta, carried = overtime.get(key, (0.0, 0.0))
+        overtime[key] = (delta + settlement.delta_hours, carried + settlement.carried_forward_hours)
+    cash_settled = {
+        (s.employee_id, s.week_start): float(s.amount)
+        for s in db.query(CashSettlement).filter(
+            CashSettlement.employee_id.in_(ids),
+            CashSettlement.week_start >= first_day,
+            CashSettlement.week_start <= last_day,
+        )
+    }
+    cash = {
+        (employee_id, week_start.date()): round(float(amount), 2)
+        for employee_id, week_start, amount in _weekly_cash_query(db, first_day, last_day, ids, by_week=True)
+    }
+
+    entries = iter(
+        db.query(
+            EmployeeTimeEntry.employee_id,
+            EmployeeTimeEntry.work_date,
+            EmployeeTimeEntry.clock_in_at,
+            EmployeeTimeEntry.clock_out_at,
+        )
+        .join(Employee, Employee.id == EmployeeTimeEntry.employee_id)
+        .filter(
+            Employee.role.in_(["employee", "subcontractor"]),
+            EmployeeTimeEntry.work_date >= first_day,
+            EmployeeTimeEntry.work_date <= last_day,
+        )
+        .order_by(Employee.full_name, Employee.id, EmployeeTimeEntry.work_date)
+        .yield_per(EXPORT_BATCH_ROWS)
+    )
+    pending = next(entries, None)
+
+    for emp in employees:
+        name = emp.full_name or emp.email
+        capacity = CapacityMatrix(
+            [emp], first_day, last_day, progressive.get(emp.id, ()), absences.get(emp.id, ())
+        )
+        week_start = first_day
+        while week_start <= last_day:
+            week_end = week_start + timedelta(days=6)
+            entries_by_day = {}
+            while pending is not None and pending.employee_id == emp.id and pending.work_date <= week_end:
+                entries_by_day[pending.work_date] = pending
+                pending = next(entries, None)
+
+            actual = 0.0
+            d = week_start
+            while d <= week_end:
+                entry = entries_by_day.get(d)
+                hours = _employee_actual_hours_for_day(emp, d, entries_by_day, capacity)
+                actual += hours
+                worked = _worked_hours(entry) if entry else None
+                yield [
+                    name, d,
+                    entry.clock_in_at.astimezone(BRUSSELS_TZ).strftime("%H:%M") if entry and entry.clock_in_at else None,
+                    entry.clock_out_at.astimezone(BRUSSELS_TZ).strftime("%H:%M") if entry and entry.clock_out_at else None,
+                    worked,
+                    "absence" if capacity.is_absent(emp.id, d) else None,
+                    round(hours, 2),
+                    None, None, None, None, None, None,
+                ]
+                d += timedelta(days=1)
+
+            settled_delta, carried = overtime.get((emp.id, week_start), (None, None))
+            yield [
+                name, f"Semaine du {week_start.strftime('%d/%m/%Y')}", None, None, None, None, None,
+                round(actual, 2),
+                round(weekly_delta_hours(actual), 2),
+                cash.get((emp.id, week_start), 0.0),
+                cash_settled.get((emp.id, week_start)),
+                settled_delta,
+                carried,
+            ]
+            week_start = week_end + timedelta(days=1)
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    # BOM : Excel (fr-BE) ouvre le fichier en UTF-8 et garde les accents.
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer, delimiter=";")
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(["" if value is None else value for value in row])
+        if count % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _xlsx_chunks(rows):
+    """Classeur en mode write-only (lignes écrites sur disque au fil de
+    l'eau), puis envoyé par morceaux depuis un fichier temporaire : une
+    archive xlsx ne se termine qu'au dernier octet."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Pointages")
+    sheet.freeze_panes = "C2"
+    for column, width in (("A", 28), ("B", 22)):
+        sheet.column_dimensions[column].width = width
+    header = []
+    for value in next(rows):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill("solid", fgColor="1E3A5F")
+        header.append(cell)
+    sheet.append(header)
+    for count, row in enumerate(rows, start=1):
+        sheet.append(row)
+        if count % EXPORT_BATCH_ROWS == 0:
+            # Corps vide : rien n'est envoyé, mais le thread est rendu au pool.
+            yield b""
+    with tempfile.TemporaryFile() as stream:
+        workbook.save(stream)
+        stream.seek(0)
+        while chunk := stream.read(EXPORT_CHUNK_BYTES):
+            yield chunk
+
+
+def _export_stream(export_format: str, first_day: date, last_day: date):
+    # Session propre au flux : celle de la requête peut être fermée avant la
+    # fin de l'envoi.
+    db = SessionLocal()
+    try:
+        rows = _export_rows(db, first_day, last_day)
+        yield from (_csv_chunks(rows) if export_format == "csv" else _xlsx_chunks(rows))
+    finally:
+        db.close()
+
+
 # --- ROUTES EMPLOYÉ ---
 
 @router.get("/today", response_model=TimeEntryOut)
-def get_today_entry(
-    db: Session = Depends(get_db),
-    current_user: Employee = Depends(get_current_user),
+async def get_today_entry(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Employee = Depends(get_current_user_async),
 ):
     today = _today_brussels()
-    entry = (
-        db.query(EmployeeTimeEntry)
-        .filter(EmployeeTimeEntry.employee_id == current_user.id, EmployeeTimeEntry.work_date == today)
-        .first()
+    entry = await db.scalar(
+        select(EmployeeTimeEntry)
+        .where(EmployeeTimeEntry.employee_id == current_user.id, EmployeeTimeEntry.work_date == today)
+        .limit(1)
     )
     return TimeEntryOut(
         work_date=today,
@@ -329,6 +686,7 @@ def get_day_entry(
 
 @router.post("/clock-in", response_model=TimeEntryOut)
 def clock_in(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
@@ -353,8 +711,10 @@ def clock_in(
 
     emp_name = current_user.full_name or current_user.email
     heure = now.astimezone(BRUSSELS_TZ).strftime("%H:%M")
-    _notify_admins(
-        db, "clock_in", "Début de journée",
+    # Notification informative : envoyée après la réponse, le pointage
+    # n'attend pas la diffusion aux admins.
+    notify_admins_later(
+        background_tasks, "clock_in", "Début de journée",
         f"{emp_name} a commencé sa journée à {heure}",
         {"employee_id": str(current_user.id), "work_date": today.isoformat()},
     )
@@ -369,6 +729,7 @@ def clock_in(
 
 @router.post("/clock-out", response_model=TimeEntryOut)
 def clock_out(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
@@ -393,8 +754,8 @@ def clock_out(
     heure = now.astimezone(BRUSSELS_TZ).strftime("%H:%M")
     duree = _worked_hours(entry)
     duree_str = f"{int(duree)}h{round((duree % 1) * 60):02d}" if duree is not None else ""
-    _notify_admins(
-        db, "clock_out", "Fin de journée",
+    notify_admins_later(
+        background_tasks, "clock_out", "Fin de journée",
         f"{emp_name} a terminé sa journée à {heure} ({duree_str} travaillées)",
         {"employee_id": str(current_user.id), "work_date": today.isoformat()},
     )
@@ -472,23 +833,31 @@ def weekly_summary(
 
     employees = db.query(Employee).filter(Employee.role.in_(["employee", "subcontractor"])).all()
 
+    # Chargement groupé : un nombre fixe de requêtes pour tout l'écran, au
+    # lieu de quelques-unes par employé et par semaine non réglée.
+    cash_settlements = {
+        s.employee_id: s
+        for s in db.query(CashSettlement)
+        .filter(CashSettlement.employee_id.in_([emp.id for emp in employees]), CashSettlement.week_start == w_start)
+        .all()
+    }
+    cash_amounts = _weekly_cash_amounts(
+        db, [emp for emp in employees if emp.id not in cash_settlements], w_start, w_end
+    )
+    balances = _overtime_balances(db, employees, include_current_week=include_current_week)
+    entries_by_employee, capacity = _load_timesheets(db, employees, w_start, w_end)
+
     result_employees = []
     for emp in employees:
-        cash_settlement = (
-            db.query(CashSettlement)
-            .filter(CashSettlement.employee_id == emp.id, CashSettlement.week_start == w_start)
-            .first()
-        )
+        cash_settlement = cash_settlements.get(emp.id)
         if cash_settlement:
             cash_amount = float(cash_settlement.amount)
             cash_settled = True
         else:
-            cash_amount = _weekly_cash_amount(db, emp, w_start, w_end)
+            cash_amount = cash_amounts[emp.id]
             cash_settled = False
 
-        overtime_balance, period_start, period_end = _overtime_balance(
-            db, emp, include_current_week=include_current_week
-        )
+        overtime_balance, period_start, period_end = balances[emp.id]
 
         result_employees.append(WeeklySummaryEmployeeOut(
             employee_id=emp.id,
@@ -499,7 +868,7 @@ def weekly_summary(
             overtime_balance_hours=overtime_balance,
             overtime_period_start=period_start,
             overtime_period_end=period_end,
-            daily_entries=_daily_entries(db, emp, w_start, w_end),
+            daily_entries=_daily_entries(emp, w_start, w_end, entries_by_employee[emp.id], capacity),
         ))
 
     return WeeklySummaryOut(week_start=w_start, week_end=w_end, employees=result_employees)
@@ -552,8 +921,9 @@ def confirm_overtime_settlement(
     if not emp:
         raise HTTPException(status_code=404, detail="Employé introuvable")
 
+    # Semaines du solde enregistrées au registre avec le règlement.
     balance, period_start, period_end = _overtime_balance(
-        db, emp, include_current_week=payload.include_current_week
+        db, emp, include_current_week=payload.include_current_week, store=True
     )
 
     if payload.hours is not None:
@@ -583,3 +953,38 @@ def confirm_overtime_settlement(
     db.commit()
     db.refresh(settlement)
     return settlement
+
+
+@router.get("/export")
+def export_timesheets(
+    date_from: date = Query(..., alias="from"),
+    date_to: date = Query(..., alias="to"),
+    format: str = "xlsx",
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Export paie de tous les employés de from à to, étendu aux semaines ISO
+    complètes : pointages jour par jour, absences, heures et écart au
+    plancher par semaine, cash calculé et réglé, règlements heures sup.
+
+    Envoyé en flux (XLSX ou CSV) : mémoire constante quelle que soit la
+    période, voir _export_rows.
+    """
+    _require_admin(current_user)
+    if format not in ("xlsx", "csv"):
+        raise HTTPException(status_code=400, detail="Format attendu : xlsx ou csv")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from doit précéder to")
+    first_day, _ = _week_bounds(date_from)
+    _, last_day = _week_bounds(date_to)
+
+    filename = f"pointages_{first_day.isoformat()}_{last_day.isoformat()}.{format}"
+    media_type = (
+        "text/csv; charset=utf-8" if format == "csv"
+        else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    return StreamingResponse(
+        _export_stream(format, first_day, last_day),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -5,11 +5,13 @@ from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal
 from io import BytesIO
 from typing import Dict, List, Optional, Tuple
+import uuid
 from uuid import UUID
 from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, or_, select, update
 from sqlalchemy.orm import Session, selectinload
 
 from app.core.deps import get_current_user
@@ -125,40 +127,49 @@ def _bucket_for(day: date, month_start: date) -> date:
 
 
 def _replace_template_tree(db: Session, template: TourTemplate, payload: TourTemplateInput) -> None:
+    """Remplace sections, commerces et prestations du modele : ids generes
+    ici et un INSERT multi-lignes par table, quel que soit le nombre de
+    commerces."""
     db.query(TourStop).filter(TourStop.template_id == template.id).delete(synchronize_session=False)
     db.query(TourSection).filter(TourSection.template_id == template.id).delete(synchronize_session=False)
     db.flush()
 
+    section_rows, stop_rows, service_rows = [], [], []
     for section_index, section_data in enumerate(payload.sections):
-        section = TourSection(
-            template_id=template.id,
-            label=section_data.label.strip(),
-            position=section_data.position if section_data.position is not None else section_index,
-        )
-        db.add(section)
-        db.flush()
+        section_id = uuid.uuid4()
+        section_rows.append({
+            "id": section_id,
+            "template_id": template.id,
+            "label": section_data.label.strip(),
+            "position": section_data.position if section_data.position is not None else section_index,
+        })
         for stop_index, stop_data in enumerate(section_data.stops):
-            stop = TourStop(
-                template_id=template.id,
-                section_id=section.id,
-                name=stop_data.name.strip(),
-                note=stop_data.note,
-                payment_text=stop_data.payment_text,
-                frequency_text=stop_data.frequency_text,
-                estimated_minutes=stop_data.estimated_minutes,
-                position=stop_data.position if stop_data.position is not None else stop_index,
-                active=stop_data.active,
-            )
-            db.add(stop)
-            db.flush()
+            stop_id = uuid.uuid4()
+            stop_rows.append({
+                "id": stop_id,
+                "template_id": template.id,
+                "section_id": section_id,
+                "name": stop_data.name.strip(),
+                "note": stop_data.note,
+                "payment_text": stop_data.payment_text,
+                "frequency_text": stop_data.frequency_text,
+                "estimated_minutes": stop_data.estimated_minutes,
+                "position": stop_data.position if stop_data.position is not None else stop_index,
+                "active": stop_data.active,
+            })
             for service_index, service_data in enumerate(stop_data.services):
-                db.add(TourService(
-                    stop_id=stop.id,
-                    label=service_data.label.strip(),
-                    price_ht=service_data.price_ht,
-                    position=service_data.position if service_data.position is not None else service_index,
-                    active=service_data.active,
-                ))
+                service_rows.append({
+                    "id": uuid.uuid4(),
+                    "stop_id": stop_id,
+                    "label": service_data.label.strip(),
+                    "price_ht": service_data.price_ht,
+                    "position": service_data.position if service_data.position is not None else service_index,
+                    "active": service_data.active,
+                })
+    for model, rows in ((TourSection, section_rows), (TourStop, stop_rows), (TourService, service_rows)):
+        if rows:
+            db.execute(insert(model), rows)
+    db.expire(template, ["sections", "stops"])
 
 
 def _validate_template_activation(payload: TourTemplateInput) -> None:
@@ -173,123 +184,173 @@ def _validate_template_activation(payload: TourTemplateInput) -> None:
         raise HTTPException(status_code=422, detail="Le modele doit contenir au moins une prestation active avant activation.")
 
 
-def _snapshot_template(db: Session, template: TourTemplate, run: TourRun) -> None:
-    """Copie figee du modele : rien n'est preselectionne, l'admin coche chaque
-    semaine les commerces a faire (l'ancien point au crayon sur le papier)."""
-    for stop in list(run.stops):
-        db.delete(stop)
-    db.flush()
+def _snapshot_template(db: Session, template: TourTemplate, run_ids: List[UUID]) -> None:
+    """Copie figee du modele dans chaque occurrence de `run_ids`, a la place
+    de son contenu : rien n'est preselectionne, l'admin coche chaque semaine
+    les commerces a faire (l'ancien point au crayon sur le papier).
+
+    Ids generes ici et INSERT multi-lignes : trois instructions pour toutes
+    les occurrences, quel que soit le nombre de commerces."""
+    if not run_ids:
+        return
+    db.query(TourRunStop).filter(TourRunStop.run_id.in_(run_ids)).delete(synchronize_session=False)
     ordered_stops = [
-        stop
+        (section, stop)
         for section in sorted(template.sections, key=lambda item: item.position)
         for stop in sorted((item for item in section.stops if item.active), key=lambda item: item.position)
     ]
-    for run_position, stop in enumerate(ordered_stops):
-        run_stop = TourRunStop(
-            run_id=run.id,
-            source_stop_id=stop.id,
-            section_label=stop.section.label if stop.section else None,
-            name=stop.name,
-            note=stop.note,
-            payment_text=stop.payment_text,
-            frequency_text=stop.frequency_text,
-            estimated_minutes=stop.estimated_minutes,
-            position=run_position,
-            selected=False,
-        )
-        db.add(run_stop)
-        db.flush()
-        for service in sorted((item for item in stop.services if item.active), key=lambda item: item.position):
-            db.add(TourRunService(
-                run_stop_id=run_stop.id,
-                source_service_id=service.id,
-                label=service.label,
-                price_ht=service.price_ht,
-                position=service.position,
-            ))
-    run.intervention.price_estimated = Decimal("0")
-
-
-def _ensure_one_draft(db: Session, template: TourTemplate, scheduled_date: date) -> Tuple[TourRun, bool]:
-    existing = db.query(TourRun).filter(
-        TourRun.template_id == template.id,
-        TourRun.scheduled_date == scheduled_date,
-    ).first()
-    if existing:
-        return existing, False
-    intervention = Intervention(
-        type="tournee",
-        title=template.name,
-        description="Tournee recurrente preparee depuis un modele.",
-        start_time=_local_datetime(scheduled_date, template.default_start_time),
-        end_time=_local_datetime(scheduled_date, template.default_end_time),
-        status="planned",
-        zone=template.zone,
-        time_tbd=False,
-        payment_mode="invoice",
-    )
-    db.add(intervention)
-    db.flush()
-    run = TourRun(
-        template_id=template.id,
-        intervention_id=intervention.id,
-        scheduled_date=scheduled_date,
-        publication_status="draft",
-    )
-    db.add(run)
-    db.flush()
-    _snapshot_template(db, template, run)
-    return run, True
-
-
-def ensure_drafts(db: Session, start_date: date, weeks: int = 8) -> int:
+    stop_rows, service_rows = [], []
+    for run_id in run_ids:
+        for run_position, (section, stop) in enumerate(ordered_stops):
+            run_stop_id = uuid.uuid4()
+            stop_rows.append({
+                "id": run_stop_id,
+                "run_id": run_id,
+                "source_stop_id": stop.id,
+                "section_label": section.label,
+                "name": stop.name,
+                "note": stop.note,
+                "payment_text": stop.payment_text,
+                "frequency_text": stop.frequency_text,
+                "estimated_minutes": stop.estimated_minutes,
+                "position": run_position,
+                "selected": False,
+            })
+            for service in sorted((item for item in stop.services if item.active), key=lambda item: item.position):
+                service_rows.append({
+                    "id": uuid.uuid4(),
+                    "run_stop_id": run_stop_id,
+                    "source_service_id": service.id,
+                    "label": service.label,
+                    "price_ht": service.price_ht,
+                    "position": service.position,
+                })
+    if stop_rows:
+        db.execute(insert(TourRunStop), stop_rows)
+    if service_rows:
+        db.execute(insert(TourRunService), service_rows)
+
+
+def _create_drafts(db: Session, template: TourTemplate, dates: List[date]) -> int:
+    """Brouillons du modele aux dates qui n'en ont pas encore : interventions,
+    occurrences et copies en quelques INSERT multi-lignes. Renvoie le nombre
+    de brouillons crees."""
+    if not dates:
+        return 0
+    existing = set(db.execute(
+        select(TourRun.scheduled_date).where(TourRun.template_id == template.id, TourRun.scheduled_date.in_(dates))
+    ).scalars())
+    drafts = [(uuid.uuid4(), uuid.uuid4(), day) for day in dates if day not in existing]
+    if not drafts:
+        return 0
+    db.execute(insert(Intervention), [
+        {
+            "id": intervention_id,
+            "type": "tournee",
+            "title": template.name,
+            "description": "Tournee recurrente preparee depuis un modele.",
+            "start_time": _local_datetime(day, template.default_start_time),
+            "end_time": _local_datetime(day, template.default_end_time),
+            "status": "planned",
+            "zone": template.zone,
+            "time_tbd": False,
+            "payment_mode": "invoice",
+            "price_estimated": Decimal("0"),
+            "tour_visibility": "draft",
+        }
+        for _, intervention_id, day in drafts
+    ])
+    db.execute(insert(TourRun), [
+        {
+            "id": run_id,
+            "template_id": template.id,
+            "intervention_id": intervention_id,
+            "scheduled_date": day,
+            "publication_status": "draft",
+        }
+        for run_id, intervention_id, day in drafts
+    ])
+    _snapshot_template(db, template, [run_id for run_id, _, _ in drafts])
+    return len(drafts)
+
+
+def ensure_drafts(db: Session, start_date: date, weeks: int = 8, template_id: Optional[UUID] = None) -> int:
+    """Genere les brouillons jusqu'a start_date + weeks (exclu) et avance
+    drafts_until (migration 034). Seuls les modeles dont l'horizon est en
+    retard sont verrouilles et relus : un passage a jour ne touche a rien."""
     weeks = max(1, min(weeks, 52))
     end_date = start_date + timedelta(weeks=weeks)
-    templates = _template_query(db).filter(
+    query = _template_query(db).filter(
         TourTemplate.active.is_(True),
         TourTemplate.archived.is_(False),
-    ).with_for_update().all()
+        or_(TourTemplate.drafts_until.is_(None), TourTemplate.drafts_until < end_date),
+    )
+    if template_id is not None:
+        query = query.filter(TourTemplate.id == template_id)
+    # Un generateur concurrent attend le verrou, puis Postgres reevalue le
+    # filtre : le modele qu'il vient d'avancer est ecarte.
+    templates = query.with_for_update().all()
+    today = datetime.now(BRUSSELS).date()
     created = 0
     for template in templates:
+        # Les semaines deja couvertes ne sont pas reparcourues ; si l'on
+        # demande un debut futur au-dela de l'horizon, le trou est comble
+        # a partir d'aujourd'hui.
         cursor = start_date
+        if template.drafts_until is not None:
+            cursor = max(template.drafts_until, min(start_date, today))
         cursor += timedelta(days=(template.weekday - cursor.isoweekday()) % 7)
+        dates = []
         while cursor < end_date:
-            _, was_created = _ensure_one_draft(db, template, cursor)
-            created += int(was_created)
+            dates.append(cursor)
             cursor += timedelta(days=7)
+        created += _create_drafts(db, template, dates)
+        template.drafts_until = end_date
     return created
 
 
-def _refresh_future_drafts(db: Session, template: TourTemplate) -> None:
+def _future_drafts(db: Session, template: TourTemplate):
     today = datetime.now(BRUSSELS).date()
-    drafts = db.query(TourRun).filter(
+    return db.query(TourRun.id, TourRun.intervention_id, TourRun.scheduled_date).filter(
         TourRun.template_id == template.id,
         TourRun.publication_status == "draft",
         TourRun.scheduled_date >= today,
     ).all()
-    for run in drafts:
-        # Si l'admin change le jour fixe, l'ancien brouillon ne doit pas
-        # subsister en plus de celui qui sera regenere au nouveau jour.
-        if run.scheduled_date.isoweekday() != template.weekday:
-            db.delete(run.intervention)
-            continue
-        intervention = run.intervention
-        intervention.title = template.name
-        intervention.zone = template.zone
-        intervention.start_time = _local_datetime(run.scheduled_date, template.default_start_time)
-        intervention.end_time = _local_datetime(run.scheduled_date, template.default_end_time)
-        _snapshot_template(db, template, run)
+
+
+def _delete_interventions(db: Session, intervention_ids: List[UUID]) -> None:
+    # Les occurrences et leurs copies suivent (ON DELETE CASCADE).
+    if intervention_ids:
+        db.query(Intervention).filter(Intervention.id.in_(intervention_ids)).delete(synchronize_session=False)
+
+
+def _refresh_future_drafts(db: Session, template: TourTemplate) -> None:
+    drafts = _future_drafts(db, template)
+    # Si l'admin change le jour fixe, l'ancien brouillon ne doit pas
+    # subsister en plus de celui qui sera regenere au nouveau jour.
+    _delete_interventions(db, [d.intervention_id for d in drafts if d.scheduled_date.isoweekday() != template.weekday])
+    run_ids = [d.id for d in drafts if d.scheduled_date.isoweekday() == template.weekday]
+    if not run_ids:
+        return
+    # Heures locales du modele a la date de chaque occurrence, en une instruction.
+    db.execute(
+        update(Intervention)
+        .where(Intervention.id == TourRun.intervention_id, TourRun.id.in_(run_ids))
+        .values(
+            title=template.name,
+            zone=template.zone,
+            start_time=func.timezone(BRUSSELS.key, TourRun.scheduled_date + template.default_start_time),
+            end_time=func.timezone(BRUSSELS.key, TourRun.scheduled_date + template.default_end_time),
+            price_estimated=Decimal("0"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    _snapshot_template(db, template, run_ids)
 
 
 def _delete_future_drafts(db: Session, template: TourTemplate) -> None:
-    today = datetime.now(BRUSSELS).date()
-    drafts = db.query(TourRun).filter(
-        TourRun.template_id == template.id,
-        TourRun.publication_status == "draft",
-        TourRun.scheduled_date >= today,
-    ).all()
-    for run in drafts:
-        db.delete(run.intervention)
+    _delete_interventions(db, [d.intervention_id for d in _future_drafts(db, template)])
+    template.drafts_until = None
 
 
 @router.get("/templates", response_model=List[TourTemplateOut])
@@ -340,7 +401,7 @@ def create_template(
     db.flush()
     _replace_template_tree(db, template, payload)
     if template.active and not template.archived:
-        ensure_drafts(db, datetime.now(BRUSSELS).date(), 8)
+        ensure_drafts(db, datetime.now(BRUSSELS).date(), 8, template.id)
     db.commit()
     return get_template(template.id, db, current_user)
 
@@ -357,6 +418,9 @@ def update_template(
     if not template:
         raise HTTPException(status_code=404, detail="Modele introuvable.")
     _validate_template_activation(payload)
+    if template.weekday != payload.weekday:
+        # Tout l'horizon est a regenerer au nouveau jour.
+        template.drafts_until = None
     template.name = payload.name.strip()
     template.zone = payload.zone
     template.weekday = payload.weekday
@@ -367,11 +431,10 @@ def update_template(
     template.source_document = payload.source_document
     _replace_template_tree(db, template, payload)
     db.flush()
-    db.expire(template, ["sections", "stops"])
     template = _template_query(db).filter(TourTemplate.id == template_id).first()
     _refresh_future_drafts(db, template)
     if template.active and not template.archived:
-        ensure_drafts(db, datetime.now(BRUSSELS).date(), 8)
+        ensure_drafts(db, datetime.now(BRUSSELS).date(), 8, template.id)
     else:
         _delete_future_drafts(db, template)
     db.commit()
@@ -415,10 +478,10 @@ def list_drafts(
     db: Session = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
+    """Lecture seule : les brouillons sont generes par le planificateur
+    (generate_drafts_job) et a l'enregistrement d'un modele, jamais ici."""
     _admin(current_user)
     start_date = start or datetime.now(BRUSSELS).date()
-    ensure_drafts(db, start_date, weeks)
-    db.commit()
     end = start_date + timedelta(weeks=weeks)
     return _run_query(db).filter(
         TourRun.publication_status == "draft",
@@ -514,6 +577,7 @@ def publish_run(
         raise HTTPException(status_code=422, detail=f"Employes incompatibles avec la tournee: {', '.join(invalid)}")
     run.intervention.employees = employees
     run.publication_status = "published"
+    run.intervention.tour_visibility = "published"
     run.published_at = datetime.now(timezone.utc)
     db.commit()
     return _load_run(db, run_id)
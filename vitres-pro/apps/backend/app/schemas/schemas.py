@@ -342,10 +342,49 @@ class InterventionOut(BaseModel):
     employees: List[EmployeeOut] = []
     items: List[InterventionItemOut] = []
     tour_run: Optional[TourRunSummaryOut] = None
+    # Occurrence calculée d'une série sans fin, pas encore en base : les
+    # routes /{id} l'enregistrent d'elles-mêmes quand on leur passe
+    # recurrence_group_id (ou POST /recurring/{recurrence_group_id}/materialize).
+    virtual: bool = False
 
     class Config:
         from_attributes = True
 
+# Tuile du calendrier mois/semaine (GET /api/interventions/calendar) : le
+# strict nécessaire à l'affichage, le détail passe par GET /{id}.
+class CalendarEmployeeOut(BaseModel):
+    id: UUID
+    full_name: Optional[str] = None
+    color: str = "#3B82F6"
+
+class InterventionCalendarOut(BaseModel):
+    id: UUID
+    type: str = "intervention"
+    title: str
+    start_time: datetime
+    end_time: datetime
+    time_tbd: bool = False
+    status: Optional[str] = None
+    zone: Optional[str] = None
+    sub_zone: Optional[str] = None
+    price_estimated: Optional[float] = None
+    reinforcement_for_id: Optional[UUID] = None
+    employees: List[CalendarEmployeeOut] = []
+    virtual: bool = False
+
+class InterventionChangesOut(BaseModel):
+    # Curseur opaque à renvoyer tel quel au prochain appel (?since=...)
+    cursor: str
+    changed: List[InterventionOut] = []
+    # Supprimées, ou qui ne sont plus visibles pour l'utilisateur (désassigné,
+    # zone changée, tournée repassée en brouillon). Hors admin, seulement
+    # parmi celles où il était assigné.
+    deleted: List[UUID] = []
+    # Séries sans fin créées, modifiées ou supprimées : recharger leurs
+    # occurrences calculées (virtual=True). Hors admin, seulement parmi
+    # celles où il est ou a été assigné.
+    series: List[UUID] = []
+
 # --- INTERVENTION NOTES ---
 class InterventionNoteCreate(BaseModel):
     text: str
@@ -0,0 +1,136 @@
+"""
+Capacité employé × jour d'une période, calculée en une passe.
+
+_get_employee_hours_for_day (planning.py) répond pour un employé et un jour :
+il reparcourt les montées en charge et relit hours_per_weekday à chaque
+appel. Sur un an et tous les employés, range-stats l'appelait des dizaines de
+milliers de fois. CapacityMatrix construit une fois par requête une ligne
+d'heures par employé (une case par jour), en appliquant dans l'ordre :
+  1. le profil hebdomadaire (hours_per_weekday, sinon daily_capacity) ;
+  2. la plage de validité hours_valid_from / hours_valid_until (0 h hors plage) ;
+  3. les montées en charge progressives, prioritaires sur tout le reste ;
+puis garde à part deux masques : absences (AbsenceIndex) et fermetures.
+
+Mêmes règles que _get_employee_hours_for_day, vérifiées case par case par
+tests/test_capacity.py.
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+BRUSSELS = ZoneInfo("Europe/Brussels")
+
+
+class AbsenceIndex:
+    """Jours d'absence par employé, calculés une fois par requête sur
+    [first_day, last_day] : chaque test devient une lecture d'ensemble au lieu
+    d'un parcours de toutes les absences, pour chaque employé et chaque jour.
+
+    Une absence couvre les jours calendaires belges qu'elle chevauche
+    (start_date < fin du jour et end_date >= début du jour, cf. _utc_bounds),
+    soit du jour local de start_date au jour local de end_date inclus."""
+
+    def __init__(self, absences: list, first_day: date, last_day: date):
+        self._days: Dict[object, set] = {}
+        for ab in absences:
+            d = max(ab.start_date.astimezone(BRUSSELS).date(), first_day)
+            last = min(ab.end_date.astimezone(BRUSSELS).date(), last_day)
+            days = self._days.setdefault(ab.employee_id, set())
+            while d <= last:
+                days.add(d)
+                d += timedelta(days=1)
+
+    def is_absent(self, employee_id, d: date) -> bool:
+        return d in self._days.get(employee_id, ())
+
+
+def _weekday_profile(emp) -> List[float]:
+    """Heures du lundi (index 0) au dimanche (index 6)."""
+    if emp.hours_per_weekday:
+        return [float(emp.hours_per_weekday.get(str(w), 0)) for w in range(1, 8)]
+    return [emp.daily_capacity] * 7
+
+
+class CapacityMatrix:
+    def __init__(
+        self,
+        employees: Iterable,
+        first_day: date,
+        last_day: date,
+        progressive: Iterable = (),
+        absences: Iterable = (),
+        closures: Iterable = (),
+    ):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.size = max((last_day - first_day).days + 1, 0)
+        self.absences = AbsenceIndex(list(absences), first_day, last_day)
+        self._rows: Dict[object, List[float]] = {}
+
+        ramps: Dict[object, list] = {}
+        for ph in progressive:
+            ramps.setdefault(ph.employee_id, []).append(ph)
+
+        offset = first_day.weekday()
+        for emp in employees:
+            profile = _weekday_profile(emp)
+            weeks = self.size // 7 + 2
+            row = (profile[offset:] + profile * weeks)[: self.size]
+
+            if emp.hours_valid_from and emp.hours_valid_from > first_day:
+                stop = min(self._index(emp.hours_valid_from), self.size)
+                row[:stop] = [0.0] * stop
+            if emp.hours_valid_until and emp.hours_valid_until < last_day:
+                begin = max(self._index(emp.hours_valid_until) + 1, 0)
+                row[begin:] = [0.0] * (self.size - begin)
+
+            # Ordre inverse : en cas de chevauchement, la première montée en
+            # charge de la liste l'emporte, comme dans _get_employee_hours_for_day.
+            for ph in reversed(ramps.get(emp.id, [])):
+                begin = max(self._index(ph.start_date), 0)
+                stop = min(self._index(ph.end_date) + 1, self.size)
+                for i in range(begin, stop):
+                    weekday = (first_day + timedelta(days=i)).isoweekday()
+                    row[i] = float(ph.hours_per_weekday.get(str(weekday), 0))
+
+            self._rows[emp.id] = row
+
+        self.closed: Set[date] = set()
+        for closure in closures:
+            d = max(closure.start_date, first_day)
+            while d <= min(closure.end_date, last_day):
+                self.closed.add(d)
+                d += timedelta(days=1)
+
+    def _index(self, d: date) -> int:
+        return (d - self.first_day).days
+
+    def days(self) -> Iterable[date]:
+        for i in range(self.size):
+            yield self.first_day + timedelta(days=i)
+
+    def hours(self, employee_id, d: date) -> float:
+        """Heures prévues au contrat ce jour-là (absences et fermetures ignorées)."""
+        return self._rows[employee_id][self._index(d)]
+
+    def is_absent(self, employee_id, d: date) -> bool:
+        return self.absences.is_absent(employee_id, d)
+
+    def is_closed(self, d: date) -> bool:
+        return d in self.closed
+
+    def day_capacity(self, d: date, employee_ids: Optional[Iterable] = None) -> Tuple[float, int]:
+        """(heures disponibles, employés présents avec des heures) pour le jour d,
+        hors absents ; (0, 0) un jour de fermeture."""
+        if d in self.closed:
+            return 0.0, 0
+        i = self._index(d)
+        total, present = 0.0, 0
+        for employee_id in (self._rows if employee_ids is None else employee_ids):
+            if self.absences.is_absent(employee_id, d):
+                continue
+            h = self._rows[employee_id][i]
+            total += h
+            if h > 0:
+                present += 1
+        return total, present
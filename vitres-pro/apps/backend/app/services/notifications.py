@@ -0,0 +1,102 @@
+"""
+Notifications in-app : envoi groupé et destinataires admins en cache.
+
+Pointage, report de paiement, RDV non repris, prestation décochée : chaque
+évènement notifie tous les admins. Au lieu de relire la table employees puis
+d'ajouter un objet ORM par admin, on garde les ids admins en mémoire et on
+écrit toutes les notifications d'un évènement en un seul INSERT multi-lignes.
+
+Le cache est propre au processus : il est vidé par les routes qui peuvent
+changer un rôle (employees.py) et expire après ADMIN_IDS_TTL, ce qui borne le
+retard des autres workers.
+"""
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import BackgroundTasks
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Employee, InAppNotification
+
+ADMIN_IDS_TTL = 300  # secondes
+
+_admin_ids: Optional[Tuple[UUID, ...]] = None
+_admin_ids_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def admin_ids(db: Session) -> Tuple[UUID, ...]:
+    """Ids des admins, relus au plus une fois par ADMIN_IDS_TTL."""
+    global _admin_ids, _admin_ids_loaded_at
+    with _lock:
+        if _admin_ids is not None and time.monotonic() - _admin_ids_loaded_at < ADMIN_IDS_TTL:
+            return _admin_ids
+    ids = tuple(db.execute(select(Employee.id).where(Employee.role == "admin")).scalars())
+    with _lock:
+        _admin_ids, _admin_ids_loaded_at = ids, time.monotonic()
+    return ids
+
+
+def invalidate_admin_ids() -> None:
+    """A appeler après toute écriture pouvant changer un rôle (création,
+    modification, suppression d'employé, sync-profile)."""
+    global _admin_ids
+    with _lock:
+        _admin_ids = None
+
+
+def notify(
+    db: Session,
+    recipient_ids: Iterable[UUID],
+    notif_type: str,
+    title: str,
+    message: str,
+    metadata: Optional[dict] = None,
+) -> int:
+    """Ajoute la notification pour chaque destinataire, en un seul INSERT,
+    dans la transaction courante (commit à la charge de l'appelant)."""
+    rows: List[dict] = [
+        {
+            "recipient_id": recipient_id,
+            "type": notif_type,
+            "title": title,
+            "message": message,
+            "metadata_": metadata,
+        }
+        for recipient_id in dict.fromkeys(recipient_ids)
+    ]
+    if rows:
+        db.execute(insert(InAppNotification), rows)
+    return len(rows)
+
+
+def notify_admins(db: Session, notif_type: str, title: str, message: str, metadata: Optional[dict] = None) -> int:
+    return notify(db, admin_ids(db), notif_type, title, message, metadata)
+
+
+def _notify_admins_job(notif_type: str, title: str, message: str, metadata: Optional[dict]) -> None:
+    from app.models.models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        notify_admins(db, notif_type, title, message, metadata)
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        # Une notification perdue ne doit jamais faire échouer l'action métier.
+        print(f"[notifications] envoi differe en echec: {error}")
+    finally:
+        db.close()
+
+
+def notify_admins_later(
+    background_tasks: BackgroundTasks, notif_type: str, title: str, message: str, metadata: Optional[dict] = None,
+) -> None:
+    """Comme notify_admins, mais après l'envoi de la réponse, dans sa propre
+    session : la requête n'attend pas l'envoi. Réservé aux notifications
+    purement informatives (pointage) ; celles qui doivent être atomiques avec
+    l'écriture métier (idempotence hors-connexion) passent par notify_admins."""
+    background_tasks.add_task(_notify_admins_job, notif_type, title, message, metadata)
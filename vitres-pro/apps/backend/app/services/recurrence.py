@@ -0,0 +1,388 @@
+"""
+Séries récurrentes "à l'infini" développées côté serveur (migration 029).
+
+Une série garde sa règle (recurrence_rule) et un modèle d'occurrence. Seules
+sont enregistrées dans interventions :
+  - les occurrences d'un horizon glissant de HORIZON_WEEKS semaines, étendu
+    par materialize_series_job (même principe que les brouillons de tournée) ;
+  - celles ouvertes à la demande (materialize_occurrence) pour être lues,
+    modifiées ou clôturées au-delà de l'horizon : par POST
+    /recurring/{id}/materialize, ou dès qu'une route /{id} reçoit l'id d'une
+    occurrence calculée avec celui de sa série (find_occurrence).
+Les suivantes sont calculées à la lecture (virtual_occurrences) par
+GET /api/interventions, /calendar et les stats de planning.
+
+Chaque occurrence a un id déterministe (occurrence_id) : le même qu'elle soit
+calculée ou enregistrée. Une occurrence déjà en base ou supprimée (pierre
+tombale, migration 023) n'est jamais recalculée ni recréée.
+"""
+import calendar
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Iterator, List, Optional, Sequence, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.models import (
+    Client, Employee, HourlyRate, Intervention, InterventionItem, InterventionTombstone,
+    RecurringSeries, intervention_employees,
+)
+
+BRUSSELS = ZoneInfo("Europe/Brussels")
+
+# Horizon enregistré en base : ce que voient les employés et le delta-sync
+# mobile (mêmes huit semaines que les brouillons de tournée).
+HORIZON_WEEKS = 8
+
+# Occurrences calculées retrouvées par leur id (find_occurrence) jusqu'à ce
+# nombre d'années : au-delà, l'id n'est plus reconnu.
+LOOKUP_YEARS = 5
+
+# Fréquences du mobile (apps/mobile/src/lib/recurrence.ts), "custom" y est
+# déjà ramené à son unité (day/week/month/year).
+FREQUENCY_ALIASES = {"day": "daily", "week": "weekly", "month": "monthly", "year": "yearly"}
+FREQUENCIES = {"daily", "weekly", "monthly", "yearly", "weekdays"}
+
+# Colonnes du modèle copiées telles quelles sur chaque occurrence.
+TEMPLATE_FIELDS = (
+    "type", "title", "description", "status", "price_estimated", "is_invoice",
+    "payment_mode", "amount_cash", "amount_invoice", "zone", "sub_zone", "client_id",
+    "address", "phone", "email", "time_tbd", "hourly_rate_id",
+)
+TEMPLATE_UUID_FIELDS = {"client_id", "hourly_rate_id"}
+ITEM_FIELDS = ("label", "price", "client_service_id", "intervention_service_id", "on_demand")
+
+
+def expandable_rule(rule: Optional[dict]) -> Optional[dict]:
+    """{"freq", "interval"} normalisés si la règle décrit une série sans fin
+    développable côté serveur, sinon None (série finie : tout est en base)."""
+    if not rule or rule.get("endType") != "never":
+        return None
+    freq = str(rule.get("freq") or "").lower()
+    freq = FREQUENCY_ALIASES.get(freq, freq)
+    if freq not in FREQUENCIES:
+        return None
+    try:
+        interval = max(1, int(rule.get("interval") or 1))
+    except (TypeError, ValueError):
+        return None
+    return {"freq": freq, "interval": interval}
+
+
+def occurrence_id(series_id: uuid.UUID, start: datetime) -> uuid.UUID:
+    return uuid.uuid5(series_id, start.astimezone(timezone.utc).isoformat())
+
+
+def horizon_end(today: Optional[date] = None) -> datetime:
+    """Fin (exclue) de l'horizon enregistré : minuit belge dans HORIZON_WEEKS semaines."""
+    today = today or datetime.now(BRUSSELS).date()
+    return datetime.combine(today + timedelta(weeks=HORIZON_WEEKS), time(0), BRUSSELS).astimezone(timezone.utc)
+
+
+def _add_months(day: date, months: int) -> date:
+    """Même jour du mois, ramené au dernier jour si le mois est plus court (31 -> 30/28)."""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _nth_day(base_day: date, freq: str, step: int, index: int) -> date:
+    if freq in ("daily", "weekly"):
+        return base_day + timedelta(days=index * step)
+    return _add_months(base_day, index * step)
+
+
+def occurrence_starts(rule: dict, dtstart: datetime, window_start: datetime, window_end: datetime) -> Iterator[datetime]:
+    """Débuts (UTC) des occurrences comprises dans [window_start, window_end),
+    à la même heure belge que dtstart, changement d'heure compris.
+    `rule` est une règle normalisée (expandable_rule)."""
+    local = dtstart.astimezone(BRUSSELS)
+    base_day, wall_clock = local.date(), local.time()
+    lower = max(window_start, dtstart)
+    first_day = lower.astimezone(BRUSSELS).date()
+
+    def at(day: date) -> datetime:
+        return datetime.combine(day, wall_clock, BRUSSELS).astimezone(timezone.utc)
+
+    freq, interval = rule["freq"], rule["interval"]
+    if freq == "weekdays":
+        day = max(base_day, first_day)
+        while True:
+            start = at(day)
+            if start >= window_end:
+                return
+            if day.isoweekday() <= 5 and start >= lower:
+                yield start
+            day += timedelta(days=1)
+
+    # Saut direct au voisinage de la fenêtre : pas d'itération depuis dtstart.
+    if freq in ("daily", "weekly"):
+        step = interval * (7 if freq == "weekly" else 1)
+        index = max(0, (first_day - base_day).days // step)
+    else:
+        step = interval * (12 if freq == "yearly" else 1)
+        index = max(0, ((first_day.year - base_day.year) * 12 + first_day.month - base_day.month) // step)
+    while True:
+        start = at(_nth_day(base_day, freq, step, index))
+        if start >= window_end:
+            return
+        if start >= lower:
+            yield start
+        index += 1
+
+
+def _json_value(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def template_items(items: Sequence[dict]) -> List[dict]:
+    return [
+        {**{field: _json_value(item.get(field)) for field in ITEM_FIELDS}, "on_demand": bool(item.get("on_demand"))}
+        for item in items
+    ]
+
+
+def series_template(values: dict, employee_ids: Sequence, items: Sequence[dict]) -> dict:
+    """Modèle JSON d'une série : colonnes de TEMPLATE_FIELDS, employés, items."""
+    template = {field: _json_value(values.get(field)) for field in TEMPLATE_FIELDS}
+    template["employee_ids"] = [str(e) for e in employee_ids]
+    template["items"] = template_items(items)
+    return template
+
+
+def _template_columns(series: RecurringSeries) -> dict:
+    values = {field: series.template.get(field) for field in TEMPLATE_FIELDS}
+    for field in TEMPLATE_UUID_FIELDS:
+        if values[field]:
+            values[field] = uuid.UUID(str(values[field]))
+    return values
+
+
+def insert_occurrences(
+    db: Session,
+    values: dict,
+    employee_ids: Sequence,
+    items: Sequence[dict],
+    occurrences: Sequence[Tuple[uuid.UUID, datetime, datetime]],
+) -> None:
+    """Insertions en masse (INSERT multi-lignes, par lots) des occurrences
+    (id, début, fin) d'une série, de leurs items et de leurs employés :
+    quelques instructions au lieu d'une par ligne."""
+    if not occurrences:
+        return
+    db.execute(insert(Intervention), [
+        {**values, "id": intervention_id, "start_time": start, "end_time": end}
+        for intervention_id, start, end in occurrences
+    ])
+    if items:
+        db.execute(insert(InterventionItem), [
+            {"id": uuid.uuid4(), "intervention_id": intervention_id, **{f: item.get(f) for f in ITEM_FIELDS}}
+            for intervention_id, _, _ in occurrences
+            for item in items
+        ])
+    if employee_ids:
+        db.execute(insert(intervention_employees), [
+            {"intervention_id": intervention_id, "employee_id": employee_id}
+            for intervention_id, _, _ in occurrences
+            for employee_id in employee_ids
+        ])
+
+
+def _taken_ids(db: Session, ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+    """Ids déjà en base ou supprimés : ni recalculés, ni recréés."""
+    if not ids:
+        return set()
+    return set(db.execute(
+        select(Intervention.id).where(Intervention.id.in_(ids)).union(
+            select(InterventionTombstone.intervention_id).where(InterventionTombstone.intervention_id.in_(ids))
+        )
+    ).scalars())
+
+
+def _pending(db: Session, series: RecurringSeries, window_start: datetime, window_end: datetime) -> List[Tuple[uuid.UUID, datetime]]:
+    """Occurrences (id, début) de la série non encore enregistrées sur la fenêtre,
+    sans dépasser sa fin ni revenir avant materialized_until."""
+    rule = expandable_rule(series.rule)
+    if not rule:
+        return []
+    lower = max(window_start, series.materialized_until)
+    upper = min(window_end, series.until) if series.until else window_end
+    return [(occurrence_id(series.id, start), start) for start in occurrence_starts(rule, series.dtstart, lower, upper)]
+
+
+def materialize(db: Session, series: RecurringSeries, until: datetime) -> int:
+    """Enregistre les occurrences de la série jusqu'à `until` (exclu) et avance
+    materialized_until. Renvoie le nombre d'occurrences créées."""
+    if until <= series.materialized_until:
+        return 0
+    pending = _pending(db, series, series.materialized_until, until)
+    taken = _taken_ids(db, [occ_id for occ_id, _ in pending])
+    duration = timedelta(minutes=series.duration_minutes)
+    occurrences = [(occ_id, start, start + duration) for occ_id, start in pending if occ_id not in taken]
+    insert_occurrences(
+        db,
+        {**_template_columns(series), "recurrence_rule": series.rule, "recurrence_group_id": series.id},
+        series.template.get("employee_ids") or [],
+        series.template.get("items") or [],
+        occurrences,
+    )
+    series.materialized_until = until
+    return len(occurrences)
+
+
+def materialize_occurrence(db: Session, series: RecurringSeries, start: datetime) -> Optional[uuid.UUID]:
+    """Enregistre une seule occurrence calculée (ouverture au-delà de l'horizon).
+    Renvoie son id, ou None si `start` n'est pas une occurrence de la série."""
+    pending = _pending(db, series, start, start + timedelta(seconds=1))
+    if not pending or pending[0][1] != start:
+        return None
+    occ_id = pending[0][0]
+    if occ_id in _taken_ids(db, [occ_id]):
+        return occ_id
+    insert_occurrences(
+        db,
+        {**_template_columns(series), "recurrence_rule": series.rule, "recurrence_group_id": series.id},
+        series.template.get("employee_ids") or [],
+        series.template.get("items") or [],
+        [(occ_id, start, start + timedelta(minutes=series.duration_minutes))],
+    )
+    return occ_id
+
+
+def find_occurrence(
+    db: Session, series_id: uuid.UUID, occ_id: uuid.UUID, until: Optional[datetime] = None,
+) -> Optional[Tuple[RecurringSeries, datetime]]:
+    """Série et début de l'occurrence calculée `occ_id` de la série
+    `series_id` (son recurrence_group_id, renvoyé avec elle), ou None. L'id
+    (uuid5) ne se décode pas : on recalcule ceux de cette seule série, de son
+    materialized_until jusqu'à `until` (par défaut LOOKUP_YEARS ans). Un id
+    déjà en base ou supprimé (pierre tombale) n'est pas cherché."""
+    if occ_id.version != 5 or _taken_ids(db, [occ_id]):
+        return None
+    series = db.get(RecurringSeries, series_id)
+    if series is None:
+        return None
+    until = until or datetime.now(timezone.utc) + timedelta(days=366 * LOOKUP_YEARS)
+    for candidate, start in _pending(db, series, series.materialized_until, until):
+        if candidate == occ_id:
+            return series, start
+    return None
+
+
+def virtual_occurrences(
+    db: Session,
+    window_start: datetime,
+    window_end: datetime,
+    zone: Optional[str] = None,
+    sub_zone: Optional[str] = None,
+    employee_id: Optional[uuid.UUID] = None,
+    exclude_cancelled: bool = False,
+) -> List[Intervention]:
+    """Occurrences calculées (jamais ajoutées à la session) sur [window_start,
+    window_end), relations comprises, pour être sérialisées ou comptées comme
+    des interventions enregistrées. Filtre sous-zone, sinon zone, comme
+    _planned_interventions_query ; employee_id = employé assigné."""
+    series_list = db.query(RecurringSeries).filter(
+        RecurringSeries.materialized_until < window_end,
+        RecurringSeries.dtstart < window_end,
+        or_(RecurringSeries.until.is_(None), RecurringSeries.until > window_start),
+    ).all()
+
+    candidates = []
+    for series in series_list:
+        template = series.template
+        if sub_zone and template.get("sub_zone") != sub_zone:
+            continue
+        if not sub_zone and zone and template.get("zone") != zone:
+            continue
+        if employee_id and str(employee_id) not in (template.get("employee_ids") or []):
+            continue
+        if exclude_cancelled and template.get("status") == "cancelled":
+            continue
+        candidates.extend((series, occ_id, start) for occ_id, start in _pending(db, series, window_start, window_end))
+    if not candidates:
+        return []
+    taken = _taken_ids(db, [occ_id for _, occ_id, _ in candidates])
+    candidates = [c for c in candidates if c[1] not in taken]
+
+    # Relations partagées par toutes les occurrences d'une série : une requête par table.
+    used = {series.id: series for series, _, _ in candidates}.values()
+    employee_ids = {uuid.UUID(e) for s in used for e in s.template.get("employee_ids") or []}
+    client_ids = {s.template["client_id"] for s in used if s.template.get("client_id")}
+    rate_ids = {s.template["hourly_rate_id"] for s in used if s.template.get("hourly_rate_id")}
+    employees = {e.id: e for e in db.query(Employee).filter(Employee.id.in_(employee_ids))} if employee_ids else {}
+    clients = {str(c.id): c for c in db.query(Client).filter(Client.id.in_(client_ids))} if client_ids else {}
+    rates = {str(r.id): r for r in db.query(HourlyRate).filter(HourlyRate.id.in_(rate_ids))} if rate_ids else {}
+
+    occurrences = []
+    for series, occ_id, start in candidates:
+        template = series.template
+        occurrence = Intervention(
+            id=occ_id,
+            start_time=start,
+            end_time=start + timedelta(minutes=series.duration_minutes),
+            recurrence_rule=series.rule,
+            recurrence_group_id=series.id,
+            tour_visibility="none",
+            **_template_columns(series),
+        )
+        # set_committed_value : pas d'évènement de backref vers les objets
+        # persistants (client, employés), l'occurrence reste hors session.
+        set_committed_value(occurrence, "employees", [
+            employees[uuid.UUID(e)] for e in template.get("employee_ids") or [] if uuid.UUID(e) in employees
+        ])
+        set_committed_value(occurrence, "items", [
+            InterventionItem(
+                id=uuid.uuid5(occ_id, str(position)), intervention_id=occ_id,
+                done=True, is_adjustment=False, **{f: item.get(f) for f in ITEM_FIELDS},
+            )
+            for position, item in enumerate(template.get("items") or [])
+        ])
+        set_committed_value(occurrence, "client", clients.get(template.get("client_id")))
+        set_committed_value(occurrence, "hourly_rate", rates.get(template.get("hourly_rate_id")))
+        set_committed_value(occurrence, "tour_run", None)
+        set_committed_value(occurrence, "reinforcement_for", None)
+        set_committed_value(occurrence, "reinforcements", [])
+        occurrence.virtual = True
+        occurrences.append(occurrence)
+    return occurrences
+
+
+def materialize_horizon(db: Session, until: Optional[datetime] = None) -> int:
+    """Étend toutes les séries actives jusqu'à l'horizon (ou `until`)."""
+    until = until or horizon_end()
+    series_list = db.query(RecurringSeries).filter(
+        RecurringSeries.materialized_until < until,
+        or_(RecurringSeries.until.is_(None), RecurringSeries.until > RecurringSeries.materialized_until),
+    ).with_for_update().all()
+    return sum(materialize(db, series, until) for series in series_list)
+
+
+def materialize_series_job() -> None:
+    """Job planifié : avance l'horizon des séries, sans faire échouer le
+    démarrage de l'API (même schéma que tours.generate_drafts_job)."""
+    from sqlalchemy import text
+    from app.models.models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        locked = db.execute(text("SELECT pg_try_advisory_xact_lock(837264022)")).scalar()
+        if not locked:
+            db.rollback()
+            return
+        materialize_horizon(db)
+        db.commit()
+    except Exception as error:
+        db.rollback()
+        # La première mise en route peut précéder l'application de la migration.
+        print(f"[recurring-series] extension differee: {error}")
+    finally:
+        db.close()
@@ -2,12 +2,17 @@ import os
 import sentry_sdk
 from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.routers import interventions, clients, planning, employees, absences, raw_events, notifications, logs, settings, timetracking, tours
+from app.core import principal_cache
+from app.core.db_pool import pool_status, probe
+from app.models.models import async_engine, async_probe_engine, engine, probe_engine
+from app.services import recurrence
 
 sentry_dsn = os.getenv("SENTRY_DSN")
 if sentry_dsn:
@@ -38,7 +43,8 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    expose_headers=["ETag"],
 )
 
 app.include_router(clients.router, prefix="/api/clients", tags=["clients"])
@@ -53,14 +59,15 @@ app.include_router(settings.router, prefix="/api/settings", tags=["settings"])
 app.include_router(timetracking.router, prefix="/api/timetracking", tags=["timetracking"])
 app.include_router(tours.router, prefix="/api/tours", tags=["tours"])
 
-tour_scheduler = BackgroundScheduler(timezone="Europe/Brussels")
+scheduler = BackgroundScheduler(timezone="Europe/Brussels")
 
 
 @app.on_event("startup")
-def start_tour_draft_scheduler():
+def start_background_jobs():
     tours.generate_drafts_job()
-    if not tour_scheduler.running:
-        tour_scheduler.add_job(
+    recurrence.materialize_series_job()
+    if not scheduler.running:
+        scheduler.add_job(
             tours.generate_drafts_job,
             "interval",
             hours=12,
@@ -69,16 +76,76 @@ def start_tour_draft_scheduler():
             max_instances=1,
             coalesce=True,
         )
-        tour_scheduler.start()
+        scheduler.add_job(
+            recurrence.materialize_series_job,
+            "interval",
+            hours=12,
+            id="recurring-series-eight-week-horizon",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        # Les GET de stats du planning ne font que lire : ce job reenregistre
+        # les cumuls perimes par les ecritures depuis le dernier passage, et
+        # les jours que les lectures ont du recalculer.
+        scheduler.add_job(
+            planning.refresh_stats_job,
+            "interval",
+            minutes=5,
+            id="planning-day-stats-refresh",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        # Idem pour le registre des heures hebdomadaires (GET /weekly-summary).
+        scheduler.add_job(
+            timetracking.refresh_ledger_job,
+            "interval",
+            minutes=30,
+            id="weekly-hours-ledger-refresh",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        scheduler.start()
 
 
 @app.on_event("shutdown")
-def stop_tour_draft_scheduler():
-    if tour_scheduler.running:
-        tour_scheduler.shutdown(wait=False)
+def stop_background_jobs():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    # Les connexions asyncpg sont liees a la boucle qui s'arrete.
+    await async_engine.dispose()
+    await async_probe_engine.dispose()
 
 
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "LVM Agenda API V2 (Prod Ready)"}
+
+
+@app.get("/health/auth-cache")
+def auth_cache_stats():
+    # Compteurs du cache d'authentification (propres a ce worker).
+    return principal_cache.stats()
+
+
+@app.get("/health/ready")
+async def readiness():
+    # Pret si la base repond sur les deux pilotes (psycopg2 pour la plupart
+    # des routes, asyncpg pour les routes async). La sonde ouvre ses propres
+    # connexions, hors pool : un pool sature reste "pret", son etat sert a
+    # dimensionner les workers.
+    database = await probe(probe_engine, async_probe_engine)
+    ready = all(database.values())
+    body = {
+        "ready": ready,
+        "database": database,
+        "pools": {"sync": pool_status(engine), "async": pool_status(async_engine)},
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
@@ -0,0 +1,125 @@
+-- Migration 023 : delta-sync des interventions (GET /api/interventions/changes)
+--
+-- Le mobile retelechargeait toute la plage du calendrier a chaque
+-- rafraichissement. Il ne demande plus que ce qui a change depuis son
+-- dernier curseur, ce qui suppose deux choses cote base :
+--
+-- 1. interventions.updated_at (migration 005) doit bouger aussi quand une
+--    ligne liee change : prestations, employes assignes, statut de tournee.
+--    Ces ecritures ne touchent pas la ligne interventions elle-meme, donc
+--    l'onupdate de l'ORM ne suffit pas. Des triggers "par instruction" (une
+--    seule mise a jour par INSERT/UPDATE/DELETE, meme en masse) s'en chargent.
+--
+-- 2. Une suppression ne laisse aucune ligne a comparer au curseur : on garde
+--    une pierre tombale (id + zone + date) pour chaque intervention supprimee,
+--    quel que soit le chemin (suppression simple, serie, tournee).
+
+CREATE TABLE IF NOT EXISTS intervention_tombstones (
+  intervention_id UUID PRIMARY KEY,
+  zone            VARCHAR(20),
+  deleted_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_intervention_tombstones_deleted_at
+  ON intervention_tombstones(deleted_at);
+
+CREATE INDEX IF NOT EXISTS idx_interventions_updated_at
+  ON interventions(updated_at);
+
+
+-- updated_at maintenu par la base, y compris pour les UPDATE en masse.
+CREATE OR REPLACE FUNCTION interventions_set_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_interventions_set_updated_at ON interventions;
+CREATE TRIGGER trg_interventions_set_updated_at
+  BEFORE UPDATE ON interventions
+  FOR EACH ROW EXECUTE FUNCTION interventions_set_updated_at();
+
+
+-- Lignes portant directement intervention_id : prestations, assignations, tournee.
+CREATE OR REPLACE FUNCTION touch_interventions_from_children() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (SELECT intervention_id FROM changed_new);
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (SELECT intervention_id FROM changed_old);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Commerces d'une tournee : remontent a l'intervention via tour_runs.
+CREATE OR REPLACE FUNCTION touch_interventions_from_run_stops() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (
+      SELECT tr.intervention_id FROM tour_runs tr JOIN changed_new c ON c.run_id = tr.id
+    );
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (
+      SELECT tr.intervention_id FROM tour_runs tr JOIN changed_old c ON c.run_id = tr.id
+    );
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Postgres n'accepte les tables de transition que sur un seul evenement par
+-- trigger : d'ou trois triggers par table, qui partagent la meme fonction.
+DO $$
+DECLARE
+  tbl TEXT;
+  fn  TEXT;
+BEGIN
+  FOR tbl, fn IN VALUES
+    ('intervention_items', 'touch_interventions_from_children'),
+    ('intervention_employees', 'touch_interventions_from_children'),
+    ('tour_runs', 'touch_interventions_from_children'),
+    ('tour_run_stops', 'touch_interventions_from_run_stops')
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_touch_ins ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_touch_upd ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_touch_del ON %I', tbl, tbl);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_touch_ins AFTER INSERT ON %I '
+      'REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_touch_upd AFTER UPDATE ON %I '
+      'REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_touch_del AFTER DELETE ON %I '
+      'REFERENCING OLD TABLE AS changed_old FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+  END LOOP;
+END $$;
+
+
+-- Pierres tombales.
+CREATE OR REPLACE FUNCTION record_intervention_tombstones() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO intervention_tombstones (intervention_id, zone, deleted_at)
+  SELECT id, zone, NOW() FROM deleted_interventions
+  ON CONFLICT (intervention_id) DO UPDATE
+    SET zone = EXCLUDED.zone, deleted_at = EXCLUDED.deleted_at;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_interventions_tombstone ON interventions;
+CREATE TRIGGER trg_interventions_tombstone
+  AFTER DELETE ON interventions
+  REFERENCING OLD TABLE AS deleted_interventions
+  FOR EACH STATEMENT EXECUTE FUNCTION record_intervention_tombstones();
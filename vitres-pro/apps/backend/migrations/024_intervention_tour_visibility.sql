@@ -0,0 +1,37 @@
+-- Visibilite "tournee" denormalisee sur interventions.
+--
+-- Chaque lecture du calendrier (liste, recherche, stats jour/plage) filtrait
+-- les brouillons de tournee par deux sous-requetes correlees sur tour_runs
+-- (NOT EXISTS ... OR EXISTS ... published), plus une troisieme pour les
+-- sous-traitants : Postgres les evaluait pour chaque intervention de la
+-- plage. La colonne recopie l'etat de la tournee liee :
+--   'none'      intervention classique (pas de tour_run)
+--   'draft'     brouillon de tournee, invisible hors ecran Tournees
+--   'published' tournee publiee
+-- Elle est posee par le routeur tours (generation de brouillon, publication) ;
+-- la suppression d'une tournee supprime l'intervention, rien a resynchroniser.
+
+ALTER TABLE interventions
+  ADD COLUMN IF NOT EXISTS tour_visibility VARCHAR(10) NOT NULL DEFAULT 'none';
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint WHERE conname = 'interventions_tour_visibility_check'
+  ) THEN
+    ALTER TABLE interventions ADD CONSTRAINT interventions_tour_visibility_check
+      CHECK (tour_visibility IN ('none', 'draft', 'published'));
+  END IF;
+END $$;
+
+UPDATE interventions i
+SET tour_visibility = tr.publication_status
+FROM tour_runs tr
+WHERE tr.intervention_id = i.id
+  AND i.tour_visibility IS DISTINCT FROM tr.publication_status;
+
+-- Index partiel : les brouillons (8 semaines d'avance par modele) sortent
+-- de l'index, les lectures calendrier deviennent un simple parcours de plage.
+CREATE INDEX IF NOT EXISTS idx_interventions_visible_start
+  ON interventions(start_time)
+  WHERE tour_visibility <> 'draft';
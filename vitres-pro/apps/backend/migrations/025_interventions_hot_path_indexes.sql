@@ -0,0 +1,25 @@
+-- Index des chemins chauds sur interventions.
+--
+-- Toutes les lectures calendrier / stats / cash filtrent une plage de
+-- start_time, souvent avec une zone ou sous-zone, et les listes non-admin
+-- ajoutent "assigne a moi" (EXISTS sur intervention_employees). Or
+-- start_time n'avait aucun index, et la PK (intervention_id, employee_id)
+-- d'intervention_employees ne sert pas a chercher par employe.
+--
+-- Les index zone/sous-zone sont partiels comme idx_interventions_visible_start
+-- (migration 024) : les brouillons de tournee n'y figurent pas.
+-- tests/test_query_plans.py verifie que les requetes concernees les utilisent.
+
+CREATE INDEX IF NOT EXISTS idx_interventions_start_time
+  ON interventions(start_time);
+
+CREATE INDEX IF NOT EXISTS idx_interventions_zone_start
+  ON interventions(zone, start_time)
+  WHERE tour_visibility <> 'draft';
+
+CREATE INDEX IF NOT EXISTS idx_interventions_sub_zone_start
+  ON interventions(sub_zone, start_time)
+  WHERE tour_visibility <> 'draft';
+
+CREATE INDEX IF NOT EXISTS idx_intervention_employees_employee
+  ON intervention_employees(employee_id, intervention_id);
@@ -0,0 +1,98 @@
+-- Moteur de recherche (GET /api/interventions/search).
+--
+-- La recherche faisait 4 ILIKE '%q%' a travers une jointure externe, plus des
+-- regexp_replace(..., '\D', '') sur titre, description et telephone client
+-- des que la saisie contenait 6 chiffres : aucun index possible, toute
+-- l'historique relue a chaque frappe.
+--
+-- Chaque intervention et chaque client porte desormais :
+--   search_document  texte normalise (minuscules, sans accents) a chercher
+--   search_digits    chiffres seuls des champs ou l'on ecrit un telephone,
+--                    un bloc par champ (separes par un espace)
+-- maintenus par trigger a chaque ecriture (y compris insertions en masse),
+-- et indexes en trigrammes : LIKE '%q%' devient un parcours d'index.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Normalisation partagee par les triggers et par la requete de recherche :
+-- "Écaussinnes", "ECAUSSINNES" et "ecaussinnes" donnent le meme texte.
+-- translate() + lower() plutot que l'extension unaccent : fonction IMMUTABLE,
+-- utilisable dans un index, identique sur toutes les bases.
+CREATE OR REPLACE FUNCTION search_normalize(value TEXT) RETURNS TEXT AS $$
+  SELECT btrim(regexp_replace(
+    replace(replace(replace(replace(
+      lower(translate(
+        coalesce(value, ''),
+        'ÀÁÂÃÄÅàáâãäåÇçÈÉÊËèéêëÌÍÎÏìíîïÑñÒÓÔÕÖòóôõöÙÚÛÜùúûüÝýÿ’‘`´',
+        'AAAAAAaaaaaaCcEEEEeeeeIIIIiiiiNnOOOOOoooooUUUUuuuuYyy'''''''''
+      )),
+      'œ', 'oe'), 'æ', 'ae'), 'Œ', 'oe'), 'Æ', 'ae'),
+    '\s+', ' ', 'g'))
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION search_digits(VARIADIC parts TEXT[]) RETURNS TEXT AS $$
+  SELECT coalesce(string_agg(d, ' '), '')
+  FROM (
+    SELECT regexp_replace(p, '\D', '', 'g') AS d FROM unnest(parts) AS p
+  ) s
+  WHERE d <> ''
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+
+ALTER TABLE interventions ADD COLUMN IF NOT EXISTS search_document TEXT;
+ALTER TABLE interventions ADD COLUMN IF NOT EXISTS search_digits TEXT;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS search_document TEXT;
+ALTER TABLE clients ADD COLUMN IF NOT EXISTS search_digits TEXT;
+
+CREATE OR REPLACE FUNCTION interventions_search_refresh() RETURNS trigger AS $$
+BEGIN
+  NEW.search_document := search_normalize(concat_ws(' ', NEW.title, NEW.description, NEW.address));
+  NEW.search_digits := search_digits(NEW.title, NEW.description, NEW.phone);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_interventions_search ON interventions;
+CREATE TRIGGER trg_interventions_search
+  BEFORE INSERT OR UPDATE OF title, description, address, phone ON interventions
+  FOR EACH ROW EXECUTE FUNCTION interventions_search_refresh();
+
+CREATE OR REPLACE FUNCTION clients_search_refresh() RETURNS trigger AS $$
+BEGIN
+  NEW.search_document := search_normalize(concat_ws(' ', NEW.name, NEW.street, NEW.zip_code, NEW.city, NEW.address));
+  NEW.search_digits := search_digits(NEW.phone);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_clients_search ON clients;
+CREATE TRIGGER trg_clients_search
+  BEFORE INSERT OR UPDATE OF name, street, zip_code, city, address, phone ON clients
+  FOR EACH ROW EXECUTE FUNCTION clients_search_refresh();
+
+-- Remplissage de l'existant. Le trigger updated_at (migration 023) est
+-- suspendu : sinon le delta-sync renverrait tout l'historique aux mobiles.
+ALTER TABLE interventions DISABLE TRIGGER trg_interventions_set_updated_at;
+UPDATE interventions
+SET search_document = search_normalize(concat_ws(' ', title, description, address)),
+    search_digits = search_digits(title, description, phone)
+WHERE search_document IS NULL;
+ALTER TABLE interventions ENABLE TRIGGER trg_interventions_set_updated_at;
+
+UPDATE clients
+SET search_document = search_normalize(concat_ws(' ', name, street, zip_code, city, address)),
+    search_digits = search_digits(phone)
+WHERE search_document IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_interventions_search_document
+  ON interventions USING gin (search_document gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_interventions_search_digits
+  ON interventions USING gin (search_digits gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_search_document
+  ON clients USING gin (search_document gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clients_search_digits
+  ON clients USING gin (search_digits gin_trgm_ops);
+
+-- Les clients trouves sont rattaches a leurs interventions par client_id.
+CREATE INDEX IF NOT EXISTS idx_interventions_client_id
+  ON interventions(client_id);
@@ -0,0 +1,50 @@
+-- Compteurs de version par table de reference (ETag / If-None-Match).
+--
+-- Le mobile relit employes, clients, sous-zones et taux horaires a chaque
+-- ouverture d'ecran, alors qu'ils ne changent presque jamais. Chaque
+-- ecriture (INSERT, UPDATE, DELETE, TRUNCATE) incremente ici le compteur de
+-- la ressource ; le backend en derive un ETag en une lecture par cle
+-- primaire et repond 304 sans relire ni serialiser la table (app/core/etag.py).
+--
+-- Trigger "par instruction" : une seule increment par requete, meme en
+-- masse. Les ecritures concurrentes sur une meme ressource se serialisent
+-- sur la ligne du compteur jusqu'au commit, acceptable pour ces tables
+-- peu ecrites.
+
+CREATE TABLE IF NOT EXISTS resource_versions (
+  name       TEXT PRIMARY KEY,
+  version    BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_resource_version() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO resource_versions (name, version, updated_at)
+  VALUES (TG_ARGV[0], 1, NOW())
+  ON CONFLICT (name) DO UPDATE
+    SET version = resource_versions.version + 1, updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+  tbl TEXT;
+  res TEXT;
+BEGIN
+  FOR tbl, res IN VALUES
+    ('employees', 'employees'),
+    ('clients', 'clients'),
+    ('sub_zones', 'zones'),
+    ('city_sub_zones', 'zones'),
+    ('hourly_rates', 'hourly_rates')
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_version ON %I', tbl, tbl);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+      'FOR EACH STATEMENT EXECUTE FUNCTION bump_resource_version(%L)',
+      tbl, tbl, res);
+    EXECUTE format(
+      'INSERT INTO resource_versions (name) VALUES (%L) ON CONFLICT (name) DO NOTHING', res);
+  END LOOP;
+END $$;
@@ -0,0 +1,46 @@
+-- Triggers "touch" de la migration 023 : une seule mise a jour par
+-- intervention et par transaction.
+--
+-- Une creation en masse (recurring-bulk) ou une modification de serie
+-- (recurrence-scope) ecrit items et employes assignes en plusieurs
+-- instructions par lots ; chacune relancait un UPDATE interventions sur les
+-- memes lignes, deja horodatees a NOW() par leur propre INSERT/UPDATE.
+-- NOW() est fixe pour toute la transaction : une ligne dont updated_at vaut
+-- deja NOW() n'a rien a gagner a etre reecrite (nouvelle version de ligne,
+-- index a mettre a jour). On la saute.
+
+CREATE OR REPLACE FUNCTION touch_interventions_from_children() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (SELECT intervention_id FROM changed_new)
+      AND updated_at IS DISTINCT FROM NOW();
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (SELECT intervention_id FROM changed_old)
+      AND updated_at IS DISTINCT FROM NOW();
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION touch_interventions_from_run_stops() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (
+      SELECT tr.intervention_id FROM tour_runs tr JOIN changed_new c ON c.run_id = tr.id
+    )
+      AND updated_at IS DISTINCT FROM NOW();
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE interventions SET updated_at = NOW()
+    WHERE id IN (
+      SELECT tr.intervention_id FROM tour_runs tr JOIN changed_old c ON c.run_id = tr.id
+    )
+      AND updated_at IS DISTINCT FROM NOW();
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,37 @@
+-- Series recurrentes "a l'infini" developpees cote serveur.
+--
+-- Le mobile calculait chaque date sur un horizon de 10 ans et les envoyait
+-- toutes a recurring-bulk : des milliers de lignes interventions par serie,
+-- relues par chaque requete de plage et reecrites par chaque modification
+-- de serie. Desormais la serie garde sa regle et un modele (champs, items,
+-- employes) ; seules existent en base les occurrences d'un horizon glissant
+-- de huit semaines (comme les brouillons de tournee), plus celles qu'on a
+-- ouvertes pour les modifier ou cloturer. Les suivantes sont calculees a la
+-- lecture (GET /api/interventions, stats de planning).
+--
+-- Une occurrence a un id deterministe (uuid5 de la serie et de sa date) :
+-- le meme, qu'elle soit encore calculee ou deja en base. Une occurrence
+-- supprimee laisse une pierre tombale (migration 023) et n'est pas recreee.
+
+CREATE TABLE IF NOT EXISTS recurring_series (
+  id                 UUID PRIMARY KEY,            -- = interventions.recurrence_group_id
+  rule               JSONB NOT NULL,              -- {"freq":"weekly","interval":1,"endType":"never"}
+  dtstart            TIMESTAMPTZ NOT NULL,        -- premiere occurrence, reference du motif
+  duration_minutes   INTEGER NOT NULL,
+  template           JSONB NOT NULL,              -- champs copies sur chaque occurrence
+  until              TIMESTAMPTZ,                 -- fin exclusive, NULL = a l'infini
+  materialized_until TIMESTAMPTZ NOT NULL,        -- avant cette date, tout est en base
+  created_at         TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at         TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_recurring_series_materialized_until
+  ON recurring_series(materialized_until);
+
+-- Les occurrences calculees dependent de cette table : elle entre dans
+-- l'ETag du calendrier (compteur de la migration 027).
+DROP TRIGGER IF EXISTS trg_recurring_series_version ON recurring_series;
+CREATE TRIGGER trg_recurring_series_version
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON recurring_series
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_resource_version('recurring_series');
+INSERT INTO resource_versions (name) VALUES ('recurring_series') ON CONFLICT (name) DO NOTHING;
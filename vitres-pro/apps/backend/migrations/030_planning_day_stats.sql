@@ -0,0 +1,173 @@
+-- Cumuls journaliers du planning (capacite / heures planifiees) en table.
+--
+-- range-stats et daily-stats recalculaient chaque jour a partir des
+-- interventions, employes, absences et montees en charge a chaque ouverture
+-- du calendrier. Le resultat est desormais garde dans planning_day_stats,
+-- une ligne par (zone, sous-zone, jour) ; '' = toutes zones / sous-zones.
+--
+-- Maintenance incrementale : plutot que de recalculer en base la regle
+-- d'heures (planning.intervention_hours, en Python), chaque ecriture qui
+-- touche un jour incremente sa version dans planning_day_versions (triggers
+-- "par instruction" ci-dessous, donc aussi pour les ecritures en masse). Une
+-- ligne de cumul n'est valide que si :
+--   - sa day_version est la version courante du jour ;
+--   - sa base_version est la somme courante des compteurs resource_versions
+--     (migration 027) employees + hourly_rates + recurring_series, qui
+--     touchent potentiellement tous les jours. Ces compteurs ne font que
+--     croitre : la somme change des que l'un d'eux change.
+-- Sinon le backend recalcule le jour et reecrit la ligne (app/routers/planning.py).
+-- La version est lue AVANT le calcul : une ecriture concurrente rend la
+-- ligne perimee, jamais l'inverse.
+--
+-- La tolerance (company_settings) et donc le statut ok/warning/overload sont
+-- appliques a la lecture, pas stockes.
+
+CREATE TABLE IF NOT EXISTS planning_day_versions (
+  day     DATE PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS planning_day_stats (
+  zone              TEXT NOT NULL DEFAULT '',
+  sub_zone          TEXT NOT NULL DEFAULT '',
+  day               DATE NOT NULL,
+  capacity_hours    DOUBLE PRECISION NOT NULL,
+  planned_hours     DOUBLE PRECISION NOT NULL,
+  present_employees INTEGER NOT NULL,
+  closed            BOOLEAN NOT NULL DEFAULT FALSE,
+  day_version       BIGINT NOT NULL,
+  base_version      BIGINT NOT NULL,
+  computed_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (zone, sub_zone, day)
+);
+
+
+-- Ordre des jours fixe : deux transactions qui marquent les memes jours
+-- prennent les verrous de ligne dans le meme ordre (pas d'interblocage).
+CREATE OR REPLACE FUNCTION mark_planning_days(days DATE[]) RETURNS void AS $$
+  INSERT INTO planning_day_versions (day, version)
+  SELECT d, 1 FROM (SELECT DISTINCT unnest(days) AS d) s
+  WHERE d IS NOT NULL
+  ORDER BY d
+  ON CONFLICT (day) DO UPDATE SET version = planning_day_versions.version + 1;
+$$ LANGUAGE sql;
+
+
+-- Interventions : jour belge de l'ancien et du nouveau start_time, seulement
+-- si une colonne qui entre dans les cumuls a change (les UPDATE de
+-- updated_at des migrations 023/028 ne marquent rien).
+CREATE OR REPLACE FUNCTION mark_planning_days_from_interventions() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (start_time AT TIME ZONE 'Europe/Brussels')::date FROM changed_new));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (start_time AT TIME ZONE 'Europe/Brussels')::date FROM changed_old));
+  ELSE
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (v.start_time AT TIME ZONE 'Europe/Brussels')::date
+      FROM changed_old o
+      JOIN changed_new n ON n.id = o.id
+      CROSS JOIN LATERAL (VALUES (o.start_time), (n.start_time)) AS v(start_time)
+      WHERE (o.start_time, o.end_time, o.status, o.hourly_rate_id, o.price_estimated,
+             o.zone, o.sub_zone, o.tour_visibility, o.carried_over_deferred_amount)
+         IS DISTINCT FROM
+            (n.start_time, n.end_time, n.status, n.hourly_rate_id, n.price_estimated,
+             n.zone, n.sub_zone, n.tour_visibility, n.carried_over_deferred_amount)));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Prestations : les prix negatifs entrent dans les heures de l'intervention.
+CREATE OR REPLACE FUNCTION mark_planning_days_from_items() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (i.start_time AT TIME ZONE 'Europe/Brussels')::date
+      FROM interventions i WHERE i.id IN (SELECT intervention_id FROM changed_new)));
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (i.start_time AT TIME ZONE 'Europe/Brussels')::date
+      FROM interventions i WHERE i.id IN (SELECT intervention_id FROM changed_old)));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Absences (timestamptz) : chaque jour belge chevauche, comme AbsenceIndex.
+CREATE OR REPLACE FUNCTION mark_planning_days_from_absences() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT g::date FROM changed_new c,
+        generate_series((c.start_date AT TIME ZONE 'Europe/Brussels')::date,
+                        (c.end_date AT TIME ZONE 'Europe/Brussels')::date,
+                        INTERVAL '1 day') AS g));
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT g::date FROM changed_old c,
+        generate_series((c.start_date AT TIME ZONE 'Europe/Brussels')::date,
+                        (c.end_date AT TIME ZONE 'Europe/Brussels')::date,
+                        INTERVAL '1 day') AS g));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Fermetures et montees en charge (colonnes DATE start_date / end_date).
+CREATE OR REPLACE FUNCTION mark_planning_days_from_date_spans() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT g::date FROM changed_new c,
+        generate_series(c.start_date, c.end_date, INTERVAL '1 day') AS g));
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT g::date FROM changed_old c,
+        generate_series(c.start_date, c.end_date, INTERVAL '1 day') AS g));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trois triggers par table (tables de transition : un seul evenement par
+-- trigger, cf. migration 023).
+DO $$
+DECLARE
+  tbl TEXT;
+  fn  TEXT;
+BEGIN
+  FOR tbl, fn IN VALUES
+    ('interventions', 'mark_planning_days_from_interventions'),
+    ('intervention_items', 'mark_planning_days_from_items'),
+    ('absences', 'mark_planning_days_from_absences'),
+    ('company_closures', 'mark_planning_days_from_date_spans'),
+    ('progressive_hours', 'mark_planning_days_from_date_spans')
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_planning_ins ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_planning_upd ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_planning_del ON %I', tbl, tbl);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_planning_ins AFTER INSERT ON %I '
+      'REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_planning_upd AFTER UPDATE ON %I '
+      'REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_planning_del AFTER DELETE ON %I '
+      'REFERENCING OLD TABLE AS changed_old FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+  END LOOP;
+END $$;
+
+-- Compteurs de base : deja presents pour employees / hourly_rates (027) et
+-- recurring_series (029) ; garantis ici pour que la somme soit stable.
+INSERT INTO resource_versions (name) VALUES ('employees'), ('hourly_rates'), ('recurring_series')
+ON CONFLICT (name) DO NOTHING;
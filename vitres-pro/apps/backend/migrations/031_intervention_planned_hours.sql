@@ -0,0 +1,160 @@
+-- Heures planifiees persistees sur interventions.planned_hours.
+--
+-- planning.intervention_hours etait evalue en Python pour chaque intervention
+-- de chaque calcul de stats, ce qui obligeait a charger le taux horaire et
+-- les prestations de toutes les interventions de la plage. La valeur est
+-- maintenant tenue a jour par la base, quel que soit le chemin d'ecriture
+-- (routes, creations en masse, recurrence-scope, UPDATE en masse) :
+--   - interventions : recalcul avant INSERT / UPDATE des colonnes utiles ;
+--   - intervention_items : recalcul des interventions parentes (les prix
+--     negatifs sont reintegres avant division par le taux) ;
+--   - hourly_rates : recalcul des interventions du taux modifie ; une
+--     suppression passe par le ON DELETE SET NULL, donc par le premier cas.
+-- Les agregats du planning deviennent un SUM(planned_hours) en SQL.
+--
+-- intervention_planned_hours() reprend exactement la regle Python
+-- (app/routers/planning.py, intervention_hours), y compris l'arrondi au
+-- quart d'heure : round() sur double precision arrondit les demis au pair,
+-- comme round() en Python. Toute modification de l'une doit etre reportee
+-- sur l'autre (tests/test_planned_hours.py compare les deux).
+
+ALTER TABLE interventions
+  ADD COLUMN IF NOT EXISTS planned_hours DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION intervention_planned_hours(
+  p_id UUID,
+  p_hourly_rate_id UUID,
+  p_start TIMESTAMPTZ,
+  p_end TIMESTAMPTZ,
+  p_price NUMERIC,
+  p_carried_over NUMERIC
+) RETURNS DOUBLE PRECISION AS $$
+  SELECT COALESCE((
+    SELECT CASE
+      WHEN r.time_only AND r.fixed_hours IS NOT NULL THEN r.fixed_hours
+      WHEN r.time_only THEN COALESCE(EXTRACT(EPOCH FROM p_end - p_start)::float8 / 3600, 0)
+      ELSE (
+        SELECT CASE WHEN e.eligible > 0 AND r.rate > 0 THEN round(e.eligible / r.rate * 4) / 4 ELSE 0 END
+        FROM (
+          SELECT COALESCE(p_price, 0)::float8
+                 - COALESCE((SELECT sum(it.price::float8) FROM intervention_items it
+                             WHERE it.intervention_id = p_id AND it.price < 0), 0)
+                 - COALESCE(p_carried_over, 0)::float8 AS eligible
+        ) e
+      )
+    END
+    FROM hourly_rates r
+    WHERE r.id = p_hourly_rate_id
+  ), 0);
+$$ LANGUAGE sql STABLE;
+
+
+-- Interventions : avant ecriture de la ligne.
+CREATE OR REPLACE FUNCTION interventions_set_planned_hours() RETURNS trigger AS $$
+BEGIN
+  NEW.planned_hours := intervention_planned_hours(
+    NEW.id, NEW.hourly_rate_id, NEW.start_time, NEW.end_time,
+    NEW.price_estimated, NEW.carried_over_deferred_amount);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Prestations : recalcul des parents, seulement s'ils changent (cloturer
+-- une prestation via items-done ne reecrit aucune intervention).
+CREATE OR REPLACE FUNCTION refresh_planned_hours_from_items() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    UPDATE interventions i
+    SET planned_hours = intervention_planned_hours(
+      i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount)
+    WHERE i.id IN (SELECT intervention_id FROM changed_new)
+      AND i.planned_hours IS DISTINCT FROM intervention_planned_hours(
+        i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount);
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE interventions i
+    SET planned_hours = intervention_planned_hours(
+      i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount)
+    WHERE i.id IN (SELECT intervention_id FROM changed_old)
+      AND i.planned_hours IS DISTINCT FROM intervention_planned_hours(
+        i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Taux horaires : recalcul des interventions qui utilisent le taux modifie.
+CREATE OR REPLACE FUNCTION refresh_planned_hours_from_rates() RETURNS trigger AS $$
+BEGIN
+  UPDATE interventions i
+  SET planned_hours = intervention_planned_hours(
+    i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount)
+  WHERE i.hourly_rate_id IN (SELECT id FROM changed_new)
+    AND i.planned_hours IS DISTINCT FROM intervention_planned_hours(
+      i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Reprise des lignes existantes. planned_hours n'est pas expose au mobile :
+-- inutile de faire bouger updated_at (et de relancer son delta-sync) pour ca.
+ALTER TABLE interventions DISABLE TRIGGER trg_interventions_set_updated_at;
+UPDATE interventions i
+SET planned_hours = intervention_planned_hours(
+  i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount)
+WHERE i.planned_hours IS DISTINCT FROM intervention_planned_hours(
+  i.id, i.hourly_rate_id, i.start_time, i.end_time, i.price_estimated, i.carried_over_deferred_amount);
+ALTER TABLE interventions ENABLE TRIGGER trg_interventions_set_updated_at;
+
+
+DROP TRIGGER IF EXISTS trg_interventions_planned_hours ON interventions;
+CREATE TRIGGER trg_interventions_planned_hours
+  BEFORE INSERT OR UPDATE OF hourly_rate_id, start_time, end_time, price_estimated, carried_over_deferred_amount
+  ON interventions
+  FOR EACH ROW EXECUTE FUNCTION interventions_set_planned_hours();
+
+DROP TRIGGER IF EXISTS trg_intervention_items_planned_ins ON intervention_items;
+DROP TRIGGER IF EXISTS trg_intervention_items_planned_upd ON intervention_items;
+DROP TRIGGER IF EXISTS trg_intervention_items_planned_del ON intervention_items;
+CREATE TRIGGER trg_intervention_items_planned_ins AFTER INSERT ON intervention_items
+  REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION refresh_planned_hours_from_items();
+CREATE TRIGGER trg_intervention_items_planned_upd AFTER UPDATE ON intervention_items
+  REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION refresh_planned_hours_from_items();
+CREATE TRIGGER trg_intervention_items_planned_del AFTER DELETE ON intervention_items
+  REFERENCING OLD TABLE AS changed_old FOR EACH STATEMENT EXECUTE FUNCTION refresh_planned_hours_from_items();
+
+DROP TRIGGER IF EXISTS trg_hourly_rates_planned_upd ON hourly_rates;
+CREATE TRIGGER trg_hourly_rates_planned_upd AFTER UPDATE ON hourly_rates
+  REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION refresh_planned_hours_from_rates();
+
+
+-- Cumuls journaliers (migration 030) : les heures d'une intervention ne
+-- dependent plus que de planned_hours. Une prestation ou un taux modifie
+-- reecrit planned_hours des interventions concernees, qui marquent leur
+-- jour : le trigger de jours sur intervention_items devient inutile.
+CREATE OR REPLACE FUNCTION mark_planning_days_from_interventions() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (start_time AT TIME ZONE 'Europe/Brussels')::date FROM changed_new));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (start_time AT TIME ZONE 'Europe/Brussels')::date FROM changed_old));
+  ELSE
+    PERFORM mark_planning_days(ARRAY(
+      SELECT (v.start_time AT TIME ZONE 'Europe/Brussels')::date
+      FROM changed_old o
+      JOIN changed_new n ON n.id = o.id
+      CROSS JOIN LATERAL (VALUES (o.start_time), (n.start_time)) AS v(start_time)
+      WHERE (o.start_time, o.status, o.zone, o.sub_zone, o.tour_visibility, o.planned_hours)
+         IS DISTINCT FROM
+            (n.start_time, n.status, n.zone, n.sub_zone, n.tour_visibility, n.planned_hours)));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_intervention_items_planning_ins ON intervention_items;
+DROP TRIGGER IF EXISTS trg_intervention_items_planning_upd ON intervention_items;
+DROP TRIGGER IF EXISTS trg_intervention_items_planning_del ON intervention_items;
@@ -0,0 +1,118 @@
+-- Chiffre d'affaires mensuel tenu a jour en table.
+--
+-- /api/planning/monthly-revenue relisait toutes les interventions "done"
+-- des derniers mois et groupait sur date_trunc(timezone('Europe/Brussels',
+-- start_time)), expression non indexee, a chaque ouverture du dashboard.
+-- monthly_revenue garde une ligne par (mois belge, zone, mode de paiement,
+-- employe qui a cloture) avec total, part cash, part facture et nombre
+-- d'interventions. La cle commence par le mois : une tranche de mois est un
+-- parcours d'index, quel que soit le niveau de detail demande.
+--
+-- Maintenance incrementale par trigger "par instruction" sur interventions :
+-- chaque ligne "done" qui disparait (suppression, sortie de done, ou valeurs
+-- modifiees) est retiree de sa cle, chaque ligne "done" qui apparait y est
+-- ajoutee. Les UPDATE qui ne touchent aucune colonne utile (updated_at des
+-- migrations 023/028, notes...) ne reecrivent rien.
+--
+-- Repartition cash / facture, comme le cash hebdomadaire (timetracking) :
+--   cash         -> tout en cash ;
+--   invoice      -> tout en facture ;
+--   invoice_cash -> amount_cash en cash (prix total si NULL), le reste en facture.
+--
+-- UNIQUE NULLS NOT DISTINCT : Postgres 15 minimum.
+
+CREATE TABLE IF NOT EXISTS monthly_revenue (
+  id                    BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  month                 DATE NOT NULL,          -- 1er du mois, heure de Bruxelles
+  zone                  VARCHAR(20),
+  payment_mode          VARCHAR(20) NOT NULL,
+  closed_by_employee_id UUID,
+  total_amount          NUMERIC(14, 2) NOT NULL DEFAULT 0,
+  cash_amount           NUMERIC(14, 2) NOT NULL DEFAULT 0,
+  invoice_amount        NUMERIC(14, 2) NOT NULL DEFAULT 0,
+  interventions         INTEGER NOT NULL DEFAULT 0,
+  CONSTRAINT uq_monthly_revenue_key
+    UNIQUE NULLS NOT DISTINCT (month, zone, payment_mode, closed_by_employee_id)
+);
+
+
+-- Ajoute les lignes "added" et retire les lignes "removed" (seules les
+-- interventions "done" comptent). Cles triees : deux transactions prennent
+-- les verrous de ligne dans le meme ordre.
+CREATE OR REPLACE FUNCTION add_monthly_revenue(removed interventions[], added interventions[]) RETURNS void AS $$
+  INSERT INTO monthly_revenue AS m (
+    month, zone, payment_mode, closed_by_employee_id,
+    total_amount, cash_amount, invoice_amount, interventions
+  )
+  SELECT month, zone, payment_mode, closed_by_employee_id,
+         sum(sign * total), sum(sign * cash), sum(sign * (total - cash)), sum(sign)::int
+  FROM (
+    SELECT date_trunc('month', timezone('Europe/Brussels', r.start_time))::date AS month,
+           r.zone, r.payment_mode, r.closed_by_employee_id, r.sign,
+           COALESCE(r.price_estimated, 0) AS total,
+           CASE r.payment_mode
+             WHEN 'cash' THEN COALESCE(r.price_estimated, 0)
+             WHEN 'invoice_cash' THEN COALESCE(r.amount_cash, r.price_estimated, 0)
+             ELSE 0
+           END AS cash
+    FROM (
+      SELECT o.*, -1 AS sign FROM unnest(removed) o
+      UNION ALL
+      SELECT n.*, 1 AS sign FROM unnest(added) n
+    ) r
+    WHERE r.status = 'done'
+  ) c
+  GROUP BY month, zone, payment_mode, closed_by_employee_id
+  ORDER BY month, zone, payment_mode, closed_by_employee_id
+  ON CONFLICT ON CONSTRAINT uq_monthly_revenue_key DO UPDATE SET
+    total_amount   = m.total_amount + EXCLUDED.total_amount,
+    cash_amount    = m.cash_amount + EXCLUDED.cash_amount,
+    invoice_amount = m.invoice_amount + EXCLUDED.invoice_amount,
+    interventions  = m.interventions + EXCLUDED.interventions;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION apply_monthly_revenue() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM add_monthly_revenue('{}', ARRAY(SELECT n::interventions FROM changed_new n WHERE n.status = 'done'));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM add_monthly_revenue(ARRAY(SELECT o::interventions FROM changed_old o WHERE o.status = 'done'), '{}');
+  ELSE
+    PERFORM add_monthly_revenue(
+      ARRAY(
+        SELECT o::interventions FROM changed_old o JOIN changed_new n ON n.id = o.id
+        WHERE o.status = 'done'
+          AND (o.status, o.start_time, o.zone, o.payment_mode, o.closed_by_employee_id,
+               o.price_estimated, o.amount_cash)
+              IS DISTINCT FROM
+              (n.status, n.start_time, n.zone, n.payment_mode, n.closed_by_employee_id,
+               n.price_estimated, n.amount_cash)),
+      ARRAY(
+        SELECT n::interventions FROM changed_old o JOIN changed_new n ON n.id = o.id
+        WHERE n.status = 'done'
+          AND (o.status, o.start_time, o.zone, o.payment_mode, o.closed_by_employee_id,
+               o.price_estimated, o.amount_cash)
+              IS DISTINCT FROM
+              (n.status, n.start_time, n.zone, n.payment_mode, n.closed_by_employee_id,
+               n.price_estimated, n.amount_cash)));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_interventions_revenue_ins ON interventions;
+DROP TRIGGER IF EXISTS trg_interventions_revenue_upd ON interventions;
+DROP TRIGGER IF EXISTS trg_interventions_revenue_del ON interventions;
+CREATE TRIGGER trg_interventions_revenue_ins AFTER INSERT ON interventions
+  REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION apply_monthly_revenue();
+CREATE TRIGGER trg_interventions_revenue_upd AFTER UPDATE ON interventions
+  REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION apply_monthly_revenue();
+CREATE TRIGGER trg_interventions_revenue_del AFTER DELETE ON interventions
+  REFERENCING OLD TABLE AS changed_old FOR EACH STATEMENT EXECUTE FUNCTION apply_monthly_revenue();
+
+
+-- Reprise complete (idempotente). Les triggers ci-dessus verrouillent deja
+-- interventions en ecriture jusqu'au commit : aucune ecriture concurrente ne
+-- peut se glisser entre la reprise et leur mise en service.
+DELETE FROM monthly_revenue;
+SELECT add_monthly_revenue('{}', ARRAY(SELECT i FROM interventions i WHERE i.status = 'done'));
@@ -0,0 +1,149 @@
+-- Heures reelles par employe et semaine ISO, gardees en table.
+--
+-- Le solde d'heures sup (_overtime_balance, app/routers/timetracking.py)
+-- rejouait chaque semaine depuis le dernier reglement, ou depuis le premier
+-- pointage si l'employe n'a jamais ete regle : un cout sans limite pour les
+-- employes rarement regles. weekly_hours_ledger garde une ligne par
+-- (employe, lundi de la semaine) avec les heures reelles et l'ecart au
+-- plancher de 37 h ; le solde devient reliquat + somme des ecarts, lue par
+-- la cle primaire. Seules les semaines terminees y sont ecrites ; la semaine
+-- en cours reste calculee a la volee.
+--
+-- Invalidation, comme planning_day_stats (migration 030) : chaque ecriture
+-- qui change les heures d'une semaine incremente sa version dans
+-- weekly_hours_versions (triggers "par instruction" ci-dessous) :
+--   - pointages (employee_time_entries, dont les corrections admin) ;
+--   - absences (chaque jour belge chevauche) ;
+--   - montees en charge (progressive_hours).
+-- Une ligne du registre n'est valide que si sa version est la version
+-- courante de la semaine et si son profil (hours_per_weekday,
+-- daily_capacity, hours_valid_from / until de l'employe, cf. _hours_profile)
+-- est le profil courant : une modification d'horaire invalide toutes les
+-- semaines de l'employe sans trigger sur employees.
+-- La version est lue AVANT le calcul : une ecriture concurrente rend la
+-- ligne perimee, jamais l'inverse.
+--
+-- Reconstruction / verification : scripts/overtime_ledger.py.
+
+CREATE TABLE IF NOT EXISTS weekly_hours_versions (
+  employee_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+  week_start  DATE NOT NULL,              -- lundi
+  version     BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (employee_id, week_start)
+);
+
+CREATE TABLE IF NOT EXISTS weekly_hours_ledger (
+  employee_id  UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+  week_start   DATE NOT NULL,             -- lundi
+  actual_hours DOUBLE PRECISION NOT NULL,
+  delta_hours  DOUBLE PRECISION NOT NULL,
+  version      BIGINT NOT NULL,
+  profile      TEXT NOT NULL,
+  computed_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (employee_id, week_start)
+);
+
+
+-- Marque les semaines des couples (employe, jour) : tableaux paralleles.
+-- Cles triees : deux transactions prennent les verrous dans le meme ordre.
+CREATE OR REPLACE FUNCTION mark_hours_weeks(employee_ids UUID[], days DATE[]) RETURNS void AS $$
+  INSERT INTO weekly_hours_versions (employee_id, week_start, version)
+  SELECT DISTINCT e, date_trunc('week', d)::date, 1
+  FROM unnest(employee_ids, days) AS k(e, d)
+  WHERE e IS NOT NULL AND d IS NOT NULL
+  ORDER BY 1, 2
+  ON CONFLICT (employee_id, week_start) DO UPDATE SET version = weekly_hours_versions.version + 1;
+$$ LANGUAGE sql;
+
+
+-- Pointages : semaine de l'ancien et du nouveau work_date, seulement si une
+-- colonne qui entre dans les heures a change.
+CREATE OR REPLACE FUNCTION mark_hours_weeks_from_entries() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM mark_hours_weeks(ARRAY(SELECT employee_id FROM changed_new),
+                             ARRAY(SELECT work_date FROM changed_new));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM mark_hours_weeks(ARRAY(SELECT employee_id FROM changed_old),
+                             ARRAY(SELECT work_date FROM changed_old));
+  ELSE
+    PERFORM mark_hours_weeks(array_agg(v.employee_id), array_agg(v.work_date))
+    FROM changed_old o
+    JOIN changed_new n ON n.id = o.id
+    CROSS JOIN LATERAL (VALUES (o.employee_id, o.work_date), (n.employee_id, n.work_date))
+      AS v(employee_id, work_date)
+    WHERE (o.employee_id, o.work_date, o.clock_in_at, o.clock_out_at)
+       IS DISTINCT FROM
+          (n.employee_id, n.work_date, n.clock_in_at, n.clock_out_at);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Absences (timestamptz) : chaque jour belge chevauche, comme AbsenceIndex.
+CREATE OR REPLACE FUNCTION mark_hours_weeks_from_absences() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_hours_weeks(array_agg(c.employee_id), array_agg(g::date))
+    FROM changed_new c,
+      generate_series((c.start_date AT TIME ZONE 'Europe/Brussels')::date,
+                      (c.end_date AT TIME ZONE 'Europe/Brussels')::date,
+                      INTERVAL '1 day') AS g;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_hours_weeks(array_agg(c.employee_id), array_agg(g::date))
+    FROM changed_old c,
+      generate_series((c.start_date AT TIME ZONE 'Europe/Brussels')::date,
+                      (c.end_date AT TIME ZONE 'Europe/Brussels')::date,
+                      INTERVAL '1 day') AS g;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Montees en charge (colonnes DATE) : un jour par semaine suffit.
+CREATE OR REPLACE FUNCTION mark_hours_weeks_from_progressive() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_hours_weeks(array_agg(c.employee_id), array_agg(g::date))
+    FROM changed_new c,
+      generate_series(date_trunc('week', c.start_date), c.end_date, INTERVAL '7 days') AS g;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_hours_weeks(array_agg(c.employee_id), array_agg(g::date))
+    FROM changed_old c,
+      generate_series(date_trunc('week', c.start_date), c.end_date, INTERVAL '7 days') AS g;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trois triggers par table (tables de transition : un seul evenement par
+-- trigger, cf. migration 023).
+DO $$
+DECLARE
+  tbl TEXT;
+  fn  TEXT;
+BEGIN
+  FOR tbl, fn IN VALUES
+    ('employee_time_entries', 'mark_hours_weeks_from_entries'),
+    ('absences', 'mark_hours_weeks_from_absences'),
+    ('progressive_hours', 'mark_hours_weeks_from_progressive')
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_hours_ins ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_hours_upd ON %I', tbl, tbl);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_hours_del ON %I', tbl, tbl);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_hours_ins AFTER INSERT ON %I '
+      'REFERENCING NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_hours_upd AFTER UPDATE ON %I '
+      'REFERENCING OLD TABLE AS changed_old NEW TABLE AS changed_new FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%s_hours_del AFTER DELETE ON %I '
+      'REFERENCING OLD TABLE AS changed_old FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+      tbl, tbl, fn);
+  END LOOP;
+END $$;
@@ -0,0 +1,35 @@
+-- Horizon des brouillons de tournee, garde par modele.
+--
+-- GET /api/tours/drafts appelait ensure_drafts a chaque lecture : SELECT
+-- ... FOR UPDATE sur tous les modeles actifs, puis insertion des
+-- brouillons manquants avant de repondre. Deux admins sur l'ecran des
+-- brouillons s'attendaient sur ces verrous, et une lecture devenait une
+-- transaction d'ecriture.
+--
+-- drafts_until joue le role de recurring_series.materialized_until
+-- (migration 029) : avant cette date (exclue), les brouillons du modele
+-- existent deja. ensure_drafts ne prend plus que les modeles dont l'horizon
+-- est en retard et l'avance ; il ne tourne que depuis le planificateur
+-- (generate_drafts_job), POST /drafts/generate et l'enregistrement d'un
+-- modele. NULL = rien de genere (modele inactif, archive, ou jour change).
+-- La liste des brouillons n'est plus qu'une lecture de tour_runs.
+
+ALTER TABLE tour_templates ADD COLUMN IF NOT EXISTS drafts_until DATE;
+
+-- Reprise : l'horizon d'un modele actif est le lendemain de son dernier
+-- brouillon ou de sa derniere tournee deja generee.
+UPDATE tour_templates t
+SET drafts_until = r.last_date + 1
+FROM (
+  SELECT template_id, max(scheduled_date) AS last_date
+  FROM tour_runs
+  WHERE template_id IS NOT NULL
+  GROUP BY template_id
+) r
+WHERE r.template_id = t.id
+  AND t.active AND NOT t.archived
+  AND t.drafts_until IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_tour_runs_draft_date
+  ON tour_runs(scheduled_date)
+  WHERE publication_status = 'draft';
@@ -0,0 +1,50 @@
+-- Desassignations, pour le retrait du cache mobile (delta-sync, migration 023).
+--
+-- Hors admin, GET /api/interventions/changes renvoie aussi les ids qui ne
+-- sont plus visibles pour l'utilisateur. Faute de savoir qui avait pu voir
+-- une intervention, il prenait toutes les interventions modifiees depuis le
+-- curseur, de toute l'entreprise, et renvoyait celles hors du perimetre :
+-- n'importe quel employe recevait ainsi les ids du planning des autres.
+--
+-- On ne retire plus que ce que l'utilisateur a pu voir, c'est-a-dire ce a
+-- quoi il est ou a ete assigne :
+--   - toujours assigne : l'intervention a change de zone ou est repassee en
+--     brouillon de tournee, et updated_at a bouge ;
+--   - plus assigne : la ligne d'intervention_employees a disparu. Le
+--     trigger ci-dessous garde (intervention, employe, date) pour chaque
+--     desassignation, quel que soit le chemin (modification, remplacement
+--     des employes, suppression de l'intervention).
+
+CREATE TABLE IF NOT EXISTS intervention_unassignments (
+  intervention_id UUID NOT NULL,
+  employee_id     UUID NOT NULL,
+  unassigned_at   TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (intervention_id, employee_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_intervention_unassignments_employee
+  ON intervention_unassignments(employee_id, unassigned_at);
+
+CREATE OR REPLACE FUNCTION record_intervention_unassignments() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO intervention_unassignments (intervention_id, employee_id, unassigned_at)
+  SELECT intervention_id, employee_id, NOW() FROM changed_old
+  ON CONFLICT (intervention_id, employee_id) DO UPDATE
+    SET unassigned_at = EXCLUDED.unassigned_at;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- UPDATE : l'ancien couple compte comme desassigne ; s'il est toujours la,
+-- l'intervention reste visible et rien n'est retire.
+DROP TRIGGER IF EXISTS trg_intervention_employees_unassign_del ON intervention_employees;
+CREATE TRIGGER trg_intervention_employees_unassign_del
+  AFTER DELETE ON intervention_employees
+  REFERENCING OLD TABLE AS changed_old
+  FOR EACH STATEMENT EXECUTE FUNCTION record_intervention_unassignments();
+
+DROP TRIGGER IF EXISTS trg_intervention_employees_unassign_upd ON intervention_employees;
+CREATE TRIGGER trg_intervention_employees_unassign_upd
+  AFTER UPDATE ON intervention_employees
+  REFERENCING OLD TABLE AS changed_old
+  FOR EACH STATEMENT EXECUTE FUNCTION record_intervention_unassignments();
@@ -0,0 +1,78 @@
+-- Changements de series sans fin, pour le delta-sync du mobile (migration 023).
+--
+-- Au-dela de l'horizon enregistre (8 semaines), les occurrences d'une serie
+-- sont calculees a la lecture (migration 029) : elles n'ont pas d'updated_at
+-- et n'apparaissent jamais dans GET /api/interventions/changes. Une nouvelle
+-- serie, un modele modifie ("toutes" / "celle-ci et les suivantes"), une
+-- serie arretee ou supprimee n'atteignaient donc jamais un client qui
+-- n'appelle plus que le delta.
+--
+-- Une ligne par serie, avec la date du dernier changement et les employes
+-- assignes avant comme apres (cumules) : /changes renvoie l'id de la serie,
+-- et hors admin seulement a ceux qui y sont ou y ont ete assignes. Le client
+-- recharge alors les occurrences calculees de ces series.
+--
+-- Seules les colonnes qui definissent les occurrences comptent :
+-- materialized_until avance a chaque passage de materialize_series_job, et
+-- les occurrences qu'il enregistre remontent deja par interventions.updated_at.
+
+CREATE TABLE IF NOT EXISTS recurring_series_changes (
+  series_id    UUID PRIMARY KEY,
+  employee_ids UUID[] NOT NULL DEFAULT '{}',
+  changed_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_recurring_series_changes_changed_at
+  ON recurring_series_changes(changed_at);
+
+CREATE OR REPLACE FUNCTION record_recurring_series_change() RETURNS trigger AS $$
+DECLARE
+  changed UUID;
+  assigned UUID[] := '{}';
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    changed := OLD.id;
+    assigned := assigned || ARRAY(
+      SELECT jsonb_array_elements_text(COALESCE(OLD.template->'employee_ids', '[]'::jsonb))::uuid
+    );
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    changed := NEW.id;
+    assigned := assigned || ARRAY(
+      SELECT jsonb_array_elements_text(COALESCE(NEW.template->'employee_ids', '[]'::jsonb))::uuid
+    );
+  END IF;
+
+  INSERT INTO recurring_series_changes AS c (series_id, employee_ids, changed_at)
+  VALUES (changed, ARRAY(SELECT DISTINCT unnest(assigned)), NOW())
+  ON CONFLICT (series_id) DO UPDATE
+    SET employee_ids = ARRAY(SELECT DISTINCT unnest(c.employee_ids || EXCLUDED.employee_ids)),
+        changed_at = EXCLUDED.changed_at;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Par ligne : une condition WHEN ne s'ecrit pas avec des tables de
+-- transition, et les series ne sont ecrites qu'une a la fois.
+DROP TRIGGER IF EXISTS trg_recurring_series_change_ins ON recurring_series;
+CREATE TRIGGER trg_recurring_series_change_ins
+  AFTER INSERT ON recurring_series
+  FOR EACH ROW EXECUTE FUNCTION record_recurring_series_change();
+
+DROP TRIGGER IF EXISTS trg_recurring_series_change_upd ON recurring_series;
+CREATE TRIGGER trg_recurring_series_change_upd
+  AFTER UPDATE ON recurring_series
+  FOR EACH ROW
+  WHEN (
+    OLD.rule IS DISTINCT FROM NEW.rule
+    OR OLD.dtstart IS DISTINCT FROM NEW.dtstart
+    OR OLD.duration_minutes IS DISTINCT FROM NEW.duration_minutes
+    OR OLD.template IS DISTINCT FROM NEW.template
+    OR OLD.until IS DISTINCT FROM NEW.until
+  )
+  EXECUTE FUNCTION record_recurring_series_change();
+
+DROP TRIGGER IF EXISTS trg_recurring_series_change_del ON recurring_series;
+CREATE TRIGGER trg_recurring_series_change_del
+  AFTER DELETE ON recurring_series
+  FOR EACH ROW EXECUTE FUNCTION record_recurring_series_change();
@@ -0,0 +1,166 @@
+-- Cumuls journaliers du planning (migration 030) : invalidation jour par jour
+-- pour les employes, les series et les taux horaires.
+--
+-- Jusqu'ici une ligne de planning_day_stats n'etait valide que si sa
+-- base_version etait la somme des compteurs resource_versions employees +
+-- hourly_rates + recurring_series. Ces compteurs bougent a chaque
+-- instruction sur ces tables : une couleur ou un avatar modifie, un
+-- materialized_until avance par materialize_series_job rendaient perimees
+-- toutes les lignes, y compris hors de la plage que refresh_stats_job
+-- reenregistre. Les lectures recalculaient alors sans fin.
+--
+-- Desormais seule la version du jour compte. Les ecritures sur ces trois
+-- tables marquent les jours deja enregistres de la plage qu'elles touchent,
+-- et seulement si une colonne qui entre dans les cumuls a change :
+--   - employees : profil horaire, capacite, plage de validite, zone ; de
+--     hours_valid_from a hours_valid_until (sans borne = tous les jours) ;
+--   - recurring_series : regle, debut, duree, modele, fin ; les jours encore
+--     calcules, de materialized_until a until. Les occurrences que
+--     materialize_series_job enregistre marquent deja leur jour (trigger sur
+--     interventions) ;
+--   - hourly_rates : taux, temps seul, forfait ; les jours encore calcules
+--     des series qui utilisent le taux. Les interventions enregistrees
+--     suivent via planned_hours (migration 031).
+--
+-- Un jour sans ligne n'a rien a marquer : le calcul suivant lira la table
+-- modifiee. Sauf si ce calcul est deja en cours et enregistre le jour apres
+-- coup avec les anciennes valeurs : le marquage prend donc en partage le
+-- verrou de refresh_stats_job (837264023), pris en exclusif par tout ce qui
+-- enregistre des cumuls, et attend la fin d'un rafraichissement en cours.
+
+CREATE OR REPLACE FUNCTION mark_stored_planning_days(first_day DATE, last_day DATE) RETURNS void AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock_shared(837264023);
+  PERFORM mark_planning_days(ARRAY(
+    SELECT DISTINCT day FROM planning_day_stats
+    WHERE (first_day IS NULL OR day >= first_day)
+      AND (last_day IS NULL OR day <= last_day)));
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION mark_planning_days_from_employees() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_stored_planning_days(OLD.hours_valid_from, OLD.hours_valid_until);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_stored_planning_days(NEW.hours_valid_from, NEW.hours_valid_until);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- until est exclusif : marquer son jour en plus est sans consequence.
+CREATE OR REPLACE FUNCTION mark_planning_days_from_series() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM mark_stored_planning_days(
+      (GREATEST(OLD.materialized_until, OLD.dtstart) AT TIME ZONE 'Europe/Brussels')::date,
+      (OLD.until AT TIME ZONE 'Europe/Brussels')::date);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM mark_stored_planning_days(
+      (GREATEST(NEW.materialized_until, NEW.dtstart) AT TIME ZONE 'Europe/Brussels')::date,
+      (NEW.until AT TIME ZONE 'Europe/Brussels')::date);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_planning_days_from_rates() RETURNS trigger AS $$
+DECLARE
+  s recurring_series;
+BEGIN
+  FOR s IN SELECT * FROM recurring_series WHERE template->>'hourly_rate_id' = OLD.id::text LOOP
+    PERFORM mark_stored_planning_days(
+      (GREATEST(s.materialized_until, s.dtstart) AT TIME ZONE 'Europe/Brussels')::date,
+      (s.until AT TIME ZONE 'Europe/Brussels')::date);
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Par ligne : une condition WHEN ne s'ecrit pas avec des tables de
+-- transition (cf. migration 036).
+DROP TRIGGER IF EXISTS trg_employees_planning_ins ON employees;
+CREATE TRIGGER trg_employees_planning_ins
+  AFTER INSERT ON employees
+  FOR EACH ROW EXECUTE FUNCTION mark_planning_days_from_employees();
+
+DROP TRIGGER IF EXISTS trg_employees_planning_upd ON employees;
+CREATE TRIGGER trg_employees_planning_upd
+  AFTER UPDATE OF hours_per_weekday, daily_capacity, hours_valid_from, hours_valid_until, zone ON employees
+  FOR EACH ROW
+  WHEN (
+    OLD.hours_per_weekday IS DISTINCT FROM NEW.hours_per_weekday
+    OR OLD.daily_capacity IS DISTINCT FROM NEW.daily_capacity
+    OR OLD.hours_valid_from IS DISTINCT FROM NEW.hours_valid_from
+    OR OLD.hours_valid_until IS DISTINCT FROM NEW.hours_valid_until
+    OR OLD.zone IS DISTINCT FROM NEW.zone
+  )
+  EXECUTE FUNCTION mark_planning_days_from_employees();
+
+DROP TRIGGER IF EXISTS trg_employees_planning_del ON employees;
+CREATE TRIGGER trg_employees_planning_del
+  AFTER DELETE ON employees
+  FOR EACH ROW EXECUTE FUNCTION mark_planning_days_from_employees();
+
+DROP TRIGGER IF EXISTS trg_recurring_series_planning_ins ON recurring_series;
+CREATE TRIGGER trg_recurring_series_planning_ins
+  AFTER INSERT ON recurring_series
+  FOR EACH ROW EXECUTE FUNCTION mark_planning_days_from_series();
+
+DROP TRIGGER IF EXISTS trg_recurring_series_planning_upd ON recurring_series;
+CREATE TRIGGER trg_recurring_series_planning_upd
+  AFTER UPDATE OF rule, dtstart, duration_minutes, template, until ON recurring_series
+  FOR EACH ROW
+  WHEN (
+    OLD.rule IS DISTINCT FROM NEW.rule
+    OR OLD.dtstart IS DISTINCT FROM NEW.dtstart
+    OR OLD.duration_minutes IS DISTINCT FROM NEW.duration_minutes
+    OR OLD.template IS DISTINCT FROM NEW.template
+    OR OLD.until IS DISTINCT FROM NEW.until
+  )
+  EXECUTE FUNCTION mark_planning_days_from_series();
+
+DROP TRIGGER IF EXISTS trg_recurring_series_planning_del ON recurring_series;
+CREATE TRIGGER trg_recurring_series_planning_del
+  AFTER DELETE ON recurring_series
+  FOR EACH ROW EXECUTE FUNCTION mark_planning_days_from_series();
+
+DROP TRIGGER IF EXISTS trg_hourly_rates_planning_upd ON hourly_rates;
+CREATE TRIGGER trg_hourly_rates_planning_upd
+  AFTER UPDATE OF rate, time_only, fixed_hours ON hourly_rates
+  FOR EACH ROW
+  WHEN (
+    OLD.rate IS DISTINCT FROM NEW.rate
+    OR OLD.time_only IS DISTINCT FROM NEW.time_only
+    OR OLD.fixed_hours IS DISTINCT FROM NEW.fixed_hours
+  )
+  EXECUTE FUNCTION mark_planning_days_from_rates();
+
+DROP TRIGGER IF EXISTS trg_hourly_rates_planning_del ON hourly_rates;
+CREATE TRIGGER trg_hourly_rates_planning_del
+  AFTER DELETE ON hourly_rates
+  FOR EACH ROW EXECUTE FUNCTION mark_planning_days_from_rates();
+
+
+-- Fin de la version de base : les lignes deja perimees par elle sont
+-- supprimees (elles passeraient sinon pour a jour), sous le verrou du
+-- rafraichissement.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name = 'planning_day_stats' AND column_name = 'base_version'
+  ) THEN
+    PERFORM pg_advisory_xact_lock(837264023);
+    DELETE FROM planning_day_stats
+    WHERE base_version <> (
+      SELECT COALESCE(SUM(version), 0) FROM resource_versions
+      WHERE name IN ('employees', 'hourly_rates', 'recurring_series'));
+    ALTER TABLE planning_day_stats DROP COLUMN base_version;
+  END IF;
+END $$;
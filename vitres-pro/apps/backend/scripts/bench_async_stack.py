@@ -0,0 +1,208 @@
+"""Benchmark : routes de lecture les plus appelees, pile synchrone vs asyncpg.
+
+N clients simultanes (500 par defaut) enchainent des lectures sur les trois
+routes async : liste des interventions de la semaine (selects Core sur
+asyncpg, serialisation dans le threadpool), compteur de notifications non
+lues, pointage du jour. La pile synchrone d'origine (def + Session psycopg2
+et chargement ORM, executee dans le threadpool) est reproduite ci-dessous et
+servie par la meme application que les routes reelles.
+
+--blocking simule une part de clients qui appellent une route synchrone
+lente (Supabase Storage, Google) : elle occupe un thread du threadpool,
+partage avec les routes DB synchrones mais pas avec les routes async.
+
+Lecture seule : aucune ecriture en base. Exemple (base locale, migrations
+appliquees, au moins un employe) :
+  python scripts/bench_async_stack.py --clients 500 --requests 4 --blocking 0.1
+"""
+# Pas de "from __future__ import annotations" : FastAPI doit resoudre les
+# annotations des routes definies localement dans legacy_routes().
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from bench_common import local_session
+
+
+def legacy_routes(app) -> None:
+    """Routes d'origine (synchrones), montees sous /sync."""
+    from fastapi import Depends, Request, Response
+    from sqlalchemy.orm import Session
+
+    from app.core.deps import get_current_user
+    from app.core.etag import not_modified
+    from app.models.models import EmployeeTimeEntry, InAppNotification, Intervention, get_db
+    from app.routers.interventions import (
+        _calendar_etag, _in_calendar_range, _parse_bound, _strip_prices, _virtual_in_range,
+        _with_out_relations,
+    )
+    from app.routers.timetracking import _entry_status, _today_brussels, _worked_hours
+    from app.schemas.schemas import InterventionOut, TimeEntryOut
+
+    @app.get("/sync/interventions", response_model=List[InterventionOut])
+    def read_interventions(
+        request: Request, response: Response, start: Optional[str] = None, end: Optional[str] = None,
+        db: Session = Depends(get_db), current_user=Depends(get_current_user),
+    ):
+        start_dt, end_dt = _parse_bound(start), _parse_bound(end)
+        cached = not_modified(request, response, _calendar_etag(db, "full", current_user, start_dt, end_dt))
+        if cached:
+            return cached
+        query = _with_out_relations(db.query(Intervention))
+        results = _in_calendar_range(query, current_user, start_dt, end_dt).all()
+        virtual = _virtual_in_range(db, current_user, start_dt, end_dt)
+        if virtual:
+            results = sorted(results + virtual, key=lambda iv: iv.start_time)
+        if current_user.role == 'subcontractor':
+            _strip_prices(results)
+        return results
+
+    @app.get("/sync/unread-count")
+    def get_unread_count(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+        count = (
+            db.query(InAppNotification)
+            .filter(InAppNotification.recipient_id == current_user.id, InAppNotification.is_read == False)
+            .count()
+        )
+        return {"count": count}
+
+    @app.get("/sync/today", response_model=TimeEntryOut)
+    def get_today_entry(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+        today = _today_brussels()
+        entry = (
+            db.query(EmployeeTimeEntry)
+            .filter(EmployeeTimeEntry.employee_id == current_user.id, EmployeeTimeEntry.work_date == today)
+            .first()
+        )
+        return TimeEntryOut(
+            work_date=today,
+            clock_in_at=entry.clock_in_at if entry else None,
+            clock_out_at=entry.clock_out_at if entry else None,
+            status=_entry_status(entry),
+            worked_hours=_worked_hours(entry) if entry else None,
+        )
+
+
+def build_app(blocking_ms: int):
+    from fastapi import FastAPI
+
+    from app.routers import interventions, notifications, timetracking
+
+    app = FastAPI()
+    legacy_routes(app)
+    app.include_router(interventions.router, prefix="/async/interventions")
+    app.include_router(notifications.router, prefix="/async/notifications")
+    app.include_router(timetracking.router, prefix="/async/timetracking")
+
+    @app.get("/blocking")
+    def blocking_call():
+        # Appel HTTP externe synchrone (Storage, Google...) : occupe un thread.
+        time.sleep(blocking_ms / 1000)
+        return {}
+
+    return app
+
+
+def paths(stack: str) -> List[str]:
+    if stack == "sync":
+        return ["/sync/interventions", "/sync/unread-count", "/sync/today"]
+    return ["/async/interventions", "/async/notifications/unread-count", "/async/timetracking/today"]
+
+
+async def run(app, stack: str, token: str, clients: int, requests: int, blocking: float, deadline: float) -> dict:
+    import httpx
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    week = {"start": today.isoformat(), "end": (today + timedelta(days=7)).isoformat()}
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: List[float] = []
+    errors = 0
+    blocking_clients = int(clients * blocking)
+    expected = (clients - blocking_clients) * requests
+
+    async def client(index: int, http) -> None:
+        nonlocal errors
+        for n in range(requests):
+            if index < blocking_clients:
+                await http.get("/blocking")
+                continue
+            path = paths(stack)[(index + n) % 3]
+            params = week if path.endswith("/interventions") else None
+            started = time.perf_counter()
+            response = await http.get(path, params=params, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 500 typique de la pile synchrone saturee : QueuePool TimeoutError.
+            errors += response.status_code >= 400
+
+    # raise_app_exceptions=False : une erreur serveur devient une 500 comptee.
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        # Echauffement : pools de connexions et cache d'authentification.
+        await asyncio.gather(*(http.get(p, params=week, headers=headers) for p in paths(stack)))
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(client(i, http)) for i in range(clients)]
+        # La pile synchrone saturee ne progresse plus qu'au rythme des attentes
+        # QueuePool (30 s) : on arrete la mesure a l'echeance.
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        elapsed = time.perf_counter() - started
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else float("nan"),
+        "errors": errors,
+        "unfinished": expected - len(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=4)
+    parser.add_argument("--blocking", type=float, default=0.1, help="part des clients sur la route lente")
+    parser.add_argument("--blocking-ms", type=int, default=200)
+    parser.add_argument("--deadline", type=float, default=60, help="secondes par pile")
+    args = parser.parse_args()
+
+    from jose import jwt
+
+    from app.core.config import settings
+    from app.models.models import Employee, async_engine
+
+    db = local_session()
+    employee = db.query(Employee).filter(Employee.role == "employee").first() or db.query(Employee).first()
+    db.close()
+    if employee is None:
+        raise SystemExit("Aucun employe en base.")
+    token = jwt.encode(
+        {"sub": str(employee.id), "aud": "authenticated", "exp": int(time.time()) + 3600},
+        settings.JWT_SECRET, algorithm="HS256",
+    )
+
+    app = build_app(args.blocking_ms)
+
+    async def both():
+        results = {}
+        for stack in ("sync", "async"):
+            results[stack] = await run(app, stack, token, args.clients, args.requests, args.blocking, args.deadline)
+        await async_engine.dispose()
+        return results
+
+    results = asyncio.run(both())
+    print(f"{args.clients} clients x {args.requests} requetes, {args.blocking:.0%} sur une route bloquante de {args.blocking_ms} ms")
+    for stack, r in results.items():
+        print(
+            f"{stack:<6} {r['rps']:8.0f} req/s   p50 {r['p50']:8.1f} ms   p99 {r['p99']:8.1f} ms"
+            f"   erreurs {r['errors']}   non terminees {r['unfinished']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark : capacite de range-stats sur un an, tous les employes.
+
+Compare la boucle d'origine (un appel a _get_employee_hours_for_day et un
+parcours des absences par employe et par jour, reproduite ci-dessous) a
+CapacityMatrix, sur des donnees synthetiques en memoire : aucune base n'est
+necessaire.
+
+Exemple :
+  python scripts/bench_capacity.py --employees 80 --absences 400 --days 365
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bench_common import report, wall_ms
+
+
+def synthetic(employees: int, absences: int, progressive: int, seed: int = 15):
+    rng = random.Random(seed)
+    staff = [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            hours_per_weekday={"1": 10, "2": 8, "3": 8, "4": 8, "5": 7} if rng.random() < 0.7 else None,
+            daily_capacity=7.6,
+            hours_valid_from=date(2026, 3, 1) if rng.random() < 0.1 else None,
+            hours_valid_until=date(2026, 9, 30) if rng.random() < 0.1 else None,
+        )
+        for _ in range(employees)
+    ]
+    ramps = []
+    for _ in range(progressive):
+        start = date(2026, 1, 1) + timedelta(days=rng.randrange(330))
+        ramps.append(SimpleNamespace(
+            employee_id=rng.choice(staff).id, start_date=start, end_date=start + timedelta(days=30),
+            hours_per_weekday={str(w): 3 for w in range(1, 6)},
+        ))
+    origin = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    leaves = []
+    for _ in range(absences):
+        start = origin + timedelta(days=rng.randrange(360))
+        leaves.append(SimpleNamespace(
+            employee_id=rng.choice(staff).id, start_date=start, end_date=start + timedelta(days=rng.randrange(1, 10)),
+        ))
+    closures = [SimpleNamespace(start_date=date(2026, 12, 21), end_date=date(2027, 1, 3))]
+    return staff, ramps, leaves, closures
+
+
+def legacy_capacity(staff, ramps, leaves, closures, first: date, last: date) -> dict:
+    """Boucle d'origine de range-stats (hors interventions)."""
+    from app.routers.planning import _get_employee_hours_for_day
+
+    closed = set()
+    for c in closures:
+        d = c.start_date
+        while d <= c.end_date:
+            closed.add(d)
+            d += timedelta(days=1)
+
+    def is_absent(emp_id, d: date) -> bool:
+        for ab in leaves:
+            if ab.employee_id == emp_id and ab.start_date.date() <= d <= ab.end_date.date():
+                return True
+        return False
+
+    result = {}
+    d = first
+    while d <= last:
+        total, present = 0.0, 0
+        if d not in closed:
+            for emp in staff:
+                if not is_absent(emp.id, d):
+                    h = _get_employee_hours_for_day(emp, d, ramps)
+                    total += h
+                    present += h > 0
+        result[d] = (total, present)
+        d += timedelta(days=1)
+    return result
+
+
+def matrix_capacity(staff, ramps, leaves, closures, first: date, last: date) -> dict:
+    from app.services.capacity import CapacityMatrix
+
+    capacity = CapacityMatrix(staff, first, last, ramps, leaves, closures)
+    return {d: capacity.day_capacity(d) for d in capacity.days()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=80)
+    parser.add_argument("--absences", type=int, default=400)
+    parser.add_argument("--progressive", type=int, default=40)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    staff, ramps, leaves, closures = synthetic(args.employees, args.absences, args.progressive)
+    first = date(2026, 1, 1)
+    last = first + timedelta(days=args.days - 1)
+
+    before = wall_ms(lambda: legacy_capacity(staff, ramps, leaves, closures, first, last), repeat=3)
+    after = wall_ms(lambda: matrix_capacity(staff, ramps, leaves, closures, first, last))
+    report(f"capacite {args.employees} employes x {args.days} jours", before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Outils partages par les scripts bench_*.py.
+
+Les benchmarks inserent des donnees synthetiques dans une transaction
+annulee a la fin : la base n'est jamais modifiee. Elle doit malgre tout etre
+locale (meme garde-fou que import_tours_word.py) et a jour des migrations.
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+from urllib.parse import urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+LOCAL_HOSTS = {"", "localhost", "127.0.0.1", "::1", "db"}  # "" = socket unix
+
+
+def _ensure_local() -> None:
+    from app.core.config import settings
+
+    host = (urlparse(settings.DATABASE_URL).hostname or "").lower()
+    if host not in LOCAL_HOSTS:
+        raise RuntimeError(f"Benchmark refuse: la base '{host}' n'est pas locale.")
+
+
+def local_session():
+    from app.models.models import SessionLocal
+
+    _ensure_local()
+    return SessionLocal()
+
+
+def local_connection():
+    """Connexion brute, pour les benchmarks qui appellent un endpoint qui
+    commite : une Session liee a cette connexion avec
+    join_transaction_mode="create_savepoint" ne commite qu'un savepoint."""
+    from app.models.models import engine
+
+    _ensure_local()
+    return engine.connect()
+
+
+def explain_ms(db, statement, repeat: int = 7) -> float:
+    """Temps d'execution serveur (EXPLAIN ANALYZE), mediane de `repeat` passes,
+    sans le transfert reseau ni la construction des objets ORM."""
+    connection = db.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    samples = []
+    for _ in range(repeat):
+        plan = connection.exec_driver_sql(f"EXPLAIN (ANALYZE, FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        samples.append(plan[0]["Execution Time"])
+    return statistics.median(samples)
+
+
+def wall_ms(fn: Callable[[], object], repeat: int = 5) -> float:
+    """Temps mur median d'un appel Python (ORM compris)."""
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def report(label: str, before_ms: float, after_ms: float) -> None:
+    ratio = before_ms / after_ms if after_ms else float("inf")
+    print(f"{label:<44} avant {before_ms:9.2f} ms   apres {after_ms:9.2f} ms   x{ratio:5.1f}")
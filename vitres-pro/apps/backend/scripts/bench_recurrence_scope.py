@@ -0,0 +1,127 @@
+"""Benchmark : PATCH /api/interventions/{id}/recurrence-scope sur une longue serie.
+
+Insere une serie hebdomadaire de 500 occurrences (3 prestations, 2 employes
+chacune) dans une transaction annulee a la fin, puis compare l'ancienne
+propagation (boucle ORM par occurrence, reproduite ci-dessous) a la
+propagation ensembliste de l'endpoint, pour une modification typique :
+titre + employes + prestations sur toute la serie.
+
+Exemple (base locale, migrations 023+ appliquees) :
+  python scripts/bench_recurrence_scope.py --occurrences 500
+"""
+from __future__ import annotations
+
+import argparse
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bench_common import local_connection, report, wall_ms
+
+
+SEED_SQL = """
+INSERT INTO employees (id, email, full_name, role, zone)
+SELECT gen_random_uuid(), 'bench-recurrence-' || n || '@example.invalid', 'Bench ' || n, 'employee', 'hainaut'
+FROM generate_series(1, 4) AS n;
+
+INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode,
+                           time_tbd, zone, recurrence_group_id, recurrence_rule)
+SELECT gen_random_uuid(), 'intervention', 'Serie bench',
+       :origin + (n * INTERVAL '7 days'), :origin + (n * INTERVAL '7 days') + INTERVAL '1 hour',
+       'planned', 'cash', FALSE, 'hainaut', :group_id,
+       jsonb_build_object('freq', 'weekly', 'interval', 1, 'count', :occurrences)
+FROM generate_series(1, :occurrences) AS n;
+
+INSERT INTO intervention_items (id, intervention_id, label, price)
+SELECT gen_random_uuid(), i.id, label, 25
+FROM interventions i, unnest(ARRAY['RDC', 'Etage', 'Velux']) AS label
+WHERE i.recurrence_group_id = :group_id;
+
+INSERT INTO intervention_employees (intervention_id, employee_id)
+SELECT i.id, e.id
+FROM interventions i
+JOIN (SELECT id FROM employees WHERE email LIKE 'bench-recurrence-%' ORDER BY email LIMIT 2) e ON TRUE
+WHERE i.recurrence_group_id = :group_id;
+"""
+
+
+def legacy_update(db, anchor, fields) -> int:
+    """Propagation d'origine : une requete Employee, un DELETE et N INSERT par occurrence."""
+    from app.models.models import Employee, Intervention, InterventionItem
+
+    targets = db.query(Intervention).filter(Intervention.recurrence_group_id == anchor.recurrence_group_id).all()
+    for target in targets:
+        for key, value in fields.items():
+            if key == "employee_ids":
+                target.employees = db.query(Employee).filter(Employee.id.in_(value)).all()
+            elif key == "items":
+                db.query(InterventionItem).filter(InterventionItem.intervention_id == target.id).delete()
+                for item_data in value:
+                    db.add(InterventionItem(
+                        intervention_id=target.id,
+                        label=item_data["label"],
+                        price=item_data["price"],
+                        on_demand=item_data.get("on_demand", False),
+                    ))
+            elif hasattr(target, key):
+                setattr(target, key, value)
+    return len(targets)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--occurrences", type=int, default=500)
+    args = parser.parse_args()
+
+    from sqlalchemy import select, text
+    from sqlalchemy.orm import Session
+    from app.models.models import Employee, Intervention
+    from app.routers.interventions import RecurrenceScopeBody, update_intervention_recurrence_scope
+
+    connection = local_connection()
+    outer = connection.begin()
+    group_id = uuid.uuid4()
+    origin = datetime.now(timezone.utc) - timedelta(days=7 * args.occurrences // 2)
+    try:
+        for statement in SEED_SQL.split(";\n"):
+            if statement.strip():
+                connection.execute(text(statement), {"origin": origin, "occurrences": args.occurrences, "group_id": group_id})
+        anchor_id = connection.execute(
+            select(Intervention.id).where(Intervention.recurrence_group_id == group_id).order_by(Intervention.start_time)
+        ).scalars().first()
+        employee_ids = connection.execute(
+            select(Employee.id).where(Employee.email.like("bench-recurrence-%")).order_by(Employee.email.desc()).limit(2)
+        ).scalars().all()
+        fields = {
+            "title": "Serie bench (modifiee)",
+            "employee_ids": [str(e) for e in employee_ids],
+            "items": [{"label": label, "price": 30} for label in ("RDC", "Etage", "Velux", "Vitrine")],
+        }
+        # L'auteur de l'entree d'audit doit exister (cle etrangere).
+        admin = SimpleNamespace(id=employee_ids[-1], role="admin", zone="hainaut")
+        body = RecurrenceScopeBody(scope="all", fields=fields)
+        print(f"Serie de {args.occurrences} occurrences inseree (transaction annulee a la fin)\n")
+
+        def run(fn):
+            # Chaque passe repart de la meme serie : savepoint annule apres coup,
+            # le commit de l'endpoint ne libere que le savepoint de la Session.
+            def once():
+                savepoint = connection.begin_nested()
+                try:
+                    with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+                        fn(db)
+                        db.commit()
+                finally:
+                    savepoint.rollback()
+            return once
+
+        before = wall_ms(run(lambda db: legacy_update(db, db.get(Intervention, anchor_id), fields)), repeat=3)
+        after = wall_ms(run(lambda db: update_intervention_recurrence_scope(anchor_id, body, db, admin)), repeat=3)
+        report(f"serie de {args.occurrences} (titre + employes + items)", before, after)
+    finally:
+        outer.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark : POST /api/interventions/recurring-bulk sur une longue serie.
+
+Cree une serie de 2 000 occurrences (5 prestations, 2 employes chacune) dans
+une transaction annulee a la fin, et compare l'ancienne creation (un objet
+ORM par occurrence, reproduite ci-dessous) a l'insertion en masse de
+l'endpoint, idempotence (record_operation) comprise.
+
+Exemple (base locale, migrations 023+ appliquees) :
+  python scripts/bench_recurring_bulk.py --occurrences 2000
+"""
+from __future__ import annotations
+
+import argparse
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bench_common import local_connection, report, wall_ms
+
+
+SEED_SQL = """
+INSERT INTO employees (id, email, full_name, role, zone)
+SELECT gen_random_uuid(), 'bench-bulk-' || n || '@example.invalid', 'Bench ' || n, 'employee', 'hainaut'
+FROM generate_series(1, 2) AS n
+"""
+
+
+def legacy_create(db, payload) -> int:
+    """Creation d'origine : le unit of work insere ligne par ligne."""
+    from app.models.models import Employee, Intervention, InterventionItem
+
+    employees = db.query(Employee).filter(Employee.id.in_(payload.employee_ids)).all()
+    recurrence_group_id = uuid.uuid4()
+    for occ in payload.occurrences:
+        intervention = Intervention(
+            id=uuid.uuid4(), type=payload.type, title=payload.title,
+            start_time=occ.start_time, end_time=occ.end_time, status=payload.status,
+            price_estimated=payload.price_estimated, payment_mode=payload.payment_mode,
+            zone=payload.zone, time_tbd=payload.time_tbd,
+            recurrence_rule=payload.recurrence_rule, recurrence_group_id=recurrence_group_id,
+        )
+        intervention.employees = employees
+        for item_data in payload.items:
+            intervention.items.append(InterventionItem(
+                label=item_data.label, price=item_data.price, on_demand=item_data.on_demand,
+            ))
+        db.add(intervention)
+    return len(payload.occurrences)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--occurrences", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    from sqlalchemy import select, text
+    from sqlalchemy.orm import Session
+    from app.models.models import Employee
+    from app.routers.interventions import create_recurring_bulk
+    from app.schemas.schemas import InterventionRecurringCreate
+
+    connection = local_connection()
+    outer = connection.begin()
+    try:
+        connection.execute(text(SEED_SQL))
+        employee_ids = connection.execute(
+            select(Employee.id).where(Employee.email.like("bench-bulk-%"))
+        ).scalars().all()
+        start = datetime.now(timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0)
+        occurrences = [
+            {"start_time": start + timedelta(days=day), "end_time": start + timedelta(days=day, hours=1)}
+            for day in range(args.occurrences)
+        ]
+        # L'auteur de l'entree d'audit doit exister (cle etrangere).
+        admin = SimpleNamespace(id=employee_ids[0], role="admin", zone="hainaut")
+        print(f"{args.occurrences} occurrences x {args.items} prestations x {len(employee_ids)} employes "
+              "(transaction annulee a la fin)\n")
+
+        def payload():
+            # Nouvel id d'operation a chaque passe : sinon l'idempotence court-circuite.
+            return InterventionRecurringCreate(
+                title="Serie bench", price_estimated=100, zone="hainaut",
+                employee_ids=employee_ids,
+                items=[{"label": f"Prestation {n}", "price": 20} for n in range(args.items)],
+                recurrence_rule={"freq": "daily", "interval": 1},
+                occurrences=occurrences,
+                client_operation_id=uuid.uuid4(),
+            )
+
+        def run(fn):
+            # Chaque passe est annulee : le commit de l'endpoint ne libere que
+            # le savepoint de la Session.
+            def once():
+                savepoint = connection.begin_nested()
+                try:
+                    with Session(bind=connection, join_transaction_mode="create_savepoint") as db:
+                        fn(db)
+                        db.commit()
+                finally:
+                    savepoint.rollback()
+            return once
+
+        before = wall_ms(run(lambda db: legacy_create(db, payload())), repeat=3)
+        after = wall_ms(run(lambda db: create_recurring_bulk(payload(), db, admin)), repeat=3)
+        report(f"serie de {args.occurrences} occurrences", before, after)
+    finally:
+        outer.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark : latence de GET /api/interventions/search sur un historique de plusieurs annees.
+
+Insere des clients et des interventions synthetiques (noms, villes accentuees,
+telephones) dans une transaction annulee a la fin, puis mesure la requete de
+recherche complete (ORM et chargement des relations compris) pour des saisies
+typiques. Objectif : moins de 50 ms par frappe.
+
+Exemple (base locale, migrations 026+ appliquees, pg_trgm disponible) :
+  python scripts/bench_search.py --rows 100000 --clients 20000
+"""
+from __future__ import annotations
+
+import argparse
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from bench_common import explain_ms, local_session, wall_ms
+
+
+SEED_SQL = """
+INSERT INTO clients (id, name, city, address, phone)
+SELECT gen_random_uuid(),
+       (ARRAY['Boulangerie', 'Pharmacie', 'Cabinet', 'Garage', 'Librairie'])[1 + n % 5] || ' ' ||
+       (ARRAY['Dupont', 'Lefèvre', 'Gérard', 'Hanotiau', 'Noël', 'Vandenbroucke'])[1 + n % 6] || ' ' || n,
+       (ARRAY['Écaussinnes', 'Soignies', 'Enghien', 'Neufchâteau', 'Bièvre', 'Saint-Hubert'])[1 + n % 6],
+       n || ' rue de la Gare',
+       '+32 47' || lpad((n % 10)::text, 1, '0') || ' ' || lpad(n::text, 6, '0')
+FROM generate_series(1, :clients) AS n;
+
+INSERT INTO interventions (id, type, title, description, start_time, end_time, status,
+                           payment_mode, time_tbd, zone, client_id)
+SELECT gen_random_uuid(), 'intervention',
+       'Vitres ' || c.name, 'Acces par l''arriere, tel. 0498 ' || lpad(n::text, 6, '0'),
+       :origin + n * (INTERVAL '1460 days' / :rows), :origin + n * (INTERVAL '1460 days' / :rows),
+       'done', 'cash', FALSE, 'hainaut',
+       CASE WHEN n % 4 = 0 THEN NULL ELSE c.id END
+FROM generate_series(1, :rows) AS n
+JOIN (SELECT id, name, row_number() OVER (ORDER BY id) AS rn FROM clients) c
+  ON c.rn = 1 + n % :clients;
+"""
+
+QUERIES = ["ecaussinnes", "Lefevre 12", "neufchâteau", "0470 000123", "0498 004242", "pharmacie noël"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=20_000)
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+    from app.routers.interventions import _search_query
+
+    db = local_session()
+    origin = datetime.now(timezone.utc) - timedelta(days=1460)
+    admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone="hainaut")
+    try:
+        for statement in SEED_SQL.split(";\n"):
+            if statement.strip():
+                db.execute(text(statement), {"origin": origin, "rows": args.rows, "clients": args.clients})
+        db.execute(text("ANALYZE clients"))
+        db.execute(text("ANALYZE interventions"))
+        print(f"{args.clients} clients, {args.rows} interventions (transaction annulee a la fin)\n")
+        for q in QUERIES:
+            query = _search_query(db, admin, q).limit(200)
+            hits = len(query.all())
+            sql_ms = explain_ms(db, query.statement)
+            total_ms = wall_ms(query.all)
+            print(f"{q!r:<20} {hits:4d} resultats   SQL {sql_ms:8.2f} ms   total {total_ms:8.2f} ms")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark : filtre brouillons de tournee par EXISTS vs colonne tour_visibility.
+
+Insere 100 000 interventions synthetiques sur deux ans (dont 3% de tournees,
+moitie brouillons) dans une transaction annulee a la fin, puis compare les
+deux formes du filtre sur les lectures calendrier (mois admin, mois
+sous-traitant, annee des stats de plage).
+
+Exemple (base locale, migrations 023+ appliquees) :
+  python scripts/bench_tour_visibility.py --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from bench_common import explain_ms, local_session, report
+
+
+SEED_SQL = """
+INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode,
+                           time_tbd, zone, tour_visibility)
+SELECT gen_random_uuid(),
+       CASE WHEN n % 33 = 0 THEN 'tournee' ELSE 'intervention' END,
+       'Bench ' || n,
+       ts, ts + INTERVAL '1 hour', 'planned', 'cash', FALSE,
+       CASE WHEN n % 2 = 0 THEN 'hainaut' ELSE 'ardennes' END,
+       CASE WHEN n % 33 <> 0 THEN 'none' WHEN n % 66 = 0 THEN 'draft' ELSE 'published' END
+FROM (
+  SELECT n, :origin + (n * INTERVAL '1 minute' * (730.0 * 1440 / :rows)) AS ts
+  FROM generate_series(1, :rows) AS n
+) s;
+
+INSERT INTO tour_runs (id, intervention_id, scheduled_date, publication_status, created_at, updated_at)
+SELECT gen_random_uuid(), id, start_time::date, tour_visibility, NOW(), NOW()
+FROM interventions
+WHERE title LIKE 'Bench %' AND tour_visibility <> 'none';
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    from sqlalchemy import select, text
+    from app.models.models import Intervention, TourRun
+
+    db = local_session()
+    origin = datetime.now(timezone.utc) - timedelta(days=365)
+    try:
+        for statement in SEED_SQL.split(";"):
+            if statement.strip():
+                db.execute(text(statement), {"origin": origin, "rows": args.rows})
+        db.execute(text("ANALYZE interventions"))
+        db.execute(text("ANALYZE tour_runs"))
+        print(f"{args.rows} interventions synthetiques inserees (transaction annulee a la fin)\n")
+
+        month_start = datetime.now(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        windows = [
+            ("mois (liste admin)", month_start, month_start + timedelta(days=31), False),
+            ("mois (liste sous-traitant)", month_start, month_start + timedelta(days=31), True),
+            ("annee (stats de plage)", month_start - timedelta(days=365), month_start, False),
+        ]
+        for label, start, end, subcontractor in windows:
+            in_range = (Intervention.start_time >= start, Intervention.start_time < end)
+
+            before = select(Intervention.id).where(
+                *in_range,
+                ~Intervention.tour_run.has() | Intervention.tour_run.has(TourRun.publication_status == "published"),
+            )
+            after = select(Intervention.id).where(*in_range, Intervention.tour_visibility != "draft")
+            if subcontractor:
+                before = before.where(~Intervention.tour_run.has())
+                after = after.where(Intervention.tour_visibility == "none")
+            report(label, explain_ms(db, before), explain_ms(db, after))
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
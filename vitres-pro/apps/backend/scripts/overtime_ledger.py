@@ -0,0 +1,127 @@
+"""Maintenance du registre des heures hebdomadaires (weekly_hours_ledger, migration 033).
+
+  rebuild : recalcule et reecrit toutes les semaines terminees de la plage,
+            pour chaque employe / sous-traitant (ou --employee), en une passe.
+  check   : compare chaque ligne consideree a jour (version et profil
+            courants) au calcul direct ; code de sortie 1 si une ligne
+            differe, c'est-a-dire si un trigger a manque une ecriture.
+
+Sans --start, la plage commence a la semaine du premier pointage. Les lignes
+perimees ne sont pas une erreur : le solde les recalcule a chaque lecture,
+et refresh_ledger_job (main.py) les reenregistre.
+
+Exemples :
+  python scripts/overtime_ledger.py rebuild
+  python scripts/overtime_ledger.py check --start 2026-01-05 --employee 3f0c...
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Ecart tolere entre ligne enregistree et calcul direct (sommes de flottants).
+EPSILON = 1e-6
+
+
+def _scope(db, start: date | None, employee: str | None):
+    """(employes, {employee_id: premier lundi}, dernier dimanche termine)."""
+    from sqlalchemy import func
+
+    from app.models.models import Employee, EmployeeTimeEntry
+    from app.routers.timetracking import _today_brussels, _week_bounds
+
+    query = db.query(Employee)
+    if employee:
+        query = query.filter(Employee.id == employee)
+    else:
+        query = query.filter(Employee.role.in_(["employee", "subcontractor"]))
+    employees = query.all()
+
+    current_week_start, _ = _week_bounds(_today_brussels())
+    last_day = current_week_start - timedelta(days=1)
+    first_work_dates = dict(
+        db.query(EmployeeTimeEntry.employee_id, func.min(EmployeeTimeEntry.work_date))
+        .filter(EmployeeTimeEntry.employee_id.in_([emp.id for emp in employees]))
+        .group_by(EmployeeTimeEntry.employee_id)
+        .all()
+    )
+    first_weeks = {}
+    for emp in employees:
+        first = start or first_work_dates.get(emp.id)
+        if first and first <= last_day:
+            first_weeks[emp.id] = _week_bounds(first)[0]
+    return [emp for emp in employees if emp.id in first_weeks], first_weeks, last_day
+
+
+def rebuild(db, start: date | None, employee: str | None) -> int:
+    from app.routers.timetracking import _weekly_hours
+
+    employees, first_weeks, last_day = _scope(db, start, employee)
+    hours = _weekly_hours(db, employees, first_weeks, last_day, store=True, rebuild=True)
+    db.commit()
+    for emp in employees:
+        print(f"rebuild {emp.full_name or emp.id} : {len(hours[emp.id])} semaines")
+    return 0
+
+
+def check(db, start: date | None, employee: str | None) -> int:
+    from app.models.models import WeeklyHoursLedger, WeeklyHoursVersion
+    from app.routers.timetracking import _hours_profile, _load_timesheets, _weekly_actual_hours
+
+    employees, first_weeks, last_day = _scope(db, start, employee)
+    mismatches = stale = checked = 0
+    for emp in employees:
+        versions = dict(
+            db.query(WeeklyHoursVersion.week_start, WeeklyHoursVersion.version)
+            .filter(WeeklyHoursVersion.employee_id == emp.id)
+            .all()
+        )
+        rows = db.query(WeeklyHoursLedger).filter(
+            WeeklyHoursLedger.employee_id == emp.id,
+            WeeklyHoursLedger.week_start >= first_weeks[emp.id],
+            WeeklyHoursLedger.week_start <= last_day,
+        ).all()
+        profile = _hours_profile(emp)
+        current = [r for r in rows if r.version == versions.get(r.week_start, 0) and r.profile == profile]
+        stale += len(rows) - len(current)
+        if not current:
+            continue
+        # Calcul employe par employe, independant de _weekly_hours.
+        entries_by_employee, capacity = _load_timesheets(db, [emp], first_weeks[emp.id], last_day)
+        for row in current:
+            checked += 1
+            want = _weekly_actual_hours(
+                emp, row.week_start, row.week_start + timedelta(days=6), entries_by_employee[emp.id], capacity
+            )
+            if abs(row.actual_hours - want) > EPSILON:
+                mismatches += 1
+                print(f"ECART {emp.full_name or emp.id} semaine {row.week_start} : "
+                      f"enregistre {row.actual_hours} / attendu {want}")
+
+    print(f"{checked} semaines a jour verifiees, {stale} perimees, {mismatches} ecarts")
+    return 1 if mismatches else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("rebuild", "check"))
+    parser.add_argument("--start", type=date.fromisoformat)
+    parser.add_argument("--employee")
+    args = parser.parse_args()
+
+    from app.models.models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        command = rebuild if args.command == "rebuild" else check
+        sys.exit(command(db, args.start, args.employee))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
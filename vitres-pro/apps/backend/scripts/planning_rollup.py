@@ -0,0 +1,108 @@
+"""Maintenance des cumuls journaliers du planning (planning_day_stats, migration 030).
+
+  rebuild : recalcule et reecrit toutes les lignes de la plage, pour chaque
+            (zone, sous-zone) deja presente dans la table ou affichee par
+            GET /api/planning/matrix, en une passe.
+  check   : compare chaque ligne consideree a jour (versions egales) au calcul
+            direct ; code de sortie 1 si une ligne differe, c'est-a-dire si un
+            trigger a manque une ecriture.
+
+Les lignes perimees ne sont pas une erreur : les lectures les recalculent
+en memoire, et refresh_stats_job (planifie dans main.py) les reenregistre.
+
+Exemples :
+  python scripts/planning_rollup.py rebuild --start 2026-01-01 --end 2026-12-31
+  python scripts/planning_rollup.py check --start 2026-01-01 --end 2026-12-31 --zone hainaut
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Ecart tolere entre ligne enregistree et calcul direct (sommes de flottants).
+EPSILON = 1e-6
+
+
+def _keys(db, start: date, end: date, zone: str | None, sub_zone: str | None) -> list:
+    """Cles (zone, sous-zone) normalisees, "" = toutes."""
+    from app.routers.planning import _stats_keys
+
+    if zone or sub_zone:
+        return [(zone or "", sub_zone or "")]
+    return _stats_keys(db, start, end)
+
+
+def rebuild(db, start: date, end: date, zone: str | None, sub_zone: str | None) -> int:
+    from sqlalchemy import text
+    from app.routers.planning import planning_stats
+
+    # Verrou de refresh_stats_job, attendu : voir la migration 037.
+    db.execute(text("SELECT pg_advisory_xact_lock(837264023)"))
+    stats = planning_stats(db, start, end, _keys(db, start, end, zone, sub_zone), rebuild=True)
+    db.commit()
+    for (z, s), by_day in stats.items():
+        print(f"rebuild zone={z or '*'} sub_zone={s or '*'} : {len(by_day)} jours")
+    return 0
+
+
+def check(db, start: date, end: date, zone: str | None, sub_zone: str | None) -> int:
+    from app.models.models import PlanningDayStats
+    from app.routers.planning import _stats_versions, compute_range_stats
+
+    days = _stats_versions(db, start, end)
+    mismatches = stale = checked = 0
+    for z, s in _keys(db, start, end, zone, sub_zone):
+        rows = db.query(PlanningDayStats).filter(
+            PlanningDayStats.zone == z,
+            PlanningDayStats.sub_zone == s,
+            PlanningDayStats.day >= start,
+            PlanningDayStats.day <= end,
+        ).all()
+        current = [r for r in rows if r.day_version == days.get(r.day, 0)]
+        stale += len(rows) - len(current)
+        if not current:
+            continue
+        # Calcul cellule par cellule, independant de compute_matrix_stats.
+        expected = compute_range_stats(db, start, end, z or None, s or None)
+        for row in current:
+            checked += 1
+            want = expected[row.day]
+            got = {
+                "capacity_hours": row.capacity_hours,
+                "planned_hours": row.planned_hours,
+                "present_employees": row.present_employees,
+                "closed": row.closed,
+            }
+            if any(abs(float(got[k]) - float(want[k])) > EPSILON for k in want):
+                mismatches += 1
+                print(f"ECART zone={z or '*'} sub_zone={s or '*'} {row.day} : enregistre {got} / attendu {want}")
+
+    print(f"{checked} lignes a jour verifiees, {stale} perimees, {mismatches} ecarts")
+    return 1 if mismatches else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=("rebuild", "check"))
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--zone")
+    parser.add_argument("--sub-zone")
+    args = parser.parse_args()
+
+    from app.models.models import SessionLocal
+
+    db = SessionLocal()
+    try:
+        command = rebuild if args.command == "rebuild" else check
+        sys.exit(command(db, args.start, args.end, args.zone, args.sub_zone))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
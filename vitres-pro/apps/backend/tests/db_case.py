@@ -0,0 +1,74 @@
+"""Socle des tests sur base Postgres.
+
+Necessite une base Postgres locale a jour des migrations :
+  TEST_DATABASE_URL=postgresql://localhost/lvm_test python -m pytest tests/
+Sans TEST_DATABASE_URL, les classes qui heritent de DbTestCase sont ignorees.
+Les donnees sont inserees dans une transaction annulee en fin de test (ou de
+classe, pour les jeux couteux a generer).
+"""
+import os
+import unittest
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.routers.planning import BRUSSELS_TZ
+
+
+def at(d: date, hour: int) -> datetime:
+    """Heure pleine, heure belge, du jour d."""
+    return datetime(d.year, d.month, d.day, hour, tzinfo=BRUSSELS_TZ)
+
+
+class DbTestCase(unittest.TestCase):
+    # Le code teste commite (correct_entry, confirm_overtime_settlement...) :
+    # la session ne commite alors qu'un savepoint.
+    savepoint = False
+    # Une seule transaction pour toute la classe ; les donnees sont inserees
+    # une fois dans seed().
+    per_class = False
+
+    @classmethod
+    def setUpClass(cls):
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url:
+            raise unittest.SkipTest("TEST_DATABASE_URL non defini : base Postgres locale requise.")
+        cls.engine = create_engine(url)
+        if cls.per_class:
+            cls._begin(cls)
+            cls.seed()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.per_class:
+            cls._end(cls)
+        cls.engine.dispose()
+
+    @classmethod
+    def seed(cls):
+        pass
+
+    def setUp(self):
+        if not self.per_class:
+            self._begin(self)
+
+    def tearDown(self):
+        if not self.per_class:
+            self._end(self)
+
+    @staticmethod
+    def _begin(target):
+        target.connection = target.engine.connect()
+        target.transaction = target.connection.begin()
+        options = {"join_transaction_mode": "create_savepoint"} if target.savepoint else {}
+        target.db = Session(bind=target.connection, **options)
+
+    @staticmethod
+    def _end(target):
+        target.db.close()
+        target.transaction.rollback()
+        target.connection.close()
+
+    def _exec(self, sql, **params):
+        return self.connection.execute(text(sql), params)
@@ -0,0 +1,68 @@
+import random
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.routers.planning import BRUSSELS_TZ, _utc_bounds
+from app.services.capacity import AbsenceIndex
+
+
+def _overlaps(ab, d: date) -> bool:
+    """Regle de reference : chevauchement du jour calendaire belge."""
+    day_start, day_end = _utc_bounds(d)
+    return ab.start_date < day_end and ab.end_date >= day_start
+
+
+class AbsenceIndexTests(unittest.TestCase):
+    def test_matches_linear_overlap_rule(self):
+        rng = random.Random(14)
+        employees = [uuid.uuid4() for _ in range(5)]
+        origin = datetime(2026, 3, 1, tzinfo=timezone.utc)  # traverse le passage a l'heure d'ete
+        absences = []
+        for _ in range(60):
+            start = origin + timedelta(minutes=rng.randrange(0, 60 * 24 * 60, 30))
+            absences.append(SimpleNamespace(
+                employee_id=rng.choice(employees),
+                start_date=start,
+                end_date=start + timedelta(minutes=rng.randrange(0, 60 * 24 * 6, 30)),
+            ))
+        first, last = date(2026, 3, 5), date(2026, 4, 20)
+        index = AbsenceIndex(absences, first, last)
+
+        d = first
+        while d <= last:
+            for emp in employees:
+                expected = any(ab.employee_id == emp and _overlaps(ab, d) for ab in absences)
+                self.assertEqual(index.is_absent(emp, d), expected, (emp, d))
+            d += timedelta(days=1)
+
+    def test_brussels_midnight_boundaries(self):
+        emp = uuid.uuid4()
+        # Absence saisie du 2 au 3 mars, minuit heure belge (23:00 UTC la veille).
+        ab = SimpleNamespace(
+            employee_id=emp,
+            start_date=datetime(2026, 3, 2, tzinfo=BRUSSELS_TZ).astimezone(timezone.utc),
+            end_date=datetime(2026, 3, 3, 23, 59, tzinfo=BRUSSELS_TZ).astimezone(timezone.utc),
+        )
+        index = AbsenceIndex([ab], date(2026, 3, 1), date(2026, 3, 5))
+        self.assertEqual(
+            [d.day for d in (date(2026, 3, n) for n in range(1, 6)) if index.is_absent(emp, d)],
+            [2, 3],
+        )
+
+    def test_unknown_employee_and_out_of_window(self):
+        emp = uuid.uuid4()
+        ab = SimpleNamespace(
+            employee_id=emp,
+            start_date=datetime(2026, 1, 1, tzinfo=timezone.utc),
+            end_date=datetime(2026, 12, 31, tzinfo=timezone.utc),
+        )
+        index = AbsenceIndex([ab], date(2026, 6, 1), date(2026, 6, 7))
+        self.assertTrue(index.is_absent(emp, date(2026, 6, 3)))
+        self.assertFalse(index.is_absent(emp, date(2026, 6, 8)))
+        self.assertFalse(index.is_absent(uuid.uuid4(), date(2026, 6, 3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
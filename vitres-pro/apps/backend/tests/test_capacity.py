@@ -0,0 +1,92 @@
+import random
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.routers.planning import _get_employee_hours_for_day, _utc_bounds
+from app.services.capacity import CapacityMatrix
+
+
+def _random_employee(rng):
+    profile = None
+    if rng.random() < 0.7:
+        profile = {str(w): rng.choice([0, 4, 7.6, 8, 10]) for w in range(1, 8) if rng.random() < 0.8}
+    valid_from = valid_until = None
+    if rng.random() < 0.3:
+        valid_from = date(2026, 1, 1) + timedelta(days=rng.randrange(200))
+        valid_until = valid_from + timedelta(days=rng.randrange(120))
+    return SimpleNamespace(
+        id=uuid.uuid4(), hours_per_weekday=profile, daily_capacity=rng.choice([7.6, 8.0]),
+        hours_valid_from=valid_from if rng.random() < 0.8 else None,
+        hours_valid_until=valid_until,
+    )
+
+
+class CapacityMatrixTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(15)
+        self.first, self.last = date(2026, 1, 5), date(2026, 12, 31)
+        self.employees = [_random_employee(rng) for _ in range(25)]
+        self.progressive = []
+        for _ in range(30):
+            start = date(2025, 12, 1) + timedelta(days=rng.randrange(380))
+            self.progressive.append(SimpleNamespace(
+                employee_id=rng.choice(self.employees).id,
+                start_date=start, end_date=start + timedelta(days=rng.randrange(60)),
+                hours_per_weekday={str(w): rng.choice([2, 3, 5]) for w in range(1, 6)},
+            ))
+        origin = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.absences = []
+        for _ in range(80):
+            start = origin + timedelta(hours=rng.randrange(24 * 365))
+            self.absences.append(SimpleNamespace(
+                employee_id=rng.choice(self.employees).id,
+                start_date=start, end_date=start + timedelta(hours=rng.randrange(24 * 10)),
+            ))
+        self.closures = [SimpleNamespace(start_date=date(2025, 12, 22), end_date=date(2026, 1, 6))]
+        self.matrix = CapacityMatrix(
+            self.employees, self.first, self.last, self.progressive, self.absences, self.closures,
+        )
+
+    def _days(self):
+        d = self.first
+        while d <= self.last:
+            yield d
+            d += timedelta(days=1)
+
+    def test_hours_match_reference_rule(self):
+        for emp in self.employees:
+            for d in self._days():
+                self.assertEqual(
+                    self.matrix.hours(emp.id, d), _get_employee_hours_for_day(emp, d, self.progressive), (emp, d),
+                )
+
+    def test_day_capacity_skips_absent_and_closed_days(self):
+        for d in self._days():
+            if d <= date(2026, 1, 6):
+                self.assertTrue(self.matrix.is_closed(d))
+                self.assertEqual(self.matrix.day_capacity(d), (0.0, 0))
+                continue
+            day_start, day_end = _utc_bounds(d)
+            total, present = 0.0, 0
+            for emp in self.employees:
+                if any(
+                    ab.employee_id == emp.id and ab.start_date < day_end and ab.end_date >= day_start
+                    for ab in self.absences
+                ):
+                    continue
+                h = _get_employee_hours_for_day(emp, d, self.progressive)
+                total += h
+                present += h > 0
+            got_total, got_present = self.matrix.day_capacity(d)
+            self.assertAlmostEqual(got_total, total, places=6)
+            self.assertEqual(got_present, present)
+
+    def test_empty_range(self):
+        matrix = CapacityMatrix(self.employees, self.last, self.first)
+        self.assertEqual(list(matrix.days()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import asyncio
+import sqlite3
+import unittest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.db_pool import TimedQueuePool, pool_status, probe
+
+
+class _AsyncEngine:
+    """Moteur async factice : SELECT 1 repond apres `delay` secondes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(self.delay)
+        yield SimpleNamespace(execute=self._execute)
+
+    async def _execute(self, _statement):
+        return None
+
+
+class PoolStatusTests(unittest.TestCase):
+    def test_checkout_and_timeout_are_counted(self):
+        pool = TimedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.05)
+        engine = SimpleNamespace(pool=pool)
+
+        held = pool.connect()
+        status = pool_status(engine)
+        self.assertEqual((status["checked_out"], status["idle"], status["checkouts"]), (1, 0, 1))
+
+        with self.assertRaises(exc.TimeoutError):
+            pool.connect()
+        status = pool_status(engine)
+        self.assertEqual(status["timeouts"], 1)
+        self.assertGreaterEqual(status["wait_max_ms"], 50)
+
+        held.close()
+        status = pool_status(engine)
+        self.assertEqual((status["checked_out"], status["idle"]), (0, 1))
+        self.assertEqual(status["max_overflow"], settings.DB_MAX_OVERFLOW)
+
+    def test_null_pool(self):
+        pool = NullPool(lambda: sqlite3.connect(":memory:"))
+        self.assertEqual(pool_status(SimpleNamespace(pool=pool)), {"mode": "null"})
+
+
+class ProbeTests(unittest.TestCase):
+    def test_both_engines_answer(self):
+        sync_engine = create_engine("sqlite://", poolclass=NullPool)
+        self.assertEqual(asyncio.run(probe(sync_engine, _AsyncEngine())), {"sync": True, "async": True})
+
+    def test_each_engine_is_reported(self):
+        broken = create_engine("sqlite:////nonexistent/dir/db.sqlite", poolclass=NullPool)
+        self.assertEqual(asyncio.run(probe(broken, _AsyncEngine())), {"sync": False, "async": True})
+        sync_engine = create_engine("sqlite://", poolclass=NullPool)
+        result = asyncio.run(probe(sync_engine, _AsyncEngine(delay=1), timeout=0.05))
+        self.assertEqual(result, {"sync": True, "async": False})
+
+
+if __name__ == "__main__":
+    unittest.main()
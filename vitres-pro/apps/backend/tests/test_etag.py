@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from fastapi import Response
+from starlette.requests import Request
+
+from app.core.etag import etag_for, not_modified
+from app.routers.clients import read_clients
+from app.routers.employees import read_employees
+from app.routers.interventions import read_interventions
+from app.routers.settings import list_hourly_rates, list_zones
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+class _Rows:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar(self):
+        return self.row[0]
+
+    def one(self):
+        return self.row
+
+    def mappings(self):
+        return self
+
+    def all(self):
+        return []
+
+    def __iter__(self):
+        return iter(())
+
+
+class _Query:
+    """Query ORM factice : toute methode chainee renvoie la query, all() une liste vide."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def all(self):
+        return []
+
+
+class FakeSession:
+    """Compte les requetes SQL (execute) et les chargements ORM (query)."""
+
+    def __init__(self, row):
+        self.row = row
+        self.executed = 0
+        self.orm_queries = 0
+
+    def execute(self, statement, *args, **kwargs):
+        self.executed += 1
+        return _Rows(self.row)
+
+    def query(self, *entities):
+        self.orm_queries += 1
+        return _Query()
+
+
+class FakeAsyncSession(FakeSession):
+    """AsyncSession factice : execute attendu, run_sync passe la session elle-meme."""
+
+    async def execute(self, statement, *args, **kwargs):
+        return super().execute(statement, *args, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self, *args, **kwargs)
+
+    async def close(self):
+        pass
+
+
+def _call(endpoint, **kwargs):
+    result = endpoint(**kwargs)
+    return asyncio.run(result) if asyncio.iscoroutine(result) else result
+
+
+class NotModifiedTests(unittest.TestCase):
+    def _assert_304_with_one_query(self, endpoint, row, session=FakeSession, **kwargs):
+        first = session(row)
+        response = Response()
+        _call(endpoint, request=_request(), response=response, db=first, **kwargs)
+        etag = response.headers["etag"]
+
+        second = session(row)
+        result = _call(endpoint, request=_request(etag), response=Response(), db=second, **kwargs)
+        self.assertEqual(result.status_code, 304)
+        self.assertEqual(result.headers["etag"], etag)
+        self.assertEqual(second.executed, 1)
+        self.assertEqual(second.orm_queries, 0)
+
+    def test_interventions(self):
+        user = SimpleNamespace(id=uuid.uuid4(), role="employee", zone="hainaut")
+        row = (12, datetime(2026, 3, 1, tzinfo=timezone.utc), None, 4, 9, 1, 3)
+        self._assert_304_with_one_query(
+            read_interventions, row, session=FakeAsyncSession, current_user=user,
+            start="2026-03-01T00:00:00Z", end="2026-04-01T00:00:00Z",
+        )
+
+    def test_clients(self):
+        self._assert_304_with_one_query(read_clients, (7,), current_user=SimpleNamespace(role="employee"))
+
+    def test_employees(self):
+        self._assert_304_with_one_query(read_employees, (5,), current_user=SimpleNamespace(role="employee"))
+
+    def test_zones(self):
+        self._assert_304_with_one_query(list_zones, (3,), current_user=SimpleNamespace(role="employee"))
+
+    def test_hourly_rates(self):
+        self._assert_304_with_one_query(list_hourly_rates, (2,), current_user=SimpleNamespace(role="admin"))
+
+    def test_new_version_is_served(self):
+        db = FakeSession((8,))
+        result = read_clients(
+            request=_request(etag_for("clients", 7)), response=Response(), db=db,
+            current_user=SimpleNamespace(role="employee"),
+        )
+        self.assertEqual(result, [])
+        self.assertEqual(db.orm_queries, 1)
+
+    def test_weak_comparison_and_wildcard(self):
+        etag = etag_for("v1")
+        self.assertIsNotNone(not_modified(_request(etag.removeprefix("W/")), Response(), etag))
+        self.assertIsNotNone(not_modified(_request(f'"other", {etag}'), Response(), etag))
+        self.assertIsNotNone(not_modified(_request("*"), Response(), etag))
+        self.assertIsNone(not_modified(_request('"other"'), Response(), etag))
+
+
+if __name__ == "__main__":
+    unittest.main()
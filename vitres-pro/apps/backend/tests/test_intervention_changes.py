@@ -0,0 +1,172 @@
+"""Delta-sync du calendrier mobile (GET /api/interventions/changes).
+
+Verifie le recouvrement du curseur, les suppressions (pierres tombales de la
+migration 023 pour l'admin) et le retrait des interventions supprimees ou
+devenues invisibles, limite a celles que l'utilisateur a pu voir (migration
+035), et les series sans fin modifiees (migration 036).
+"""
+import json
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.routers.interventions import SYNC_CURSOR_OVERLAP, read_intervention_changes
+
+from db_case import DbTestCase
+
+ZONE, OTHER_ZONE = "sync-a", "sync-b"
+
+
+class InterventionChangesTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = self._exec("SELECT now()").scalar()
+        self.a, self.b, self.c = (self._employee(ZONE) for _ in range(3))
+        self.admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone=ZONE)
+
+    def _employee(self, zone, role="employee"):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone) VALUES (:id, :email, 'Sync', :role, :zone)",
+            id=emp, email=f"sync-{emp}@example.invalid", role=role, zone=zone,
+        )
+        return SimpleNamespace(id=emp, role=role, zone=zone)
+
+    def _intervention(self, *assigned, zone=ZONE, updated_at=None):
+        intervention_id = uuid.uuid4()
+        start = datetime(2031, 3, 5, 9, tzinfo=timezone.utc)
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, time_tbd, zone, tour_visibility, updated_at) "
+            "VALUES (:id, 'intervention', 'Sync', :start, :end, 'planned', 'cash', 100, FALSE, :zone, 'none', "
+            "COALESCE(CAST(:updated_at AS TIMESTAMPTZ), now()))",
+            id=intervention_id, start=start, end=start + timedelta(hours=1), zone=zone, updated_at=updated_at,
+        )
+        for emp in assigned:
+            self._assign(intervention_id, emp)
+        return intervention_id
+
+    def _assign(self, intervention_id, emp):
+        self._exec(
+            "INSERT INTO intervention_employees (intervention_id, employee_id) VALUES (:iv, :emp)",
+            iv=intervention_id, emp=emp.id,
+        )
+
+    def _changes(self, user, since=None):
+        since = since or (self.now - SYNC_CURSOR_OVERLAP).isoformat()
+        result = read_intervention_changes(since=since, db=self.db, current_user=user)
+        return {iv.id for iv in result["changed"]}, set(result["deleted"])
+
+    def test_cursor_overlaps_writes_in_flight(self):
+        result = read_intervention_changes(since=None, db=self.db, current_user=self.a)
+        self.assertEqual(datetime.fromisoformat(result["cursor"]), self.now - SYNC_CURSOR_OVERLAP)
+        self.assertEqual((result["changed"], result["deleted"]), ([], []))
+
+        # Ecrite dans la minute qui precede le curseur (transaction commitee
+        # apres la lecture) : renvoyee au prochain appel. Plus ancienne : non.
+        recent = self._intervention(updated_at=self.now - timedelta(seconds=30))
+        old = self._intervention(updated_at=self.now - 2 * SYNC_CURSOR_OVERLAP)
+        changed, deleted = self._changes(self.admin, since=result["cursor"])
+        self.assertIn(recent, changed)
+        self.assertNotIn(old, changed | deleted)
+
+        # Un curseur sans fuseau est lu en UTC ; un curseur illisible est refuse.
+        naive = (self.now - SYNC_CURSOR_OVERLAP).astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+        self.assertIn(recent, self._changes(self.admin, since=naive)[0])
+        with self.assertRaises(HTTPException) as ctx:
+            read_intervention_changes(since="hier", db=self.db, current_user=self.a)
+        self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_deletions_reach_only_the_assigned(self):
+        mine, colleague = self._intervention(self.a), self._intervention(self.b)
+        unassigned, no_zone = self._intervention(), self._intervention(self.b, zone=None)
+        ids = {mine, colleague, unassigned, no_zone}
+        for intervention_id in ids:
+            # Comme l'ORM : les assignations d'abord (pas de cascade sur la FK).
+            self._exec("DELETE FROM intervention_employees WHERE intervention_id = :id", id=intervention_id)
+            self._exec("DELETE FROM interventions WHERE id = :id", id=intervention_id)
+
+        # Meme zone ou zone NULL : rien du planning d'un autre.
+        self.assertEqual(self._changes(self.a)[1], {mine})
+        self.assertEqual(self._changes(self.b)[1], {colleague, no_zone})
+        self.assertEqual(self._changes(self.c), (set(), set()))
+        self.assertEqual(self._changes(self.admin)[1] & ids, ids)
+
+    def test_revoked_only_among_interventions_the_user_could_see(self):
+        shared = self._intervention(self.a, self.b)
+        moved = self._intervention(self.a)
+        drafted = self._intervention(self.a)
+        untouched = self._intervention(self.b)
+
+        self._exec("DELETE FROM intervention_employees WHERE intervention_id = :iv AND employee_id = :emp",
+                   iv=shared, emp=self.a.id)
+        self._exec("UPDATE interventions SET zone = :zone WHERE id = :id", zone=OTHER_ZONE, id=moved)
+        self._exec("UPDATE interventions SET tour_visibility = 'draft' WHERE id = :id", id=drafted)
+
+        changed, deleted = self._changes(self.a)
+        self.assertEqual(changed & {shared, moved, drafted, untouched}, set())
+        self.assertEqual(deleted, {shared, moved, drafted})
+
+        # B voit toujours ses interventions ; C, jamais assigne, ne recoit
+        # aucun id du planning des autres.
+        changed, deleted = self._changes(self.b)
+        self.assertEqual(changed & {shared, untouched}, {shared, untouched})
+        self.assertEqual(deleted, set())
+        self.assertEqual(self._changes(self.c), (set(), set()))
+
+        # Reassigne : de nouveau visible, plus retire.
+        self._assign(shared, self.a)
+        changed, deleted = self._changes(self.a)
+        self.assertIn(shared, changed)
+        self.assertNotIn(shared, deleted)
+
+    def _series(self, *assigned):
+        series_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO recurring_series (id, rule, dtstart, duration_minutes, template, materialized_until) "
+            "VALUES (:id, '{\"freq\": \"weekly\", \"endType\": \"never\"}', :start, 60, "
+            "CAST(:template AS JSONB), :start)",
+            id=series_id, start=datetime(2031, 3, 5, 9, tzinfo=timezone.utc),
+            template=json.dumps({"zone": ZONE, "employee_ids": [str(emp.id) for emp in assigned]}),
+        )
+        return series_id
+
+    def _series_changes(self, user):
+        since = (self.now - SYNC_CURSOR_OVERLAP).isoformat()
+        return set(read_intervention_changes(since=since, db=self.db, current_user=user)["series"])
+
+    def test_series_changes_reach_their_employees(self):
+        mine, theirs = self._series(self.a), self._series(self.b)
+        self.assertEqual(self._series_changes(self.a), {mine})
+        self.assertEqual(self._series_changes(self.c), set())
+        self.assertEqual(self._series_changes(self.admin) & {mine, theirs}, {mine, theirs})
+
+        # Reassignee de A a C : les deux rechargent ; supprimee : B aussi.
+        self._exec(
+            "UPDATE recurring_series SET template = jsonb_set(template, '{employee_ids}', CAST(:ids AS JSONB)) "
+            "WHERE id = :id", id=mine, ids=json.dumps([str(self.c.id)]),
+        )
+        self._exec("DELETE FROM recurring_series WHERE id = :id", id=theirs)
+        self.assertEqual(self._series_changes(self.a), {mine})
+        self.assertEqual(self._series_changes(self.c), {mine})
+        self.assertEqual(self._series_changes(self.b), {theirs})
+
+        # L'horizon qui avance (materialize_series_job) n'est pas un changement.
+        self._exec("UPDATE recurring_series_changes SET changed_at = :old WHERE series_id = :id",
+                   id=mine, old=self.now - 2 * SYNC_CURSOR_OVERLAP)
+        self._exec("UPDATE recurring_series SET materialized_until = materialized_until + INTERVAL '7 days' "
+                   "WHERE id = :id", id=mine)
+        self.assertEqual(self._series_changes(self.c), set())
+
+    def test_admin_has_nothing_revoked(self):
+        drafted = self._intervention(self.a)
+        self._exec("UPDATE interventions SET tour_visibility = 'draft' WHERE id = :id", id=drafted)
+        changed, deleted = self._changes(self.admin)
+        self.assertNotIn(drafted, changed | deleted)
+
+
+if __name__ == "__main__":
+    unittest.main()
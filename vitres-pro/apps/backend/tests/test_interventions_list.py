@@ -0,0 +1,193 @@
+"""GET /api/interventions en selects Core : meme contenu que la liste ORM.
+
+Compare la reponse de la route (une requete Core par relation, serialisee
+hors de la boucle) a la serialisation InterventionOut des objets charges
+par _with_out_relations : client, taux horaire, employes, items, tournee et
+sa progression, renforts dans les deux sens. Verifie aussi que les prix
+restent masques pour un sous-traitant.
+"""
+import asyncio
+import json
+import unittest
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from starlette.requests import Request
+
+from app.models.models import Intervention
+from app.routers.interventions import _in_calendar_range, _parse_bound, _with_out_relations, read_interventions
+from app.schemas.schemas import InterventionOut
+
+from db_case import DbTestCase, at
+
+ZONE = "list-test"
+MONDAY = date(2031, 5, 5)
+
+
+class _AsyncSession:
+    """AsyncSession minimale sur la session du test : memes requetes, dans
+    la transaction annulee en fin de test."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def execute(self, statement):
+        return self.db.execute(statement)
+
+    async def run_sync(self, fn):
+        return fn(self.db)
+
+    async def close(self):
+        pass
+
+
+def _sorted(value):
+    """Listes d'objets triees par id : l'ordre des relations n'est pas fixe."""
+    if isinstance(value, dict):
+        return {key: _sorted(v) for key, v in value.items()}
+    if isinstance(value, list):
+        items = [_sorted(v) for v in value]
+        return sorted(items, key=lambda v: v["id"]) if items and isinstance(items[0], dict) else items
+    return value
+
+
+class InterventionListTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone=ZONE)
+        self.employee = self._employee("employee")
+        self.colleague = self._employee("employee")
+        self.subcontractor = self._employee("subcontractor")
+        self.client = uuid.uuid4()
+        self._exec(
+            "INSERT INTO clients (id, name, street, zip_code, city) VALUES (:id, 'Boulangerie', 'Rue Haute 1', '7000', 'Mons')",
+            id=self.client,
+        )
+        self.rate = uuid.uuid4()
+        self._exec("INSERT INTO hourly_rates (id, rate, label, time_only) VALUES (:id, 45, 'Standard', FALSE)", id=self.rate)
+
+        self.source = self._intervention(
+            9, [self.employee, self.colleague], client_id=self.client, hourly_rate_id=self.rate,
+            tour_visibility="published",
+        )
+        self._items(self.source, ("Vitres", 60), ("Chassis", 40))
+        run = uuid.uuid4()
+        self._exec(
+            "INSERT INTO tour_runs (id, intervention_id, scheduled_date, publication_status) "
+            "VALUES (:id, :iv, :day, 'published')",
+            id=run, iv=self.source, day=MONDAY,
+        )
+        for position, (selected, status) in enumerate(
+            ((True, "done"), (True, "pending"), (True, "pending"), (False, "done"))
+        ):
+            self._exec(
+                "INSERT INTO tour_run_stops (id, run_id, name, position, selected, status) "
+                "VALUES (:id, :run, 'Commerce', :position, :selected, :status)",
+                id=uuid.uuid4(), run=run, position=position, selected=selected, status=status,
+            )
+
+        # Deux renforts du sous-traitant (un a heure fixe), un du collegue a definir.
+        self.fixed = self._intervention(14, [self.subcontractor], reinforcement_for_id=self.source, time_tbd=False)
+        self.tbd = self._intervention(16, [self.subcontractor], reinforcement_for_id=self.source, time_tbd=True)
+        self.helper = self._intervention(13, [self.colleague], reinforcement_for_id=self.source, time_tbd=True)
+        self.own = self._intervention(11, [self.subcontractor], hourly_rate_id=self.rate)
+        self._items(self.own, ("Velux", 35))
+
+    def _employee(self, role):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone, color, weekly_hours, daily_capacity, hours_per_weekday) "
+            "VALUES (:id, :email, 'Liste', :role, :zone, '#10B981', 38, 7.6, '{\"1\": 8}')",
+            id=emp, email=f"list-{emp}@example.invalid", role=role, zone=ZONE,
+        )
+        return SimpleNamespace(id=emp, role=role, zone=ZONE)
+
+    def _intervention(self, hour, employees, tour_visibility="none", time_tbd=False, **columns):
+        iv = uuid.uuid4()
+        start = at(MONDAY, hour)
+        names = "".join(f", {name}" for name in columns)
+        values = "".join(f", :{name}" for name in columns)
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, is_invoice, "
+            f"price_estimated, zone, time_tbd, tour_visibility{names}) "
+            f"VALUES (:id, 'intervention', 'Liste', :start, :end, 'planned', 'cash', FALSE, 100, :zone, :tbd, :vis{values})",
+            id=iv, start=start, end=start + timedelta(hours=1), zone=ZONE, tbd=time_tbd, vis=tour_visibility,
+            **columns,
+        )
+        for emp in employees:
+            self._exec(
+                "INSERT INTO intervention_employees (intervention_id, employee_id) VALUES (:iv, :emp)",
+                iv=iv, emp=emp.id,
+            )
+        return iv
+
+    def _items(self, iv, *items):
+        for label, price in items:
+            self._exec(
+                "INSERT INTO intervention_items (id, intervention_id, label, price) VALUES (:id, :iv, :label, :price)",
+                id=uuid.uuid4(), iv=iv, label=label, price=price,
+            )
+
+    def _week(self):
+        return at(MONDAY, 0).isoformat(), at(MONDAY + timedelta(days=7), 0).isoformat()
+
+    def _list(self, user):
+        start, end = self._week()
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+        response = asyncio.run(read_interventions(
+            request=request, response=Response(), start=start, end=end,
+            db=_AsyncSession(self.db), current_user=user,
+        ))
+        self.assertIn("etag", response.headers)
+        return {iv["id"]: iv for iv in json.loads(response.body)}
+
+    def _orm(self, user):
+        start, end = map(_parse_bound, self._week())
+        query = _in_calendar_range(_with_out_relations(self.db.query(Intervention)), user, start, end)
+        adapter = TypeAdapter(List[InterventionOut])
+        dumped = adapter.dump_python(adapter.validate_python(query.all(), from_attributes=True), mode="json")
+        return {iv["id"]: iv for iv in dumped}
+
+    def test_same_content_as_the_orm_list(self):
+        for user in (self.admin, self.employee):
+            with self.subTest(role=user.role):
+                listed, expected = self._list(user), self._orm(user)
+                self.assertEqual(listed.keys(), expected.keys())
+                for iv_id in expected:
+                    self.assertEqual(_sorted(listed[iv_id]), _sorted(expected[iv_id]))
+
+    def test_relations(self):
+        source = self._list(self.admin)[str(self.source)]
+        self.assertEqual(source["client"]["city"], "Mons")
+        self.assertEqual(source["hourly_rate"]["rate"], 45)
+        self.assertEqual(sorted(item["label"] for item in source["items"]), ["Chassis", "Vitres"])
+        self.assertEqual(
+            source["tour_run"]["progress"], {"resolved": 1, "total": 3, "percent": 33},
+        )
+        self.assertEqual(source["tour_run"]["lifecycle_status"], "published")
+        arrivals = {e["id"]: e["reinforcement_start_time"] for e in source["reinforcement_employees"]}
+        self.assertEqual(arrivals.keys(), {str(self.subcontractor.id), str(self.colleague.id)})
+        self.assertIsNone(arrivals[str(self.colleague.id)])
+        self.assertIsNotNone(arrivals[str(self.subcontractor.id)])
+
+        fixed = self._list(self.subcontractor)[str(self.fixed)]
+        self.assertEqual(
+            sorted(e["id"] for e in fixed["reinforcement_for_employees"]),
+            sorted(str(e.id) for e in (self.employee, self.colleague)),
+        )
+
+    def test_prices_hidden_from_subcontractors(self):
+        listed = self._list(self.subcontractor)
+        self.assertEqual(listed.keys(), {str(self.own), str(self.fixed), str(self.tbd)})
+        for iv in listed.values():
+            self.assertIsNone(iv["price_estimated"])
+            self.assertIsNone(iv["hourly_rate"])
+        self.assertEqual([item["price"] for item in listed[str(self.own)]["items"]], [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
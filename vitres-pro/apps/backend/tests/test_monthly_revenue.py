@@ -0,0 +1,162 @@
+"""Chiffre d'affaires mensuel (monthly_revenue, migration 032).
+
+Apres chaque ecriture sur interventions, la table doit valoir l'agregation
+directe des interventions "done" ; /revenue la lit avec le detail demande.
+"""
+import random
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, text
+
+from app.routers.planning import get_revenue
+
+from db_case import DbTestCase
+
+ZONES = ("revenue-a", "revenue-b")
+ADMIN = SimpleNamespace(role="admin")
+
+DIRECT_SQL = """
+SELECT date_trunc('month', timezone('Europe/Brussels', start_time))::date AS month,
+       zone, payment_mode, closed_by_employee_id,
+       sum(COALESCE(price_estimated, 0)) AS total,
+       sum(CASE payment_mode WHEN 'cash' THEN COALESCE(price_estimated, 0)
+                             WHEN 'invoice_cash' THEN COALESCE(amount_cash, price_estimated, 0)
+                             ELSE 0 END) AS cash,
+       count(*) AS interventions
+FROM interventions
+WHERE status = 'done' AND zone IN :zones
+GROUP BY 1, 2, 3, 4
+"""
+
+ROLLUP_SQL = """
+SELECT month, zone, payment_mode, closed_by_employee_id, total_amount, cash_amount, interventions
+FROM monthly_revenue
+WHERE zone IN :zones AND interventions <> 0
+"""
+
+
+class MonthlyRevenueTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.employees = [uuid.uuid4() for _ in range(3)]
+        for emp in self.employees:
+            self._exec(
+                "INSERT INTO employees (id, email, full_name, role, zone) "
+                "VALUES (:id, :email, 'Revenue', 'employee', 'hainaut')",
+                id=emp, email=f"revenue-{emp}@example.invalid",
+            )
+        self.ids = []
+
+    def _insert(self, start, status="done", mode="cash", price=100, amount_cash=None, zone=ZONES[0], closed_by=None):
+        intervention_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, amount_cash, time_tbd, zone, tour_visibility, closed_by_employee_id) "
+            "VALUES (:id, 'intervention', 'CA', :start, :end, :status, :mode, :price, :cash, FALSE, "
+            ":zone, 'none', :closed_by)",
+            id=intervention_id, start=start, end=start + timedelta(hours=1), status=status, mode=mode,
+            price=price, cash=amount_cash, zone=zone, closed_by=closed_by,
+        )
+        self.ids.append(intervention_id)
+        return intervention_id
+
+    def assertRollupMatches(self):
+        params = {"zones": ZONES}
+        direct = {tuple(r[:4]): tuple(r[4:]) for r in self._exec_expanding(DIRECT_SQL, params)}
+        rollup = {tuple(r[:4]): tuple(r[4:]) for r in self._exec_expanding(ROLLUP_SQL, params)}
+        self.assertEqual(rollup, direct)
+
+    def _exec_expanding(self, sql, params):
+        statement = text(sql).bindparams(bindparam("zones", expanding=True))
+        return self.connection.execute(statement, params).all()
+
+    def test_random_writes_keep_rollup_exact(self):
+        rng = random.Random(19)
+        origin = datetime(2031, 1, 1, tzinfo=timezone.utc)
+        for _ in range(120):
+            self._insert(
+                origin + timedelta(hours=rng.randrange(24 * 120)),
+                status=rng.choice(["planned", "done", "done", "cancelled"]),
+                mode=rng.choice(["cash", "invoice", "invoice_cash"]),
+                price=Decimal(rng.randrange(0, 50000)) / 100,
+                amount_cash=Decimal(rng.randrange(0, 20000)) / 100 if rng.random() < 0.5 else None,
+                zone=rng.choice(ZONES),
+                closed_by=rng.choice(self.employees + [None]),
+            )
+        self.assertRollupMatches()
+
+        for _ in range(60):
+            target = rng.choice(self.ids)
+            change = rng.randrange(5)
+            if change == 0:
+                self._exec("UPDATE interventions SET status = :s WHERE id = :id",
+                           s=rng.choice(["planned", "done"]), id=target)
+            elif change == 1:
+                self._exec("UPDATE interventions SET price_estimated = price_estimated + 10 WHERE id = :id", id=target)
+            elif change == 2:
+                self._exec("UPDATE interventions SET start_time = start_time + INTERVAL '20 days' WHERE id = :id", id=target)
+            elif change == 3:
+                self._exec("UPDATE interventions SET closed_by_employee_id = :e, payment_mode = 'invoice_cash' "
+                           "WHERE id = :id", e=rng.choice(self.employees), id=target)
+            else:
+                self._exec("DELETE FROM interventions WHERE id = :id", id=target)
+                self.ids.remove(target)
+        # UPDATE en masse et mise a NULL par la suppression d'un employe.
+        self._exec("UPDATE interventions SET zone = :b WHERE zone = :a AND status = 'done'", a=ZONES[0], b=ZONES[1])
+        self._exec("DELETE FROM employees WHERE id = :id", id=self.employees[0])
+        self.assertRollupMatches()
+
+    def test_brussels_month_boundary(self):
+        # 1er fevrier 00h30 a Bruxelles = 31 janvier 23h30 UTC.
+        self._insert(datetime(2031, 1, 31, 23, 30, tzinfo=timezone.utc), price=50)
+        rows = get_revenue(start="2031-01", end="2031-02", by="zone", db=self.db, current_user=ADMIN)
+        self.assertEqual([(r["month"], r["zone"], r["total"]) for r in rows], [("2031-02", ZONES[0], 50.0)])
+
+    def test_revenue_breakdowns(self):
+        march = datetime(2031, 3, 10, 9, tzinfo=timezone.utc)
+        emp = self.employees[1]
+        self._insert(march, mode="cash", price=100, closed_by=emp)
+        self._insert(march, mode="invoice", price=200, closed_by=emp)
+        self._insert(march, mode="invoice_cash", price=300, amount_cash=120, zone=ZONES[1])
+        self._insert(march, mode="invoice_cash", price=80, zone=ZONES[1])  # split inconnu : tout en cash
+        self._insert(march, status="planned", price=999)
+
+        total = get_revenue(start="2031-03", end="2031-03", db=self.db, current_user=ADMIN)
+        self.assertEqual(total, [{
+            "month": "2031-03", "total": 680.0, "cash": 300.0, "invoice": 380.0, "interventions": 4,
+        }])
+
+        by_mode = get_revenue(start="2031-03", end="2031-03", by="payment_mode", db=self.db, current_user=ADMIN)
+        self.assertEqual(
+            [(r["payment_mode"], r["cash"], r["invoice"]) for r in by_mode],
+            [("cash", 100.0, 0.0), ("invoice", 0.0, 200.0), ("invoice_cash", 200.0, 180.0)],
+        )
+
+        by_employee = get_revenue(start="2031-03", end="2031-03", by="employee,zone", db=self.db, current_user=ADMIN)
+        self.assertIn(
+            {"month": "2031-03", "employee_id": emp, "zone": ZONES[0],
+             "total": 300.0, "cash": 100.0, "invoice": 200.0, "interventions": 2},
+            by_employee,
+        )
+
+    def test_invalid_parameters(self):
+        for params in ({"by": "client"}, {"start": "2031-13"}, {"start": "2031-05", "end": "2031-04"},
+                       {"start": "2029-01", "end": "2031-01"}):
+            with self.subTest(params=params), self.assertRaises(HTTPException) as raised:
+                get_revenue(**{"start": None, "end": None, "by": "", **params}, db=self.db, current_user=ADMIN)
+            self.assertEqual(raised.exception.status_code, 400)
+
+    def test_reserved_to_admins(self):
+        for role in ("employee", "subcontractor"):
+            with self.subTest(role=role), self.assertRaises(HTTPException) as raised:
+                get_revenue(by="employee", db=self.db, current_user=SimpleNamespace(role=role))
+            self.assertEqual(raised.exception.status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
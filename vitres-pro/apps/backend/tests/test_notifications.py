@@ -0,0 +1,71 @@
+import unittest
+import uuid
+
+from app.services import notifications
+
+
+class _Scalars:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return iter(self.values)
+
+
+class _FakeSession:
+    """Session factice : enregistre les execute() ; renvoie les ids admins pour les SELECT."""
+
+    def __init__(self, admin_ids=()):
+        self.admin_ids = list(admin_ids)
+        self.calls = []
+
+    def execute(self, statement, params=None):
+        self.calls.append((statement, params))
+        return _Scalars(self.admin_ids)
+
+
+class NotifyTests(unittest.TestCase):
+    def setUp(self):
+        notifications.invalidate_admin_ids()
+
+    def tearDown(self):
+        notifications.invalidate_admin_ids()
+
+    def test_single_insert_with_deduplicated_recipients(self):
+        a, b = uuid.uuid4(), uuid.uuid4()
+        db = _FakeSession()
+        sent = notifications.notify(db, [a, b, a], "clock_in", "Pointage", "msg", {"k": 1})
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(db.calls), 1)
+        rows = db.calls[0][1]
+        self.assertEqual([row["recipient_id"] for row in rows], [a, b])
+        self.assertEqual(rows[0]["metadata_"], {"k": 1})
+
+    def test_no_recipient_no_statement(self):
+        db = _FakeSession()
+        self.assertEqual(notifications.notify(db, [], "clock_in", "Pointage", "msg"), 0)
+        self.assertEqual(db.calls, [])
+
+    def test_admin_ids_cached_until_invalidated(self):
+        admin = uuid.uuid4()
+        db = _FakeSession([admin])
+        self.assertEqual(notifications.admin_ids(db), (admin,))
+        self.assertEqual(notifications.admin_ids(db), (admin,))
+        self.assertEqual(len(db.calls), 1)
+
+        notifications.invalidate_admin_ids()
+        notifications.admin_ids(db)
+        self.assertEqual(len(db.calls), 2)
+
+    def test_notify_admins_reuses_cache(self):
+        admins = [uuid.uuid4(), uuid.uuid4()]
+        db = _FakeSession(admins)
+        notifications.notify_admins(db, "deferred_cash", "Paiement reporté", "msg")
+        notifications.notify_admins(db, "deferred_cash", "Paiement reporté", "msg")
+        # 1 SELECT des admins + 2 INSERT
+        self.assertEqual(len(db.calls), 3)
+        self.assertEqual(len(db.calls[-1][1]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""Registre des heures hebdomadaires (weekly_hours_ledger, migration 033).
+
+Compare le solde heures sup lu dans le registre au calcul a la volee
+(semaine par semaine depuis le dernier reglement), avant et apres chaque
+ecriture couverte par les triggers, lignes perimees puis reenregistrees par
+le job. Verifie aussi que la lecture du solde n'ecrit rien.
+"""
+import random
+import sys
+import unittest
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import text
+
+from app.models.models import Employee, WeeklyHoursLedger
+from app.routers.timetracking import (
+    _load_timesheets, _overtime_balances, _week_bounds, _weekly_actual_hours, correct_entry,
+    refresh_weekly_ledger, weekly_delta_hours,
+)
+from app.schemas.schemas import TimeEntryCorrectionIn
+
+from db_case import DbTestCase, at
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+import overtime_ledger  # noqa: E402
+
+TODAY = date(2031, 3, 12)
+CURRENT_MONDAY = date(2031, 3, 10)
+FIRST_MONDAY = date(2030, 12, 30)
+ADMIN = SimpleNamespace(role="admin")
+
+
+def _direct_balance(db, emp, include_current_week):
+    """Calcul a la volee : chaque semaine relue depuis le dernier reglement."""
+    current_week_start, current_week_end = _week_bounds(TODAY)
+    last = current_week_end if include_current_week else current_week_start - timedelta(days=1)
+    settlement = db.execute(text(
+        "SELECT period_end, carried_forward_hours FROM overtime_settlements "
+        "WHERE employee_id = :id ORDER BY period_end DESC LIMIT 1"
+    ), {"id": emp.id}).first()
+    if settlement:
+        period_start, total = settlement.period_end + timedelta(days=1), settlement.carried_forward_hours
+    else:
+        first = db.execute(text(
+            "SELECT min(work_date) FROM employee_time_entries WHERE employee_id = :id"
+        ), {"id": emp.id}).scalar()
+        period_start, total = _week_bounds(first or current_week_start)[0], 0.0
+    cursor = period_start
+    while cursor <= last:
+        w_start, w_end = _week_bounds(cursor)
+        w_end = min(w_end, last)
+        entries, capacity = _load_timesheets(db, [emp], w_start, w_end)
+        total += weekly_delta_hours(_weekly_actual_hours(emp, w_start, w_end, entries[emp.id], capacity))
+        cursor = w_end + timedelta(days=1)
+    return round(total, 2), period_start, last
+
+
+class OvertimeLedgerTests(DbTestCase):
+    # correct_entry() commite : seul un savepoint l'est ici.
+    savepoint = True
+
+    def setUp(self):
+        super().setUp()
+        today = mock.patch("app.routers.timetracking._today_brussels", return_value=TODAY)
+        today.start()
+        self.addCleanup(today.stop)
+
+        rng = random.Random(21)
+        self.ids = []
+        for n in range(5):
+            emp = uuid.uuid4()
+            self.ids.append(emp)
+            self._exec(
+                "INSERT INTO employees (id, email, full_name, role, zone, daily_capacity, hours_per_weekday) "
+                "VALUES (:id, :email, 'Registre', 'employee', 'hainaut', 7.6, :profile)",
+                id=emp, email=f"ledger-{emp}@example.invalid",
+                profile='{"1": 8, "2": 8, "3": 8, "4": 8, "5": 6}' if n % 2 else None,
+            )
+            for d in (FIRST_MONDAY + timedelta(days=i) for i in range(73)):
+                if d.isoweekday() <= 5 and rng.random() < 0.85:
+                    self._exec(
+                        "INSERT INTO employee_time_entries (id, employee_id, work_date, clock_in_at, clock_out_at) "
+                        "VALUES (gen_random_uuid(), :emp, :day, :start, :end)",
+                        emp=emp, day=d, start=at(d, 8), end=at(d, 8) + timedelta(minutes=rng.randrange(300, 600)),
+                    )
+        # Deux employes regles en cours de route, dont un avec reliquat.
+        for emp, period_end, carried in ((self.ids[0], date(2031, 1, 26), 2.25), (self.ids[1], date(2031, 2, 16), 0)):
+            self._exec(
+                "INSERT INTO overtime_settlements (id, employee_id, delta_hours, carried_forward_hours, "
+                "period_start, period_end) VALUES (gen_random_uuid(), :emp, 1, :carried, :start, :end)",
+                emp=emp, carried=carried, start=FIRST_MONDAY, end=period_end,
+            )
+
+    def _employees(self):
+        self.db.expire_all()
+        return self.db.query(Employee).filter(Employee.id.in_(self.ids)).all()
+
+    def assertMatchesDirect(self):
+        # Registre tel que laisse par la derniere ecriture, puis apres le job.
+        for refreshed in (False, True):
+            if refreshed:
+                refresh_weekly_ledger(self.db)
+            employees = self._employees()
+            for include_current_week in (False, True):
+                balances = _overtime_balances(self.db, employees, include_current_week)
+                for emp in employees:
+                    with self.subTest(employee=emp.id, include_current_week=include_current_week, refreshed=refreshed):
+                        self.assertEqual(balances[emp.id], _direct_balance(self.db, emp, include_current_week))
+        return _overtime_balances(self.db, employees)
+
+    def _ledger_rows(self):
+        return self._exec(
+            "SELECT count(*) FROM weekly_hours_ledger WHERE employee_id = ANY(:ids)", ids=self.ids,
+        ).scalar()
+
+    def _ledger(self, emp, week):
+        return self.db.query(WeeklyHoursLedger).filter(
+            WeeklyHoursLedger.employee_id == emp, WeeklyHoursLedger.week_start == week,
+        ).one_or_none()
+
+    def test_reading_the_balance_writes_nothing(self):
+        _overtime_balances(self.db, self._employees(), include_current_week=True)
+        self.assertEqual(self._ledger_rows(), 0)
+        refresh_weekly_ledger(self.db)
+        rows = self._ledger_rows()
+        self.assertGreater(rows, 0)
+
+        # Ligne perimee par une correction : recalculee a la lecture, pas reecrite.
+        emp, week = self.ids[3], date(2031, 2, 3)
+        version = self._ledger(emp, week).version
+        self._exec(
+            "UPDATE employee_time_entries SET clock_out_at = clock_out_at + INTERVAL '1 hour' "
+            "WHERE employee_id = :id AND work_date BETWEEN :start AND :end",
+            id=emp, start=week, end=week + timedelta(days=6),
+        )
+        _overtime_balances(self.db, self._employees())
+        self.assertEqual(self._ledger(emp, week).version, version)
+        refresh_weekly_ledger(self.db)
+        self.assertNotEqual(self._ledger(emp, week).version, version)
+        self.assertEqual(self._ledger_rows(), rows)
+
+    def test_ledger_holds_closed_weeks_only(self):
+        self.assertMatchesDirect()
+        weeks = self.db.query(WeeklyHoursLedger.week_start).filter(
+            WeeklyHoursLedger.employee_id == self.ids[2]
+        ).order_by(WeeklyHoursLedger.week_start).all()
+        self.assertEqual([w for (w,) in weeks], [FIRST_MONDAY + timedelta(weeks=i) for i in range(10)])
+        row = self._ledger(self.ids[2], FIRST_MONDAY)
+        self.assertEqual(row.delta_hours, weekly_delta_hours(row.actual_hours))
+        # Le solde ne relit plus que le registre : meme resultat.
+        self.assertEqual(_overtime_balances(self.db, self._employees()), self.assertMatchesDirect())
+
+    def test_writes_invalidate_their_weeks(self):
+        before = self.assertMatchesDirect()
+        emp, week = self.ids[3], date(2031, 2, 3)
+        version = self._ledger(emp, week).version
+
+        correct_entry(TimeEntryCorrectionIn(
+            employee_id=emp, work_date=week + timedelta(days=5),
+            clock_in_at=at(week, 6), clock_out_at=at(week, 18),
+        ), db=self.db, current_user=ADMIN)
+        after = self.assertMatchesDirect()
+        self.assertEqual(after[emp][0], round(before[emp][0] + 12, 2))
+        self.assertNotEqual(self._ledger(emp, week).version, version)
+
+        self._exec(
+            "INSERT INTO absences (id, employee_id, start_date, end_date, type) "
+            "VALUES (gen_random_uuid(), :emp, :start, :end, 'sick')",
+            emp=self.ids[4], start=at(date(2031, 1, 20), 0), end=at(date(2031, 1, 31), 23),
+        )
+        self.assertMatchesDirect()
+
+        self._exec(
+            "INSERT INTO progressive_hours (id, employee_id, start_date, end_date, hours_per_weekday) "
+            "VALUES (gen_random_uuid(), :emp, '2031-01-22', '2031-01-29', '{\"3\": 2, \"4\": 3}')",
+            emp=self.ids[4],
+        )
+        self.assertMatchesDirect()
+
+        # Profil horaire : pas de trigger, la ligne porte le profil de son calcul.
+        self._exec("UPDATE employees SET daily_capacity = 5 WHERE id = :id", id=self.ids[4])
+        self.assertMatchesDirect()
+
+        self._exec("DELETE FROM employee_time_entries WHERE employee_id = :id AND work_date < '2031-02-01'",
+                   id=self.ids[2])
+        self.assertMatchesDirect()
+
+    def test_rebuild_and_check_commands(self):
+        self.assertMatchesDirect()
+        with mock.patch("builtins.print"):
+            self.assertEqual(overtime_ledger.check(self.db, None, None), 0)
+            # Ecriture qui contourne les triggers : seul check peut la voir.
+            self._exec(
+                "UPDATE weekly_hours_ledger SET actual_hours = actual_hours + 1 "
+                "WHERE employee_id = :id AND week_start = :week",
+                id=self.ids[0], week=date(2031, 2, 10),
+            )
+            self.assertEqual(overtime_ledger.check(self.db, None, None), 1)
+            self.assertEqual(overtime_ledger.rebuild(self.db, None, None), 0)
+            self.assertEqual(overtime_ledger.check(self.db, None, None), 0)
+        self.assertMatchesDirect()
+
+
+if __name__ == "__main__":
+    unittest.main()
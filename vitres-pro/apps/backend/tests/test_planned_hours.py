@@ -0,0 +1,118 @@
+"""interventions.planned_hours (migration 031) contre la regle Python.
+
+La colonne est maintenue par trigger ; elle doit toujours valoir
+planning.intervention_hours de la meme intervention, apres n'importe quelle
+ecriture : intervention, prestations, taux horaire modifie ou supprime.
+"""
+import random
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import selectinload
+
+from app.models.models import Intervention
+from app.routers.planning import intervention_hours
+
+from db_case import DbTestCase
+
+ORIGIN = datetime(2031, 6, 2, 8, tzinfo=timezone.utc)
+
+
+class PlannedHoursTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = []
+
+    def _rate(self, rate, time_only=False, fixed_hours=None):
+        rate_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO hourly_rates (id, label, rate, time_only, fixed_hours) "
+            "VALUES (:id, 'Test', :rate, :time_only, :fixed)",
+            id=rate_id, rate=rate, time_only=time_only, fixed=fixed_hours,
+        )
+        return rate_id
+
+    def _intervention(self, rate_id, price, minutes=60, carried_over=None, items=()):
+        intervention_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, time_tbd, zone, tour_visibility, hourly_rate_id, carried_over_deferred_amount) "
+            "VALUES (:id, 'intervention', 'Heures', :start, :end, 'planned', 'cash', :price, FALSE, "
+            "'hainaut', 'none', :rate, :carried)",
+            id=intervention_id, start=ORIGIN, end=ORIGIN + timedelta(minutes=minutes),
+            price=price, rate=rate_id, carried=carried_over,
+        )
+        for item_price in items:
+            self._add_item(intervention_id, item_price)
+        self.ids.append(intervention_id)
+        return intervention_id
+
+    def _add_item(self, intervention_id, price):
+        self._exec(
+            "INSERT INTO intervention_items (id, intervention_id, label, price, done, on_demand, is_adjustment) "
+            "VALUES (gen_random_uuid(), :iv, 'Item', :price, TRUE, FALSE, FALSE)",
+            iv=intervention_id, price=price,
+        )
+
+    def assertMatchesPython(self):
+        self.db.expire_all()
+        interventions = self.db.query(Intervention).options(
+            selectinload(Intervention.hourly_rate), selectinload(Intervention.items),
+        ).filter(Intervention.id.in_(self.ids)).all()
+        self.assertEqual(len(interventions), len(self.ids))
+        for iv in interventions:
+            self.assertEqual(iv.planned_hours, intervention_hours(iv), iv.id)
+
+    def test_rule_cases(self):
+        hourly = self._rate(40)
+        self._intervention(hourly, 100)                                 # 2.5 h
+        self._intervention(hourly, 110)                                 # 2.75 h
+        self._intervention(hourly, 15)                                  # 0.375 -> 0.5 (demi au pair)
+        self._intervention(hourly, 100, items=(120, -20))               # prix negatif reintegre
+        self._intervention(hourly, 100, carried_over=60)                # solde reporte exclu
+        self._intervention(hourly, None)
+        self._intervention(hourly, -10)
+        self._intervention(self._rate(40, time_only=True), 0, minutes=90)
+        self._intervention(self._rate(40, time_only=True, fixed_hours=12), 0)
+        self._intervention(self._rate(0), 100)
+        self._intervention(None, 100)
+        self.assertMatchesPython()
+
+    def test_random_prices(self):
+        rng = random.Random(17)
+        rates = [self._rate(r) for r in (35, 40, 45.5, 52, 60)]
+        for _ in range(200):
+            items = [round(rng.uniform(-40, 120), 2) for _ in range(rng.randrange(4))]
+            carried = round(rng.uniform(0, 50), 2) if rng.random() < 0.2 else None
+            self._intervention(rng.choice(rates), round(rng.uniform(0, 400), 2), carried_over=carried, items=items)
+        self.assertMatchesPython()
+
+    def test_writes_keep_column_up_to_date(self):
+        rate_id = self._rate(40)
+        intervention_id = self._intervention(rate_id, 100)
+
+        self._exec("UPDATE interventions SET price_estimated = 200 WHERE id = :id", id=intervention_id)
+        self.assertMatchesPython()
+
+        self._add_item(intervention_id, -40)
+        self.assertMatchesPython()
+        self._exec("DELETE FROM intervention_items WHERE intervention_id = :id", id=intervention_id)
+        self.assertMatchesPython()
+
+        self._exec("UPDATE hourly_rates SET rate = 50 WHERE id = :id", id=rate_id)
+        self.assertMatchesPython()
+        self._exec("UPDATE hourly_rates SET time_only = TRUE, fixed_hours = 3 WHERE id = :id", id=rate_id)
+        self.assertMatchesPython()
+
+        self._exec("DELETE FROM hourly_rates WHERE id = :id", id=rate_id)
+        self.assertMatchesPython()
+        hours = self.connection.execute(
+            text("SELECT planned_hours FROM interventions WHERE id = :id"), {"id": intervention_id},
+        ).scalar()
+        self.assertEqual(hours, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,306 @@
+"""Cumuls journaliers du planning (planning_day_stats, migration 030).
+
+Verifie que chaque ecriture couverte par les triggers rend le cumul du jour
+perime, et elle seulement (migration 037 : employes, series, taux), que la
+relecture donne alors le meme resultat que le calcul direct, et que les
+lectures n'ecrivent rien : elles mettent les jours recalcules en file, et
+seul refresh_stats_job (refresh_planning_stats, store_stale_reads)
+enregistre.
+"""
+import json
+import unittest
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from app.models.models import PlanningDayStats
+from app.routers.planning import (
+    _take_stale_reads, compute_matrix_stats, compute_range_stats, get_planning_matrix, get_range_stats_endpoint,
+    planning_day_stats, planning_stats, refresh_planning_stats, store_stale_reads,
+)
+
+from db_case import DbTestCase, at
+
+ZONE = "rollup-test"
+MONDAY = date(2031, 3, 3)
+SUNDAY = MONDAY + timedelta(days=6)
+
+
+class PlanningRollupTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        # File des lectures perimees : vide au depart de chaque test.
+        _take_stale_reads()
+        self.employee_id, self.rate_id = uuid.uuid4(), uuid.uuid4()
+        self.intervention_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone, daily_capacity, hours_per_weekday) "
+            "VALUES (:id, :email, 'Rollup', 'employee', :zone, 8, '{\"1\": 8, \"2\": 8, \"3\": 8, \"4\": 8, \"5\": 6}')",
+            id=self.employee_id, email=f"rollup-{self.employee_id}@example.invalid", zone=ZONE,
+        )
+        self._exec(
+            "INSERT INTO hourly_rates (id, label, rate, time_only) VALUES (:id, 'Rollup', 40, FALSE)",
+            id=self.rate_id,
+        )
+        # Mercredi 00h30 heure belge = mardi 23h30 UTC : compte le mercredi.
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, time_tbd, zone, sub_zone, tour_visibility, hourly_rate_id) "
+            "VALUES (:id, 'intervention', 'Rollup', :start, :end, 'planned', 'cash', 160, FALSE, "
+            ":zone, 'SUB_R', 'none', :rate)",
+            id=self.intervention_id, start=at(MONDAY + timedelta(days=2), 0).replace(minute=30),
+            end=at(MONDAY + timedelta(days=2), 2), zone=ZONE, rate=self.rate_id,
+        )
+
+    def _stats(self, sub_zone=None):
+        """Cumuls enregistres comme par le planificateur, puis relus : une
+        ligne perimee par une ecriture est recalculee a la relecture."""
+        planning_stats(self.db, MONDAY, SUNDAY, [(ZONE, sub_zone or "")], store=True)
+        return planning_day_stats(self.db, MONDAY, SUNDAY, ZONE, sub_zone)
+
+    def _stored(self):
+        return self.db.query(PlanningDayStats).filter(PlanningDayStats.zone == ZONE).count()
+
+    def _series(self, **template):
+        """Serie hebdomadaire du lundi 10h, rien d'enregistre : ses
+        occurrences sont calculees (160 / 40 = 4 h chacune)."""
+        series_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO recurring_series (id, rule, dtstart, duration_minutes, template, materialized_until) "
+            "VALUES (:id, '{\"freq\": \"weekly\", \"interval\": 1, \"endType\": \"never\"}', :start, 60, "
+            "CAST(:template AS JSONB), :until)",
+            id=series_id, start=at(MONDAY, 10), until=at(MONDAY - timedelta(weeks=1), 10),
+            template=json.dumps({
+                "type": "intervention", "title": "Rollup", "status": "planned", "zone": ZONE,
+                "price_estimated": 160, "hourly_rate_id": str(self.rate_id), **template,
+            }),
+        )
+        return series_id
+
+    def _rereads_rows(self):
+        """Lecture de la semaine servie par la table seule : versions, puis lignes."""
+        stats, statements = self._statements(lambda: planning_day_stats(self.db, MONDAY, SUNDAY, ZONE))
+        self.assertMatchesDirect(stats)
+        return len(statements) == 2
+
+    def _statements(self, call):
+        statements = []
+
+        def record(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        event.listen(self.connection, "before_cursor_execute", record)
+        try:
+            result = call()
+        finally:
+            event.remove(self.connection, "before_cursor_execute", record)
+        return result, statements
+
+    def assertMatchesDirect(self, stats, sub_zone=None):
+        self.assertEqual(stats, compute_range_stats(self.db, MONDAY, SUNDAY, ZONE, sub_zone))
+
+    def test_reads_do_not_write(self):
+        stats, statements = self._statements(lambda: planning_day_stats(self.db, MONDAY, SUNDAY, ZONE))
+        self.assertMatchesDirect(stats)
+        wednesday = MONDAY + timedelta(days=2)
+        self.assertEqual(stats[wednesday]["planned_hours"], 4.0)  # 160 / 40, jour belge
+        self.assertEqual(stats[MONDAY]["capacity_hours"], 8.0)
+        self.assertEqual(stats[MONDAY + timedelta(days=4)]["capacity_hours"], 6.0)
+
+        _, route_statements = self._statements(lambda: get_range_stats_endpoint(
+            MONDAY.isoformat(), SUNDAY.isoformat(), ZONE, db=self.db, current_user=None,
+        ))
+        for statement in statements + route_statements:
+            self.assertTrue(statement.lstrip().upper().startswith("SELECT"), statement)
+        self.assertEqual(self._stored(), 0)
+
+    def test_refresh_stores_rows_then_reads_them(self):
+        refresh_planning_stats(self.db, MONDAY, SUNDAY)
+        # Zone de l'employe, hors tableau de bord faute de sous-zone.
+        self.assertEqual(self._stored(), 7)
+        stats, statements = self._statements(lambda: planning_day_stats(self.db, MONDAY, SUNDAY, ZONE))
+        self.assertMatchesDirect(stats)
+        # Versions des jours, puis les lignes : aucun recalcul.
+        self.assertEqual(len(statements), 2)
+
+        # Jour perime : recalcule a la lecture, sans ecrire, jusqu'au
+        # prochain rafraichissement.
+        wednesday = MONDAY + timedelta(days=2)
+        self._exec("UPDATE interventions SET price_estimated = 80 WHERE id = :id", id=self.intervention_id)
+        stats, statements = self._statements(lambda: planning_day_stats(self.db, MONDAY, SUNDAY, ZONE))
+        self.assertEqual(stats[wednesday]["planned_hours"], 2.0)
+        self.assertGreater(len(statements), 2)
+        refresh_planning_stats(self.db, MONDAY, SUNDAY)
+        stats, statements = self._statements(lambda: planning_day_stats(self.db, MONDAY, SUNDAY, ZONE))
+        self.assertEqual((stats[wednesday]["planned_hours"], len(statements)), (2.0, 2))
+
+    def test_intervention_write_invalidates_its_days(self):
+        self._stats()
+        wednesday, friday = MONDAY + timedelta(days=2), MONDAY + timedelta(days=4)
+        self._exec("UPDATE interventions SET price_estimated = 80 WHERE id = :id", id=self.intervention_id)
+        self.assertEqual(self._stats()[wednesday]["planned_hours"], 2.0)
+
+        self._exec(
+            "UPDATE interventions SET start_time = :start, end_time = :end WHERE id = :id",
+            id=self.intervention_id, start=at(friday, 9), end=at(friday, 10),
+        )
+        stats = self._stats()
+        self.assertEqual((stats[wednesday]["planned_hours"], stats[friday]["planned_hours"]), (0.0, 2.0))
+        self.assertMatchesDirect(stats)
+
+        self._exec("UPDATE interventions SET status = 'cancelled' WHERE id = :id", id=self.intervention_id)
+        self.assertEqual(self._stats()[friday]["planned_hours"], 0.0)
+
+    def test_sub_zone_rows_are_kept_apart(self):
+        wednesday = MONDAY + timedelta(days=2)
+        self.assertEqual(self._stats("SUB_R")[wednesday]["planned_hours"], 4.0)
+        self.assertEqual(self._stats("SUB_OTHER")[wednesday]["planned_hours"], 0.0)
+        self._exec("UPDATE interventions SET sub_zone = 'SUB_OTHER' WHERE id = :id", id=self.intervention_id)
+        self.assertEqual(self._stats("SUB_R")[wednesday]["planned_hours"], 0.0)
+        self.assertMatchesDirect(self._stats("SUB_OTHER"), "SUB_OTHER")
+
+    def test_capacity_writes_invalidate(self):
+        self._stats()
+        tuesday, thursday = MONDAY + timedelta(days=1), MONDAY + timedelta(days=3)
+        self._exec(
+            "INSERT INTO absences (id, employee_id, start_date, end_date, type) "
+            "VALUES (gen_random_uuid(), :emp, :start, :end, 'sick')",
+            emp=self.employee_id, start=at(tuesday, 0), end=at(tuesday, 23),
+        )
+        self.assertEqual(self._stats()[tuesday]["capacity_hours"], 0.0)
+
+        self._exec(
+            "INSERT INTO progressive_hours (id, employee_id, start_date, end_date, hours_per_weekday) "
+            "VALUES (gen_random_uuid(), :emp, :day, :day, '{\"4\": 3}')",
+            emp=self.employee_id, day=thursday,
+        )
+        self.assertEqual(self._stats()[thursday]["capacity_hours"], 3.0)
+
+        # Employes : jours enregistres de leur plage de validite (sans borne ici).
+        self._exec("UPDATE employees SET hours_per_weekday = '{\"1\": 5}' WHERE id = :id", id=self.employee_id)
+        self.assertEqual(self._stats()[MONDAY]["capacity_hours"], 5.0)
+
+        self._exec(
+            "INSERT INTO company_closures (id, start_date, end_date) VALUES (gen_random_uuid(), :day, :day)",
+            day=MONDAY,
+        )
+        stats = self._stats()
+        self.assertTrue(stats[MONDAY]["closed"])
+        self.assertMatchesDirect(stats)
+
+    def test_hourly_rate_edit_invalidates(self):
+        self._stats()
+        self._exec("UPDATE hourly_rates SET rate = 80 WHERE id = :id", id=self.rate_id)
+        self.assertEqual(self._stats()[MONDAY + timedelta(days=2)]["planned_hours"], 2.0)
+
+    def test_unrelated_writes_keep_rows_current(self):
+        self._series()
+        refresh_planning_stats(self.db, MONDAY, SUNDAY)
+        self.assertTrue(self._rereads_rows())
+
+        # Ni couleur ni nom d'employe, ni libelle de taux, ni avancee de
+        # l'horizon enregistre (materialize_series_job) ne touchent un cumul.
+        self._exec("UPDATE employees SET color = '#000000', full_name = 'Autre' WHERE id = :id", id=self.employee_id)
+        self._exec("UPDATE hourly_rates SET label = 'Autre' WHERE id = :id", id=self.rate_id)
+        self._exec("UPDATE recurring_series SET materialized_until = :until", until=at(MONDAY, 9))
+        self.assertTrue(self._rereads_rows())
+
+        # Un nouvel employe compte dans la capacite de chaque jour.
+        other = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone, daily_capacity) "
+            "VALUES (:id, :email, 'Ailleurs', 'employee', 'rollup-other', 8)",
+            id=other, email=f"rollup-{other}@example.invalid",
+        )
+        self.assertFalse(self._rereads_rows())
+        refresh_planning_stats(self.db, MONDAY, SUNDAY)
+        self.assertTrue(self._rereads_rows())
+
+        # Plage de validite : seuls les jours enregistres qu'elle couvre.
+        self._exec(
+            "UPDATE employees SET hours_valid_from = :day WHERE id = :id",
+            id=self.employee_id, day=MONDAY + timedelta(days=3),
+        )
+        self.assertEqual(self._stats()[MONDAY]["capacity_hours"], 0.0)
+        self._exec(
+            "UPDATE employees SET hours_valid_from = :day, hours_valid_until = :day WHERE id = :id",
+            id=self.employee_id, day=SUNDAY + timedelta(days=1),
+        )
+        self.assertEqual(self._stats()[MONDAY + timedelta(days=3)]["capacity_hours"], 0.0)
+        refresh_planning_stats(self.db, SUNDAY + timedelta(days=7), SUNDAY + timedelta(days=7))
+        self._exec(
+            "UPDATE employees SET hours_valid_from = :day, hours_valid_until = :day WHERE id = :id",
+            id=self.employee_id, day=SUNDAY + timedelta(days=2),
+        )
+        self.assertTrue(self._rereads_rows())
+
+    def test_series_writes_invalidate_computed_days(self):
+        series_id = self._series()
+        self.assertEqual(self._stats()[MONDAY]["planned_hours"], 4.0)
+
+        self._exec("UPDATE hourly_rates SET rate = 80 WHERE id = :id", id=self.rate_id)
+        stats = self._stats()
+        self.assertEqual((stats[MONDAY]["planned_hours"], stats[MONDAY + timedelta(days=2)]["planned_hours"]), (2.0, 2.0))
+
+        self._exec(
+            "UPDATE recurring_series SET template = template || '{\"price_estimated\": 320}' WHERE id = :id",
+            id=series_id,
+        )
+        self.assertEqual(self._stats()[MONDAY]["planned_hours"], 4.0)
+
+        self._exec("UPDATE recurring_series SET until = :until WHERE id = :id", id=series_id, until=at(MONDAY, 0))
+        self.assertEqual(self._stats()[MONDAY]["planned_hours"], 0.0)
+
+        self._exec("UPDATE recurring_series SET until = NULL WHERE id = :id", id=series_id)
+        self._stats()
+        self._exec("DELETE FROM recurring_series WHERE id = :id", id=series_id)
+        stats = self._stats()
+        self.assertEqual(stats[MONDAY]["planned_hours"], 0.0)
+        self.assertMatchesDirect(stats)
+
+    def test_stale_reads_are_stored_by_the_job(self):
+        week = {MONDAY + timedelta(days=i) for i in range(7)}
+        planning_day_stats(self.db, MONDAY, SUNDAY, ZONE)
+        queued = _take_stale_reads()
+        self.assertEqual(queued, {(ZONE, ""): week})
+        store_stale_reads(self.db, queued)
+        self.assertEqual(self._stored(), 7)
+        self.assertTrue(self._rereads_rows())
+        self.assertEqual(_take_stale_reads(), {})
+
+        # Seul le jour reecrit repart en file ; puis deux plages disjointes.
+        wednesday = MONDAY + timedelta(days=2)
+        self._exec("UPDATE interventions SET price_estimated = 80 WHERE id = :id", id=self.intervention_id)
+        self.assertFalse(self._rereads_rows())
+        self.assertEqual(_take_stale_reads(), {(ZONE, ""): {wednesday}})
+        next_week = [d + timedelta(weeks=1) for d in (MONDAY, wednesday)]
+        store_stale_reads(self.db, {(ZONE, ""): {wednesday, *next_week}, (ZONE, "SUB_R"): set(next_week)})
+        self.assertTrue(self._rereads_rows())
+        self.assertEqual(self._stored(), 7 + 2 + 2)
+
+    def test_matrix_cells_match_single_cell_computation(self):
+        self._exec(
+            "INSERT INTO sub_zones (id, code, label, parent_zone, position) "
+            "VALUES (gen_random_uuid(), 'SUB_R', 'Rollup', :zone, 0)",
+            zone=ZONE,
+        )
+        keys = [("", ""), (ZONE, ""), (ZONE, "SUB_R"), ("", "SUB_R"), ("other", "")]
+        matrix = compute_matrix_stats(self.db, MONDAY, SUNDAY, keys)
+        for zone_key, sub_zone_key in keys:
+            with self.subTest(zone=zone_key, sub_zone=sub_zone_key):
+                self.assertEqual(
+                    matrix[(zone_key, sub_zone_key)],
+                    compute_range_stats(self.db, MONDAY, SUNDAY, zone_key or None, sub_zone_key or None),
+                )
+        self.assertEqual(planning_stats(self.db, MONDAY, SUNDAY, keys), matrix)
+
+        response = get_planning_matrix(MONDAY.isoformat(), SUNDAY.isoformat(), db=self.db, current_user=None)
+        cells = {(c["zone"], c["sub_zone"]): c["days"] for c in response["cells"]}
+        self.assertEqual(cells[(ZONE, "SUB_R")]["2031-03-05"]["planned_hours"], 4.0)
+        self.assertEqual(cells[(ZONE, None)]["2031-03-03"]["capacity_hours"], 8.0)
+        self.assertEqual(len(cells[(None, None)]), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
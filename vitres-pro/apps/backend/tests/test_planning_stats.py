@@ -0,0 +1,133 @@
+import unittest
+import uuid
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from app.routers.planning import BRUSSELS_TZ, _current_stats, _matrix_cells, _missing_days
+from app.services.capacity import CapacityMatrix
+
+MONDAY = date(2031, 3, 3)
+SUNDAY = MONDAY + timedelta(days=6)
+
+
+def _row(day, zone="", sub_zone="", day_version=0, planned=1.0):
+    return SimpleNamespace(
+        zone=zone, sub_zone=sub_zone, day=day, day_version=day_version,
+        capacity_hours=8.0, planned_hours=planned, present_employees=1, closed=False,
+    )
+
+
+def _employee(zone, profile):
+    return SimpleNamespace(
+        id=uuid.uuid4(), zone=zone, hours_per_weekday=profile, daily_capacity=8.0,
+        hours_valid_from=None, hours_valid_until=None,
+    )
+
+
+def _planned(day, hours, zone=None, sub_zone=None, by_zone=1, by_sub_zone=1):
+    """Ligne GROUPING SETS : by_* = 1 quand la colonne est agregee."""
+    return SimpleNamespace(day=day, zone=zone, sub_zone=sub_zone, by_zone=by_zone, by_sub_zone=by_sub_zone, hours=hours)
+
+
+def _occurrence(day, hours, zone, sub_zone=None):
+    """Occurrence calculee a taux forfaitaire : compte exactement hours."""
+    start = datetime(day.year, day.month, day.day, 9, tzinfo=BRUSSELS_TZ)
+    return SimpleNamespace(
+        hourly_rate_id=uuid.uuid4(), hourly_rate=SimpleNamespace(time_only=True, fixed_hours=hours),
+        start_time=start, end_time=start + timedelta(hours=1), zone=zone, sub_zone=sub_zone,
+    )
+
+
+class CurrentStatsTests(unittest.TestCase):
+    def test_rows_are_current_only_when_the_day_version_matches(self):
+        tuesday, thursday = MONDAY + timedelta(days=1), MONDAY + timedelta(days=3)
+        rows = [
+            _row(MONDAY, day_version=3),
+            _row(tuesday, day_version=2),          # jour reecrit depuis le calcul
+            _row(thursday),                        # jour jamais touche : version 0
+            _row(MONDAY, zone="hainaut", day_version=3),
+            _row(MONDAY, zone="ardennes", day_version=3),  # cle non demandee
+        ]
+        results = _current_stats(rows, [("", ""), ("hainaut", "")], days={MONDAY: 3, tuesday: 4})
+        self.assertEqual(sorted(results), [("", ""), ("hainaut", "")])
+        self.assertEqual(sorted(results[("", "")]), [MONDAY, thursday])
+        self.assertEqual(results[("", "")][MONDAY], {
+            "capacity_hours": 8.0, "planned_hours": 1.0, "present_employees": 1, "closed": False,
+        })
+        self.assertEqual(sorted(results[("hainaut", "")]), [MONDAY])
+
+    def test_missing_days_per_key(self):
+        full = {d: {} for d in (MONDAY + timedelta(days=i) for i in range(7))}
+        results = {
+            ("", ""): full,
+            ("hainaut", ""): {MONDAY: {}, SUNDAY: {}},
+            ("hainaut", "SUB"): {},
+        }
+        missing = _missing_days(results, MONDAY, SUNDAY)
+        self.assertEqual(sorted(missing), [("hainaut", ""), ("hainaut", "SUB")])
+        self.assertEqual(missing[("hainaut", "")], [MONDAY + timedelta(days=i) for i in range(1, 6)])
+        self.assertEqual(len(missing[("hainaut", "SUB")]), 7)
+
+
+class MatrixCellsTests(unittest.TestCase):
+    def setUp(self):
+        self.employees = [
+            _employee("hainaut", {"1": 8, "2": 8, "3": 8, "4": 8, "5": 6}),
+            _employee("hainaut", {"1": 4}),
+            _employee("ardennes", None),
+        ]
+        self.absence_day = MONDAY + timedelta(days=1)
+        self.capacity = CapacityMatrix(
+            self.employees, MONDAY, SUNDAY,
+            absences=[SimpleNamespace(
+                employee_id=self.employees[0].id,
+                start_date=datetime(2031, 3, 4, 0, tzinfo=BRUSSELS_TZ),
+                end_date=datetime(2031, 3, 4, 23, tzinfo=BRUSSELS_TZ),
+            )],
+            closures=[SimpleNamespace(start_date=SUNDAY, end_date=SUNDAY)],
+        )
+
+    def _cells(self, keys, planned_rows=(), occurrences=()):
+        return _matrix_cells(self.capacity, planned_rows, occurrences, self.employees, keys)
+
+    def test_planned_hours_follow_grouping_sets(self):
+        wednesday = MONDAY + timedelta(days=2)
+        rows = [
+            _planned(wednesday, 5.0),
+            _planned(wednesday, 3.0, zone="hainaut", by_zone=0),
+            _planned(wednesday, 2.0, zone="ardennes", by_zone=0),
+            _planned(wednesday, 1.5, sub_zone="SUB_H", by_sub_zone=0),
+            # Sous-zone NULL : deja comptee par les lignes toutes zones / zone.
+            _planned(wednesday, 3.5, sub_zone=None, by_sub_zone=0),
+        ]
+        occurrences = [_occurrence(wednesday, 2.0, "hainaut", "SUB_H")]
+        keys = [("", ""), ("hainaut", ""), ("hainaut", "SUB_H"), ("ardennes", ""), ("ardennes", "SUB_A")]
+        cells = self._cells(keys, rows, occurrences)
+
+        self.assertEqual(
+            {key: cells[key][wednesday]["planned_hours"] for key in keys},
+            {("", ""): 7.0, ("hainaut", ""): 5.0, ("hainaut", "SUB_H"): 3.5, ("ardennes", ""): 2.0, ("ardennes", "SUB_A"): 0.0},
+        )
+        self.assertEqual(cells[("", "")][MONDAY]["planned_hours"], 0.0)
+
+    def test_capacity_by_zone_absences_and_closures(self):
+        keys = [("", ""), ("hainaut", ""), ("hainaut", "SUB_H"), ("ardennes", ""), ("nowhere", "")]
+        cells = self._cells(keys)
+        for key in keys:
+            self.assertEqual(sorted(cells[key]), [MONDAY + timedelta(days=i) for i in range(7)])
+
+        self.assertEqual(cells[("", "")][MONDAY]["capacity_hours"], 20.0)
+        self.assertEqual(cells[("", "")][MONDAY]["present_employees"], 3)
+        # La capacite d'une sous-zone est celle de sa zone parente.
+        self.assertEqual(cells[("hainaut", "SUB_H")][MONDAY], cells[("hainaut", "")][MONDAY])
+        self.assertEqual(cells[("hainaut", "")][MONDAY]["capacity_hours"], 12.0)
+        self.assertEqual(cells[("hainaut", "")][self.absence_day]["capacity_hours"], 0.0)
+        self.assertEqual(cells[("ardennes", "")][self.absence_day]["capacity_hours"], 8.0)
+        self.assertEqual(cells[("nowhere", "")][MONDAY]["present_employees"], 0)
+        self.assertEqual(cells[("", "")][SUNDAY], {
+            "capacity_hours": 0.0, "planned_hours": 0.0, "present_employees": 0, "closed": True,
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+import unittest
+import uuid
+
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import principal_cache
+from app.core.config import settings
+from app.core.deps import get_current_user, get_current_user_async
+from app.models.models import Employee
+
+
+def _employee(**overrides):
+    values = dict(
+        id=uuid.uuid4(), email="a@b.be", full_name="Ouvrier", role="employee", color="#000000",
+        phone=None, avatar_path=None, zone="hainaut", weekly_hours=38.0, daily_capacity=7.6,
+        hours_per_weekday={"1": 8}, hours_valid_from=None, hours_valid_until=None,
+    )
+    values.update(overrides)
+    return Employee(**values)
+
+
+class _CountingSession(Session):
+    """Session sans base : query() renvoie l'employe fourni et compte les appels."""
+
+    def __init__(self, employee):
+        super().__init__()
+        self.employee = employee
+        self.queries = 0
+
+    def query(self, *entities):
+        self.queries += 1
+        session = self
+
+        class _Q:
+            def filter(self, *args):
+                return self
+
+            def first(self):
+                return session.employee
+
+        return _Q()
+
+
+class PrincipalCacheTests(unittest.TestCase):
+    def setUp(self):
+        principal_cache.clear()
+
+    def tearDown(self):
+        principal_cache.clear()
+
+    def test_hit_is_attached_and_clean(self):
+        employee = _employee()
+        principal_cache.store_principal("k", employee, None)
+
+        db = Session()
+        cached = principal_cache.get_principal(db, "k")
+        self.assertIn(cached, db)
+        self.assertEqual(cached.id, employee.id)
+        self.assertEqual(cached.hours_per_weekday, {"1": 8})
+        self.assertFalse(db.dirty)
+        self.assertEqual(principal_cache.stats()["hits"], 1)
+
+        # Les JSON sont copies : une modification en requete ne pollue pas le cache.
+        cached.hours_per_weekday["1"] = 2
+        self.assertEqual(principal_cache.get_principal(Session(), "k").hours_per_weekday, {"1": 8})
+
+    def test_expired_token_not_stored(self):
+        principal_cache.store_principal("k", _employee(), time.time() - 1)
+        self.assertIsNone(principal_cache.get_principal(Session(), "k"))
+        self.assertEqual(principal_cache.stats(), {"hits": 0, "misses": 1, "size": 0})
+
+    def test_invalidate_drops_every_token_of_employee(self):
+        employee, other = _employee(), _employee(email="c@d.be")
+        principal_cache.store_principal("k1", employee, None)
+        principal_cache.store_principal("k2", employee, None)
+        principal_cache.store_principal("k3", other, None)
+        principal_cache.invalidate_principal(str(employee.id))
+        self.assertEqual(principal_cache.stats()["size"], 1)
+        self.assertIsNotNone(principal_cache.get_principal(Session(), "k3"))
+
+    def test_lru_bound(self):
+        size = principal_cache.PRINCIPAL_CACHE_SIZE
+        principal_cache.PRINCIPAL_CACHE_SIZE = 2
+        try:
+            for key in ("k1", "k2", "k3"):
+                principal_cache.store_principal(key, _employee(), None)
+            self.assertIsNone(principal_cache.get_principal(Session(), "k1"))
+            self.assertIsNotNone(principal_cache.get_principal(Session(), "k3"))
+        finally:
+            principal_cache.PRINCIPAL_CACHE_SIZE = size
+
+    def test_get_current_user_queries_once_per_token(self):
+        employee = _employee()
+        token = jwt.encode(
+            {"sub": str(employee.id), "aud": "authenticated", "exp": int(time.time()) + 3600},
+            settings.JWT_SECRET, algorithm="HS256",
+        )
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        first = _CountingSession(employee)
+        self.assertIs(get_current_user(credentials, first), employee)
+        second = _CountingSession(employee)
+        self.assertEqual(get_current_user(credentials, second).id, employee.id)
+        self.assertEqual((first.queries, second.queries), (1, 0))
+
+    def test_async_dependency_serves_cached_principal_without_query(self):
+        employee = _employee()
+        token = "token-deja-vu"
+        principal_cache.store_principal(principal_cache.token_key(token), employee, None)
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        async def resolve():
+            # AsyncSession sans moteur : toute requete SQL echouerait.
+            db = AsyncSession()
+            user = await get_current_user_async(credentials, db)
+            return user, user in db.sync_session
+
+        user, attached = asyncio.run(resolve())
+        self.assertEqual(user.id, employee.id)
+        self.assertTrue(attached)
+
+
+if __name__ == "__main__":
+    unittest.main()
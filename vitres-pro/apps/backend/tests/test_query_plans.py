@@ -0,0 +1,150 @@
+"""Non-regression des plans de requete sur les chemins chauds d'interventions.
+
+Lance EXPLAIN (FORMAT JSON) sur le SQL genere par la liste calendrier, les
+stats du jour, le cash hebdomadaire et l'assignation en masse, et echoue si
+Postgres revient a un Seq Scan sur interventions (index des migrations 025
+et 026).
+"""
+import json
+import unittest
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app.routers.interventions import BulkAssignBody, _bulk_assign_query, _calendar_query, _search_query
+from app.routers.planning import (
+    _planned_hours_by_day_query, _planned_hours_matrix_query, _planned_interventions_query, _utc_bounds,
+)
+from app.routers.timetracking import _weekly_cash_query
+
+from db_case import DbTestCase
+
+
+SEED_INTERVENTIONS = 20_000
+SEED_EMPLOYEES = 20
+# Deux ans de donnees centres sur ce jour : assez pour que le planificateur
+# prefere un index des qu'on ne lit qu'un jour ou une semaine.
+PIVOT = date(2026, 3, 11)
+
+SEED_SQL = """
+INSERT INTO employees (id, email, full_name, role, zone)
+SELECT ('00000000-0000-4000-8000-' || lpad(n::text, 12, '0'))::uuid,
+       'plan-test-' || n || '@example.invalid', 'Plan ' || n,
+       CASE WHEN n = 1 THEN 'subcontractor' ELSE 'employee' END,
+       CASE WHEN n % 2 = 0 THEN 'hainaut' ELSE 'ardennes' END
+FROM generate_series(1, :employees) AS n;
+
+INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode,
+                           price_estimated, time_tbd, zone, sub_zone, tour_visibility)
+SELECT ('00000000-0000-4000-9000-' || lpad(n::text, 12, '0'))::uuid,
+       'intervention', 'Plan ' || n,
+       ts, ts + INTERVAL '1 hour',
+       (ARRAY['planned', 'done', 'done', 'cancelled'])[1 + n % 4],
+       (ARRAY['cash', 'invoice', 'invoice_cash'])[1 + n % 3],
+       80, FALSE,
+       CASE WHEN n % 2 = 0 THEN 'hainaut' ELSE 'ardennes' END,
+       'SUB_' || (n % 8),
+       CASE WHEN n % 50 = 0 THEN 'draft' WHEN n % 50 = 1 THEN 'published' ELSE 'none' END
+FROM (
+  SELECT n, :origin + n * (INTERVAL '730 days' / :rows) AS ts
+  FROM generate_series(1, :rows) AS n
+) s;
+
+INSERT INTO intervention_employees (intervention_id, employee_id)
+SELECT ('00000000-0000-4000-9000-' || lpad(n::text, 12, '0'))::uuid,
+       ('00000000-0000-4000-8000-' || lpad((1 + (n + k) % :employees)::text, 12, '0'))::uuid
+FROM generate_series(1, :rows) AS n, generate_series(0, 1) AS k;
+"""
+
+
+def _employee_id(n: int) -> uuid.UUID:
+    return uuid.UUID(f"00000000-0000-4000-8000-{n:012d}")
+
+
+def _seq_scans_on_interventions(plan: dict) -> list:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") == "interventions":
+        found.append(plan)
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans_on_interventions(child))
+    return found
+
+
+class QueryPlanTests(DbTestCase):
+    per_class = True
+
+    @classmethod
+    def seed(cls):
+        origin = datetime.combine(PIVOT, time(8), tzinfo=timezone.utc) - timedelta(days=365)
+        params = {"origin": origin, "rows": SEED_INTERVENTIONS, "employees": SEED_EMPLOYEES}
+        for statement in SEED_SQL.split(";"):
+            if statement.strip():
+                cls.connection.execute(text(statement), params)
+        cls.connection.execute(text("ANALYZE interventions"))
+        cls.connection.execute(text("ANALYZE intervention_employees"))
+
+    def assertNoSeqScan(self, query):
+        # Dialecte de la connexion (standard_conforming_strings connu) et
+        # parametres passes au driver, qui les interpole cote client : le
+        # planificateur voit des constantes. literal_binds avec un dialecte nu
+        # doublerait les % et \ des motifs LIKE ... ESCAPE. Query ORM ou select Core.
+        statement = getattr(query, "statement", query)
+        compiled = statement.compile(
+            dialect=self.connection.dialect, compile_kwargs={"render_postcompile": True},
+        )
+        plan = self.connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scans = _seq_scans_on_interventions(plan[0]["Plan"])
+        self.assertEqual(scans, [], f"Seq Scan sur interventions :\n{json.dumps(plan, indent=2)}")
+
+    def _week(self):
+        start, _ = _utc_bounds(PIVOT)
+        return start, start + timedelta(days=7)
+
+    def test_calendar_admin(self):
+        admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone="hainaut")
+        self.assertNoSeqScan(_calendar_query(admin, *self._week()))
+
+    def test_calendar_employee(self):
+        employee = SimpleNamespace(id=_employee_id(2), role="employee", zone="hainaut")
+        self.assertNoSeqScan(_calendar_query(employee, *self._week()))
+
+    def test_calendar_subcontractor(self):
+        subcontractor = SimpleNamespace(id=_employee_id(1), role="subcontractor", zone="ardennes")
+        self.assertNoSeqScan(_calendar_query(subcontractor, *self._week()))
+
+    def test_day_stats(self):
+        day_start, day_end = _utc_bounds(PIVOT)
+        for zone, sub_zone in ((None, None), ("hainaut", None), ("hainaut", "SUB_2")):
+            with self.subTest(zone=zone, sub_zone=sub_zone):
+                self.assertNoSeqScan(_planned_interventions_query(self.db, day_start, day_end, zone, sub_zone))
+                self.assertNoSeqScan(_planned_hours_by_day_query(self.db, day_start, day_end, zone, sub_zone))
+
+    def test_planning_matrix(self):
+        self.assertNoSeqScan(_planned_hours_matrix_query(self.db, *self._week()))
+
+    def test_weekly_cash(self):
+        week_start = PIVOT - timedelta(days=PIVOT.weekday())
+        employee_ids = [_employee_id(n) for n in range(1, SEED_EMPLOYEES + 1)]
+        self.assertNoSeqScan(_weekly_cash_query(self.db, week_start, week_start + timedelta(days=6), employee_ids))
+
+    def test_bulk_assign(self):
+        body = BulkAssignBody(date=PIVOT, sub_zone="SUB_2", employee_ids=[])
+        self.assertNoSeqScan(_bulk_assign_query(self.db, body))
+
+    def test_search(self):
+        # Index trigrammes de la migration 026 : sans pg_trgm, rien a verifier.
+        if not self.connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar():
+            self.skipTest("pg_trgm absent : index de recherche non crees.")
+        admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone="hainaut")
+        employee = SimpleNamespace(id=_employee_id(2), role="employee", zone="hainaut")
+        for user, q in ((admin, "Plan 12345"), (employee, "plan 1234"), (admin, "+32 475 12 34 56")):
+            with self.subTest(role=user.role, q=q):
+                self.assertNoSeqScan(_search_query(self.db, user, q))
+
+
+if __name__ == "__main__":
+    unittest.main()
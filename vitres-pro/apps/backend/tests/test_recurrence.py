@@ -0,0 +1,71 @@
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.services.recurrence import expandable_rule, occurrence_id, occurrence_starts
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class ExpandableRuleTests(unittest.TestCase):
+    def test_only_endless_series_are_expanded(self):
+        self.assertIsNone(expandable_rule({"freq": "weekly", "interval": 1, "count": 12}))
+        self.assertIsNone(expandable_rule(None))
+        self.assertEqual(
+            expandable_rule({"freq": "week", "interval": 2, "endType": "never"}),
+            {"freq": "weekly", "interval": 2},
+        )
+
+    def test_unknown_frequency_is_not_expanded(self):
+        self.assertIsNone(expandable_rule({"freq": "hourly", "endType": "never"}))
+        self.assertIsNone(expandable_rule({"freq": "daily", "interval": "x", "endType": "never"}))
+
+
+class OccurrenceStartsTests(unittest.TestCase):
+    def test_weekly_keeps_brussels_wall_clock_across_dst(self):
+        # Mardi 9h a Bruxelles (UTC+2), puis passage a l'heure d'hiver le 25/10.
+        starts = list(occurrence_starts(
+            {"freq": "weekly", "interval": 1}, utc(2026, 10, 20, 7), utc(2026, 10, 1), utc(2026, 11, 4),
+        ))
+        self.assertEqual(starts, [utc(2026, 10, 20, 7), utc(2026, 10, 27, 8), utc(2026, 11, 3, 8)])
+
+    def test_window_far_from_dtstart(self):
+        starts = list(occurrence_starts(
+            {"freq": "daily", "interval": 3}, utc(2026, 1, 1, 8), utc(2030, 6, 1), utc(2030, 6, 8),
+        ))
+        self.assertEqual(len(starts), 2)
+        self.assertTrue(all((s.date() - utc(2026, 1, 1).date()).days % 3 == 0 for s in starts))
+
+    def test_monthly_clamps_to_last_day_of_month(self):
+        starts = list(occurrence_starts(
+            {"freq": "monthly", "interval": 1}, utc(2027, 1, 31, 9), utc(2027, 1, 1), utc(2027, 4, 1),
+        ))
+        self.assertEqual([s.date().isoformat() for s in starts], ["2027-01-31", "2027-02-28", "2027-03-31"])
+
+    def test_weekdays_skip_weekend(self):
+        starts = list(occurrence_starts(
+            {"freq": "weekdays", "interval": 1}, utc(2026, 10, 16, 7), utc(2026, 10, 16), utc(2026, 10, 21),
+        ))
+        self.assertEqual([s.isoweekday() for s in starts], [5, 1, 2])
+
+    def test_window_end_is_exclusive(self):
+        starts = list(occurrence_starts(
+            {"freq": "daily", "interval": 1}, utc(2026, 1, 1, 8), utc(2026, 1, 1), utc(2026, 1, 3, 8),
+        ))
+        self.assertEqual(starts, [utc(2026, 1, 1, 8), utc(2026, 1, 2, 8)])
+
+
+class OccurrenceIdTests(unittest.TestCase):
+    def test_same_instant_same_id(self):
+        series_id = uuid.uuid4()
+        start = utc(2026, 10, 20, 7)
+        self.assertEqual(
+            occurrence_id(series_id, start),
+            occurrence_id(series_id, start.astimezone(timezone(timedelta(hours=2)))),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""Series sans fin (migration 029) : occurrences calculees ouvertes par leur id.
+
+Verifie que GET, PATCH, DELETE /{id}, /{id}/recurrence-scope et
+/{id}/items-done enregistrent d'eux-memes une occurrence calculee au-dela de
+l'horizon (sans POST /recurring/{id}/materialize) quand le client fournit sa
+serie, une seule fois, et jamais pour un employe qui ne la voit pas dans la
+liste ; et qu'un id inconnu ou supprime ne declenche aucun parcours.
+"""
+import unittest
+import uuid
+from unittest import mock
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.models.models import Intervention, RecurringSeries
+from app.routers.interventions import (
+    ItemsDoneBody, RecurrenceScopeBody, create_recurring_bulk, delete_intervention,
+    delete_intervention_recurrence_scope, read_intervention, update_intervention,
+    update_intervention_recurrence_scope, update_items_done,
+)
+from app.schemas.schemas import InterventionRecurringCreate
+from app.services.recurrence import find_occurrence, occurrence_id, virtual_occurrences
+
+from db_case import DbTestCase, at
+
+ZONE = "series-test"
+WEEKLY = {"freq": "weekly", "interval": 1, "endType": "never"}
+
+
+class RecurringSeriesTests(DbTestCase):
+    savepoint = True
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self._employee("admin")
+        self.assigned = self._employee("employee")
+        self.other = self._employee("employee")
+        self.first = at(date.today() + timedelta(days=1), 9)
+        self.group = self._series(self.first)
+        # Vingt semaines : bien au-dela de l'horizon enregistre (8 semaines).
+        self.far = self._start(20)
+        self.far_id = occurrence_id(self.group, self.far)
+
+    def _employee(self, role):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone) VALUES (:id, :email, 'Serie', :role, :zone)",
+            id=emp, email=f"series-{emp}@example.invalid", role=role, zone=ZONE,
+        )
+        return SimpleNamespace(id=emp, role=role, zone=ZONE, full_name="Serie", email=None)
+
+    def _start(self, weeks):
+        return at(self.first.date() + timedelta(weeks=weeks), 9)
+
+    def _series(self, first, **fields):
+        payload = InterventionRecurringCreate(
+            title="Vitres hebdo", zone=ZONE, employee_ids=[self.assigned.id],
+            items=[{"label": "Vitres", "price": 40}, {"label": "Chassis", "price": 20}],
+            recurrence_rule=WEEKLY,
+            occurrences=[{"start_time": first, "end_time": first + timedelta(hours=1)}],
+            **fields,
+        )
+        result = create_recurring_bulk(payload, db=self.db, current_user=self.admin)
+        return uuid.UUID(result["recurrence_group_id"])
+
+    def _stored(self, intervention_id):
+        return self.db.get(Intervention, intervention_id, populate_existing=True)
+
+    def _call(self, route, *args, user=None, series=True):
+        """Route appelee comme par le client : id de la serie en parametre."""
+        return route(
+            *args, recurrence_group_id=self.group if series else None,
+            db=self.db, current_user=user or self.admin,
+        )
+
+    def _read(self, intervention_id, **kwargs):
+        return self._call(read_intervention, intervention_id, **kwargs)
+
+    def test_read_opens_the_occurrence_once(self):
+        self.assertIsNone(self._stored(self.far_id))
+        self.assertEqual(find_occurrence(self.db, self.group, self.far_id)[1], self.far)
+
+        intervention = self._read(self.far_id)
+        self.assertEqual((intervention.id, intervention.start_time), (self.far_id, self.far))
+        self.assertEqual(sorted(item.label for item in intervention.items), ["Chassis", "Vitres"])
+        self.assertEqual([e.id for e in intervention.employees], [self.assigned.id])
+
+        # Enregistree : plus calculee, relue telle quelle.
+        window = virtual_occurrences(self.db, self.far, self.far + timedelta(days=1))
+        self.assertNotIn(self.far_id, [occ.id for occ in window])
+        self.assertEqual(self._read(self.far_id).id, self.far_id)
+        count = self._exec("SELECT count(*) FROM interventions WHERE id = :id", id=self.far_id).scalar()
+        self.assertEqual(count, 1)
+
+    def test_employee_opens_only_what_the_list_shows(self):
+        with self.assertRaises(HTTPException) as ctx:
+            self._read(self.far_id, user=self.other)
+        self.assertEqual(ctx.exception.status_code, 404)
+        self.assertIsNone(self._stored(self.far_id))
+
+        self.assertEqual(self._read(self.far_id, user=self.assigned).id, self.far_id)
+
+    def test_unknown_ids_are_not_opened(self):
+        # Id aleatoire, date hors de la serie, ou serie non fournie.
+        off_day = occurrence_id(self.group, self.far + timedelta(days=1))
+        for intervention_id, series in ((uuid.uuid4(), True), (off_day, True), (self.far_id, False)):
+            with self.subTest(intervention_id=intervention_id, series=series):
+                with self.assertRaises(HTTPException) as ctx:
+                    self._read(intervention_id, series=series)
+                self.assertEqual(ctx.exception.status_code, 404)
+        self.assertIsNone(find_occurrence(self.db, uuid.uuid4(), self.far_id))
+        self.assertIsNone(self._stored(self.far_id))
+
+    def test_patch_and_items_done(self):
+        updated = self._call(update_intervention, self.far_id, {"title": "Vitres + velux"})
+        self.assertEqual(updated.title, "Vitres + velux")
+        # Seule l'occurrence visee est enregistree.
+        self.assertIsNone(self._stored(occurrence_id(self.group, self._start(19))))
+
+        later = occurrence_id(self.group, self._start(21))
+        items = self._read(later, user=self.assigned).items
+        item_id = next(item.id for item in items if item.label == "Chassis")
+        closed = self._call(update_items_done, later, ItemsDoneBody(not_done_item_ids=[item_id]), user=self.assigned)
+        self.assertEqual(float(closed.price_estimated), 40.0)
+        # Le modele de la serie n'est pas touche : la semaine suivante reste calculee.
+        next_week = occurrence_id(self.group, self._start(22))
+        self.assertIsNone(self._stored(next_week))
+
+    def test_delete_leaves_a_tombstone(self):
+        self._call(delete_intervention, self.far_id)
+        self.assertIsNone(self._stored(self.far_id))
+        window = virtual_occurrences(self.db, self.far - timedelta(days=1), self.far + timedelta(days=1))
+        self.assertNotIn(self.far_id, [occ.id for occ in window])
+        # Id supprime (encore en cache sur un telephone) : ni recalcule, ni cherche.
+        with mock.patch("app.services.recurrence._pending") as pending:
+            with self.assertRaises(HTTPException) as ctx:
+                self._read(self.far_id)
+        self.assertEqual(ctx.exception.status_code, 404)
+        pending.assert_not_called()
+
+    def test_recurrence_scope_from_a_computed_occurrence(self):
+        body = RecurrenceScopeBody(scope="following", fields={"title": "Nouveau titre"})
+        result = self._call(update_intervention_recurrence_scope, self.far_id, body)
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(self._stored(self.far_id).title, "Nouveau titre")
+        # Avant l'ancre : enregistrees avec l'ancien titre ; apres : nouveau modele.
+        self.assertEqual(self._stored(occurrence_id(self.group, self._start(19))).title, "Vitres hebdo")
+        self.assertEqual(self.db.get(RecurringSeries, self.group).template["title"], "Nouveau titre")
+
+        anchor = occurrence_id(self.group, self._start(25))
+        result = self._call(delete_intervention_recurrence_scope, anchor, "following")
+        self.assertEqual(result["deleted"], 1)
+        self.assertEqual(self.db.get(RecurringSeries, self.group).until, self._start(25))
+        self.assertIsNone(find_occurrence(self.db, self.group, occurrence_id(self.group, self._start(26))))
+
+    def test_existing_series_is_not_duplicated(self):
+        before = self._exec(
+            "SELECT count(*) FROM interventions WHERE recurrence_group_id = :id", id=self.group,
+        ).scalar()
+        for rule in (WEEKLY, {"freq": "weekly", "interval": 1, "endType": "count", "count": 4}):
+            with self.subTest(rule=rule):
+                payload = InterventionRecurringCreate(
+                    title="Vitres hebdo", zone=ZONE, recurrence_rule=rule, recurrence_group_id=self.group,
+                    occurrences=[
+                        {"start_time": self._start(k), "end_time": self._start(k) + timedelta(hours=1)}
+                        for k in range(4)
+                    ],
+                )
+                with self.assertRaises(HTTPException) as ctx:
+                    create_recurring_bulk(payload, db=self.db, current_user=self.admin)
+                self.assertEqual(ctx.exception.status_code, 409)
+        after = self._exec(
+            "SELECT count(*) FROM interventions WHERE recurrence_group_id = :id", id=self.group,
+        ).scalar()
+        self.assertEqual(after, before)
+
+        # Un groupe fourni sans serie existante (duplication) reste accepte.
+        self.assertNotEqual(self._series(self._start(30), recurrence_group_id=uuid.uuid4()), self.group)
+
+
+if __name__ == "__main__":
+    unittest.main()
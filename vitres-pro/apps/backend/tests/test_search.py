@@ -0,0 +1,145 @@
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.routers.interventions import _phone_core, _search_normalize, _search_query
+
+from db_case import DbTestCase
+
+
+# Saisies et documents : accents, ligatures, apostrophes typographiques,
+# espaces multiples, caracteres hors table (laisses tels quels).
+SAMPLES = [
+    "Écaussinnes",
+    "ECAUSSINNES",
+    "  Rue de l’Église   12 ",
+    "Cœur d‘Alène",
+    "ÆSOP Œuvre",
+    "Ÿvoir à Namur",
+    "Façade\tvitrée\n2e étage",
+    "Ñandú `test´",
+    "100% net_1",
+    "Dvořák ß",
+    "",
+]
+
+
+def _word():
+    """Mot unique sans chiffre : ne declenche pas la recherche par telephone."""
+    return uuid.uuid4().hex.translate(str.maketrans("0123456789", "ghijklmnop"))[:10]
+
+
+class PhoneCoreTests(unittest.TestCase):
+    def test_belgian_prefixes_are_dropped(self):
+        for digits in ("0475123456", "32475123456", "0032475123456", "00475123456"):
+            with self.subTest(digits=digits):
+                self.assertEqual(_phone_core(digits), "475123456")
+
+    def test_short_numbers_keep_their_prefix(self):
+        # Moins de 6 chiffres apres le prefixe : numero de rue, code postal...
+        for digits in ("012345", "3212345", "00475", "123456"):
+            with self.subTest(digits=digits):
+                self.assertEqual(_phone_core(digits), digits)
+
+    def test_each_prefix_is_dropped_once_in_order(self):
+        # Forme internationale ecrite avec le 0 national.
+        self.assertEqual(_phone_core("00320475123456"), "475123456")
+        # "32" n'est cherche qu'avant le "0" national : 032... reste 32...
+        self.assertEqual(_phone_core("0320123456"), "320123456")
+
+
+class SearchNormalizeTests(unittest.TestCase):
+    def test_accents_case_and_spaces(self):
+        self.assertEqual(_search_normalize("Écaussinnes"), "ecaussinnes")
+        self.assertEqual(_search_normalize("  Rue de l’Église   12 "), "rue de l'eglise 12")
+        self.assertEqual(_search_normalize("Cœur d‘Alène"), "coeur d'alene")
+        self.assertEqual(_search_normalize("ÆSOP Œuvre"), "aesop oeuvre")
+        self.assertEqual(_search_normalize("Façade\tvitrée\n2e étage"), "facade vitree 2e etage")
+
+    def test_empty(self):
+        self.assertEqual(_search_normalize(None), "")
+        self.assertEqual(_search_normalize("   "), "")
+
+
+class SearchQueryTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = SimpleNamespace(id=uuid.uuid4(), role="admin", zone="hainaut")
+        self.origin = datetime(2031, 3, 3, 9, tzinfo=timezone.utc)
+
+    def _client(self, name, phone=None):
+        client_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO clients (id, name, phone) VALUES (:id, :name, :phone)",
+            id=client_id, name=name, phone=phone,
+        )
+        return client_id
+
+    def _intervention(self, title, days=0, client_id=None, description=None, phone=None):
+        intervention_id = uuid.uuid4()
+        start = self.origin + timedelta(days=days)
+        self._exec(
+            "INSERT INTO interventions (id, type, title, description, phone, client_id, start_time, end_time, "
+            "status, payment_mode, price_estimated, time_tbd, zone, tour_visibility) "
+            "VALUES (:id, 'intervention', :title, :description, :phone, :client, :start, :end, 'planned', "
+            "'cash', 80, FALSE, 'hainaut', 'none')",
+            id=intervention_id, title=title, description=description, phone=phone, client=client_id,
+            start=start, end=start + timedelta(hours=1),
+        )
+        return intervention_id
+
+    def _search(self, q):
+        return [iv.id for iv in _search_query(self.db, self.admin, q)]
+
+    def test_python_matches_sql_normalization(self):
+        for value in SAMPLES:
+            with self.subTest(value=value):
+                sql = self._exec("SELECT search_normalize(:value)", value=value).scalar()
+                self.assertEqual(_search_normalize(value), sql)
+
+    def test_ranking(self):
+        # Cle propre au test : les autres lignes de la base ne matchent pas.
+        key = _word()
+        anywhere = self._intervention(f"Vitres{key}x", days=5)
+        word_recent = self._intervention(f"Vitres {key}ë", days=4)
+        word_old = self._intervention(f"Vitres {key}e", days=1)
+        client_prefix = self._intervention("Vitrine", days=0, client_id=self._client(f"{key.upper()} SPRL"))
+        title_prefix = self._intervention(f"{key} rez", days=2)
+        self._intervention("Sans rapport", days=3)
+
+        # Debut de document (titre ou client) > debut d'un mot > n'importe ou ;
+        # puis le plus recent. Accents et casse ignores des deux cotes.
+        self.assertEqual(self._search(f"  {key.upper()}Ë "), [word_recent, word_old])
+        self.assertEqual(
+            self._search(key.upper()),
+            [title_prefix, client_prefix, word_recent, word_old, anywhere],
+        )
+
+    def test_phone_forms_and_escaping(self):
+        key = uuid.uuid4().int % 10**6
+        phone = f"0475 {key:06d}".replace(" ", "/", 1)
+        by_client = self._intervention("Client", days=1, client_id=self._client("Tel", phone=f"+32 475 {key:06d}"))
+        by_field = self._intervention("Champ", days=0, phone=phone)
+        by_description = self._intervention("Note", days=2, description=f"rappeler le 0032475{key:06d}")
+        expected = {by_client, by_field, by_description}
+        for q in (f"0475{key:06d}", f"+32 475 {key:06d}", f"475.{key:06d}"):
+            with self.subTest(q=q):
+                self.assertEqual(set(self._search(q)), expected)
+
+        # % et _ sont cherches tels quels.
+        word = _word()
+        literal = self._intervention(f"Remise 100% net_{word}")
+        self.assertEqual(self._search(f"100% net_{word}"), [literal])
+        self.assertEqual(self._search(f"100x net {word}"), [])
+
+    def test_documents_follow_sql_trigger(self):
+        intervention_id = self._intervention("Façade  Œuvre", description="2e ÉTAGE")
+        document = self._exec(
+            "SELECT search_document FROM interventions WHERE id = :id", id=intervention_id,
+        ).scalar()
+        self.assertEqual(document, _search_normalize("Façade  Œuvre 2e ÉTAGE"))
+
+
+if __name__ == "__main__":
+    unittest.main()
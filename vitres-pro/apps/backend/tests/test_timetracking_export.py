@@ -0,0 +1,151 @@
+"""Export paie des pointages (GET /api/timetracking/export).
+
+Verifie le contenu des lignes (jours, absences, totaux de semaine, cash,
+reglements), les deux formats, et que le nombre de requetes ne depend ni du
+nombre d'employes ni de la longueur de la periode.
+"""
+import csv
+import io
+import unittest
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+from openpyxl import load_workbook
+from sqlalchemy import event
+
+from app.routers.timetracking import (
+    EXPORT_COLUMNS, _csv_chunks, _export_rows, _xlsx_chunks, export_timesheets,
+)
+
+from db_case import DbTestCase, at
+
+MONDAY = date(2031, 3, 3)
+SUNDAY = MONDAY + timedelta(days=13)
+# Employes, absences, montees en charge, reglements heures sup et cash, cash
+# agrege, pointages (curseur serveur).
+MAX_QUERIES = 7
+
+
+class TimetrackingExportTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.emp = self._employee("Export A")
+        for i in range(5):
+            d = MONDAY + timedelta(days=i)
+            self._entry(self.emp, d, 9)
+        self._exec(
+            "INSERT INTO absences (id, employee_id, start_date, end_date, type) "
+            "VALUES (gen_random_uuid(), :emp, :start, :end, 'sick')",
+            emp=self.emp, start=at(MONDAY + timedelta(days=7), 0), end=at(MONDAY + timedelta(days=7), 23),
+        )
+        self._exec(
+            "INSERT INTO overtime_settlements (id, employee_id, delta_hours, carried_forward_hours, "
+            "period_start, period_end) VALUES (gen_random_uuid(), :emp, 8, 0.5, '2031-02-24', :end)",
+            emp=self.emp, end=MONDAY + timedelta(days=6),
+        )
+        self._exec(
+            "INSERT INTO cash_settlements (id, employee_id, amount, week_start) VALUES (gen_random_uuid(), :emp, 40, :week)",
+            emp=self.emp, week=MONDAY,
+        )
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, time_tbd, zone, tour_visibility, closed_by_employee_id) "
+            "VALUES (gen_random_uuid(), 'intervention', 'Export', :start, :end, 'done', 'cash', 40, FALSE, "
+            "'hainaut', 'none', :emp)",
+            start=at(MONDAY + timedelta(days=1), 10), end=at(MONDAY + timedelta(days=1), 11), emp=self.emp,
+        )
+
+    def _employee(self, name):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone, daily_capacity) "
+            "VALUES (:id, :email, :name, 'employee', 'hainaut', 8)",
+            id=emp, email=f"export-{emp}@example.invalid", name=name,
+        )
+        return emp
+
+    def _entry(self, emp, d, hours):
+        self._exec(
+            "INSERT INTO employee_time_entries (id, employee_id, work_date, clock_in_at, clock_out_at) "
+            "VALUES (gen_random_uuid(), :emp, :day, :start, :end)",
+            emp=emp, day=d, start=at(d, 7), end=at(d, 7 + hours),
+        )
+
+    def _rows(self, first=MONDAY, last=SUNDAY):
+        statements = []
+
+        def count(*_args):
+            statements.append(1)
+
+        event.listen(self.connection, "before_cursor_execute", count)
+        try:
+            rows = list(_export_rows(self.db, first, last))
+        finally:
+            event.remove(self.connection, "before_cursor_execute", count)
+        return rows, len(statements)
+
+    def _employee_rows(self, rows, name="Export A"):
+        return [row for row in rows[1:] if row[0] == name]
+
+    def test_days_and_week_totals(self):
+        rows, _ = self._rows()
+        self.assertEqual(rows[0], EXPORT_COLUMNS)
+        mine = self._employee_rows(rows)
+        self.assertEqual(len(mine), 2 * 8)
+
+        monday = mine[0]
+        self.assertEqual(monday[1:7], [MONDAY, "07:00", "16:00", 9.0, None, 9.0])
+        first_week = mine[7]
+        self.assertEqual(first_week[1], "Semaine du 03/03/2031")
+        self.assertEqual(first_week[7:], [45.0, 8.0, 40.0, 40.0, 8.0, 0.5])
+
+        absent_monday = mine[8]
+        self.assertEqual(absent_monday[5:7], ["absence", 8.0])
+        second_week = mine[15]
+        self.assertEqual(second_week[7:], [8.0, -29.0, 0.0, None, None, None])
+
+    def test_query_count_is_fixed(self):
+        _, baseline = self._rows()
+        self.assertLessEqual(baseline, MAX_QUERIES)
+        for n in range(5):
+            emp = self._employee(f"Export {n}")
+            for i in range(0, 300, 2):
+                self._entry(emp, MONDAY - timedelta(days=200) + timedelta(days=i), 7)
+        rows, queries = self._rows(MONDAY - timedelta(days=203), SUNDAY)
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(rows), 1 + 6 * 31 * 8)
+
+    def test_csv_and_xlsx_formats(self):
+        content = b"".join(_csv_chunks(_export_rows(self.db, MONDAY, SUNDAY)))
+        self.assertTrue(content.startswith("\ufeff".encode("utf-8")))
+        parsed = list(csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual(parsed[0], EXPORT_COLUMNS)
+        self.assertIn(["Export A", "2031-03-03", "07:00", "16:00", "9.0", "", "9.0", "", "", "", "", "", ""], parsed)
+
+        content = b"".join(_xlsx_chunks(_export_rows(self.db, MONDAY, SUNDAY)))
+        sheet = load_workbook(io.BytesIO(content), read_only=True)["Pointages"]
+        values = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(values[0], EXPORT_COLUMNS)
+        self.assertIn(
+            ["Export A", "Semaine du 03/03/2031", None, None, None, None, None, 45, 8, 40, 40, 8, 0.5],
+            values,
+        )
+
+    def test_validation(self):
+        admin = SimpleNamespace(role="admin")
+        for params in ({"format": "pdf"}, {"date_from": SUNDAY, "date_to": MONDAY}):
+            args = {"date_from": MONDAY, "date_to": SUNDAY, "format": "csv", **params}
+            with self.subTest(params=params), self.assertRaises(HTTPException) as raised:
+                export_timesheets(**args, current_user=admin)
+            self.assertEqual(raised.exception.status_code, 400)
+        with self.assertRaises(HTTPException) as raised:
+            export_timesheets(MONDAY, SUNDAY, "csv", current_user=SimpleNamespace(role="employee"))
+        self.assertEqual(raised.exception.status_code, 403)
+        response = export_timesheets(MONDAY + timedelta(days=2), MONDAY + timedelta(days=9), "csv", current_user=admin)
+        self.assertIn("pointages_2031-03-03_2031-03-16.csv", response.headers["content-disposition"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+"""Brouillons de tournee : horizon par modele (drafts_until, migration 034).
+
+Verifie que ensure_drafts avance l'horizon sans reparcourir les semaines
+deja generees, que GET /api/tours/drafts n'ecrit ni ne verrouille rien, que
+deux lectures paralleles passent pendant qu'une generation tient les
+tables, et que generer ou enregistrer un gros modele coute un nombre fixe
+d'instructions.
+"""
+import unittest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.models import TourRun, TourRunStop, TourTemplate
+from app.routers.tours import _local_datetime, ensure_drafts, list_drafts, update_template
+from app.schemas.schemas import TourTemplateInput
+
+from db_case import DbTestCase
+
+# Lundi ; le modele passe le mercredi.
+MONDAY = date(2031, 3, 3)
+ADMIN = SimpleNamespace(role="admin")
+# Un an de brouillons d'un modele de 60 commerces : INSERT multi-lignes par
+# lots, independants du nombre de commerces et de semaines.
+MAX_STATEMENTS = 40
+
+
+def _large_payload():
+    """3 sections de 20 commerces a deux prestations ; un commerce et une
+    prestation inactifs ne sont pas copies."""
+    return TourTemplateInput(
+        name="Tournee longue", zone="hainaut", weekday=3, active=True,
+        default_start_time=time(7, 30), default_end_time=time(15),
+        sections=[
+            {
+                "label": f"Section {s}",
+                "position": 2 - s,
+                "stops": [
+                    {
+                        "name": f"Commerce {s}-{n}",
+                        "position": 19 - n,
+                        "active": (s, n) != (0, 0),
+                        "services": [
+                            {"label": "2 F", "price_ht": 30, "position": 0},
+                            {"label": "1 F", "price_ht": 20, "position": 1, "active": n != 1},
+                        ],
+                    }
+                    for n in range(20)
+                ],
+            }
+            for s in range(3)
+        ],
+    )
+
+
+class TourDraftsTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self.template = uuid.uuid4()
+        self._exec(
+            "INSERT INTO tour_templates (id, name, zone, weekday, default_start_time, default_end_time, active) "
+            "VALUES (:id, 'Tournee horizon', 'hainaut', 3, '08:00', '16:00', TRUE)",
+            id=self.template,
+        )
+        stop = uuid.uuid4()
+        self._exec(
+            "INSERT INTO tour_stops (id, template_id, name, position, active) VALUES (:id, :template, 'Commerce', 0, TRUE)",
+            id=stop, template=self.template,
+        )
+        self._exec(
+            "INSERT INTO tour_services (id, stop_id, label, price_ht, position, active) "
+            "VALUES (gen_random_uuid(), :stop, '2 F', 30, 0, TRUE)",
+            stop=stop,
+        )
+
+    def _statements(self, connection, call):
+        statements = []
+
+        def record(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        event.listen(connection, "before_cursor_execute", record)
+        try:
+            result = call()
+        finally:
+            event.remove(connection, "before_cursor_execute", record)
+        return result, statements
+
+    def _drafts(self, db):
+        runs = list_drafts(start=MONDAY, weeks=8, db=db, current_user=ADMIN)
+        return [run.scheduled_date for run in runs if run.template_id == self.template]
+
+    def test_generation_advances_the_watermark(self):
+        self.assertEqual(ensure_drafts(self.db, MONDAY, 4, self.template), 4)
+        template = self.db.get(TourTemplate, self.template)
+        self.assertEqual(template.drafts_until, MONDAY + timedelta(weeks=4))
+
+        # Horizon couvert : une seule requete, aucun verrou pris sur le modele.
+        self.db.flush()
+        created, statements = self._statements(self.connection, lambda: ensure_drafts(self.db, MONDAY, 4, self.template))
+        self.assertEqual((created, len(statements)), (0, 1))
+
+        # Horizon etendu : seules les semaines nouvelles sont parcourues.
+        self.assertEqual(ensure_drafts(self.db, MONDAY, 6, self.template), 2)
+        self.assertEqual(template.drafts_until, MONDAY + timedelta(weeks=6))
+        self.assertEqual(self._drafts(self.db), [MONDAY + timedelta(days=2, weeks=i) for i in range(6)])
+
+        # Un brouillon supprime par l'admin n'est pas recree.
+        self._exec(
+            "DELETE FROM interventions WHERE id = (SELECT intervention_id FROM tour_runs "
+            "WHERE template_id = :id AND scheduled_date = :day)",
+            id=self.template, day=MONDAY + timedelta(days=2),
+        )
+        self.assertEqual(ensure_drafts(self.db, MONDAY, 6, self.template), 0)
+
+    def test_list_drafts_is_a_pure_read(self):
+        ensure_drafts(self.db, MONDAY, 3, self.template)
+        self.db.flush()
+        self.db.expire_all()
+        drafts, statements = self._statements(self.connection, lambda: self._drafts(self.db))
+        self.assertEqual(drafts, [MONDAY + timedelta(days=2, weeks=i) for i in range(3)])
+        for statement in statements:
+            self.assertTrue(statement.lstrip().upper().startswith("SELECT"), statement)
+            self.assertNotIn("FOR UPDATE", statement.upper())
+        # Rien n'a ete ecrit ni ajoute a la session.
+        self.assertFalse(self.db.new or self.db.dirty or self.db.deleted)
+
+    def test_large_template_snapshot_is_set_based(self):
+        self.assertEqual(ensure_drafts(self.db, MONDAY, 52, self.template), 52)
+        self.db.flush()
+        _, statements = self._statements(
+            self.connection, lambda: update_template(self.template, _large_payload(), db=self.db, current_user=ADMIN)
+        )
+        self.assertLessEqual(len(statements), MAX_STATEMENTS)
+
+        self.db.expire_all()
+        runs = self.db.query(TourRun).filter(TourRun.template_id == self.template).order_by(TourRun.scheduled_date).all()
+        self.assertEqual(len(runs), 52)
+        # Sections et commerces dans l'ordre des positions, inactifs exclus.
+        expected = [f"Commerce {s}-{n}" for s in (2, 1, 0) for n in range(19, -1, -1) if (s, n) != (0, 0)]
+        for run in runs:
+            with self.subTest(run=run.scheduled_date):
+                self.assertEqual([stop.name for stop in run.stops], expected)
+                self.assertEqual(run.stops[0].section_label, "Section 2")
+                self.assertEqual([stop.position for stop in run.stops], list(range(59)))
+                self.assertFalse(any(stop.selected for stop in run.stops))
+                labels = {stop.name: [service.label for service in stop.services] for stop in run.stops}
+                self.assertEqual(labels["Commerce 2-0"], ["2 F", "1 F"])
+                self.assertEqual(labels["Commerce 2-1"], ["2 F"])
+                # Heure locale, y compris apres le passage a l'heure d'ete.
+                self.assertEqual(run.intervention.start_time, _local_datetime(run.scheduled_date, time(7, 30)))
+                self.assertEqual(run.intervention.title, "Tournee longue")
+                self.assertEqual(run.intervention.price_estimated, 0)
+        self.assertEqual(
+            self.db.query(TourRunStop).join(TourRun).filter(TourRun.template_id == self.template).count(),
+            52 * 59,
+        )
+
+        # Changement de jour : les anciens brouillons disparaissent, le nouveau
+        # jour est regenere depuis aujourd'hui.
+        payload = _large_payload()
+        payload.weekday = 5
+        update_template(self.template, payload, db=self.db, current_user=ADMIN)
+        self.db.expire_all()
+        weekdays = {
+            run.scheduled_date.isoweekday()
+            for run in self.db.query(TourRun).filter(TourRun.template_id == self.template)
+        }
+        self.assertEqual(weekdays, {5})
+
+    def test_parallel_gets_do_not_block_each_other(self):
+        # Une generation en cours (planificateur, enregistrement d'un modele)
+        # tient les tables : toute ecriture ou SELECT ... FOR UPDATE attend,
+        # une lecture simple passe. Le modele de setUp, non commite, tiendrait
+        # lui-meme un verrou d'ecriture : on l'annule d'abord.
+        self.transaction.rollback()
+        self.transaction = self.connection.begin()
+        holder = self.engine.connect()
+        holder.begin()
+        try:
+            holder.execute(text("SET LOCAL lock_timeout = '2s'"))
+            holder.execute(text("LOCK TABLE tour_templates, tour_runs, interventions IN EXCLUSIVE MODE"))
+
+            def get_drafts(_):
+                with self.engine.connect() as connection, connection.begin():
+                    connection.execute(text("SET LOCAL lock_timeout = '2s'"))
+                    db = Session(bind=connection)
+                    try:
+                        runs = list_drafts(start=MONDAY, weeks=8, db=db, current_user=ADMIN)
+                        writer = connection.execute(text("SELECT txid_current_if_assigned()")).scalar()
+                        return len(runs), writer
+                    finally:
+                        db.close()
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                results = list(pool.map(get_drafts, range(2)))
+            self.assertEqual([writer for _, writer in results], [None, None])
+
+            # Temoin : l'ancienne lecture (ensure_drafts) restait bloquee.
+            with self.engine.connect() as connection, connection.begin():
+                connection.execute(text("SET LOCAL lock_timeout = '200ms'"))
+                with self.assertRaises(OperationalError):
+                    ensure_drafts(Session(bind=connection), MONDAY, 8)
+        finally:
+            holder.rollback()
+            holder.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Cash hebdomadaire par employe, agrege en SQL (_weekly_cash_amounts).
+
+Compare, sur un jeu genere, l'agregat SQL au calcul Python qu'il remplace
+(interventions de la semaine hydratees avec leurs employes, puis filtrees
+employe par employe).
+"""
+import random
+import unittest
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy.orm import selectinload
+
+from app.models.models import Employee, Intervention
+from app.routers.planning import BRUSSELS_TZ, _utc_bounds
+from app.routers.timetracking import _weekly_cash_amount, _weekly_cash_amounts
+
+from db_case import DbTestCase
+
+MONDAY = date(2031, 3, 10)
+SUNDAY = MONDAY + timedelta(days=6)
+
+
+def _python_cash_amount(db, emp, week_start, week_end):
+    """Regles d'origine, intervention par intervention."""
+    day_start_utc, _ = _utc_bounds(week_start)
+    _, day_end_utc = _utc_bounds(week_end)
+    interventions = (
+        db.query(Intervention)
+        .options(selectinload(Intervention.employees))
+        .filter(
+            Intervention.start_time >= day_start_utc,
+            Intervention.start_time < day_end_utc,
+            Intervention.status == "done",
+            Intervention.payment_mode.in_(["cash", "invoice_cash"]),
+            Intervention.tour_visibility == "none",
+        )
+        .all()
+    )
+    total = 0.0
+    for iv in interventions:
+        if iv.closed_by_employee_id is not None:
+            if iv.closed_by_employee_id != emp.id:
+                continue
+        elif not any(e.id == emp.id for e in iv.employees):
+            continue
+        if iv.deferred_cash_amount is not None:
+            continue
+        if iv.payment_mode == "invoice_cash":
+            total += float(iv.amount_cash) if iv.amount_cash is not None else float(iv.price_estimated or 0)
+        else:
+            total += float(iv.price_estimated or 0)
+    return round(total, 2)
+
+
+class WeeklyCashTests(DbTestCase):
+    def test_matches_python_rules_on_generated_week(self):
+        rng = random.Random(22)
+        ids = []
+        for _ in range(8):
+            emp = uuid.uuid4()
+            ids.append(emp)
+            self._exec(
+                "INSERT INTO employees (id, email, full_name, role, zone) "
+                "VALUES (:id, :email, 'Cash', 'employee', 'hainaut')",
+                id=emp, email=f"cash-{emp}@example.invalid",
+            )
+        # Semaine et bords (dimanche soir / lundi 00h30 heure belge).
+        starts = [datetime(2031, 3, 9, 23, 30, tzinfo=BRUSSELS_TZ), datetime(2031, 3, 17, 0, 30, tzinfo=BRUSSELS_TZ)]
+        starts += [
+            datetime.combine(MONDAY + timedelta(days=rng.randrange(7)), datetime.min.time(), BRUSSELS_TZ)
+            + timedelta(minutes=rng.randrange(24 * 60))
+            for _ in range(300)
+        ]
+        for start in starts:
+            intervention_id = uuid.uuid4()
+            price = rng.choice([None, Decimal(rng.randrange(0, 40000)) / 100])
+            self._exec(
+                "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+                "price_estimated, amount_cash, deferred_cash_amount, time_tbd, zone, tour_visibility, "
+                "closed_by_employee_id) VALUES (:id, 'intervention', 'Cash', :start, :end, :status, :mode, "
+                ":price, :cash, :deferred, FALSE, 'hainaut', :visibility, :closed_by)",
+                id=intervention_id, start=start, end=start + timedelta(hours=1),
+                status=rng.choice(["done", "done", "done", "planned"]),
+                mode=rng.choice(["cash", "invoice_cash", "invoice_cash", "invoice"]),
+                price=price,
+                cash=rng.choice([None, Decimal(rng.randrange(0, 20000)) / 100]),
+                deferred=rng.choice([None, None, None, Decimal("25.00")]),
+                visibility=rng.choice(["none", "none", "none", "published"]),
+                closed_by=rng.choice([None, None] + ids),
+            )
+            for emp in rng.sample(ids, rng.randrange(4)):
+                self._exec(
+                    "INSERT INTO intervention_employees (intervention_id, employee_id) VALUES (:iv, :emp)",
+                    iv=intervention_id, emp=emp,
+                )
+
+        employees = self.db.query(Employee).filter(Employee.id.in_(ids)).all()
+        amounts = _weekly_cash_amounts(self.db, employees, MONDAY, SUNDAY)
+        self.assertEqual(set(amounts), set(ids))
+        for emp in employees:
+            with self.subTest(employee=emp.id):
+                expected = _python_cash_amount(self.db, emp, MONDAY, SUNDAY)
+                self.assertEqual(amounts[emp.id], expected)
+                self.assertEqual(_weekly_cash_amount(self.db, emp, MONDAY, SUNDAY), expected)
+        self.assertGreater(sum(amounts.values()), 0)
+
+    def test_employee_without_cash_gets_zero(self):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone) VALUES (:id, :email, 'Cash', 'employee', 'hainaut')",
+            id=emp, email=f"cash-{emp}@example.invalid",
+        )
+        employee = self.db.get(Employee, emp)
+        self.assertEqual(_weekly_cash_amounts(self.db, [employee], MONDAY, SUNDAY), {emp: 0.0})
+        self.assertEqual(_weekly_cash_amounts(self.db, [], MONDAY, SUNDAY), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
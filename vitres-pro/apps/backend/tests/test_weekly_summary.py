@@ -0,0 +1,153 @@
+"""Recap hebdomadaire des pointages (GET /api/timetracking/weekly-summary).
+
+Verifie les soldes d'heures sup, le cash de la semaine et les pointages du
+jour, que la route n'ecrit rien (le registre est tenu par
+refresh_ledger_job), puis que le nombre de requetes reste le meme quand on
+ajoute des employes et des semaines non reglees.
+"""
+import unittest
+import uuid
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from sqlalchemy import event
+
+from app.routers.timetracking import refresh_weekly_ledger, weekly_summary
+
+from db_case import DbTestCase, at
+
+# Mercredi : la semaine en cours commence le lundi 10 mars.
+TODAY = date(2031, 3, 12)
+CURRENT_MONDAY = date(2031, 3, 10)
+ADMIN = SimpleNamespace(role="admin")
+# Employes, reglements cash, cash agrege, reglements heures sup, premiers
+# pointages, versions et registre des semaines, semaines a recalculer
+# (pointages, absences, montees en charge), puis pointages, absences et
+# montees en charge de la semaine affichee.
+MAX_QUERIES = 13
+
+
+class WeeklySummaryTests(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        today = mock.patch("app.routers.timetracking._today_brussels", return_value=TODAY)
+        today.start()
+        self.addCleanup(today.stop)
+
+        self.a, self.b, self.c = (self._employee(role) for role in ("employee", "employee", "subcontractor"))
+        # A : jamais regle, deux semaines completes de 40 h (dont une absence).
+        for d in _days(date(2031, 2, 24), 5) + _days(date(2031, 3, 3), 4) + [CURRENT_MONDAY]:
+            self._entry(self.a, d, 8)
+        self._exec(
+            "INSERT INTO absences (id, employee_id, start_date, end_date, type) "
+            "VALUES (gen_random_uuid(), :emp, :start, :end, 'sick')",
+            emp=self.a, start=at(date(2031, 3, 7), 0), end=at(date(2031, 3, 7), 23),
+        )
+        # B : regle jusqu'au 2 mars avec 1,5 h de reliquat, puis 27 h.
+        self._exec(
+            "INSERT INTO overtime_settlements (id, employee_id, delta_hours, carried_forward_hours, "
+            "period_start, period_end) VALUES (gen_random_uuid(), :emp, 3, 1.5, '2031-02-24', '2031-03-02')",
+            emp=self.b,
+        )
+        for d in _days(date(2031, 3, 3), 3):
+            self._entry(self.b, d, 9)
+
+        self._intervention("cash", 100, closed_by=self.a, assigned=(self.a, self.b))
+        self._intervention("invoice_cash", 300, amount_cash=120, assigned=(self.a, self.b))
+        self._intervention("cash", 50, closed_by=self.b, deferred=50)
+        self._exec(
+            "INSERT INTO cash_settlements (id, employee_id, amount, week_start) "
+            "VALUES (gen_random_uuid(), :emp, 77, :week)",
+            emp=self.b, week=CURRENT_MONDAY,
+        )
+
+    def _employee(self, role):
+        emp = uuid.uuid4()
+        self._exec(
+            "INSERT INTO employees (id, email, full_name, role, zone, daily_capacity) "
+            "VALUES (:id, :email, 'Recap', :role, 'hainaut', 8)",
+            id=emp, email=f"summary-{emp}@example.invalid", role=role,
+        )
+        return emp
+
+    def _entry(self, emp, d, hours):
+        self._exec(
+            "INSERT INTO employee_time_entries (id, employee_id, work_date, clock_in_at, clock_out_at) "
+            "VALUES (gen_random_uuid(), :emp, :day, :start, :end)",
+            emp=emp, day=d, start=at(d, 8), end=at(d, 8 + hours),
+        )
+
+    def _intervention(self, mode, price, amount_cash=None, closed_by=None, deferred=None, assigned=()):
+        intervention_id = uuid.uuid4()
+        self._exec(
+            "INSERT INTO interventions (id, type, title, start_time, end_time, status, payment_mode, "
+            "price_estimated, amount_cash, deferred_cash_amount, time_tbd, zone, tour_visibility, "
+            "closed_by_employee_id) VALUES (:id, 'intervention', 'Recap', :start, :end, 'done', :mode, "
+            ":price, :cash, :deferred, FALSE, 'hainaut', 'none', :closed_by)",
+            id=intervention_id, start=at(CURRENT_MONDAY, 10), end=at(CURRENT_MONDAY, 11), mode=mode,
+            price=price, cash=amount_cash, deferred=deferred, closed_by=closed_by,
+        )
+        for emp in assigned:
+            self._exec(
+                "INSERT INTO intervention_employees (intervention_id, employee_id) VALUES (:iv, :emp)",
+                iv=intervention_id, emp=emp,
+            )
+
+    def _summary(self):
+        statements = []
+
+        def count(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        event.listen(self.connection, "before_cursor_execute", count)
+        try:
+            summary = weekly_summary(week_start=CURRENT_MONDAY.isoformat(), db=self.db, current_user=ADMIN)
+        finally:
+            event.remove(self.connection, "before_cursor_execute", count)
+        writes = [s for s in statements if not s.lstrip().upper().startswith("SELECT")]
+        self.assertEqual(writes, [])
+        return {e.employee_id: e for e in summary.employees}, len(statements)
+
+    def test_balances_cash_and_daily_entries(self):
+        by_employee, _ = self._summary()
+        a, b, c = by_employee[self.a], by_employee[self.b], by_employee[self.c]
+
+        self.assertEqual(
+            (a.overtime_balance_hours, a.overtime_period_start, a.overtime_period_end),
+            (6.0, date(2031, 2, 24), date(2031, 3, 9)),
+        )
+        self.assertEqual((b.overtime_balance_hours, b.overtime_period_start), (-8.5, date(2031, 3, 3)))
+        self.assertEqual((c.overtime_balance_hours, c.overtime_period_start), (0.0, CURRENT_MONDAY))
+
+        self.assertEqual((a.cash_amount, a.cash_settled), (220.0, False))
+        self.assertEqual((b.cash_amount, b.cash_settled), (77.0, True))
+        self.assertEqual((c.cash_amount, c.cash_settled), (0.0, False))
+
+        self.assertEqual([d.actual_hours for d in a.daily_entries], [8.0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(len(c.daily_entries), 7)
+
+    def test_query_count_does_not_grow_with_employees_or_weeks(self):
+        _, baseline = self._summary()
+        self.assertLessEqual(baseline, MAX_QUERIES)
+
+        for _ in range(6):
+            emp = self._employee("employee")
+            for d in _days(date(2030, 10, 7), 150):
+                self._entry(emp, d, 7)
+        by_employee, queries = self._summary()
+        self.assertEqual(len(by_employee), 9)
+        self.assertEqual(queries, baseline)
+
+        # Semaines terminees enregistrees par le job : plus rien a recalculer.
+        refresh_weekly_ledger(self.db)
+        _, cached = self._summary()
+        self.assertEqual(cached, baseline - 3)
+
+
+def _days(start: date, count: int) -> list:
+    return [start + timedelta(days=i) for i in range(count)]
+
+
+if __name__ == "__main__":
+    unittest.main()